@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台自动保存与崩溃恢复
+编辑停止片刻后（防抖，连续编辑时最长延迟MAX_LATENCY_S），GUI线程只复制变化轨道的列数组，
+编码、压缩、写盘和fsync都在后台线程完成，不阻塞界面。
+
+自动保存不覆盖用户的项目文件，而是写入恢复目录中本次会话的文件：
+
+    <会话>.journal       日志：头记录（基础文件、通道路由、轨道信息）+ 各次变化轨道的完整数据块
+    <会话>_<序号>.mcproj  检查点：空闲时把基础文件和日志合并成的完整项目（原子写入）
+
+每条记录带长度和CRC32，崩溃时写了一半的记录在恢复时被丢弃；检查点写完后日志才改为以它为基础。
+用户保存项目后以项目文件为新的基础，正常退出时删除恢复文件。
+"""
+
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+from models.channel_map import ChannelMap
+from models.timeline_data import TimelineData, MotorTrack, LoopMode
+from core.project_format import (Chunk, CODEC_ZLIB, ProjectReader, ProjectFormatError, assemble_project,
+                                 decode_columns, decompress_chunk, encode_chunk, encode_columns,
+                                 is_binary_project, load_timeline, timeline_metadata, write_file_atomic)
+from core.project_manager import PROJECT_EXTENSION
+from core.logger import get_logger
+
+logger = get_logger()
+
+# 恢复文件目录
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.motor_controller', 'autosave')
+JOURNAL_EXTENSION = '.journal'
+
+DEBOUNCE_S = 0.5                       # 编辑停止多久后写日志
+MAX_LATENCY_S = 2.0                    # 连续编辑时最长多久写一次日志
+CHECKPOINT_IDLE_S = 5.0                # 空闲多久后合并检查点
+MAX_JOURNAL_BYTES = 64 * 1024 * 1024   # 日志超过此大小时不等空闲即合并检查点
+
+# 记录头：魔数, 内容长度, CRC32(内容)；内容第一个字节为记录类型
+_RECORD = struct.Struct('<4sII')
+_RECORD_MAGIC = b'MCJR'
+# 轨道记录：轨道信息JSON长度，之后是JSON和数据块
+_TRACK_INFO = struct.Struct('<I')
+
+RECORD_HEADER = b'H'
+RECORD_TRACK = b'T'
+
+
+class Recovery(NamedTuple):
+    """上次异常退出留下的可恢复修改"""
+    journal_path: str
+    project_path: Optional[str]     # 对应的项目文件（未保存过的新项目为None）
+    saved_time: float               # 最后写入时间（time.time()）
+    track_count: int                # 日志中记录的轨道数
+
+
+def _record(kind: bytes, payload: bytes) -> bytes:
+    body = kind + payload
+    return _RECORD.pack(_RECORD_MAGIC, len(body), zlib.crc32(body)) + body
+
+
+def _file_identity(file_path: str) -> Optional[List[int]]:
+    """文件的大小和修改时间（判断基础文件是否被改动）"""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _process_alive(pid: int) -> bool:
+    """会话所属进程是否仍在运行（Windows上os.kill会结束进程，不做检查）"""
+    if pid == os.getpid():
+        return True
+    if os.name == 'nt':
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_journal(journal_path: str) -> List[Tuple[bytes, bytes]]:
+    """
+    读取日志中的完整记录（遇到写了一半或校验失败的记录即停止）
+
+    Returns:
+        [(记录类型, 内容)]
+    """
+    with open(journal_path, 'rb') as f:
+        data = f.read()
+    records = []
+    offset = 0
+    while offset + _RECORD.size <= len(data):
+        magic, length, crc = _RECORD.unpack_from(data, offset)
+        body = data[offset + _RECORD.size:offset + _RECORD.size + length]
+        if magic != _RECORD_MAGIC or len(body) < length or zlib.crc32(body) != crc:
+            break
+        records.append((body[:1], body[1:]))
+        offset += _RECORD.size + length
+    if offset < len(data):
+        logger.warning(f"日志末尾有{len(data) - offset}字节不完整，已忽略: {journal_path}")
+    return records
+
+
+def _session_files(directory: str, session: str) -> List[str]:
+    """会话的日志、检查点和临时文件"""
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    return [os.path.join(directory, name) for name in names
+            if name.startswith(session + '.') or name.startswith(session + '_')]
+
+
+def find_recoveries(directory: str = DEFAULT_DIRECTORY) -> List[Recovery]:
+    """
+    查找上次异常退出留下的恢复文件（正在运行的会话除外，没有修改的日志直接删除）
+
+    Returns:
+        List[Recovery]: 按最后写入时间从新到旧
+    """
+    recoveries = []
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith(JOURNAL_EXTENSION)]
+    except OSError:
+        return recoveries
+    for name in names:
+        session = name[:-len(JOURNAL_EXTENSION)]
+        try:
+            if _process_alive(int(session.split('-')[0])):
+                continue
+        except ValueError:
+            continue
+        journal_path = os.path.join(directory, name)
+        try:
+            records = read_journal(journal_path)
+            if not records or records[0][0] != RECORD_HEADER:
+                raise ProjectFormatError("缺少日志头")
+            header = json.loads(records[0][1].decode('utf-8'))
+            track_count = sum(1 for kind, _ in records if kind == RECORD_TRACK)
+            if track_count == 0 and header['base']['kind'] != 'checkpoint':
+                discard_recovery(journal_path)
+                continue
+            recoveries.append(Recovery(journal_path, header.get('project_path'),
+                                       os.path.getmtime(journal_path), track_count))
+        except Exception as e:
+            logger.warning(f"无法读取恢复文件 {journal_path}: {e}")
+    recoveries.sort(key=lambda recovery: recovery.saved_time, reverse=True)
+    return recoveries
+
+
+def recover(journal_path: str) -> Tuple[TimelineData, Optional[str]]:
+    """
+    从日志恢复时间轴：加载基础文件，再用每条轨道最后一次记录的数据替换
+
+    Returns:
+        (时间轴, 对应的项目文件路径)
+    """
+    records = read_journal(journal_path)
+    if not records or records[0][0] != RECORD_HEADER:
+        raise ProjectFormatError("缺少日志头")
+    header = json.loads(records[0][1].decode('utf-8'))
+    base = header['base']
+    if base['kind'] == 'empty':
+        meta = header['timeline']
+        timeline = TimelineData(ChannelMap.from_dict(meta['channel_map']))
+        timeline.time_scale = meta.get('time_scale', 1.0)
+        timeline.time_unit = meta.get('time_unit', '秒')
+        timeline._set_tracks(MotorTrack(index, info['name'], LoopMode(info['loop_mode']))
+                             for index, info in enumerate(meta['tracks'][:timeline.channel_count]))
+    else:
+        if _file_identity(base['path']) != base['identity']:
+            raise ProjectFormatError(f"自动保存之后基础文件已被修改或删除: {base['path']}")
+        timeline, _ = load_timeline(base['path'])
+        for track in timeline.tracks:
+            # 全部解码并释放映射：检查点文件在恢复后会被删除
+            track.component_count
+
+    latest: Dict[int, Tuple[Dict[str, Any], bytes]] = {}
+    for kind, payload in records[1:]:
+        if kind == RECORD_TRACK:
+            (length,) = _TRACK_INFO.unpack_from(payload)
+            info = json.loads(payload[_TRACK_INFO.size:_TRACK_INFO.size + length].decode('utf-8'))
+            latest[info['motor_id']] = (info, payload[_TRACK_INFO.size + length:])
+
+    tracks = list(timeline.tracks)
+    for motor_id, (info, stored) in latest.items():
+        if motor_id >= len(tracks):
+            continue
+        track = MotorTrack(motor_id, info['name'], LoopMode(info['loop_mode']))
+        decode_columns(decompress_chunk(stored, info['codec'], info['raw_length']), track)
+        tracks[motor_id] = track
+    timeline._set_tracks(tracks)
+    timeline._update_total_duration()
+    logger.info(f"已从自动保存恢复: {journal_path} ({len(latest)}条轨道的修改)")
+    return timeline, header.get('project_path')
+
+
+def discard_recovery(journal_path: str):
+    """删除恢复文件（日志及其检查点）"""
+    directory, name = os.path.split(journal_path)
+    for file_path in _session_files(directory, name[:-len(JOURNAL_EXTENSION)]):
+        try:
+            os.remove(file_path)
+        except OSError as e:
+            logger.warning(f"删除恢复文件失败 {file_path}: {e}")
+
+
+class AutoSaver:
+    """
+    时间轴的后台自动保存
+
+    tick()由GUI线程的定时器调用，只比较版本号和复制变化轨道的列；
+    以下以_w开头的成员只由后台线程访问。
+    """
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY, debounce: float = DEBOUNCE_S,
+                 max_latency: float = MAX_LATENCY_S, checkpoint_idle: float = CHECKPOINT_IDLE_S,
+                 max_journal_bytes: int = MAX_JOURNAL_BYTES):
+        """
+        Args:
+            directory: 恢复文件目录
+            debounce: 编辑停止多久后写日志（秒）
+            max_latency: 连续编辑时最长多久写一次日志（秒）
+            checkpoint_idle: 空闲多久后合并检查点（秒）
+            max_journal_bytes: 日志超过此大小时不等空闲即合并检查点
+        """
+        self.directory = directory
+        self.debounce = debounce
+        self.max_latency = max_latency
+        self.checkpoint_idle = checkpoint_idle
+        self.max_journal_bytes = max_journal_bytes
+        self.session = f"{os.getpid()}-{int(time.time() * 1000)}"
+        self.journal_path = os.path.join(directory, self.session + JOURNAL_EXTENSION)
+        self.timeline_data: Optional[TimelineData] = None
+        self.project_path: Optional[str] = None
+        self.journal_bytes = 0                    # 后台线程更新
+        self._journaled: Dict[int, int] = {}      # 已写入日志的轨道版本
+        self._version = -1
+        self._last_change = 0.0
+        self._pending_since: Optional[float] = None
+        self._records = 0                         # 上次检查点之后提交的轨道记录数
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+        self._w_journal = None
+        self._w_base: Dict[str, Any] = {'kind': 'empty'}
+        self._w_chunks: Dict[int, Chunk] = {}
+        self._w_tracks: Dict[int, Dict[str, Any]] = {}
+        self._w_checkpoint: Optional[str] = None
+        self._w_sequence = 0
+
+    def attach(self, timeline_data: TimelineData, project_path: Optional[str] = None, modified: bool = False):
+        """
+        以当前内容为基础重新开始日志（新建/打开/保存项目后调用）
+
+        Args:
+            project_path: 项目文件（二进制格式时作为基础，未修改的轨道不写入日志）
+            modified: 内容与项目文件不一致（例如从恢复文件加载），下次写日志时写入全部轨道
+        """
+        self.timeline_data = timeline_data
+        self.project_path = os.path.abspath(project_path) if project_path else None
+        self._version = timeline_data.version
+        self._pending_since = None
+        self._records = 0
+        if self.project_path and not modified and is_binary_project(self.project_path):
+            base = {'kind': 'project', 'path': self.project_path, 'identity': _file_identity(self.project_path)}
+            self._journaled = timeline_data.track_versions()
+        else:
+            base = {'kind': 'empty'}
+            self._journaled = {}
+        self._submit(self._w_reset, self._header(base))
+
+    def _header(self, base: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'session': self.session,
+            'saved_time': datetime.now().isoformat(),
+            'project_path': self.project_path,
+            'base': base,
+            'timeline': timeline_metadata(self.timeline_data),
+        }
+
+    # ==================== GUI线程 ====================
+
+    def tick(self, now: Optional[float] = None):
+        """定时调用：内容变化并停止编辑片刻后写日志，空闲较久后合并检查点"""
+        if self.timeline_data is None:
+            return
+        now = time.monotonic() if now is None else now
+        version = self.timeline_data.version
+        if version != self._version:
+            self._version = version
+            self._last_change = now
+            if self._pending_since is None:
+                self._pending_since = now
+        if self._pending_since is not None:
+            if now - self._last_change >= self.debounce or now - self._pending_since >= self.max_latency:
+                self.flush()
+        elif self._records and self._queue.empty() and \
+                (now - self._last_change >= self.checkpoint_idle or self.journal_bytes >= self.max_journal_bytes):
+            self.checkpoint()
+
+    def flush(self):
+        """把变化的轨道写入日志（GUI线程只复制列数组）"""
+        self._pending_since = None
+        timeline = self.timeline_data
+        if timeline is None:
+            return
+        snapshots = []
+        for motor_id in timeline.dirty_tracks(self._journaled):
+            track = timeline.tracks[motor_id]
+            snapshots.append((motor_id, track.name, track.loop_mode.value, track._store.snapshot(), track._order[:]))
+            self._journaled[motor_id] = track.version
+        if snapshots:
+            self._records += len(snapshots)
+            self._submit(self._w_append, snapshots)
+
+    def checkpoint(self):
+        """合并基础文件和日志为检查点"""
+        if self.timeline_data is None:
+            return
+        self._records = 0
+        self._submit(self._w_checkpoint_task, self._header({}))
+
+    def wait(self):
+        """等待已提交的写入完成"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self, discard: bool = True):
+        """
+        停止后台线程（程序正常退出时调用）
+
+        Args:
+            discard: 删除本次会话的恢复文件
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self.timeline_data = None
+        if discard:
+            discard_recovery(self.journal_path)
+
+    def _submit(self, func, payload):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._queue.put((func, payload))
+
+    # ==================== 后台线程 ====================
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    if self._w_journal is not None:
+                        self._w_journal.close()
+                        self._w_journal = None
+                    return
+                func, payload = task
+                func(payload)
+            except Exception as e:
+                logger.error(f"自动保存失败: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _w_reset(self, header: Dict[str, Any]):
+        """日志重新以header中的基础开始（原子替换，之后删除不再使用的检查点）"""
+        if self._w_journal is not None:
+            self._w_journal.close()
+            self._w_journal = None
+        os.makedirs(self.directory, exist_ok=True)
+        content = _record(RECORD_HEADER, json.dumps(header, ensure_ascii=False).encode('utf-8'))
+        write_file_atomic(self.journal_path, content)
+        self._w_journal = open(self.journal_path, 'ab')
+        self.journal_bytes = len(content)
+        self._w_base = header['base']
+        self._w_chunks.clear()
+        self._w_tracks.clear()
+        checkpoint = header['base'].get('path') if header['base']['kind'] == 'checkpoint' else None
+        if self._w_checkpoint is not None and self._w_checkpoint != checkpoint:
+            try:
+                os.remove(self._w_checkpoint)
+            except OSError as e:
+                logger.warning(f"删除旧检查点失败: {e}")
+        self._w_checkpoint = checkpoint
+
+    def _w_append(self, snapshots):
+        records = []
+        for motor_id, name, loop_mode, store, order in snapshots:
+            chunk = encode_chunk(len(order), encode_columns(store, order), CODEC_ZLIB)
+            info = {'motor_id': motor_id, 'name': name, 'loop_mode': loop_mode, 'count': chunk.count,
+                    'codec': chunk.codec, 'raw_length': chunk.raw_length}
+            info_bytes = json.dumps(info, ensure_ascii=False).encode('utf-8')
+            records.append(_record(RECORD_TRACK, _TRACK_INFO.pack(len(info_bytes)) + info_bytes + chunk.stored))
+            self._w_chunks[motor_id] = chunk
+            self._w_tracks[motor_id] = info
+        content = b''.join(records)
+        self._w_journal.write(content)
+        self._w_journal.flush()
+        os.fsync(self._w_journal.fileno())
+        self.journal_bytes += len(content)
+        logger.debug(f"自动保存日志: {len(snapshots)}条轨道, {len(content)}字节")
+
+    def _w_checkpoint_task(self, header: Dict[str, Any]):
+        meta = header['timeline']
+        track_meta = meta['tracks']
+        for motor_id, info in self._w_tracks.items():
+            if motor_id < len(track_meta):
+                track_meta[motor_id] = {'name': info['name'], 'loop_mode': info['loop_mode']}
+        chunks: List[Optional[Chunk]] = [self._w_chunks.get(index) for index in range(len(track_meta))]
+        if None in chunks:
+            base = self._w_base
+            if base['kind'] == 'empty' or _file_identity(base['path']) != base['identity']:
+                logger.warning("基础文件已变化，跳过本次检查点")
+                return
+            reader = ProjectReader(base['path'])
+            try:
+                chunks = [chunk if chunk is not None else reader.chunk(index)
+                          for index, chunk in enumerate(chunks)]
+            finally:
+                reader.close()
+
+        self._w_sequence += 1
+        checkpoint = os.path.join(self.directory, f"{self.session}_{self._w_sequence}{PROJECT_EXTENSION}")
+        metadata = {'version': '1.0.0', 'modified_time': header['saved_time'], 'autosave': True}
+        write_file_atomic(checkpoint, assemble_project(dict(metadata, **meta), chunks))
+        header['base'] = {'kind': 'checkpoint', 'path': checkpoint, 'identity': _file_identity(checkpoint)}
+        self._w_reset(header)
+        logger.debug(f"自动保存检查点: {checkpoint}")
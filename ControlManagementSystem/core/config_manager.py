@@ -8,6 +8,7 @@ import os
 import sys
 from typing import Dict, Any
 from core.logger import get_logger
+from models.channel_map import ChannelMap, DEFAULT_CHANNELS_PER_BOARD
 
 logger = get_logger()
 
@@ -42,7 +43,8 @@ class ConfigManager:
         return {
             # 舵机参数
             "servo": {
-                "servo_count": 18,              # 舵机数量
+                "servo_count": 18,              # 舵机数量（时间轴通道数）
+                "channels_per_board": 18,       # 每块驱动板的通道数，通道依次分配到各板
                 "angle_min": 0.0,               # 最小角度(度)
                 "angle_max": 180.0,             # 最大角度(度)
                 "default_speed_ms": 1000,       # 默认运动时间(毫秒)
@@ -163,6 +165,13 @@ class ConfigManager:
         """设置舵机参数"""
         self.config['servo'] = settings
     
+    def get_channel_map(self) -> ChannelMap:
+        """按舵机数量和每板通道数生成通道路由"""
+        servo = self.config.get('servo', {})
+        channel_count = max(1, int(servo.get('servo_count', DEFAULT_CHANNELS_PER_BOARD)))
+        per_board = max(1, int(servo.get('channels_per_board', DEFAULT_CHANNELS_PER_BOARD)))
+        return ChannelMap.uniform(channel_count, per_board)
+    
     def get_default_speed_ms(self) -> int:
         """获取默认运动时间（毫秒）"""
         return self.config.get('servo', {}).get('default_speed_ms', 1000)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+撤销/重做历史
+监听时间轴的变更通知，每步只保存变更附带的逆操作（涉及部件的ID、原起始时间/时长、原参数等），
+不保存整个时间轴的快照：历史的内存和撤销/重做的耗时都与该步修改的规模成正比。
+超出内存预算或步数上限时丢弃最早的步骤。
+"""
+
+import sys
+from array import array
+from collections import deque
+from typing import Any, Deque, NamedTuple, Optional, Tuple
+from models.component import Component
+from models.component_store import ComponentStore
+from models.timeline_data import TimelineData, TimelineChange, Inverse
+from core.logger import get_logger
+
+logger = get_logger()
+
+# 默认内存预算（字节）和步数上限
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 1000
+
+
+class HistoryEntry(NamedTuple):
+    """一步可撤销（或重做）的修改"""
+    description: str
+    inverse: Tuple[Inverse, ...]
+    nbytes: int
+
+
+def _sizeof(value: Any) -> int:
+    """逆操作参数的估算内存（字节）"""
+    if isinstance(value, array):
+        return 64 + value.itemsize * len(value)
+    if isinstance(value, ComponentStore):
+        return value.nbytes() + sum(_sizeof(extras) for extras in value.extras.values())
+    if isinstance(value, Component):
+        data = value._data
+        if data is None:
+            return sys.getsizeof(value)
+        return sys.getsizeof(value) + sys.getsizeof(data) + _sizeof(data[4])
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_sizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class EditHistory:
+    """时间轴的撤销/重做历史"""
+
+    def __init__(self, timeline_data: Optional[TimelineData] = None,
+                 max_bytes: int = DEFAULT_MAX_BYTES, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            timeline_data: 记录修改的时间轴
+            max_bytes: 撤销和重做步骤合计的内存预算（字节）
+            max_entries: 撤销步数上限
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.timeline_data: Optional[TimelineData] = None
+        self._undo: Deque[HistoryEntry] = deque()
+        self._redo: Deque[HistoryEntry] = deque()
+        self._nbytes = 0
+        self._applying = False
+        self._captured: Optional[TimelineChange] = None
+        if timeline_data is not None:
+            self.attach(timeline_data)
+
+    def attach(self, timeline_data: TimelineData):
+        """改为记录另一个时间轴（新建/打开项目后调用），清空历史"""
+        if self.timeline_data is not None:
+            self.timeline_data.remove_listener(self._on_timeline_changed)
+        self.timeline_data = timeline_data
+        timeline_data.add_listener(self._on_timeline_changed)
+        self.clear()
+
+    def clear(self):
+        """清空撤销和重做历史"""
+        self._undo.clear()
+        self._redo.clear()
+        self._nbytes = 0
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    @property
+    def undo_description(self) -> str:
+        return self._undo[-1].description if self._undo else ""
+
+    @property
+    def redo_description(self) -> str:
+        return self._redo[-1].description if self._redo else ""
+
+    @property
+    def nbytes(self) -> int:
+        """历史占用的估算内存（字节）"""
+        return self._nbytes
+
+    def __len__(self) -> int:
+        return len(self._undo)
+
+    # ==================== 记录 ====================
+
+    def _on_timeline_changed(self, change: TimelineChange):
+        if self._applying:
+            self._captured = change
+            return
+        if not change.inverse:
+            # 无法撤销的修改之后，更早的逆操作不再对应当前数据
+            if self._undo or self._redo:
+                logger.warning(f"修改不可撤销，清空撤销历史: {change.kind.value}")
+                self.clear()
+            return
+        for entry in self._redo:
+            self._nbytes -= entry.nbytes
+        self._redo.clear()
+        self._push(self._undo, HistoryEntry(change.kind.value, change.inverse, _sizeof(change.inverse)))
+        self._evict()
+
+    def _push(self, stack: Deque[HistoryEntry], entry: HistoryEntry):
+        stack.append(entry)
+        self._nbytes += entry.nbytes
+
+    def _evict(self):
+        """超出预算时丢弃最早的撤销步骤"""
+        while self._undo and (self._nbytes > self.max_bytes or len(self._undo) > self.max_entries):
+            entry = self._undo.popleft()
+            self._nbytes -= entry.nbytes
+            logger.debug(f"丢弃最早的撤销步骤: {entry.description} ({entry.nbytes}字节)")
+
+    # ==================== 撤销/重做 ====================
+
+    def undo(self) -> bool:
+        """
+        撤销最近一步修改
+
+        Returns:
+            bool: 是否撤销了修改
+        """
+        return self._step(self._undo, self._redo, "撤销")
+
+    def redo(self) -> bool:
+        """
+        重做最近撤销的一步修改
+
+        Returns:
+            bool: 是否重做了修改
+        """
+        return self._step(self._redo, self._undo, "重做")
+
+    def _step(self, source: Deque[HistoryEntry], target: Deque[HistoryEntry], action: str) -> bool:
+        """在一次批量修改中执行逆操作，执行时产生的逆操作放入另一侧的历史"""
+        if not source or self.timeline_data is None:
+            return False
+        entry = source.pop()
+        self._nbytes -= entry.nbytes
+        self._applying = True
+        self._captured = None
+        try:
+            with self.timeline_data.batch():
+                for func, args in entry.inverse:
+                    func(*args)
+        except Exception as e:
+            logger.error(f"{action}失败，清空撤销历史: {e}")
+            self.clear()
+            return False
+        finally:
+            self._applying = False
+        captured, self._captured = self._captured, None
+        if captured is not None and captured.inverse:
+            self._push(target, HistoryEntry(entry.description, captured.inverse, _sizeof(captured.inverse)))
+            self._evict()
+        logger.info(f"{action}: {entry.description}")
+        return True
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Flash程序槽位管理
+将编译好的程序写入下位机Flash，之后无需上位机即可脱机回放
+"""
+
+import struct
+from typing import Optional, List, Dict, Callable
+from core.logger import get_logger
+from core.serial_comm import SerialComm
+from core.motion_compiler import CompiledProgram
+
+logger = get_logger()
+
+# 与固件 program_storage.h 保持一致
+PROGRAM_RECORD_SIZE = 16
+PROGRAM_BLOCK_DATA_SIZE = 13
+PROGRAM_SLOT_SIZE = 64 * 1024
+PROGRAM_HEADER_SIZE = 256
+PROGRAM_MAX_BLOCKS = (PROGRAM_SLOT_SIZE - PROGRAM_HEADER_SIZE) // PROGRAM_RECORD_SIZE
+
+# 每帧写入的块数（9 × 13 + 3 = 120字节，不超过协议数据长度上限）
+PROGRAM_WRITE_CHUNK = 9
+
+# 擦除整个槽位约需数百毫秒，BEGIN使用更长的超时
+PROGRAM_BEGIN_TIMEOUT = 3.0
+PROGRAM_WRITE_RETRIES = 3
+
+
+class FlashProgramManager:
+    """Flash程序槽位的上传、校验、查询与回放"""
+
+    def __init__(self, serial_comm: SerialComm):
+        self.serial_comm = serial_comm
+
+    def program_crc(self, program: CompiledProgram) -> int:
+        """计算记录区CRC-16（与固件存储格式一致：13字节数据 + 3字节0填充）"""
+        records = b''.join(block['payload'] + b'\x00' * (PROGRAM_RECORD_SIZE - PROGRAM_BLOCK_DATA_SIZE)
+                           for block in program.blocks)
+        return self.serial_comm.crc16_ccitt(records)
+
+    def upload(self, slot: int, program: CompiledProgram,
+               progress_callback: Optional[Callable[[int, int], None]] = None) -> bool:
+        """
+        将程序写入指定槽位
+
+        Args:
+            slot: 槽位号
+            program: 编译好的程序
+            progress_callback: 进度回调 (已写入块数, 总块数)
+
+        Returns:
+            bool: 写入并校验成功返回True
+        """
+        total = len(program.blocks)
+        if total == 0 or total > PROGRAM_MAX_BLOCKS:
+            logger.error(f"程序块数无效: {total} (上限{PROGRAM_MAX_BLOCKS})")
+            return False
+
+        crc = self.program_crc(program)
+        response = self.serial_comm.send_and_wait(
+            SerialComm.CMD_PROGRAM_BEGIN, struct.pack('<BHH', slot, total, crc), PROGRAM_BEGIN_TIMEOUT)
+        if response is None or response[0] != SerialComm.RESP_OK:
+            logger.error(f"槽位{slot}开始写入失败")
+            return False
+
+        index = 0
+        retries = 0
+        while index < total:
+            chunk = program.blocks[index:index + PROGRAM_WRITE_CHUNK]
+            data = struct.pack('<HB', index, len(chunk)) + b''.join(block['payload'] for block in chunk)
+            response = self.serial_comm.send_and_wait(SerialComm.CMD_PROGRAM_WRITE, data)
+
+            if response is not None and len(response[1]) >= 2:
+                # 以下位机返回的序号为准：应答丢失时重发的块会被拒绝，据此重新同步
+                next_index = struct.unpack_from('<H', response[1])[0]
+                if next_index > index:
+                    index = next_index
+                    retries = 0
+                    if progress_callback:
+                        progress_callback(index, total)
+                    continue
+
+            retries += 1
+            if retries > PROGRAM_WRITE_RETRIES:
+                logger.error(f"槽位{slot}写入失败: 块{index}")
+                return False
+            logger.warning(f"槽位{slot}写入块{index}无应答，重试({retries}/{PROGRAM_WRITE_RETRIES})")
+
+        response = self.serial_comm.send_and_wait(SerialComm.CMD_PROGRAM_END)
+        if response is None or response[0] != SerialComm.RESP_OK:
+            logger.error(f"槽位{slot}校验失败")
+            return False
+
+        if not self.verify(slot, program):
+            return False
+
+        logger.info(f"程序已写入槽位{slot}: {total}块, CRC 0x{crc:04X}")
+        return True
+
+    def verify(self, slot: int, program: CompiledProgram) -> bool:
+        """比较槽位内程序与本地程序的块数和CRC"""
+        slots = self.list_slots()
+        if slots is None or slot >= len(slots):
+            return False
+
+        info = slots[slot]
+        expected_crc = self.program_crc(program)
+        if not info['valid'] or info['block_count'] != len(program.blocks) or info['crc'] != expected_crc:
+            logger.warning(f"槽位{slot}内容不一致: {info}, 期望{len(program.blocks)}块 CRC 0x{expected_crc:04X}")
+            return False
+        return True
+
+    def list_slots(self) -> Optional[List[Dict]]:
+        """
+        查询所有槽位
+
+        Returns:
+            [{'slot', 'valid', 'block_count', 'crc'}, ...]，通信失败返回None
+        """
+        response = self.serial_comm.send_and_wait(SerialComm.CMD_PROGRAM_LIST)
+        if response is None or response[0] != SerialComm.RESP_OK or not response[1]:
+            return None
+
+        payload = response[1]
+        slots = []
+        for slot in range(payload[0]):
+            offset = 1 + slot * 5
+            if offset + 5 > len(payload):
+                break
+            valid, block_count, crc = struct.unpack_from('<BHH', payload, offset)
+            slots.append({'slot': slot, 'valid': bool(valid), 'block_count': block_count, 'crc': crc})
+        return slots
+
+    def run(self, slot: int) -> bool:
+        """脱机回放指定槽位"""
+        response = self.serial_comm.send_and_wait(SerialComm.CMD_PROGRAM_RUN, bytes([slot]))
+        if response is None or response[0] != SerialComm.RESP_OK:
+            logger.error(f"槽位{slot}回放失败")
+            return False
+        logger.info(f"开始脱机回放槽位{slot}")
+        return True
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上位机定时帧流
+把程序烘焙成每20ms一帧的全通道位置表，由独立线程按绝对截止时间发送MOVE_ALL；
+等待末段自旋校正，统计抖动和错过的截止时间（不依赖设备端规划器）
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import List, Dict, Any, Optional, Tuple, Callable
+from core.logger import get_logger
+from core.serial_comm import SerialComm
+from core.motion_compiler import CompiledProgram
+from core.trajectory_model import ChannelTrajectory, build_trajectories, evaluate_pose
+
+logger = get_logger()
+
+# 与固件 config.h INTERPOLATION_PERIOD_MS 保持一致
+FRAME_PERIOD_MS = 20
+JITTER_WINDOW = 3000            # 抖动统计保留的最近帧数（50Hz下约1分钟）
+WAKE_WINDOW = 250               # 估计sleep唤醒延迟的最近样本数（约5秒）
+
+
+class FrameTable:
+    """
+    逐帧位置表
+
+    frames覆盖程序的首次执行；循环通道另存一个周期的位置列，
+    从其周期起按帧号取模重复，其余通道保持最后一帧的位置。
+    """
+
+    def __init__(self, frames: List[List[float]],
+                 cycles: Optional[Dict[int, Tuple[int, List[float]]]] = None):
+        """
+        Args:
+            frames: 各帧的全通道位置
+            cycles: {舵机ID: (周期帧数, 一个周期内的位置列)}
+        """
+        self.frames = frames
+        self.cycles = cycles or {}
+
+    @property
+    def is_looping(self) -> bool:
+        return bool(self.cycles)
+
+    def pose(self, index: int) -> Optional[List[float]]:
+        """第index帧的全通道位置，播放结束返回None"""
+        if index < len(self.frames):
+            pose = list(self.frames[index])
+        elif self.cycles and self.frames:
+            pose = list(self.frames[-1])
+        else:
+            return None
+
+        for servo_id, (period, column) in self.cycles.items():
+            if index >= period:
+                pose[servo_id] = column[index % period]
+        return pose
+
+
+def bake_program(program: CompiledProgram, start_positions: List[float],
+                 period_ms: float = FRAME_PERIOD_MS) -> FrameTable:
+    """
+    把编译后的程序烘焙为逐帧位置表（与设备端梯形插值一致）
+
+    Args:
+        program: 编译结果
+        start_positions: 各通道起始角度
+        period_ms: 帧周期
+
+    Returns:
+        FrameTable: 循环通道按周期模板生成位置列
+    """
+    dt = period_ms / 1000.0
+    trajectories = build_trajectories(program.blocks, start_positions)
+    end_s = max((trajectory.end_time() for trajectory in trajectories.values()), default=0.0)
+    count = int(math.ceil(end_s / dt)) + 1
+    frames = [evaluate_pose(trajectories, start_positions, k * dt) for k in range(count)]
+
+    cycles = {}
+    for servo_id, loop in program.loops.items():
+        period = max(1, int(round(loop['period_ms'] / period_ms)))
+        trajectory = trajectories.get(servo_id)
+        cycle_start = trajectory.segments[-1][2] if trajectory else start_positions[servo_id]
+        cycle = ChannelTrajectory(cycle_start)
+        for block in loop['blocks']:
+            cycle.add_block(block)
+        cycles[servo_id] = (period, [cycle.position_at(j * dt) for j in range(period)])
+
+    logger.info(f"烘焙帧表: {count}帧 × {period_ms}ms, 循环通道{sorted(cycles)}")
+    return FrameTable(frames, cycles)
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(math.ceil(pct / 100.0 * len(ordered))) - 1)]
+
+
+class FrameStreamer:
+    """按固定周期发送MOVE_ALL的定时线程"""
+
+    def __init__(self, serial_comm: SerialComm, period_ms: float = FRAME_PERIOD_MS, spin_ms: float = 1.0):
+        """
+        Args:
+            serial_comm: 串口通信对象
+            period_ms: 帧周期
+            spin_ms: 截止时间前改为自旋等待的最短时长；实际按测得的sleep超时自动加长
+        """
+        self.serial_comm = serial_comm
+        self.period_ms = period_ms
+        self.spin_ms = spin_ms
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._jitter: deque = deque(maxlen=JITTER_WINDOW)
+        self._write: deque = deque(maxlen=JITTER_WINDOW)
+        self._oversleep: deque = deque(maxlen=WAKE_WINDOW)
+        self._margin = spin_ms / 1000.0
+        self.last_pose: Optional[List[float]] = None
+        self.stats: Dict[str, Any] = {}
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.stats = {'frames': 0, 'missed': 0, 'skipped': 0, 'send_failed': 0, 'max_jitter_ms': 0.0}
+        self._jitter.clear()
+        self._write.clear()
+        self._oversleep.clear()
+        self._margin = self.spin_ms / 1000.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # ==================== 控制 ====================
+
+    def start(self, table: FrameTable, on_frame: Optional[Callable[[int, List[float]], None]] = None) -> bool:
+        """
+        在独立线程中开始播放帧表
+
+        Args:
+            table: 逐帧位置表
+            on_frame: 每帧发送后的回调（帧号, 位置），在发送线程中调用
+        """
+        if self.is_running:
+            logger.warning("帧流已在运行")
+            return False
+        self._reset_stats()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(table, on_frame), daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """停止播放并等待线程退出"""
+        self._stop_event.set()
+        self.wait(1.0)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待播放结束，返回是否已结束"""
+        if self._thread is None:
+            return True
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    # ==================== 统计 ====================
+
+    def report(self) -> Dict[str, Any]:
+        """抖动与截止时间统计（抖动 = 实际发送时刻 - 计划时刻）"""
+        jitter = list(self._jitter)
+        write = list(self._write)
+        return dict(self.stats,
+                    jitter_p50_ms=_percentile(jitter, 50),
+                    jitter_p99_ms=_percentile(jitter, 99),
+                    write_p99_ms=_percentile(write, 99),
+                    spin_margin_ms=self._margin * 1000.0)
+
+    # ==================== 定时线程 ====================
+
+    def _wait_until(self, deadline: float):
+        """睡眠到截止时间前一段余量，再自旋到截止时间；余量跟随测得的唤醒延迟（p99）"""
+        wake = deadline - self._margin
+        remaining = wake - time.perf_counter()
+        if remaining > 0:
+            self._stop_event.wait(remaining)
+            self._oversleep.append(time.perf_counter() - wake)
+            if len(self._oversleep) >= 20:
+                self._margin = min(max(self.spin_ms / 1000.0, _percentile(list(self._oversleep), 99) * 1.2),
+                                   self.period_ms / 2000.0)
+        while time.perf_counter() < deadline:
+            pass
+
+    def _run(self, table: FrameTable, on_frame: Optional[Callable[[int, List[float]], None]]):
+        period = self.period_ms / 1000.0
+        speed_ms = int(round(self.period_ms))
+        # 截止时间按绝对时间计算，不累积漂移
+        t0 = time.perf_counter() + period
+        index = 0
+        logger.info(f"帧流开始: 周期{self.period_ms}ms")
+
+        while not self._stop_event.is_set():
+            deadline = t0 + index * period
+            self._wait_until(deadline)
+            if self._stop_event.is_set():
+                break
+
+            now = time.perf_counter()
+            late_ms = (now - deadline) * 1000.0
+            if late_ms >= self.period_ms:
+                # 整帧以上的延迟：跳到当前应发送的帧，不补发过时的位置
+                behind = int(late_ms // self.period_ms)
+                self.stats['missed'] += 1
+                self.stats['skipped'] += behind
+                index += behind
+                deadline = t0 + index * period
+                late_ms = (now - deadline) * 1000.0
+
+            pose = table.pose(index)
+            if pose is None:
+                break
+            if self.serial_comm.send_servo_command(SerialComm.CMD_MOVE_ALL,
+                                                   SerialComm.pack_move_all(pose, speed_ms)):
+                self.last_pose = pose
+            else:
+                self.stats['send_failed'] += 1
+
+            self._jitter.append(late_ms)
+            self._write.append((time.perf_counter() - now) * 1000.0)
+            self.stats['frames'] += 1
+            if late_ms > self.stats['max_jitter_ms']:
+                self.stats['max_jitter_ms'] = late_ms
+            if on_frame is not None:
+                on_frame(index, pose)
+            index += 1
+
+        logger.info(f"帧流结束: {self.report()}")
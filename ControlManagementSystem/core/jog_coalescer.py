@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+点动/滑块命令合并
+每个通道只保留最新的目标角度（后到覆盖先到），所有待发送通道合并为一帧MOVE_MULTI
+（全部通道待发送时为MOVE_ALL），按上限频率发送：快速点击、拖动滑块或播放头
+不会堆积命令，设备始终执行操作者最新的意图
+"""
+
+import threading
+import time
+from typing import List, Dict, Any, Optional
+from core.logger import get_logger
+from core.serial_comm import SerialComm
+
+logger = get_logger()
+
+
+class JogCoalescer:
+    """按通道合并的最新目标发送器"""
+
+    def __init__(self, serial_comm: SerialComm, max_rate_hz: float = 50.0, speed_ms: int = 0):
+        """
+        Args:
+            serial_comm: 串口通信对象
+            max_rate_hz: 最高发送频率（帧/秒）
+            speed_ms: 每帧的运动时间（毫秒），0表示直接到位
+        """
+        self.serial_comm = serial_comm
+        self.min_interval = 1.0 / max_rate_hz
+        self.speed_ms = speed_ms
+
+        self._cond = threading.Condition()
+        self._pending: Dict[int, float] = {}
+        self._last_flush = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self.stats: Dict[str, Any] = {'requests': 0, 'frames': 0, 'coalesced': 0, 'failed': 0}
+
+    # ==================== 目标 ====================
+
+    def set_target(self, servo_id: int, angle: float) -> float:
+        """
+        设置通道的目标角度（覆盖尚未发送的旧目标）
+
+        Returns:
+            float: 限幅后的目标角度
+        """
+        angle = max(0.0, min(180.0, angle))
+        with self._cond:
+            if servo_id in self._pending:
+                self.stats['coalesced'] += 1
+            self._pending[servo_id] = angle
+            self.stats['requests'] += 1
+            self._ensure_thread()
+            self._cond.notify()
+        return angle
+
+    def set_pose(self, angles: List[float]):
+        """设置所有通道的目标（整帧姿态，按MOVE_ALL发送）"""
+        with self._cond:
+            if self._pending:
+                self.stats['coalesced'] += 1
+            self._pending = {servo_id: max(0.0, min(180.0, angle)) for servo_id, angle in enumerate(angles)}
+            self.stats['requests'] += 1
+            self._ensure_thread()
+            self._cond.notify()
+
+    def jog(self, servo_id: int, current_angle: float, delta: float) -> float:
+        """
+        相对移动
+
+        Args:
+            servo_id: 舵机ID
+            current_angle: 当前角度（调用方记录的最近目标）
+            delta: 相对角度变化
+
+        Returns:
+            float: 新的目标角度
+        """
+        return self.set_target(servo_id, current_angle + delta)
+
+    def flush(self):
+        """立即发送所有待发送目标（不受频率限制）"""
+        with self._cond:
+            batch = self._take()
+        self._send(batch)
+
+    # ==================== 发送线程 ====================
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _take(self) -> Dict[int, float]:
+        batch = self._pending
+        self._pending = {}
+        self._last_flush = time.perf_counter()
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                # 空闲超过1秒退出线程，下次设置目标时重新启动
+                if not self._pending and not self._cond.wait_for(lambda: self._pending, timeout=1.0):
+                    self._thread = None
+                    return
+                # 距上一帧不足最小间隔则等待，期间到达的目标继续合并
+                delay = self._last_flush + self.min_interval - time.perf_counter()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                batch = self._take()
+            self._send(batch)
+
+    def _send(self, batch: Dict[int, float]):
+        if not batch:
+            return
+        servo_count = self.serial_comm.servo_count
+        if len(batch) == servo_count and all(servo_id in batch for servo_id in range(servo_count)):
+            cmd = SerialComm.CMD_MOVE_ALL
+            data = SerialComm.pack_move_all([batch[servo_id] for servo_id in range(servo_count)], self.speed_ms)
+        else:
+            cmd = SerialComm.CMD_MOVE_MULTI
+            data = SerialComm.pack_move_multi(batch, self.speed_ms)
+        if self.serial_comm.send_servo_command(cmd, data):
+            self.stats['frames'] += 1
+            logger.debug(f"点动合并发送: {batch}")
+        else:
+            self.stats['failed'] += 1
+            logger.error(f"点动命令发送失败: {batch}")
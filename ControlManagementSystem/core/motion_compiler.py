@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运动程序编译器
+将时间线编译为运动块序列（ADD_MOTION_BLOCK），并进行关键帧精简；
+循环轨道编译为一个稳态周期模板，上传时按周期平移时间戳（不展开）
+"""
+
+from typing import List, Dict, Any, Tuple, Optional, Iterator
+from dataclasses import dataclass, field
+from models.timeline_data import TimelineData, MotorTrack, LoopMode
+from models.component import Component, ComponentType
+from models.channel_map import ChannelMap
+from core.logger import get_logger
+from core.serial_comm import SerialComm
+from core.trajectory_model import (
+    ANGLE_RESOLUTION, RATE_RESOLUTION, RATE_MAX,
+    ChannelTrajectory, quantize_block, solve_velocity, trapezoid_profile
+)
+import hashlib
+import heapq
+import itertools
+import json
+import math
+import struct
+
+logger = get_logger()
+
+# 编译器版本：编译结果格式或算法变化时递增
+COMPILER_VERSION = 2
+
+# 精简时的采样步长（秒）与单次合并的最大块数
+DECIMATION_SAMPLE_S = 0.01
+DECIMATION_MAX_GROUP = 64
+
+
+def _component_to_block(component: Component, servo_id: int, current_pos: float) -> Optional[Dict[str, Any]]:
+    """将单个部件转换为运动块，非运动部件返回None"""
+    params = component.parameters
+    if component.type in (ComponentType.FORWARD_ROTATION, ComponentType.REVERSE_ROTATION):
+        target_angle = params.get('target_angle', current_pos)
+        motion_mode = params.get('motion_mode', 'time')
+    elif component.type == ComponentType.HOME:
+        target_angle = params.get('home_angle', 90.0)
+        motion_mode = 'time'
+    else:
+        return None
+
+    if motion_mode == 'trapezoid':
+        velocity = params.get('velocity', 30.0)
+        acceleration = params.get('acceleration', 60.0)
+        deceleration = params.get('deceleration', 0.0)
+    else:
+        # 时间模式：加速、匀速、减速各占1/3，保证在speed_ms内到达
+        duration_s = max(params.get('speed_ms', 1000), 1) / 1000.0
+        distance = abs(target_angle - current_pos)
+        velocity = min(RATE_MAX, max(RATE_RESOLUTION, 1.5 * distance / duration_s))
+        acceleration = min(RATE_MAX, max(RATE_RESOLUTION, 4.5 * distance / (duration_s * duration_s)))
+        deceleration = 0.0
+
+    return quantize_block({
+        'timestamp_ms': int(round(component.start_time * 1000)),
+        'servo_id': servo_id,
+        'angle': target_angle,
+        'velocity': velocity,
+        'acceleration': acceleration,
+        'deceleration': deceleration
+    })
+
+
+def _compile_track(track: MotorTrack, start_pos: float) -> List[Dict[str, Any]]:
+    """将单个轨道编译为运动块（按时间戳顺序）"""
+    blocks = []
+    current_pos = start_pos
+    for component in track.iter_components():
+        block = _component_to_block(component, track.motor_id, current_pos)
+        if block is None:
+            continue
+        blocks.append(block)
+        current_pos = block['angle']
+    return blocks
+
+
+def compile_timeline(timeline_data: TimelineData, start_positions: List[float]) -> List[Dict[str, Any]]:
+    """
+    将时间线编译为运动块列表
+
+    Args:
+        timeline_data: 时间线数据
+        start_positions: 各通道起始角度
+
+    Returns:
+        按(时间戳, 舵机ID)排序的运动块列表
+    """
+    # 各轨道的块已按时间戳有序，多路归并即可
+    streams = [_compile_track(track, start_positions[track.motor_id])
+               for track in timeline_data.tracks if track.component_count]
+    return list(heapq.merge(*streams, key=lambda b: (b['timestamp_ms'], b['servo_id'])))
+
+
+def loop_period_ms(timeline_data: TimelineData, track: MotorTrack, loop_all: bool = False) -> int:
+    """
+    轨道的循环周期（ms），不循环返回0
+
+    Args:
+        loop_all: 整条时间线循环（周期为时间线总长），否则只有循环模式的轨道按自身长度循环
+    """
+    if loop_all:
+        tracks = timeline_data.tracks
+    elif track.loop_mode == LoopMode.LOOP:
+        tracks = [track]
+    else:
+        return 0
+    end_s = max((t.get_end_time() for t in tracks), default=0.0)
+    return int(round(end_s * 1000))
+
+
+def compile_loops(timeline_data: TimelineData, start_positions: List[float],
+                  decimation_tolerance: float = 0.1, loop_all: bool = False) -> Dict[int, Dict[str, Any]]:
+    """
+    编译循环轨道的稳态周期
+
+    首个周期包含在普通运动块中（从起始角度出发）；之后每个周期都从轨道的最终角度出发，
+    因此只需编译一次，按周期平移时间戳即可无限重复。
+
+    Returns:
+        {舵机ID: {'period_ms': 周期, 'blocks': 周期内的运动块（时间戳相对周期起点）}}
+    """
+    loops = {}
+    for track in timeline_data.tracks:
+        period_ms = loop_period_ms(timeline_data, track, loop_all)
+        servo_id = track.motor_id
+        first_cycle = _compile_track(track, start_positions[servo_id]) if period_ms > 0 else []
+        if not first_cycle:
+            continue
+
+        cycle_start = list(start_positions)
+        cycle_start[servo_id] = first_cycle[-1]['angle']
+        cycle = _compile_track(track, cycle_start[servo_id])
+        if decimation_tolerance > 0:
+            cycle, _ = decimate_blocks(cycle, cycle_start, decimation_tolerance)
+        if not cycle:
+            # 稳态周期全是空操作：首个周期后保持最终角度即可
+            continue
+        for block in cycle:
+            block['payload'] = SerialComm.pack_motion_block(
+                block['timestamp_ms'], block['servo_id'], block['angle'],
+                block['velocity'], block['acceleration'], block['deceleration'])
+        loops[servo_id] = {'period_ms': period_ms, 'blocks': cycle}
+    return loops
+
+
+def _merge_candidate(group: List[Dict[str, Any]], start_pos: float, end_s: float) -> Dict[str, Any]:
+    """构造合并后的运动块：从组首时间戳出发，尽量在原结束时间到达组尾目标"""
+    first, last = group[0], group[-1]
+    acceleration = max(b['acceleration'] for b in group)
+    deceleration = max(b['deceleration'] if b['deceleration'] > 0 else b['acceleration'] for b in group)
+    distance = abs(last['angle'] - start_pos)
+
+    velocity = solve_velocity(distance, end_s - first['timestamp_ms'] / 1000.0, acceleration, deceleration)
+    if velocity is None:
+        velocity = max(b['velocity'] for b in group)
+    # 向上取整，避免量化后变慢
+    velocity = min(RATE_MAX, max(RATE_RESOLUTION, math.ceil(velocity / RATE_RESOLUTION - 1e-9) * RATE_RESOLUTION))
+
+    return quantize_block({
+        'timestamp_ms': first['timestamp_ms'],
+        'servo_id': first['servo_id'],
+        'angle': last['angle'],
+        'velocity': velocity,
+        'acceleration': acceleration,
+        'deceleration': deceleration
+    })
+
+
+def _max_deviation(original: ChannelTrajectory, merged: ChannelTrajectory, t0: float, t1: float) -> float:
+    """在[t0, t1]区间内采样比较两条轨迹的最大偏差"""
+    deviation = 0.0
+    steps = max(1, int(math.ceil((t1 - t0) / DECIMATION_SAMPLE_S)))
+    for i in range(steps + 1):
+        t = min(t1, t0 + i * DECIMATION_SAMPLE_S)
+        deviation = max(deviation, abs(original.position_at(t) - merged.position_at(t)))
+    return deviation
+
+
+def _decimate_channel(blocks: List[Dict[str, Any]], start_pos: float,
+                      tolerance: float, report: Dict[str, int]) -> List[Dict[str, Any]]:
+    """精简单个通道的运动块"""
+    # 1. 去除空操作：目标与当前位置在0.01°分辨率下相同
+    kept = []
+    current = start_pos
+    for block in blocks:
+        if round(block['angle'] / ANGLE_RESOLUTION) == round(current / ANGLE_RESOLUTION):
+            report['dropped_noop'] += 1
+            continue
+        kept.append(block)
+        current = block['angle']
+
+    # 2. 贪心合并连续块，合并结果与原轨迹偏差不超过容差
+    original = ChannelTrajectory(start_pos)
+    for block in kept:
+        original.add_block(block)
+    segment_ends = [seg[0] + sum(seg[3][:3]) for seg in original.segments]
+
+    result = []
+    i = 0
+    current = start_pos
+    while i < len(kept):
+        best_j = i
+        best_block = kept[i]
+        j = i + 1
+        while j < len(kept) and j - i < DECIMATION_MAX_GROUP:
+            end_s = segment_ends[j]
+            candidate = _merge_candidate(kept[i:j + 1], current, end_s)
+            profile = trapezoid_profile(abs(candidate['angle'] - current), candidate['velocity'],
+                                        candidate['acceleration'], candidate['deceleration'])
+            merged_end = candidate['timestamp_ms'] / 1000.0 + sum(profile[:3])
+            next_start = kept[j + 1]['timestamp_ms'] / 1000.0 if j + 1 < len(kept) else None
+            # 合并后的运动必须在下一块开始前完成，否则下一块的起点会不同
+            if next_start is not None and merged_end > next_start:
+                break
+
+            merged = ChannelTrajectory(current)
+            merged.add_block(candidate)
+            t0 = kept[i]['timestamp_ms'] / 1000.0
+            if _max_deviation(original, merged, t0, max(end_s, merged_end)) > tolerance:
+                break
+
+            best_j, best_block = j, candidate
+            j += 1
+
+        if best_j > i:
+            report['merged'] += best_j - i
+        result.append(best_block)
+        current = best_block['angle']
+        i = best_j + 1
+
+    return result
+
+
+def decimate_blocks(blocks: List[Dict[str, Any]], start_positions: List[float],
+                    tolerance: float = 0.1) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    关键帧精简：去除空操作并合并同一通道上的连续小运动
+
+    Args:
+        blocks: 运动块列表
+        start_positions: 各通道起始角度
+        tolerance: 允许的最大角度偏差（度）
+
+    Returns:
+        (精简后的运动块列表, 统计报告)
+    """
+    report = {'original': len(blocks), 'output': 0, 'dropped_noop': 0, 'merged': 0}
+
+    channels: Dict[int, List[Dict[str, Any]]] = {}
+    for block in sorted(blocks, key=lambda b: b['timestamp_ms']):
+        channels.setdefault(block['servo_id'], []).append(block)
+
+    result = []
+    for servo_id, channel_blocks in channels.items():
+        result.extend(_decimate_channel(channel_blocks, start_positions[servo_id], tolerance, report))
+
+    result.sort(key=lambda b: (b['timestamp_ms'], b['servo_id']))
+    report['output'] = len(result)
+    removed = report['original'] - report['output']
+    report['reduction_pct'] = removed * 100.0 / report['original'] if report['original'] else 0.0
+
+    logger.info(f"关键帧精简: {report['original']} → {report['output']}块 "
+                f"(-{report['reduction_pct']:.1f}%, 空操作{report['dropped_noop']}, 合并{report['merged']}, "
+                f"容差{tolerance}°)")
+    return result, report
+
+
+def _blocks_to_dicts(blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [dict(block, payload=block['payload'].hex()) for block in blocks]
+
+
+def _blocks_from_dicts(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [dict(item, payload=bytes.fromhex(item['payload'])) for item in items]
+
+
+def shift_block(block: Dict[str, Any], timestamp_ms: int) -> Dict[str, Any]:
+    """返回改写时间戳后的运动块副本（帧数据同步改写）"""
+    return dict(block, timestamp_ms=timestamp_ms,
+                payload=struct.pack('<I', timestamp_ms) + block['payload'][4:])
+
+
+def _repeat_cycle(servo_id: int, loop: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """从第二个周期起无限重复周期模板，只改写时间戳"""
+    period_ms = loop['period_ms']
+    for cycle in itertools.count(1):
+        for block in loop['blocks']:
+            timestamp_ms = block['timestamp_ms'] + cycle * period_ms
+            if timestamp_ms > 0xFFFFFFFF:
+                logger.warning(f"舵机{servo_id}循环时间戳超出协议范围，停止循环")
+                return
+            yield shift_block(block, timestamp_ms)
+
+
+@dataclass
+class CompiledProgram:
+    """编译结果：运动块（含编码后的帧数据）、循环周期模板与元数据"""
+    key: str
+    blocks: List[Dict[str, Any]]
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    loops: Dict[int, Dict[str, Any]] = field(default_factory=dict)
+
+    @property
+    def is_looping(self) -> bool:
+        return bool(self.loops)
+
+    def iter_blocks(self) -> Iterator[Dict[str, Any]]:
+        """
+        按上传顺序生成运动块：普通块之后，循环轨道按周期平移时间戳无限重复
+
+        内存占用与循环次数无关；没有循环轨道时等同于遍历blocks
+        """
+        streams = [iter(self.blocks)]
+        streams.extend(_repeat_cycle(servo_id, loop) for servo_id, loop in sorted(self.loops.items()))
+        return heapq.merge(*streams, key=lambda b: (b['timestamp_ms'], b['servo_id']))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典（帧数据以十六进制保存）"""
+        loops = {str(servo_id): {'period_ms': loop['period_ms'], 'blocks': _blocks_to_dicts(loop['blocks'])}
+                 for servo_id, loop in self.loops.items()}
+        return {'key': self.key, 'metadata': self.metadata, 'blocks': _blocks_to_dicts(self.blocks),
+                'loops': loops}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CompiledProgram':
+        """从字典创建实例"""
+        loops = {int(servo_id): {'period_ms': loop['period_ms'], 'blocks': _blocks_from_dicts(loop['blocks'])}
+                 for servo_id, loop in data.get('loops', {}).items()}
+        return cls(key=data['key'], blocks=_blocks_from_dicts(data['blocks']),
+                   metadata=data.get('metadata', {}), loops=loops)
+
+
+def program_content_hash(timeline_data: TimelineData, start_positions: List[float],
+                         decimation_tolerance: float, loop_all: bool = False) -> str:
+    """
+    计算时间线内容的稳定哈希（与部件ID、选中状态、轨道内顺序无关）
+
+    哈希覆盖所有影响编译结果的输入：部件类型/时间/参数、循环模式、起始角度、
+    精简容差、整体循环标志、通道路由（按板拆分的结果与缓存键）以及编译器版本。
+    """
+    tracks = []
+    for track in timeline_data.tracks:
+        components = sorted(
+            ([c.type.value, c.start_time, c.duration, c.parameters] for c in track.iter_components()),
+            key=lambda item: json.dumps(item, sort_keys=True, ensure_ascii=False))
+        tracks.append([track.motor_id, track.loop_mode.value, components])
+
+    content = {
+        'compiler_version': COMPILER_VERSION,
+        'start_positions': list(start_positions),
+        'decimation_tolerance': decimation_tolerance,
+        'loop_all': loop_all,
+        'channel_map': timeline_data.channel_map.to_dict(),
+        'tracks': tracks,
+    }
+    text = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def compile_program(timeline_data: TimelineData, start_positions: List[float],
+                    decimation_tolerance: float = 0.1, key: Optional[str] = None,
+                    loop_all: bool = False) -> CompiledProgram:
+    """
+    编译时间线为可直接上传的程序
+
+    Args:
+        timeline_data: 时间线数据
+        start_positions: 各通道起始角度
+        decimation_tolerance: 关键帧精简容差（度），0表示不精简
+        key: 内容哈希，None时自动计算
+        loop_all: 整条时间线循环（否则只循环设为循环模式的轨道）
+
+    Returns:
+        CompiledProgram: 每个块附带ADD_MOTION_BLOCK数据（payload）
+    """
+    if key is None:
+        key = program_content_hash(timeline_data, start_positions, decimation_tolerance, loop_all)
+
+    blocks = compile_timeline(timeline_data, start_positions)
+    report = {}
+    if blocks and decimation_tolerance > 0:
+        blocks, report = decimate_blocks(blocks, start_positions, decimation_tolerance)
+
+    for block in blocks:
+        block['payload'] = SerialComm.pack_motion_block(
+            block['timestamp_ms'], block['servo_id'], block['angle'],
+            block['velocity'], block['acceleration'], block['deceleration'])
+
+    loops = compile_loops(timeline_data, start_positions, decimation_tolerance, loop_all) if blocks else {}
+
+    metadata = {
+        'compiler_version': COMPILER_VERSION,
+        'block_count': len(blocks),
+        'duration_ms': blocks[-1]['timestamp_ms'] if blocks else 0,
+        'decimation': report,
+        'loop_periods_ms': {str(servo_id): loop['period_ms'] for servo_id, loop in loops.items()},
+    }
+    return CompiledProgram(key=key, blocks=blocks, metadata=metadata, loops=loops)
+
+
+def _route_block(block: Dict[str, Any], local_id: int) -> Dict[str, Any]:
+    """返回改写为板内通道号的运动块副本（帧数据同步改写）"""
+    return dict(block, servo_id=local_id, payload=SerialComm.pack_motion_block(
+        block['timestamp_ms'], local_id, block['angle'],
+        block['velocity'], block['acceleration'], block['deceleration']))
+
+
+def split_program(program: CompiledProgram, channel_map: ChannelMap) -> Dict[str, CompiledProgram]:
+    """
+    按驱动板拆分程序：运动块和循环模板按通道路由到各板，通道号改写为板内编号
+
+    各板程序的时间轴相同，由MultiBoardController同步启动
+
+    Returns:
+        {板名: 该板的程序}，没有运动块的板也包含在内（空程序）
+    """
+    blocks: Dict[str, List[Dict[str, Any]]] = {name: [] for name in channel_map.board_names}
+    for block in program.blocks:
+        board, local_id = channel_map.route(block['servo_id'])
+        blocks[board].append(_route_block(block, local_id))
+
+    loops: Dict[str, Dict[int, Dict[str, Any]]] = {name: {} for name in channel_map.board_names}
+    for servo_id, loop in program.loops.items():
+        board, local_id = channel_map.route(servo_id)
+        loops[board][local_id] = {'period_ms': loop['period_ms'],
+                                  'blocks': [_route_block(block, local_id) for block in loop['blocks']]}
+
+    programs = {}
+    for name in channel_map.board_names:
+        metadata = dict(program.metadata, board=name, block_count=len(blocks[name]),
+                        duration_ms=blocks[name][-1]['timestamp_ms'] if blocks[name] else 0,
+                        loop_periods_ms={str(servo_id): loop['period_ms'] for servo_id, loop in loops[name].items()})
+        programs[name] = CompiledProgram(key=f"{program.key}:{name}", blocks=blocks[name],
+                                         metadata=metadata, loops=loops[name])
+    return programs
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多板同步启动
+各板预装并预约启动：上位机通过多次时间戳交换估计每块板的时钟偏移，
+再让所有板在同一时刻（换算为各自的设备时间）开始执行
+"""
+
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple, Any
+from core.logger import get_logger
+from core.serial_comm import SerialComm
+from core.servo_commander import ServoCommander
+from core.motion_compiler import CompiledProgram, compile_program, split_program
+from models.timeline_data import TimelineData
+
+logger = get_logger()
+
+# 时钟同步采样次数：下位机每10ms轮询一次USB，需要足够多的样本才能取到排队延迟最小的一次
+CLOCK_SYNC_SAMPLES = 16
+
+# 预约启动的最小提前量（ms），需覆盖向所有板发送ARM_START的时间
+ARM_MARGIN_MS = 100.0
+
+# 启动偏差目标（us）
+SKEW_TARGET_US = 1000.0
+
+
+def host_time_us() -> float:
+    """主机单调时钟（us）"""
+    return time.perf_counter() * 1e6
+
+
+@dataclass
+class ClockOffset:
+    """设备时钟相对主机时钟的偏移估计"""
+    offset_us: float        # 设备时间 - 主机时间
+    rtt_us: float           # 所选样本的往返时间
+    samples: int            # 有效样本数
+
+    @property
+    def uncertainty_us(self) -> float:
+        """偏移估计的误差上界（半个往返时间）"""
+        return self.rtt_us / 2.0
+
+    def to_device(self, host_us: float) -> int:
+        return int(round(host_us + self.offset_us))
+
+    def to_host(self, device_us: int) -> float:
+        return device_us - self.offset_us
+
+
+def read_device_time(serial_comm: SerialComm,
+                     timeout: float = 0.2) -> Optional[Tuple[int, bool, int]]:
+    """
+    查询设备时钟
+
+    Returns:
+        (设备当前时间us, 是否在预约等待, 最近一次预约启动的触发时间us)，失败返回None
+    """
+    response = serial_comm.send_and_wait(SerialComm.CMD_GET_TIME, b'', timeout)
+    if response is None or response[0] != SerialComm.RESP_OK or len(response[1]) < 17:
+        return None
+    now_us, armed, fire_us = struct.unpack_from('<QBQ', response[1])
+    return now_us, bool(armed), fire_us
+
+
+def estimate_clock_offset(serial_comm: SerialComm, samples: int = CLOCK_SYNC_SAMPLES,
+                          timeout: float = 0.2) -> Optional[ClockOffset]:
+    """
+    估计设备时钟偏移（NTP式：取往返时间最小的一次交换，假设请求与响应延迟对称）
+
+    Args:
+        serial_comm: 串口通信对象
+        samples: 交换次数
+        timeout: 单次等待超时（秒）
+
+    Returns:
+        ClockOffset，全部失败返回None
+    """
+    best = None
+    valid = 0
+    for _ in range(samples):
+        t0 = host_time_us()
+        result = read_device_time(serial_comm, timeout)
+        t1 = host_time_us()
+        if result is None:
+            continue
+        valid += 1
+        rtt_us = t1 - t0
+        if best is None or rtt_us < best[1]:
+            best = (result[0] - (t0 + t1) / 2.0, rtt_us)
+
+    if best is None:
+        return None
+    return ClockOffset(offset_us=best[0], rtt_us=best[1], samples=valid)
+
+
+class MultiBoardController:
+    """多板同步执行：每块板独立即时上传，启动时刻统一预约"""
+
+    def __init__(self, boards: Dict[str, SerialComm], arm_margin_ms: float = ARM_MARGIN_MS):
+        """
+        Args:
+            boards: {板名: 串口通信对象}
+            arm_margin_ms: 预约启动的最小提前量（ms）
+        """
+        self.boards = boards
+        self.commanders = {name: ServoCommander(comm) for name, comm in boards.items()}
+        for name, commander in self.commanders.items():
+            commander.board_name = name
+        self.arm_margin_ms = arm_margin_ms
+        self.offsets: Dict[str, ClockOffset] = {}
+        self.last_skew_report: Dict[str, Any] = {}
+
+        self._barrier: Optional[threading.Barrier] = None
+        self._arm_results: Dict[str, Any] = {}
+        self._start_host_us = 0.0
+        self._start_device_us: Dict[str, int] = {}
+
+    def sync_clocks(self, samples: int = CLOCK_SYNC_SAMPLES) -> bool:
+        """估计所有板的时钟偏移"""
+        self.offsets.clear()
+        for name, comm in self.boards.items():
+            offset = estimate_clock_offset(comm, samples)
+            if offset is None:
+                logger.error(f"板{name}时钟同步失败")
+                return False
+            self.offsets[name] = offset
+            logger.info(f"板{name}时钟偏移: {offset.offset_us:.0f}us "
+                        f"(RTT {offset.rtt_us:.0f}us, ±{offset.uncertainty_us:.0f}us, {offset.samples}/{samples})")
+        return True
+
+    def execute_timeline(self, timeline_data: TimelineData, loop_all: bool = False) -> bool:
+        """
+        编译整条时间线，按通道路由拆分到各板后同步执行
+
+        Args:
+            timeline_data: 时间线（channel_map中的板名须与boards一致）
+            loop_all: 整条时间线循环
+        """
+        channel_map = timeline_data.channel_map
+        missing = [name for name in channel_map.board_names if name not in self.boards]
+        if missing:
+            logger.error(f"通道路由中的板未连接: {missing}")
+            return False
+
+        # 起始角度：各板命令器记录的当前角度按路由拼成全局列表
+        start_positions = []
+        for channel in range(channel_map.channel_count):
+            name, local_id = channel_map.route(channel)
+            positions = self.commanders[name].current_positions
+            start_positions.append(positions[local_id] if local_id < len(positions) else 90.0)
+
+        tolerance = self.commanders[channel_map.board_names[0]].decimation_tolerance
+        program = compile_program(timeline_data, start_positions, tolerance, loop_all=loop_all)
+        programs = split_program(program, channel_map)
+        logger.info("按板拆分程序: " + ", ".join(f"{name} {len(p.blocks)}块" for name, p in programs.items()))
+        return self.execute(programs)
+
+    def execute(self, programs: Dict[str, CompiledProgram]) -> bool:
+        """
+        同步执行各板程序
+
+        循环程序（含循环轨道）在各板持续上传并监听，直到stop()后才返回
+
+        Args:
+            programs: {板名: 编译好的程序}
+
+        Returns:
+            bool: 全部板启动并完成上传
+        """
+        names = [name for name in programs if programs[name].blocks or programs[name].is_looping]
+        if not names:
+            logger.warning("没有需要执行的程序")
+            return False
+        looping = any(programs[name].is_looping for name in names)
+
+        for name in names:
+            comm = self.boards[name]
+            if not comm.clear_buffer():
+                logger.error(f"板{name}清空缓冲区失败")
+                return False
+            active_servos = set(block['servo_id'] for block in programs[name].blocks) | set(programs[name].loops)
+            for servo_id in sorted(active_servos):
+                comm.enable_servo(servo_id)
+
+        if not self.sync_clocks():
+            return False
+
+        # 各板预装完成后在屏障处汇合，由最后到达的线程统一预约启动
+        self._arm_results = {}
+        self._start_device_us = {}
+        self._barrier = threading.Barrier(len(names), action=lambda: self._arm_all(names))
+        results: Dict[str, bool] = {}
+
+        def worker(name: str):
+            commander = self.commanders[name]
+            commander.should_stop = False
+            program = programs[name]
+
+            def start_motion():
+                return self._wait_armed_start(name)
+
+            if program.is_looping:
+                # 循环程序：按周期持续上传并监听，直到stop()（停止即正常结束）
+                results[name] = (commander.execute_looping(program.iter_blocks(), start_motion)
+                                 or commander.should_stop)
+            else:
+                results[name] = commander.upload_and_start(program.blocks, start_motion=start_motion)
+            if not results[name]:
+                # 其他板仍在等待屏障时直接打断，避免其无限等待
+                self._barrier.abort()
+                if looping:
+                    # 循环中的板不会自行结束
+                    self.stop()
+
+        threads = [threading.Thread(target=worker, args=(name,), daemon=True) for name in names]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if not all(results.get(name) for name in names):
+            logger.error("多板执行失败，停止所有板")
+            self.stop()
+            return False
+
+        self.measure_start_skew()
+        return True
+
+    def _wait_armed_start(self, name: str):
+        """启动回调：等待所有板预装完成，返回预约的时间原点（perf_counter秒）或False"""
+        try:
+            self._barrier.wait()
+        except threading.BrokenBarrierError:
+            return False
+        return self._arm_results.get(name, False)
+
+    def _arm_all(self, names):
+        """向所有板发送预约启动（在屏障动作中执行）"""
+        margin_us = max(self.arm_margin_ms * 1000.0,
+                        sum(2.0 * self.offsets[name].rtt_us for name in names) + 20000.0)
+        start_host_us = host_time_us() + margin_us
+
+        armed = []
+        for name in names:
+            device_us = self.offsets[name].to_device(start_host_us)
+            response = self.boards[name].send_and_wait(SerialComm.CMD_ARM_START, struct.pack('<Q', device_us))
+            if response is None or response[0] != SerialComm.RESP_OK:
+                logger.error(f"板{name}预约启动失败")
+                for armed_name in armed:
+                    self.boards[armed_name].stop_motion()
+                self._arm_results = {n: False for n in names}
+                return
+            armed.append(name)
+            self._start_device_us[name] = device_us
+
+        if host_time_us() >= start_host_us:
+            logger.warning("预约发送耗时超过提前量，部分板可能已错过启动时刻")
+
+        self._start_host_us = start_host_us
+        self._arm_results = {name: start_host_us / 1e6 for name in names}
+        logger.info(f"已预约{len(names)}块板在{margin_us / 1000.0:.0f}ms后同步启动")
+
+    def measure_start_skew(self) -> Dict[str, Any]:
+        """
+        测量板间启动偏差：读取各板实际触发时间并换算到主机时间轴
+
+        Returns:
+            {'skew_us', 'uncertainty_us', 'boards': {板名: {...}}}
+        """
+        boards = {}
+        for name, device_start_us in self._start_device_us.items():
+            result = read_device_time(self.boards[name])
+            if result is None or result[2] == 0:
+                logger.warning(f"板{name}未返回启动时间")
+                continue
+            offset = self.offsets[name]
+            fire_us = result[2]
+            boards[name] = {
+                'fire_host_us': offset.to_host(fire_us) - self._start_host_us,
+                'fire_late_us': fire_us - device_start_us,
+                'offset_us': offset.offset_us,
+                'uncertainty_us': offset.uncertainty_us,
+            }
+
+        report: Dict[str, Any] = {'boards': boards, 'skew_us': None, 'uncertainty_us': None}
+        if len(boards) >= 2:
+            fires = [info['fire_host_us'] for info in boards.values()]
+            uncertainties = sorted((info['uncertainty_us'] for info in boards.values()), reverse=True)
+            report['skew_us'] = max(fires) - min(fires)
+            report['uncertainty_us'] = uncertainties[0] + uncertainties[1]
+
+            message = (f"板间启动偏差: {report['skew_us']:.0f}us "
+                       f"(时钟估计误差±{report['uncertainty_us']:.0f}us, 目标<{SKEW_TARGET_US:.0f}us)")
+            if report['skew_us'] > SKEW_TARGET_US:
+                logger.warning(message)
+            else:
+                logger.info(message)
+
+        self.last_skew_report = report
+        return report
+
+    def stop(self):
+        """停止所有板"""
+        for name, comm in self.boards.items():
+            self.commanders[name].should_stop = True
+            comm.stop_motion()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+时间线实时预览（Scrub）
+拖动播放头时用上位机轨迹模型计算所有通道在该时刻的位置，经合并限速的MOVE_ALL发送到硬件，
+无需上传并运行程序即可在真机上查看姿态
+"""
+
+from typing import List, Dict, Optional
+from models.timeline_data import TimelineData
+from core.logger import get_logger
+from core.jog_coalescer import JogCoalescer
+from core.trajectory_model import ChannelTrajectory, build_trajectories, evaluate_pose
+
+logger = get_logger()
+
+
+class PoseScrubber:
+    """按播放头时间发送姿态（时间线内容不变时复用轨迹模型）"""
+
+    def __init__(self, servo_commander, coalescer: JogCoalescer):
+        """
+        Args:
+            servo_commander: 舵机命令器（提供编译与起始位置）
+            coalescer: 合并限速的发送通道
+        """
+        self.servo_commander = servo_commander
+        self.coalescer = coalescer
+        self._key: Optional[str] = None
+        self._start_positions: List[float] = []
+        self._trajectories: Dict[int, ChannelTrajectory] = {}
+
+    def invalidate(self):
+        """丢弃缓存的轨迹模型"""
+        self._key = None
+
+    def pose_at(self, timeline_data: TimelineData, t: float) -> List[float]:
+        """计算t秒时所有通道的位置（与程序实际执行的编译结果一致）"""
+        commander = self.servo_commander
+        key = commander.program_key(timeline_data)
+        if key != self._key:
+            program = commander.compile_program(timeline_data)
+            self._start_positions = list(commander.start_positions(timeline_data))
+            self._trajectories = build_trajectories(program.blocks, self._start_positions)
+            self._key = key
+            logger.debug(f"预览轨迹已更新: {len(program.blocks)}块")
+        return evaluate_pose(self._trajectories, self._start_positions, t)
+
+    def scrub(self, timeline_data: TimelineData, t: float) -> List[float]:
+        """
+        移动硬件到t秒时的姿态
+
+        Returns:
+            List[float]: 发送的各通道角度（只含本连接所在板的通道）
+        """
+        channel_map = timeline_data.channel_map
+        board = self.servo_commander.connected_board(channel_map)
+        if board not in channel_map.board_names:
+            logger.warning(f"通道路由中没有驱动板{board}，不发送预览姿态")
+            return []
+        full_pose = self.pose_at(timeline_data, t)
+        pose = [full_pose[channel] for channel in channel_map.channels_of(board)][:self.servo_commander.servo_count]
+        self.coalescer.set_pose(pose)
+        return pose
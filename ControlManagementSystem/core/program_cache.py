@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+编译程序缓存
+按时间线内容哈希把编译结果保存在磁盘上，按总大小进行LRU淘汰
+"""
+
+import json
+import os
+import tempfile
+from typing import Optional, List, Tuple
+from core.logger import get_logger
+from core.motion_compiler import CompiledProgram, COMPILER_VERSION
+
+logger = get_logger()
+
+
+class ProgramCache:
+    """磁盘编译缓存（每个程序一个JSON文件，文件修改时间即最近使用时间）"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            cache_dir: 缓存目录，None表示 ~/.motor_controller/program_cache
+            max_bytes: 缓存总大小上限（字节）
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.expanduser('~'), '.motor_controller', 'program_cache')
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[CompiledProgram]:
+        """读取缓存，未命中或版本不符返回None"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                program = CompiledProgram.from_dict(json.load(f))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            logger.warning(f"编译缓存损坏，已丢弃: {path} ({e})")
+            self.invalidate(key)
+            self.misses += 1
+            return None
+
+        if program.key != key or program.metadata.get('compiler_version') != COMPILER_VERSION:
+            self.invalidate(key)
+            self.misses += 1
+            return None
+
+        # 更新最近使用时间
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        self.hits += 1
+        logger.info(f"编译缓存命中: {key[:12]} ({program.metadata.get('block_count', 0)}块)")
+        return program
+
+    def put(self, program: CompiledProgram) -> bool:
+        """写入缓存（先写临时文件再替换），随后按大小淘汰"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(program.to_dict(), f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self._path(program.key))
+        except Exception as e:
+            logger.error(f"写入编译缓存失败: {e}")
+            return False
+
+        self.evict()
+        return True
+
+    def invalidate(self, key: str):
+        """删除指定缓存"""
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        """清空缓存"""
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def evict(self):
+        """按最近使用时间淘汰，直到总大小不超过上限"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        while entries and total > self.max_bytes:
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+                total -= size
+                logger.debug(f"淘汰编译缓存: {os.path.basename(path)}")
+            except OSError:
+                pass
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """返回 [(最近使用时间, 大小, 路径), ...]"""
+        entries = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+二进制项目格式
+文件由固定头、元数据（JSON）、轨道目录和各轨道的数据块组成：
+
+    头      魔数 b'MCPROJ', 格式版本, 元数据长度, 轨道数
+    元数据  项目版本/时间、通道路由、轨道名称与循环模式、部件总数等（UTF-8 JSON）
+    目录    每条轨道一项：部件数、编码方式、数据块偏移/长度、CRC32
+    数据块  按起始时间排序的部件列（与ComponentStore相同的数组），可选zlib/zstd压缩
+
+读取时只解析头、元数据和目录，文件内存映射，各轨道在第一次访问部件时才解码
+（列数据直接复制进数组，不经过部件对象和参数字典）。JSON格式保留用于导入/导出。
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from operator import itemgetter
+from typing import Dict, Any, List, NamedTuple, Tuple
+from models.component import allocate_uids
+from models.component_store import ComponentStore, CODE_TYPES
+from models.channel_map import ChannelMap
+from models.timeline_data import TimelineData, MotorTrack, LoopMode
+from core.logger import get_logger
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，未安装时只能使用zlib
+    zstandard = None
+
+logger = get_logger()
+
+MAGIC = b'MCPROJ'
+FORMAT_VERSION = 1
+
+# 头：魔数, 格式版本, 保留, 元数据长度, 轨道数
+_HEADER = struct.Struct('<6sHHII')
+# 目录项：部件数, 编码方式, 保留, 数据块偏移, 存储长度, 原始长度, CRC32(存储的字节)
+_DIRECTORY_ENTRY = struct.Struct('<IBBHQIII')
+# 数据块头：部件数, 速度曲线数, 溢出参数JSON长度
+_CHUNK_HEADER = struct.Struct('<III')
+
+# 编码方式
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODECS = {'none': CODEC_NONE, 'zlib': CODEC_ZLIB, 'zstd': CODEC_ZSTD}
+
+# 数据块中的列（顺序即文件中的顺序）
+_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ('start', 'd'), ('duration', 'd'), ('type_code', 'B'), ('present', 'B'),
+    ('f0', 'd'), ('i0', 'i'), ('m0', 'B'), ('profile', 'I'))
+
+_BIG_ENDIAN = sys.byteorder == 'big'
+
+
+class ProjectFormatError(Exception):
+    """项目文件损坏或格式不支持"""
+
+
+class Chunk(NamedTuple):
+    """编码后的轨道数据块"""
+    count: int          # 部件数
+    codec: int          # 编码方式
+    stored: bytes       # 写入文件的字节（压缩后）
+    raw_length: int     # 解压后的长度
+
+
+def is_binary_project(file_path: str) -> bool:
+    """文件是否为二进制项目格式（按魔数判断）"""
+    try:
+        with open(file_path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+# ==================== 编码 ====================
+
+def _gather(column: array, order: array, identity: bool) -> bytes:
+    """按排序取出列（行号已按顺序连续时直接使用整列）"""
+    if identity:
+        data = column
+    elif len(order) == 1:
+        data = array(column.typecode, [column[order[0]]])
+    else:
+        data = array(column.typecode, itemgetter(*order)(column)) if order else array(column.typecode)
+    if _BIG_ENDIAN:
+        data = array(data.typecode, data)
+        data.byteswap()
+    return data.tobytes()
+
+
+def encode_columns(store: ComponentStore, order: array) -> bytes:
+    """
+    轨道的部件列（未压缩）
+
+    Args:
+        store: 轨道的列存储（或其snapshot()副本）
+        order: 按起始时间排序的行号
+    """
+    identity = not store._free and len(order) == len(store.uid) and order == array('i', range(len(order)))
+    extras = {}
+    if store.extras:
+        position = {row: i for i, row in enumerate(order)}
+        extras = {str(position[row]): values for row, values in store.extras.items()}
+    extras_bytes = json.dumps(extras, ensure_ascii=False).encode('utf-8') if extras else b''
+    profiles = array('d', [value for profile in store.profiles for value in profile])
+    if _BIG_ENDIAN:
+        profiles.byteswap()
+    parts = [_CHUNK_HEADER.pack(len(order), len(store.profiles), len(extras_bytes))]
+    parts.extend(_gather(getattr(store, name), order, identity) for name, _ in _COLUMNS)
+    parts.append(profiles.tobytes())
+    parts.append(extras_bytes)
+    return b''.join(parts)
+
+
+def resolve_codec(compression: str) -> int:
+    """压缩方式名称 -> 编码方式（zstd未安装时使用zlib）"""
+    if compression not in CODECS:
+        raise ValueError(f"不支持的压缩方式: {compression}")
+    codec = CODECS[compression]
+    if codec == CODEC_ZSTD and zstandard is None:
+        logger.warning("未安装zstandard，改用zlib压缩")
+        codec = CODEC_ZLIB
+    return codec
+
+
+def encode_chunk(count: int, raw: bytes, codec: int, level: int = 1) -> Chunk:
+    """压缩轨道数据"""
+    if codec == CODEC_ZLIB:
+        return Chunk(count, codec, zlib.compress(raw, level), len(raw))
+    if codec == CODEC_ZSTD:
+        return Chunk(count, codec, zstandard.ZstdCompressor(level=level).compress(raw), len(raw))
+    return Chunk(count, CODEC_NONE, raw, len(raw))
+
+
+def decompress_chunk(stored: bytes, codec: int, raw_length: int) -> bytes:
+    """解压轨道数据"""
+    if codec == CODEC_ZLIB:
+        raw = zlib.decompress(stored)
+    elif codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ProjectFormatError("文件使用zstd压缩，需要安装zstandard")
+        raw = zstandard.ZstdDecompressor().decompress(stored, max_output_size=raw_length)
+    else:
+        raw = stored
+    if len(raw) != raw_length:
+        raise ProjectFormatError("轨道数据长度不符")
+    return raw
+
+
+def timeline_metadata(timeline_data: TimelineData) -> Dict[str, Any]:
+    """时间轴中保存在元数据里的信息（不含部件）"""
+    return {
+        'channel_map': timeline_data.channel_map.to_dict(),
+        'time_scale': timeline_data.time_scale,
+        'time_unit': timeline_data.time_unit,
+        'total_duration': timeline_data.total_duration,
+        'tracks': [{'name': track.name, 'loop_mode': track.loop_mode.value} for track in timeline_data.tracks],
+    }
+
+
+def assemble_project(metadata: Dict[str, Any], chunks: List[Chunk]) -> bytes:
+    """
+    组装文件内容
+
+    Args:
+        metadata: 项目信息和timeline_metadata()
+        chunks: 各轨道的数据块（与metadata['tracks']对应）
+    """
+    meta = dict(metadata, component_count=sum(chunk.count for chunk in chunks))
+    meta_bytes = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+    offset = _HEADER.size + len(meta_bytes) + _DIRECTORY_ENTRY.size * len(chunks)
+    parts = [_HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(meta_bytes), len(chunks)), meta_bytes]
+    for chunk in chunks:
+        parts.append(_DIRECTORY_ENTRY.pack(chunk.count, chunk.codec, 0, 0, offset, len(chunk.stored),
+                                           chunk.raw_length, zlib.crc32(chunk.stored)))
+        offset += len(chunk.stored)
+    parts.extend(chunk.stored for chunk in chunks)
+    return b''.join(parts)
+
+
+def encode_project(timeline_data: TimelineData, metadata: Dict[str, Any],
+                   compression: str = 'none', level: int = 1) -> bytes:
+    """
+    编码为二进制项目文件内容
+
+    Args:
+        timeline_data: 时间轴（延迟解码的轨道会先解码）
+        metadata: 项目信息（version、created_time、modified_time等），与时间轴信息一起写入元数据
+        compression: 数据块压缩方式 'none'/'zlib'/'zstd'（zstd未安装时使用zlib）
+        level: 压缩级别
+    """
+    codec = resolve_codec(compression)
+    chunks = [encode_chunk(track.component_count, encode_columns(track._store, track._order), codec, level)
+              for track in timeline_data.tracks]
+    return assemble_project(dict(metadata, **timeline_metadata(timeline_data)), chunks)
+
+
+def write_file_atomic(file_path: str, content: bytes):
+    """
+    原子写入：先写临时文件并fsync，再重命名覆盖目标文件
+
+    写入过程中崩溃或断电时目标文件保持原内容，不会出现写了一半的文件
+    """
+    temp_path = file_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, file_path)
+    if hasattr(os, 'O_DIRECTORY'):
+        # 目录项也要落盘，否则断电后重命名可能丢失（Windows不支持也不需要）
+        fd = os.open(os.path.dirname(os.path.abspath(file_path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+# ==================== 解码 ====================
+
+def read_header(f) -> Tuple[Dict[str, Any], int]:
+    """
+    读取头和元数据（不读取目录和数据块）
+
+    Returns:
+        (元数据, 轨道数)
+    """
+    header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise ProjectFormatError("文件过短")
+    magic, version, _, meta_length, track_count = _HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ProjectFormatError("不是二进制项目文件")
+    if version > FORMAT_VERSION:
+        raise ProjectFormatError(f"项目格式版本 {version} 高于支持的版本 {FORMAT_VERSION}")
+    meta_bytes = f.read(meta_length)
+    if len(meta_bytes) < meta_length:
+        raise ProjectFormatError("元数据不完整")
+    return json.loads(meta_bytes.decode('utf-8')), track_count
+
+
+def read_project_metadata(file_path: str) -> Dict[str, Any]:
+    """只读取项目文件的元数据（项目列表等场合使用）"""
+    with open(file_path, 'rb') as f:
+        return read_header(f)[0]
+
+
+def read_project_directory(file_path: str) -> Tuple[Dict[str, Any], List[Tuple[int, ...]]]:
+    """
+    读取元数据和轨道目录（不读取数据块）
+
+    Returns:
+        (元数据, 目录项列表)，目录项为 (部件数, 编码方式, 保留, 保留, 偏移, 存储长度, 原始长度, CRC32)
+    """
+    with open(file_path, 'rb') as f:
+        metadata, track_count = read_header(f)
+        data = f.read(_DIRECTORY_ENTRY.size * track_count)
+    if len(data) < _DIRECTORY_ENTRY.size * track_count:
+        raise ProjectFormatError("轨道目录不完整")
+    return metadata, list(_DIRECTORY_ENTRY.iter_unpack(data))
+
+
+def decode_columns(raw: bytes, track: MotorTrack):
+    """把encode_columns()的数据填入轨道（分配新的部件ID，登记到轨道的ID索引）"""
+    count, profile_count, extras_length = _CHUNK_HEADER.unpack_from(raw)
+    store = ComponentStore(track)
+    offset = _CHUNK_HEADER.size
+    for name, typecode in _COLUMNS:
+        column = array(typecode)
+        size = column.itemsize * count
+        column.frombytes(raw[offset:offset + size])
+        if _BIG_ENDIAN:
+            column.byteswap()
+        setattr(store, name, column)
+        offset += size
+    profiles = array('d')
+    profiles.frombytes(raw[offset:offset + 24 * profile_count])
+    if _BIG_ENDIAN:
+        profiles.byteswap()
+    offset += 24 * profile_count
+    if any(code >= len(CODE_TYPES) for code in store.type_code) or \
+            any(profile >= profile_count for profile in store.profile):
+        raise ProjectFormatError(f"轨道{track.motor_id}数据损坏")
+    store.profiles = [tuple(profiles[i:i + 3]) for i in range(0, len(profiles), 3)]
+    store._profile_ids = {struct.pack('3d', *profile): i for i, profile in enumerate(store.profiles)}
+    if extras_length:
+        extras = json.loads(raw[offset:offset + extras_length].decode('utf-8'))
+        store.extras = {int(row): values for row, values in extras.items()}
+
+    uids = allocate_uids(count)
+    store.uid = array('i', uids)
+    track._store = store
+    track._order = array('i', range(count))
+    track._starts = array('d', store.start)
+    track._max_duration = max(store.duration, default=0.0)
+    track._index.set_range(uids, track._slot, track._order)
+
+
+class ProjectReader:
+    """
+    内存映射的项目文件
+
+    打开时校验各数据块的CRC（损坏的文件在打开时报错，而不是在之后访问某条轨道时）；
+    轨道在第一次访问部件时从映射中解码，全部轨道解码后关闭映射（之后可以覆盖写入同一文件）。
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        with open(file_path, 'rb') as f:
+            self.metadata, track_count = read_header(f)
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        offset = _HEADER.size + _HEADER.unpack_from(self._buffer)[3]
+        self.directory = [_DIRECTORY_ENTRY.unpack_from(self._buffer, offset + i * _DIRECTORY_ENTRY.size)
+                          for i in range(track_count)]
+        self._pending = len(self.directory)
+        end = offset + _DIRECTORY_ENTRY.size * track_count
+        for index, (_, codec, _, _, chunk_offset, length, _, crc) in enumerate(self.directory):
+            if chunk_offset < end or chunk_offset + length > len(self._buffer) or codec not in CODECS.values():
+                self.close()
+                raise ProjectFormatError("轨道目录损坏")
+            if zlib.crc32(self._buffer[chunk_offset:chunk_offset + length]) != crc:
+                self.close()
+                raise ProjectFormatError(f"轨道{index}数据校验失败")
+
+    def close(self):
+        """关闭映射（未解码的轨道不能再解码）"""
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+
+    def chunk(self, index: int) -> Chunk:
+        """第index条轨道的数据块（存储的字节，未解压）"""
+        if self._buffer is None:
+            raise ProjectFormatError(f"项目文件已关闭: {self.file_path}")
+        count, codec, _, _, offset, length, raw_length, _ = self.directory[index]
+        return Chunk(count, codec, self._buffer[offset:offset + length], raw_length)
+
+    def decode_track(self, index: int, track: MotorTrack):
+        """把第index条轨道的部件填入track（MotorTrack.lazy的加载函数）"""
+        chunk = self.chunk(index)
+        raw = decompress_chunk(chunk.stored, chunk.codec, chunk.raw_length)
+        self._pending -= 1
+        if self._pending == 0:
+            self.close()
+        decode_columns(raw, track)
+
+    def timeline(self) -> TimelineData:
+        """创建时间轴（各轨道延迟解码）"""
+        meta = self.metadata
+        channel_map = ChannelMap.from_dict(meta['channel_map'])
+        timeline = TimelineData(channel_map)
+        timeline.time_scale = meta.get('time_scale', 1.0)
+        timeline.time_unit = meta.get('time_unit', '秒')
+        timeline.total_duration = meta.get('total_duration', 0.0)
+
+        tracks: List[MotorTrack] = []
+        for index, info in enumerate(meta['tracks'][:min(len(self.directory), channel_map.channel_count)]):
+            tracks.append(MotorTrack.lazy(index, info['name'], LoopMode(info['loop_mode']),
+                                          lambda track, index=index: self.decode_track(index, track)))
+        # 超出通道数的轨道不会被解码
+        self._pending = len(tracks)
+        if not tracks:
+            self.close()
+        timeline._set_tracks(tracks)
+        return timeline
+
+
+def load_timeline(file_path: str) -> Tuple[TimelineData, Dict[str, Any]]:
+    """
+    打开二进制项目文件
+
+    Returns:
+        (时间轴, 元数据)
+    """
+    reader = ProjectReader(file_path)
+    return reader.timeline(), reader.metadata
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+项目库索引
+扫描目录中的项目文件，把元数据（时长、轨道数、部件数、修改时间、内容哈希）缓存在本地SQLite数据库中。
+再次扫描时只重新读取大小或修改时间变化的文件；二进制项目只读取文件头、元数据和轨道目录，
+内容哈希由各数据块的CRC计算，不读取数据块本身。列出项目和最近项目只查询数据库。
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+from datetime import datetime
+from typing import Dict, Any, List, NamedTuple, Optional, Set
+from core.project_format import is_binary_project, read_project_directory
+from core.project_manager import PROJECT_EXTENSION
+from core.logger import get_logger
+
+logger = get_logger()
+
+# 数据库结构版本（不同时重建索引，索引内容都可以从文件重新生成，最近访问时间除外）
+SCHEMA_VERSION = 1
+
+# 扫描的文件扩展名
+PROJECT_EXTENSIONS = (PROJECT_EXTENSION, '.json')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    path TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    format TEXT,
+    version TEXT,
+    created_time TEXT,
+    modified_time TEXT,
+    duration REAL,
+    track_count INTEGER,
+    component_count INTEGER,
+    content_hash TEXT,
+    error TEXT,
+    last_accessed TEXT
+);
+CREATE INDEX IF NOT EXISTS projects_directory ON projects (directory);
+CREATE INDEX IF NOT EXISTS projects_accessed ON projects (last_accessed);
+"""
+
+_FIELDS = ('path', 'directory', 'name', 'size', 'mtime_ns', 'format', 'version', 'created_time', 'modified_time',
+           'duration', 'track_count', 'component_count', 'content_hash', 'error', 'last_accessed')
+
+# 内容哈希中每条轨道的数据块摘要：部件数, 编码方式, 原始长度, CRC32
+_CHUNK_DIGEST = struct.Struct('<IBII')
+
+
+class ProjectRecord(NamedTuple):
+    """索引中的一个项目文件"""
+    path: str
+    directory: str
+    name: str
+    size: int
+    mtime_ns: int
+    format: Optional[str]           # 'binary' / 'json'
+    version: Optional[str]
+    created_time: Optional[str]
+    modified_time: Optional[str]
+    duration: Optional[float]
+    track_count: Optional[int]
+    component_count: Optional[int]
+    content_hash: Optional[str]
+    error: Optional[str]            # 无法读取时的原因（文件变化前不再重新读取）
+    last_accessed: Optional[str]
+
+
+class ScanResult(NamedTuple):
+    """一次扫描的统计"""
+    added: int
+    updated: int
+    removed: int
+    unchanged: int
+
+
+def read_project_summary(file_path: str) -> Dict[str, Any]:
+    """
+    读取项目文件的摘要（二进制格式只读取头、元数据和目录，JSON格式需要解析整个文件）
+
+    Returns:
+        Dict: format/version/created_time/modified_time/duration/track_count/component_count/content_hash
+    """
+    if is_binary_project(file_path):
+        metadata, directory = read_project_directory(file_path)
+        digest = hashlib.sha1(json.dumps(
+            {key: metadata.get(key) for key in ('channel_map', 'time_scale', 'time_unit', 'tracks')},
+            sort_keys=True).encode('utf-8'))
+        for count, codec, _, _, _, _, raw_length, crc in directory:
+            digest.update(_CHUNK_DIGEST.pack(count, codec, raw_length, crc))
+        return {
+            'format': 'binary',
+            'version': metadata.get('version'),
+            'created_time': metadata.get('created_time'),
+            'modified_time': metadata.get('modified_time'),
+            'duration': metadata.get('total_duration', 0.0),
+            'track_count': len(directory),
+            'component_count': sum(entry[0] for entry in directory),
+            'content_hash': digest.hexdigest(),
+        }
+
+    with open(file_path, 'rb') as f:
+        content = f.read()
+    data = json.loads(content.decode('utf-8'))
+    if not isinstance(data, dict) or 'timeline_data' not in data:
+        raise ValueError("不是项目文件")
+    tracks = data['timeline_data'].get('tracks', [])
+    return {
+        'format': 'json',
+        'version': data.get('version'),
+        'created_time': data.get('created_time'),
+        'modified_time': data.get('modified_time'),
+        'duration': data['timeline_data'].get('total_duration', 0.0),
+        'track_count': len(tracks),
+        'component_count': sum(len(track.get('components', [])) for track in tracks),
+        'content_hash': hashlib.sha1(content).hexdigest(),
+    }
+
+
+class ProjectLibrary:
+    """项目文件元数据索引（SQLite），同时保存最近访问时间"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Args:
+            db_path: 数据库文件，None表示 ~/.motor_controller/project_library.db
+        """
+        if db_path is None:
+            db_path = os.path.join(os.path.expanduser('~'), '.motor_controller', 'project_library.db')
+        self.db_path = db_path
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            if version:
+                logger.info(f"项目库索引结构已更新，重建索引: {db_path}")
+            self._db.executescript("DROP TABLE IF EXISTS projects;" + _SCHEMA)
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._import_recent_json()
+
+    def close(self):
+        self._db.close()
+
+    def _import_recent_json(self):
+        """导入旧版 recent_projects.json 中的最近项目"""
+        config_file = os.path.join(os.path.expanduser('~'), '.motor_controller', 'recent_projects.json')
+        try:
+            with open(config_file, 'r', encoding='utf-8') as f:
+                recent_projects = json.load(f)
+        except (OSError, ValueError):
+            return
+        for project in recent_projects:
+            try:
+                self.touch(project['file_path'], project.get('last_accessed'))
+            except (KeyError, TypeError):
+                continue
+        logger.info(f"已导入{len(recent_projects)}个最近项目")
+
+    # ==================== 扫描 ====================
+
+    def _walk(self, directory: str, recursive: bool, found: Dict[str, os.stat_result]):
+        try:
+            entries = list(os.scandir(directory))
+        except OSError as e:
+            logger.warning(f"无法读取目录 {directory}: {e}")
+            return
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    # 跳过隐藏目录（例如自动保存的恢复目录）
+                    if recursive and not entry.name.startswith('.'):
+                        self._walk(entry.path, recursive, found)
+                elif entry.name.lower().endswith(PROJECT_EXTENSIONS):
+                    found[entry.path] = entry.stat()
+            except OSError:
+                continue
+
+    def scan(self, directory: str, recursive: bool = True) -> ScanResult:
+        """
+        扫描目录，只重新读取新增或大小/修改时间变化的文件，删除已不存在的文件
+
+        Args:
+            directory: 项目目录
+            recursive: 是否包含子目录（隐藏目录除外）
+        """
+        directory = os.path.abspath(directory)
+        found: Dict[str, os.stat_result] = {}
+        self._walk(directory, recursive, found)
+
+        if recursive:
+            rows = self._db.execute("SELECT path, size, mtime_ns FROM projects WHERE directory = ? "
+                                    "OR substr(directory, 1, ?) = ?",
+                                    (directory, len(directory) + 1, os.path.join(directory, '')))
+        else:
+            rows = self._db.execute("SELECT path, size, mtime_ns FROM projects WHERE directory = ?", (directory,))
+        cached = {path: (size, mtime_ns) for path, size, mtime_ns in rows}
+
+        added = updated = unchanged = 0
+        with self._db:
+            for path, stat in found.items():
+                previous = cached.get(path)
+                if previous == (stat.st_size, stat.st_mtime_ns):
+                    unchanged += 1
+                    continue
+                self._index(path, stat)
+                if previous is None:
+                    added += 1
+                else:
+                    updated += 1
+            removed: Set[str] = cached.keys() - found.keys()
+            self._db.executemany("DELETE FROM projects WHERE path = ?", ((path,) for path in removed))
+        result = ScanResult(added, updated, len(removed), unchanged)
+        logger.info(f"项目库扫描 {directory}: 新增{added}, 更新{updated}, 移除{len(removed)}, 未变{unchanged}")
+        return result
+
+    def _index(self, path: str, stat: os.stat_result):
+        """读取文件摘要并写入索引（保留最近访问时间）"""
+        try:
+            summary = read_project_summary(path)
+            error = None
+        except Exception as e:
+            summary = {}
+            error = str(e) or type(e).__name__
+        values = {
+            'path': path,
+            'directory': os.path.dirname(path),
+            'name': os.path.basename(path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'error': error,
+        }
+        values.update(summary)
+        columns = [field for field in _FIELDS if field != 'last_accessed']
+        self._db.execute(
+            f"INSERT INTO projects ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT(path) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in columns[1:])}",
+            [values.get(column) for column in columns])
+
+    # ==================== 查询 ====================
+
+    def get(self, file_path: str) -> Optional[ProjectRecord]:
+        """
+        文件的索引信息（文件变化时重新读取）
+
+        Returns:
+            Optional[ProjectRecord]: 文件不存在时为None
+        """
+        path = os.path.abspath(file_path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            with self._db:
+                self._db.execute("DELETE FROM projects WHERE path = ?", (path,))
+            return None
+        record = self._fetch(path)
+        if record is None or (record.size, record.mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+            with self._db:
+                self._index(path, stat)
+            record = self._fetch(path)
+        return record
+
+    def _fetch(self, path: str) -> Optional[ProjectRecord]:
+        row = self._db.execute(f"SELECT {', '.join(_FIELDS)} FROM projects WHERE path = ?", (path,)).fetchone()
+        return ProjectRecord(*row) if row is not None else None
+
+    def projects(self, directory: Optional[str] = None, recursive: bool = True) -> List[ProjectRecord]:
+        """
+        索引中的项目（不读取文件；需要最新内容时先调用scan()）
+
+        Args:
+            directory: 只列出该目录中的项目，None表示全部
+            recursive: 是否包含子目录
+        Returns:
+            List[ProjectRecord]: 按修改时间从新到旧，不含无法读取的文件
+        """
+        query = f"SELECT {', '.join(_FIELDS)} FROM projects WHERE error IS NULL"
+        args: tuple = ()
+        if directory is not None:
+            directory = os.path.abspath(directory)
+            if recursive:
+                query += " AND (directory = ? OR substr(directory, 1, ?) = ?)"
+                args = (directory, len(directory) + 1, os.path.join(directory, ''))
+            else:
+                query += " AND directory = ?"
+                args = (directory,)
+        query += " ORDER BY mtime_ns DESC"
+        return [ProjectRecord(*row) for row in self._db.execute(query, args)]
+
+    def duplicates(self) -> List[List[ProjectRecord]]:
+        """内容哈希相同的项目组"""
+        groups: Dict[str, List[ProjectRecord]] = {}
+        for record in self.projects():
+            groups.setdefault(record.content_hash, []).append(record)
+        return [records for records in groups.values() if len(records) > 1]
+
+    # ==================== 最近项目 ====================
+
+    def touch(self, file_path: str, accessed: Optional[str] = None):
+        """记录项目的访问时间（文件未索引时先读取摘要）"""
+        record = self.get(file_path)
+        if record is None:
+            return
+        if accessed is None:
+            accessed = datetime.now().isoformat()
+        with self._db:
+            self._db.execute("UPDATE projects SET last_accessed = ? WHERE path = ?", (accessed, record.path))
+
+    def recent(self, max_count: int = 10) -> List[ProjectRecord]:
+        """最近访问的项目（已删除的文件从索引中移除）"""
+        records = []
+        rows = self._db.execute(f"SELECT {', '.join(_FIELDS)} FROM projects WHERE last_accessed IS NOT NULL "
+                                f"ORDER BY last_accessed DESC", ())
+        for row in rows.fetchall():
+            record = ProjectRecord(*row)
+            if not os.path.exists(record.path):
+                with self._db:
+                    self._db.execute("DELETE FROM projects WHERE path = ?", (record.path,))
+                continue
+            records.append(record)
+            if len(records) >= max_count:
+                break
+        return records
@@ -3,6 +3,7 @@
 """
 项目管理器
 负责项目的保存和加载
+项目默认保存为二进制格式（.mcproj，见core.project_format），.json文件按原JSON格式导入/导出
 """
 
 import json
@@ -10,43 +11,77 @@ import os
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 from models.timeline_data import TimelineData
+from models.channel_map import ChannelMap
+from core.project_format import encode_project, is_binary_project, load_timeline, write_file_atomic
 import logging
 
 logger = logging.getLogger('motor_controller')
 
+# 二进制项目文件扩展名（其他扩展名按JSON保存）
+PROJECT_EXTENSION = '.mcproj'
+
+def is_json_path(file_path: str) -> bool:
+    """按扩展名判断是否保存为JSON"""
+    return os.path.splitext(file_path)[1].lower() == '.json'
+
 class ProjectManager:
     """项目管理器"""
     
     def __init__(self):
         self.current_project_path: Optional[str] = None
         self.project_modified = False
+        self._library = None
+    
+    @property
+    def library(self):
+        """项目库索引（第一次使用时打开数据库）"""
+        if self._library is None:
+            from .project_library import ProjectLibrary
+            self._library = ProjectLibrary()
+        return self._library
         
-    def create_new_project(self) -> TimelineData:
-        """创建新项目"""
+    def create_new_project(self, channel_map: Optional[ChannelMap] = None) -> TimelineData:
+        """
+        创建新项目
+        
+        Args:
+            channel_map: 通道路由，None表示一块板18个通道
+        """
         logger.info("创建新项目")
         self.current_project_path = None
         self.project_modified = False
-        return TimelineData()
+        return TimelineData(channel_map)
     
-    def save_project(self, timeline_data: TimelineData, file_path: str) -> bool:
-        """保存项目到文件"""
+    def save_project(self, timeline_data: TimelineData, file_path: str, compression: str = 'none') -> bool:
+        """
+        保存项目到文件
+        
+        Args:
+            file_path: .json按JSON格式导出，其他扩展名保存为二进制格式
+            compression: 二进制格式的数据块压缩方式 'none'/'zlib'/'zstd'
+        """
         try:
             # 准备项目数据
-            project_data = {
+            metadata = {
                 'version': '1.0.0',
                 'created_time': datetime.now().isoformat(),
-                'modified_time': datetime.now().isoformat(),
-                'timeline_data': timeline_data.to_dict()
+                'modified_time': datetime.now().isoformat()
             }
             
+            # 先编码（延迟解码的轨道在此解码，释放对原文件的映射）
+            if is_json_path(file_path):
+                content = json.dumps(dict(metadata, timeline_data=timeline_data.to_dict()),
+                                     ensure_ascii=False, indent=2).encode('utf-8')
+            else:
+                content = encode_project(timeline_data, metadata, compression)
+            
             # 确保目录存在
             dir_path = os.path.dirname(file_path)
             if dir_path:
                 os.makedirs(dir_path, exist_ok=True)
             
-            # 保存到文件
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(project_data, f, ensure_ascii=False, indent=2)
+            # 原子写入：保存中途崩溃不会损坏原文件
+            write_file_atomic(file_path, content)
             
             self.current_project_path = file_path
             self.project_modified = False
@@ -59,10 +94,14 @@ class ProjectManager:
             return False
     
     def load_project(self, file_path: str) -> Optional[TimelineData]:
-        """从文件加载项目"""
+        """从文件加载项目（按文件内容识别二进制或JSON格式）"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                project_data = json.load(f)
+            if is_binary_project(file_path):
+                timeline_data, project_data = load_timeline(file_path)
+            else:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    project_data = json.load(f)
+                timeline_data = None
             
             # 检查版本兼容性
             version = project_data.get('version', '1.0.0')
@@ -70,7 +109,8 @@ class ProjectManager:
                 logger.warning(f"项目版本 {version} 可能不兼容")
             
             # 加载时间轴数据
-            timeline_data = TimelineData.from_dict(project_data['timeline_data'])
+            if timeline_data is None:
+                timeline_data = TimelineData.from_dict(project_data['timeline_data'])
             
             self.current_project_path = file_path
             self.project_modified = False
@@ -111,17 +151,23 @@ class ProjectManager:
             return False
     
     def get_project_info(self, file_path: str) -> Optional[Dict[str, Any]]:
-        """获取项目信息"""
+        """获取项目信息（来自项目库索引，文件变化时只重新读取元数据）"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                project_data = json.load(f)
+            record = self.library.get(file_path)
+            if record is None or record.error:
+                logger.error(f"获取项目信息失败: {record.error if record else '文件不存在'}")
+                return None
             
             return {
-                'version': project_data.get('version', '1.0.0'),
-                'created_time': project_data.get('created_time', ''),
-                'modified_time': project_data.get('modified_time', ''),
+                'version': record.version or '1.0.0',
+                'created_time': record.created_time or '',
+                'modified_time': record.modified_time or '',
                 'file_path': file_path,
-                'file_size': os.path.getsize(file_path)
+                'file_size': record.size,
+                'duration': record.duration,
+                'track_count': record.track_count,
+                'component_count': record.component_count,
+                'content_hash': record.content_hash
             }
             
         except Exception as e:
@@ -157,15 +203,15 @@ class ProjectManager:
         return self.project_modified
     
     def get_recent_projects(self, max_count: int = 10) -> List[Dict[str, Any]]:
-        """获取最近的项目列表"""
+        """获取最近的项目列表（只查询项目库索引）"""
         try:
-            # 从配置文件读取最近项目列表
-            config_file = os.path.join(os.path.expanduser('~'), '.motor_controller', 'recent_projects.json')
-            
-            if os.path.exists(config_file):
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    recent_projects = json.load(f)
-                return recent_projects[:max_count]
+            return [{
+                'file_path': record.path,
+                'name': record.name,
+                'last_accessed': record.last_accessed,
+                'duration': record.duration,
+                'component_count': record.component_count
+            } for record in self.library.recent(max_count)]
             
         except Exception as e:
             logger.error(f"读取最近项目列表失败: {e}")
@@ -175,34 +221,6 @@ class ProjectManager:
     def add_to_recent_projects(self, file_path: str):
         """添加项目到最近列表"""
         try:
-            config_dir = os.path.join(os.path.expanduser('~'), '.motor_controller')
-            os.makedirs(config_dir, exist_ok=True)
-            
-            config_file = os.path.join(config_dir, 'recent_projects.json')
-            
-            # 读取现有列表
-            recent_projects = []
-            if os.path.exists(config_file):
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    recent_projects = json.load(f)
-            
-            # 添加新项目到列表开头
-            project_info = {
-                'file_path': file_path,
-                'name': os.path.basename(file_path),
-                'last_accessed': datetime.now().isoformat()
-            }
-            
-            # 移除重复项
-            recent_projects = [p for p in recent_projects if p['file_path'] != file_path]
-            recent_projects.insert(0, project_info)
-            
-            # 限制列表长度
-            recent_projects = recent_projects[:10]
-            
-            # 保存列表
-            with open(config_file, 'w', encoding='utf-8') as f:
-                json.dump(recent_projects, f, ensure_ascii=False, indent=2)
-            
+            self.library.touch(file_path)
         except Exception as e:
             logger.error(f"添加最近项目失败: {e}")
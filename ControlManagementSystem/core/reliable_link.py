@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可靠传输
+帧ID作为序号，滑动窗口连续发送；超时、设备NAK或收到损坏的应答时只重传丢失的帧（选择重传）。
+设备端按序交付，乱序到达的帧暂存在接收窗口中，重复帧只重发缓存的应答。
+重传都在定时线程中发送：串口读取线程只登记重传请求，不会阻塞在发送队列上而耽误解析应答。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple, List, Dict, Any, Iterable
+from core.logger import get_logger
+from core.serial_comm import SerialComm
+
+logger = get_logger()
+
+# 与固件 reliable_link.h 保持一致
+SEQ_MODULO = 255            # 序号空间1-255（0为普通帧）
+RELIABLE_WINDOW = 8         # 设备接收窗口
+MIN_RTO_MS = 50.0           # 最小重传超时（设备每10ms轮询一次USB）
+
+
+def seq_distance(a: int, b: int) -> int:
+    """序号差 (a - b)，结果在 [0, 254]"""
+    return ((a - 1) - (b - 1)) % SEQ_MODULO
+
+
+class _Pending:
+    """已发送未应答的帧"""
+    __slots__ = ('seq', 'cmd', 'data', 'sent_at', 'retries', 'event', 'response', 'failed')
+
+    def __init__(self, seq: int, cmd: int, data: bytes):
+        self.seq = seq
+        self.cmd = cmd
+        self.data = data
+        self.sent_at = 0.0
+        self.retries = 0
+        self.event = threading.Event()
+        self.response: Optional[Tuple[int, bytes]] = None
+        self.failed = False
+
+
+class ReliableLink:
+    """滑动窗口 + 选择重传"""
+
+    def __init__(self, serial_comm: SerialComm, window: int = RELIABLE_WINDOW,
+                 rto_ms: Optional[float] = None, max_retries: int = 10):
+        """
+        Args:
+            serial_comm: 串口通信对象
+            window: 发送窗口（不超过设备接收窗口）
+            rto_ms: 重传超时，None表示按测得的RTT自动计算
+            max_retries: 单帧最大重传次数
+        """
+        self.serial_comm = serial_comm
+        self.window = min(window, RELIABLE_WINDOW)
+        self.rto_ms = rto_ms
+        self.max_retries = max_retries
+        self.active = False
+
+        self._cond = threading.Condition()
+        self._pending: "OrderedDict[int, _Pending]" = OrderedDict()
+        self._next_seq = 1
+        self._timer_thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self._requested: "OrderedDict[int, str]" = OrderedDict()   # 读取线程登记的重传：序号 -> 原因
+        self._rto = MIN_RTO_MS / 1000.0
+
+        self.stats: Dict[str, Any] = {}
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.stats = {'frames': 0, 'retransmits': 0, 'timeouts': 0, 'naks': 0,
+                      'crc_errors': 0, 'duplicates': 0, 'failed': 0}
+
+    @property
+    def retransmit_rate(self) -> float:
+        """重传率（重传帧数 / 发送帧数）"""
+        return self.stats['retransmits'] / self.stats['frames'] if self.stats['frames'] else 0.0
+
+    # ==================== 会话 ====================
+
+    def open(self) -> bool:
+        """进入可靠模式：设备从序号1开始按序接收"""
+        self.close()
+        response = self.serial_comm.send_and_wait(SerialComm.CMD_LINK_RESET, bytes([1]))
+        if response is None or response[0] != SerialComm.RESP_OK:
+            logger.warning("设备不支持可靠传输，使用普通模式")
+            return False
+
+        rtt = self.serial_comm.last_rtt
+        self._rto = max(MIN_RTO_MS, self.rto_ms or 0.0, 4000.0 * rtt if rtt else 0.0) / 1000.0
+        self._next_seq = 1
+        self._requested.clear()
+        self._wake.clear()
+        self._reset_stats()
+        self.active = True
+        self.serial_comm.link_listener = self
+
+        self._timer_thread = threading.Thread(target=self._timer_loop, daemon=True)
+        self._timer_thread.start()
+        logger.info(f"可靠传输已启用: 窗口{self.window}, 重传超时{self._rto * 1000:.0f}ms")
+        return True
+
+    def close(self):
+        """退出可靠模式，未完成的帧全部失败"""
+        if not self.active:
+            return
+        with self._cond:
+            self.active = False
+            for entry in self._pending.values():
+                entry.failed = True
+                entry.event.set()
+            self._pending.clear()
+            self._requested.clear()
+            self._cond.notify_all()
+        self._wake.set()
+        if self.serial_comm.link_listener is self:
+            self.serial_comm.link_listener = None
+        if self._timer_thread is not None:
+            self._timer_thread.join(timeout=1.0)
+            self._timer_thread = None
+        if self.stats['frames']:
+            logger.info(f"可靠传输统计: {self.stats}, 重传率{self.retransmit_rate * 100:.1f}%")
+
+    # ==================== 发送 ====================
+
+    def submit(self, cmd: int, data: bytes = b'') -> Optional[_Pending]:
+        """发送一帧（窗口已满时阻塞），返回待应答条目"""
+        with self._cond:
+            # 窗口以最早未应答的帧为起点：设备只能识别窗口范围内的重复帧
+            while self.active and self._pending and \
+                    seq_distance(self._next_seq, next(iter(self._pending))) >= self.window:
+                self._cond.wait(self._rto)
+            if not self.active:
+                return None
+            entry = _Pending(self._next_seq, cmd, data)
+            self._next_seq = self._next_seq % SEQ_MODULO + 1
+            entry.sent_at = time.perf_counter()
+            self._pending[entry.seq] = entry
+            self.stats['frames'] += 1
+
+        if not self.serial_comm.send_servo_command(cmd, data, frame_id=entry.seq):
+            self._fail(entry)
+        return entry
+
+    def wait(self, entry: Optional[_Pending], timeout: Optional[float] = None) -> Optional[Tuple[int, bytes]]:
+        """等待应答，失败返回None"""
+        if entry is None:
+            return None
+        if timeout is None:
+            timeout = self._rto * (self.max_retries + 2)
+        entry.event.wait(timeout)
+        return None if entry.failed else entry.response
+
+    def send(self, cmd: int, data: bytes = b'') -> Optional[Tuple[int, bytes]]:
+        """发送一帧并等待应答（未启用可靠模式时退化为普通发送）"""
+        if not self.active:
+            return self.serial_comm.send_and_wait(cmd, data)
+        return self.wait(self.submit(cmd, data))
+
+    def send_many(self, frames: Iterable[Tuple[int, bytes]]) -> List[Optional[Tuple[int, bytes]]]:
+        """窗口内连续发送多帧，按顺序返回各帧应答"""
+        if not self.active:
+            return [self.serial_comm.send_and_wait(cmd, data) for cmd, data in frames]
+        entries = [self.submit(cmd, data) for cmd, data in frames]
+        return [self.wait(entry) for entry in entries]
+
+    def _retransmit(self, entry: _Pending, reason: str):
+        """重传单帧（调用方已检查条目仍未应答）"""
+        with self._cond:
+            if entry.seq not in self._pending or entry.event.is_set():
+                return
+            if entry.retries >= self.max_retries:
+                self.stats['failed'] += 1
+                logger.error(f"帧{entry.seq}重传{entry.retries}次仍失败: CMD=0x{entry.cmd:02X}")
+                self._pending.pop(entry.seq, None)
+                entry.failed = True
+                entry.event.set()
+                self._cond.notify_all()
+                return
+            entry.retries += 1
+            entry.sent_at = time.perf_counter()
+            self.stats['retransmits'] += 1
+        logger.debug(f"重传帧{entry.seq} ({reason}, 第{entry.retries}次)")
+        self.serial_comm.send_servo_command(entry.cmd, entry.data, frame_id=entry.seq)
+
+    def _fail(self, entry: _Pending):
+        with self._cond:
+            self._pending.pop(entry.seq, None)
+            entry.failed = True
+            entry.event.set()
+            self.stats['failed'] += 1
+            self._cond.notify_all()
+
+    def _timer_loop(self):
+        """重传线程：发送读取线程登记的重传（NAK/应答损坏），并重传超时未应答的帧"""
+        while self.active:
+            self._wake.wait(self._rto / 4)
+            self._wake.clear()
+            with self._cond:
+                requested = [(self._pending.get(seq), reason) for seq, reason in self._requested.items()]
+                self._requested.clear()
+            for entry, reason in requested:
+                if entry is not None and not self._recently_retransmitted(entry):
+                    self._retransmit(entry, reason)
+
+            now = time.perf_counter()
+            with self._cond:
+                expired = [entry for entry in self._pending.values() if now - entry.sent_at >= self._rto]
+                self.stats['timeouts'] += len(expired)
+            for entry in expired:
+                self._retransmit(entry, "超时")
+
+    # ==================== 接收回调（串口读取线程） ====================
+
+    def on_frame(self, seq: int, cmd: int, resp_code: int, payload: bytes):
+        """收到带序号的应答"""
+        with self._cond:
+            entry = self._pending.get(seq)
+            if entry is None or entry.cmd != cmd:
+                self.stats['duplicates'] += 1
+                return
+            del self._pending[seq]
+            entry.response = (resp_code, payload)
+            entry.event.set()
+            self._cond.notify_all()
+
+    def _recently_retransmitted(self, entry: _Pending) -> bool:
+        """半个超时内已重传过的帧不再重复重传，避免连续NAK引起重传风暴"""
+        return entry.retries > 0 and time.perf_counter() - entry.sent_at < self._rto / 2
+
+    def _request_retransmit(self, seq: int, reason: str):
+        """登记重传并唤醒重传线程（调用方持有锁）"""
+        self._requested.setdefault(seq, reason)
+        self._wake.set()
+
+    def on_nak(self, seq: int):
+        """设备请求重传期望序号的帧"""
+        with self._cond:
+            self.stats['naks'] += 1
+            if seq in self._pending:
+                self._request_retransmit(seq, "NAK")
+
+    def on_crc_error(self):
+        """收到损坏的应答：无法得知序号，尽快重传最早未应答的帧"""
+        with self._cond:
+            self.stats['crc_errors'] += 1
+            if self._pending:
+                self._request_retransmit(next(iter(self._pending)), "应答损坏")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+断线续传检查点
+记录正在执行的程序（编译缓存键）和设备已执行的块数，USB断开或上位机重启后
+据此只续传未执行的运动块，不需要从头重新上传整个程序
+"""
+
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass, asdict
+from typing import Optional
+from core.logger import get_logger
+
+logger = get_logger()
+
+
+@dataclass
+class ResumeCheckpoint:
+    """
+    执行进度
+
+    上传顺序中第 block_offset + executed 个块之前的块都已执行。
+    block_offset为本次设备启动之前（历次续传）已执行的块数，
+    time_offset_ms为本次启动时减去的时间戳（续传时整体前移）。
+    """
+    program_key: str
+    block_offset: int = 0
+    time_offset_ms: int = 0
+    executed: int = 0
+    saved_at: float = 0.0
+
+    @property
+    def consumed(self) -> int:
+        """上传顺序中已执行的块数"""
+        return self.block_offset + self.executed
+
+
+class CheckpointStore:
+    """检查点文件（原子写入，执行中按间隔节流）"""
+
+    def __init__(self, path: Optional[str] = None, min_interval_s: float = 1.0):
+        """
+        Args:
+            path: 检查点文件，None表示 ~/.motor_controller/resume_checkpoint.json
+            min_interval_s: 执行中两次写入的最小间隔（秒）
+        """
+        if path is None:
+            path = os.path.join(os.path.expanduser('~'), '.motor_controller', 'resume_checkpoint.json')
+        self.path = path
+        self.min_interval_s = min_interval_s
+        self._last_save = 0.0
+
+    def save(self, checkpoint: ResumeCheckpoint, force: bool = False) -> bool:
+        """
+        写入检查点
+
+        Args:
+            checkpoint: 执行进度
+            force: 忽略节流立即写入（启动、断线时）
+        """
+        now = time.time()
+        if not force and now - self._last_save < self.min_interval_s:
+            return False
+        checkpoint.saved_at = now
+        try:
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(asdict(checkpoint), f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"写入续传检查点失败: {e}")
+            return False
+        self._last_save = now
+        return True
+
+    def load(self) -> Optional[ResumeCheckpoint]:
+        """读取检查点，不存在或损坏返回None"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return ResumeCheckpoint(**json.load(f))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"续传检查点无效: {e}")
+            return None
+
+    def clear(self):
+        """程序正常结束或被停止后删除检查点"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"删除续传检查点失败: {e}")
@@ -11,10 +11,15 @@ import serial
 import serial.tools.list_ports
 import time
 import threading
-from typing import List, Optional, Callable, Dict, Any
+import struct
+import itertools
+import queue
+from collections import deque
+from typing import List, Optional, Callable, Dict, Any, Tuple
 from PyQt5.QtCore import QObject, pyqtSignal
 import logging
 from .logger import get_logger, get_serial_logger
+from models.channel_map import DEFAULT_CHANNELS_PER_BOARD
 
 # 应用日志：记录上位机操作
 logger = get_logger()
@@ -26,6 +31,7 @@ class SerialComm(QObject):
     
     # 命令定义
     CMD_MOVE_SINGLE = 0x01
+    CMD_MOVE_MULTI = 0x02            # 多轴选择性控制
     CMD_MOVE_ALL = 0x03
     CMD_MOVE_TRAPEZOID = 0x04        # 梯形速度运动
     CMD_TRAJ_ADD_POINT = 0x06        # 添加轨迹点
@@ -40,6 +46,11 @@ class SerialComm(QObject):
     CMD_SAVE_FLASH = 0x30
     CMD_LOAD_FLASH = 0x31
     CMD_SET_START_POSITIONS = 0x33
+    CMD_PROGRAM_BEGIN = 0x34         # 开始写入Flash程序槽位
+    CMD_PROGRAM_WRITE = 0x35         # 写入一批运动块
+    CMD_PROGRAM_END = 0x36           # 结束写入并校验
+    CMD_PROGRAM_LIST = 0x37          # 查询程序槽位
+    CMD_PROGRAM_RUN = 0x38           # 脱机回放程序槽位
     
     # 运动缓冲区管理命令（Look-Ahead Planner）
     CMD_ADD_MOTION_BLOCK = 0x40      # 添加运动指令到缓冲区（位置模式）
@@ -49,6 +60,15 @@ class SerialComm(QObject):
     CMD_RESUME_MOTION = 0x44         # 恢复执行
     CMD_CLEAR_BUFFER = 0x45          # 清空缓冲区
     CMD_GET_BUFFER_STATUS = 0x46     # 查询缓冲区状态
+    CMD_GET_TIME = 0x47              # 查询设备时钟（多板时钟同步）
+    CMD_ARM_START = 0x48             # 预约在指定设备时间开始执行
+    CMD_LINK_RESET = 0x49            # 进入可靠传输模式（帧ID作为序号）
+    CMD_LINK_NAK = 0x4A              # 设备请求重传（应答数据为期望序号）
+    CMD_GET_STREAM_CRC = 0x4B        # 查询已接收运动块的累积校验
+    CMD_GET_BLOCK_CRCS = 0x4C        # 查询最近接收的各运动块校验
+    CMD_TRUNCATE_BUFFER = 0x4D       # 丢弃指定序号之后接收的运动块
+    CMD_ADD_PLANNED_BLOCK = 0x4E     # 添加上位机预规划速度的运动块
+    CMD_SET_FEED_OVERRIDE = 0x4F     # 设置/查询播放速度倍率（10~200%）
     
     # 360度连续旋转舵机命令
     CMD_ADD_CONTINUOUS_MOTION = 0x50  # 添加速度控制块到缓冲区
@@ -65,6 +85,19 @@ class SerialComm(QObject):
     RESP_OK = 0x00
     RESP_ERROR = 0x01
     
+    # 发送优先级（数值越小越先发送）
+    PRIORITY_SAFETY = 0     # 急停、停止、暂停、速度倍率：抢占所有排队帧
+    PRIORITY_NORMAL = 1     # 交互命令
+    PRIORITY_BULK = 2       # 批量上传
+    PRIORITY_NAMES = {PRIORITY_SAFETY: 'safety', PRIORITY_NORMAL: 'normal', PRIORITY_BULK: 'bulk'}
+    
+    SAFETY_COMMANDS = frozenset({CMD_ESTOP, CMD_STOP_MOTION, CMD_PAUSE_MOTION, CMD_SET_FEED_OVERRIDE})
+    BULK_COMMANDS = frozenset({CMD_ADD_MOTION_BLOCK, CMD_ADD_PLANNED_BLOCK, CMD_ADD_CONTINUOUS_MOTION,
+                               CMD_TRAJ_ADD_POINT, CMD_PROGRAM_WRITE})
+    
+    # 每个优先级保留的延迟样本数
+    TX_LATENCY_WINDOW = 256
+    
     # 信号定义
     connected = pyqtSignal()
     disconnected = pyqtSignal()
@@ -82,8 +115,27 @@ class SerialComm(QObject):
         self.baud_rate = 115200
         self.timeout = 1.0
         
-        # 舵机数量
-        self.servo_count = 18
+        # 本板舵机数量（多板时时间轴通道经ChannelMap路由到各板）
+        self.servo_count = DEFAULT_CHANNELS_PER_BOARD
+        
+        # 等待响应的请求：cmd -> [等待者, ...]（按发送顺序匹配）
+        self._pending_responses: Dict[int, deque] = {}
+        # 超时请求的迟到响应：cmd -> 待丢弃的响应数
+        self._late_responses: Dict[int, int] = {}
+        self._pending_lock = threading.Lock()
+        
+        # 最近一次测得的往返时间（秒）
+        self.last_rtt: Optional[float] = None
+        
+        # 可靠传输监听者（ReliableLink）：接收带序号的应答、NAK和CRC错误通知
+        self.link_listener = None
+        
+        # 发送线程：所有帧经优先级队列由单一线程写入串口，避免多线程交错写入
+        self._tx_queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._tx_seq = itertools.count()
+        self.write_thread: Optional[threading.Thread] = None
+        self._tx_stats_lock = threading.Lock()
+        self._reset_tx_stats()
     
     def get_available_ports(self) -> List[Dict[str, str]]:
         """获取可用串口列表"""
@@ -112,11 +164,16 @@ class SerialComm(QObject):
             self.port_name = port_name
             self.baud_rate = baud_rate
             self.is_connected = True
+            with self._pending_lock:
+                self._late_responses.clear()   # 上一次连接中超时请求的响应不会再到达
             
-            # 启动读取线程
+            # 启动读取线程和发送线程
             self.is_running = True
             self.read_thread = threading.Thread(target=self._read_loop, daemon=True)
             self.read_thread.start()
+            self._reset_tx_stats()
+            self.write_thread = threading.Thread(target=self._write_loop, daemon=True)
+            self.write_thread.start()
             
             # 等待连接稳定
             time.sleep(0.5)
@@ -138,6 +195,11 @@ class SerialComm(QObject):
         if self.read_thread and self.read_thread.is_alive():
             self.read_thread.join(timeout=1.0)
         
+        if self.write_thread and self.write_thread.is_alive():
+            # 唤醒发送线程，使其退出并让排队的帧全部失败返回
+            self._tx_queue.put((self.PRIORITY_SAFETY, -1, None))
+            self.write_thread.join(timeout=1.0)
+        
         if self.serial_port and self.serial_port.is_open:
             try:
                 self.serial_port.close()
@@ -150,9 +212,8 @@ class SerialComm(QObject):
         logger.info("串口已断开")
         self.disconnected.emit()
     
-    def crc16_ccitt(self, data: bytes) -> int:
-        """计算CRC-16 CCITT校验（与单片机一致）"""
-        crc = 0xFFFF
+    def crc16_ccitt(self, data: bytes, crc: int = 0xFFFF) -> int:
+        """计算CRC-16 CCITT校验（与单片机一致），crc为分段累积计算时之前的结果"""
         for byte in data:
             crc ^= (byte << 8)
             for _ in range(8):
@@ -163,15 +224,16 @@ class SerialComm(QObject):
                 crc &= 0xFFFF
         return crc
     
-    def build_frame(self, cmd: int, data: bytes = b'') -> bytes:
+    def build_frame(self, cmd: int, data: bytes = b'', frame_id: int = 0) -> bytes:
         """构建协议帧
         
         帧格式: [0xFF][0xFE][ID][CMD][LEN][DATA...][CRC_H][CRC_L]
+        ID为0表示普通帧，可靠模式下为序号（1-255）
         """
         frame = bytearray()
         frame.append(0xFF)  # 帧头1
         frame.append(0xFE)  # 帧头2
-        frame.append(0x00)  # ID (广播)
+        frame.append(frame_id)  # ID
         frame.append(cmd)   # 命令
         frame.append(len(data))  # 数据长度
         frame.extend(data)  # 数据
@@ -183,22 +245,107 @@ class SerialComm(QObject):
         
         return bytes(frame)
     
-    def send_servo_command(self, cmd: int, data: bytes = b'') -> bool:
-        """发送舵机命令"""
+    def command_priority(self, cmd: int) -> int:
+        """命令的发送优先级"""
+        if cmd in self.SAFETY_COMMANDS:
+            return self.PRIORITY_SAFETY
+        if cmd in self.BULK_COMMANDS:
+            return self.PRIORITY_BULK
+        return self.PRIORITY_NORMAL
+    
+    def send_servo_command(self, cmd: int, data: bytes = b'', priority: Optional[int] = None,
+                           frame_id: int = 0) -> bool:
+        """发送舵机命令
+        
+        帧交给发送线程按优先级写入，本函数等待写入完成后返回。
+        
+        Args:
+            cmd: 命令字
+            data: 数据内容
+            priority: 发送优先级，None表示按命令自动分类
+            frame_id: 帧ID（可靠模式下的序号）
+        
+        Returns:
+            bool: 是否已写入串口
+        """
         if not self.is_connected or not self.serial_port:
             logger.warning("设备未连接")
             return False
         
-        try:
-            # 构建帧
-            frame = self.build_frame(cmd, data)
+        if priority is None:
+            priority = self.command_priority(cmd)
+        
+        request = {
+            'cmd': cmd,
+            'frame': self.build_frame(cmd, data, frame_id),
+            'enqueued': time.perf_counter(),
+            'done': threading.Event(),
+            'ok': False,
+            'state': 'queued',   # queued -> writing，超时未取出时为 cancelled（发送线程丢弃）
+        }
+        with self._tx_stats_lock:
+            stats = self._tx_stats[priority]
+            stats['depth'] += 1
+            stats['max_depth'] = max(stats['max_depth'], stats['depth'])
+        self._tx_queue.put((priority, next(self._tx_seq), request))
+        
+        if not request['done'].wait(timeout=2.0):
+            with self._tx_stats_lock:
+                if request['state'] == 'queued':
+                    request['state'] = 'cancelled'
+            if request['state'] == 'cancelled':
+                # 调用方视为发送失败，帧不能再晚于后续命令写出
+                logger.error(f"发送超时，已取消: CMD=0x{cmd:02X}")
+                return False
+            # 发送线程已开始写入，等待写完
+            request['done'].wait()
+        return request['ok']
+    
+    def _write_loop(self):
+        """发送线程：按优先级取帧写入串口（同优先级先进先出）"""
+        while True:
+            priority, _, request = self._tx_queue.get()
+            if request is None:
+                break
             
-            # 发送
+            with self._tx_stats_lock:
+                self._tx_stats[priority]['depth'] -= 1
+                cancelled = request['state'] == 'cancelled'
+                if not cancelled:
+                    request['state'] = 'writing'
+            
+            if cancelled or not self.is_running:
+                request['done'].set()
+                continue
+            
+            request['ok'] = self._write_frame(request['cmd'], request['frame'])
+            
+            latency = time.perf_counter() - request['enqueued']
+            with self._tx_stats_lock:
+                stats = self._tx_stats[priority]
+                stats['sent'] += 1
+                stats['latency'].append(latency)
+            request['done'].set()
+        
+        # 连接已关闭，排队中的帧直接失败
+        while True:
+            try:
+                priority, _, request = self._tx_queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                with self._tx_stats_lock:
+                    self._tx_stats[priority]['depth'] -= 1
+                request['done'].set()
+    
+    def _write_frame(self, cmd: int, frame: bytes) -> bool:
+        """写入一帧（仅在发送线程中调用）"""
+        try:
             self.serial_port.write(frame)
             
             # 发送日志（详细记录）
             hex_str = ' '.join([f'{b:02X}' for b in frame])
-            serial_logger.info(f"[TX] CMD=0x{cmd:02X} LEN={len(data)} 帧={hex_str}")
+            serial_logger.info(f"[TX] CMD=0x{cmd:02X} LEN={frame[4]} 帧={hex_str}")
             self.data_sent.emit(f"TX: {hex_str}")
             
             return True
@@ -209,11 +356,110 @@ class SerialComm(QObject):
             self.error_occurred.emit(error_msg)
             return False
     
+    def _reset_tx_stats(self):
+        with self._tx_stats_lock:
+            self._tx_stats = {
+                priority: {'sent': 0, 'depth': 0, 'max_depth': 0,
+                           'latency': deque(maxlen=self.TX_LATENCY_WINDOW)}
+                for priority in self.PRIORITY_NAMES
+            }
+    
+    def get_tx_stats(self) -> Dict[str, Dict[str, Any]]:
+        """发送统计：各优先级的已发送帧数、队列深度及入队到写出的延迟（ms）"""
+        result = {}
+        with self._tx_stats_lock:
+            for priority, stats in self._tx_stats.items():
+                latency = sorted(stats['latency'])
+                result[self.PRIORITY_NAMES[priority]] = {
+                    'sent': stats['sent'],
+                    'depth': stats['depth'],
+                    'max_depth': stats['max_depth'],
+                    'latency_avg_ms': sum(latency) * 1000.0 / len(latency) if latency else 0.0,
+                    'latency_p99_ms': latency[int(len(latency) * 0.99)] * 1000.0 if latency else 0.0,
+                    'latency_max_ms': latency[-1] * 1000.0 if latency else 0.0,
+                }
+        return result
+    
+    def send_and_wait(self, cmd: int, data: bytes = b'',
+                      timeout: float = 0.5) -> Optional[Tuple[int, bytes]]:
+        """发送命令并等待对应响应
+        
+        同一命令的多个请求按发送顺序与响应一一匹配。请求超时后丢弃该命令的下一个
+        响应（超时请求的迟到响应），避免之后的请求都错位收到上一个请求的响应。
+        
+        Args:
+            cmd: 命令字
+            data: 数据内容
+            timeout: 超时时间（秒）
+        
+        Returns:
+            (响应码, 响应数据)，超时或发送失败返回None
+        """
+        waiter = {'event': threading.Event(), 'response': None, 'discarded': False}
+        with self._pending_lock:
+            self._pending_responses.setdefault(cmd, deque()).append(waiter)
+        
+        sent = self.send_servo_command(cmd, data)
+        if sent and waiter['event'].wait(timeout):
+            return waiter['response']
+        
+        with self._pending_lock:
+            queue = self._pending_responses.get(cmd)
+            if queue and waiter in queue:
+                queue.remove(waiter)
+                # 等待期间已丢弃过一个响应时不再记录：那可能就是本请求的响应（上一个迟到响应丢失），
+                # 否则一次响应丢失会使之后的请求逐个超时
+                if sent and not waiter['discarded']:
+                    self._late_responses[cmd] = self._late_responses.get(cmd, 0) + 1
+        if sent and waiter['response'] is None:
+            logger.warning(f"等待响应超时: CMD=0x{cmd:02X}")
+        return waiter['response']
+    
+    def _resolve_response(self, cmd: int, resp_code: int, payload: bytes):
+        """将收到的响应交给最早等待该命令的请求（先丢弃超时请求的迟到响应）"""
+        with self._pending_lock:
+            queue = self._pending_responses.get(cmd)
+            if self._late_responses.get(cmd):
+                self._late_responses[cmd] -= 1
+                if queue:
+                    queue[0]['discarded'] = True
+                logger.debug(f"丢弃超时请求的迟到响应: CMD=0x{cmd:02X}")
+                return
+            if not queue:
+                return
+            waiter = queue.popleft()
+        waiter['response'] = (resp_code, payload)
+        waiter['event'].set()
+    
     def ping(self) -> bool:
         """心跳测试"""
         logger.info("发送PING命令")
         return self.send_servo_command(self.CMD_PING)
     
+    def measure_rtt(self, samples: int = 5, timeout: float = 0.5) -> Optional[float]:
+        """用PING测量链路往返时间
+        
+        Args:
+            samples: 采样次数
+            timeout: 单次等待超时（秒）
+        
+        Returns:
+            最小往返时间（秒），全部超时返回None
+        """
+        rtts = []
+        for _ in range(samples):
+            t0 = time.perf_counter()
+            if self.send_and_wait(self.CMD_PING, b'', timeout) is not None:
+                rtts.append(time.perf_counter() - t0)
+        
+        if not rtts:
+            logger.warning("RTT测量失败：PING无响应")
+            return None
+        
+        self.last_rtt = min(rtts)
+        logger.info(f"链路RTT: 最小{self.last_rtt * 1000:.2f}ms, 最大{max(rtts) * 1000:.2f}ms ({len(rtts)}/{samples})")
+        return self.last_rtt
+    
     def move_single_servo(self, servo_id: int, angle: float, speed_ms: int = 1000) -> bool:
         """控制单个舵机
         
@@ -266,7 +512,42 @@ class SerialComm(QObject):
             if i < 8:  # 只显示前8个
                 logger.debug(f"  舵机{i}: {angle:.1f}°")
         
-        # 构建数据: servo_count个舵机的角度 + 速度
+        return self.send_servo_command(self.CMD_MOVE_ALL, self.pack_move_all(angles, speed_ms))
+    
+    @staticmethod
+    def pack_move_multi(targets: Dict[int, float], speed_ms: int = 0) -> bytes:
+        """
+        打包MOVE_MULTI数据（只移动列出的舵机）
+        
+        Args:
+            targets: {舵机ID: 目标角度}
+            speed_ms: 运动时间 (毫秒)
+        
+        Returns:
+            bytes: 1 + 舵机数×3 + 2字节数据
+        """
+        # 数据格式：[count] + count×[ID][角度高][角度低] + [速度高][速度低]
+        data = bytearray([len(targets)])
+        for servo_id, angle in sorted(targets.items()):
+            angle_raw = int(round(max(0.0, min(180.0, angle)) * 100))
+            data.extend((servo_id, (angle_raw >> 8) & 0xFF, angle_raw & 0xFF))
+        data.append((speed_ms >> 8) & 0xFF)
+        data.append(speed_ms & 0xFF)
+        return bytes(data)
+    
+    @staticmethod
+    def pack_move_all(angles: List[float], speed_ms: int) -> bytes:
+        """
+        打包MOVE_ALL数据
+        
+        Args:
+            angles: 各舵机目标角度（长度需为舵机数量）
+            speed_ms: 运动时间 (毫秒)
+        
+        Returns:
+            bytes: 舵机数量×2 + 2字节数据
+        """
+        # 构建数据: 各舵机的角度（大端序, 0.01度精度） + 速度
         data = bytearray()
         for angle in angles:
             angle_raw = int(angle * 100)
@@ -274,8 +555,7 @@ class SerialComm(QObject):
             data.append(angle_raw & 0xFF)
         data.append((speed_ms >> 8) & 0xFF)
         data.append(speed_ms & 0xFF)
-        
-        return self.send_servo_command(self.CMD_MOVE_ALL, bytes(data))
+        return bytes(data)
     
     def enable_servo(self, servo_id: int = 0xFF) -> bool:
         """使能舵机
@@ -325,6 +605,20 @@ class SerialComm(QObject):
         Returns:
             bool: 是否成功
         """
+        data = self.pack_motion_block(timestamp_ms, servo_id, angle,
+                                      velocity, acceleration, deceleration)
+        return self.send_servo_command(self.CMD_ADD_MOTION_BLOCK, data)
+    
+    @staticmethod
+    def pack_motion_block(timestamp_ms: int, servo_id: int, angle: float,
+                          velocity: float, acceleration: float,
+                          deceleration: float = 0.0) -> bytes:
+        """
+        打包ADD_MOTION_BLOCK数据
+        
+        Returns:
+            bytes: 13字节数据
+        """
         # 数据格式：[timestamp_ms(4)] [servo_id(1)] [angle(2)] [velocity(2)] [accel(2)] [decel(2)]
         # total: 13字节
         
@@ -336,22 +630,40 @@ class SerialComm(QObject):
         data.append(servo_id)
         
         # angle (2字节, 有符号, 0.01度精度)
-        angle_raw = int(angle * 100)
+        angle_raw = int(round(angle * 100))
         data.extend(angle_raw.to_bytes(2, 'little', signed=True))
         
         # velocity (2字节, 无符号, 0.1度/秒精度)
-        vel_raw = int(velocity * 10)
+        vel_raw = int(round(velocity * 10))
         data.extend(vel_raw.to_bytes(2, 'little'))
         
         # acceleration (2字节, 无符号, 0.1度/秒²精度)
-        accel_raw = int(acceleration * 10)
+        accel_raw = int(round(acceleration * 10))
         data.extend(accel_raw.to_bytes(2, 'little'))
         
         # deceleration (2字节, 无符号, 0.1度/秒²精度)
-        decel_raw = int(deceleration * 10) if deceleration > 0 else 0
+        decel_raw = int(round(deceleration * 10)) if deceleration > 0 else 0
         data.extend(decel_raw.to_bytes(2, 'little'))
         
-        return self.send_servo_command(self.CMD_ADD_MOTION_BLOCK, bytes(data))
+        return bytes(data)
+    
+    @staticmethod
+    def pack_planned_block(motion_data: bytes, profile: Dict[str, float]) -> bytes:
+        """
+        打包ADD_PLANNED_BLOCK数据
+        
+        Args:
+            motion_data: pack_motion_block()生成的13字节数据
+            profile: 预规划速度参数 {'entry_speed', 'exit_speed', 'v_max_actual', 't_accel', 't_const', 't_decel'}
+        
+        Returns:
+            bytes: 31字节数据
+        """
+        # 速度：2字节, 0.1度/秒精度；各阶段时间：4字节, 微秒
+        speeds = [min(65535, max(0, int(round(profile[key] * 10))))
+                  for key in ('entry_speed', 'exit_speed', 'v_max_actual')]
+        times = [max(0, int(round(profile[key] * 1e6))) for key in ('t_accel', 't_const', 't_decel')]
+        return motion_data + struct.pack('<3H3I', *speeds, *times)
     
     def start_motion(self) -> bool:
         """开始执行缓冲区指令"""
@@ -369,6 +681,28 @@ class SerialComm(QObject):
         """恢复执行"""
         return self.send_servo_command(self.CMD_RESUME_MOTION, bytes())
     
+    def set_feed_override(self, percent: int) -> bool:
+        """
+        设置播放速度倍率（运行中即时生效，按安全优先级抢占排队的上传帧）
+        
+        Args:
+            percent: 倍率百分比（10~200，100为原速）
+        """
+        return self.send_servo_command(self.CMD_SET_FEED_OVERRIDE, struct.pack('<H', percent))
+    
+    def get_feed_override(self) -> Optional[Dict[str, int]]:
+        """
+        查询播放速度倍率
+        
+        Returns:
+            dict: {'percent': 当前倍率, 'program_time_ms': 设备端程序时钟}，失败返回None
+        """
+        response = self.send_and_wait(self.CMD_SET_FEED_OVERRIDE, bytes())
+        if response and response[0] == self.RESP_OK and len(response[1]) >= 6:
+            percent, program_time_ms = struct.unpack_from('<HI', response[1])
+            return {'percent': percent, 'program_time_ms': program_time_ms}
+        return None
+    
     def clear_buffer(self) -> bool:
         """清空缓冲区"""
         return self.send_servo_command(self.CMD_CLEAR_BUFFER, bytes())
@@ -378,17 +712,41 @@ class SerialComm(QObject):
         查询缓冲区状态
         
         Returns:
-            dict: {'count': 已用, 'running': 是否运行, 'paused': 是否暂停, 'available': 可用空间}
+            dict: {'count': 已用, 'running': 是否运行, 'paused': 是否暂停, 'available': 可用空间,
+                   'recalc_count': 前瞻重算次数, 'recalc_time_us': 前瞻重算累计耗时,
+                   'executed': 本次启动后已执行块数, 'last_timestamp_ms': 最近执行块的时间戳,
+                   'program_time_ms': 设备程序时钟}，无应答时各项为0
         """
-        response = self.send_servo_command(self.CMD_GET_BUFFER_STATUS, bytes())
-        if response and len(response) >= 4:
-            return {
-                'count': response[0],
-                'running': bool(response[1]),
-                'paused': bool(response[2]),
-                'available': response[3]
-            }
-        return {'count': 0, 'running': False, 'paused': False, 'available': 0}
+        status = self.query_buffer_status()
+        if status is not None:
+            return status
+        return {'count': 0, 'running': False, 'paused': False, 'available': 0,
+                'recalc_count': 0, 'recalc_time_us': 0,
+                'executed': 0, 'last_timestamp_ms': 0, 'program_time_ms': 0}
+    
+    def query_buffer_status(self) -> Optional[dict]:
+        """查询缓冲区状态，无应答返回None（用于区分链路断开和设备空闲）"""
+        response = self.send_and_wait(self.CMD_GET_BUFFER_STATUS, bytes())
+        if not response or response[0] != self.RESP_OK or len(response[1]) < 4:
+            return None
+        response = response[1]
+        status = {
+            'count': response[0],
+            'running': bool(response[1]),
+            'paused': bool(response[2]),
+            'available': response[3],
+            'recalc_count': 0,
+            'recalc_time_us': 0,
+            'executed': 0,
+            'last_timestamp_ms': 0,
+            'program_time_ms': 0
+        }
+        if len(response) >= 12:
+            status['recalc_count'], status['recalc_time_us'] = struct.unpack_from('<II', response, 4)
+        if len(response) >= 24:
+            status['executed'], status['last_timestamp_ms'], status['program_time_ms'] = \
+                struct.unpack_from('<III', response, 12)
+        return status
     
     def save_to_flash(self) -> bool:
         """保存参数到Flash"""
@@ -451,13 +809,13 @@ class SerialComm(QObject):
         """设置起始位置
         
         Args:
-            angles: 18个舵机的角度列表 (0-180度)
+            angles: 本板所有舵机的角度列表 (0-180度)
         
         Returns:
             bool: 是否成功
         """
-        if len(angles) != 18:
-            logger.error(f"角度列表长度错误: {len(angles)}, 需要18个")
+        if len(angles) != self.servo_count:
+            logger.error(f"角度列表长度错误: {len(angles)}, 需要{self.servo_count}个")
             return False
         
         logger.info("设置起始位置")
@@ -496,7 +854,8 @@ class SerialComm(QObject):
                     buffer.extend(chunk)
                     
                     # 处理缓冲区中的所有数据
-                    while len(buffer) > 0:
+                    incomplete = False
+                    while len(buffer) > 0 and not incomplete:
                         # 优先查找协议帧
                         frame_found = False
                         
@@ -525,13 +884,15 @@ class SerialComm(QObject):
                                         break
                                     else:
                                         # 等待更多数据
-                                        return
+                                        incomplete = True
+                                        break
                                 else:
                                     # 等待更多数据
-                                    return
+                                    incomplete = True
+                                    break
                         
                         # 如果没找到帧头，处理为文本数据
-                        if not frame_found:
+                        if not frame_found and not incomplete:
                             if len(buffer) > 0:
                                 self._process_text_data(buffer)
                                 buffer.clear()
@@ -574,6 +935,8 @@ class SerialComm(QObject):
             if crc_expected != crc_received:
                 serial_logger.warning(f"[RX] CRC错误! 帧={hex_str} 期望={crc_expected:04X} 实际={crc_received:04X}")
                 self.data_received.emit(f"RX: {hex_str} [CRC错误]")
+                if self.link_listener is not None:
+                    self.link_listener.on_crc_error()
                 return
             
             # 解析帧
@@ -589,6 +952,17 @@ class SerialComm(QObject):
             # 显示协议帧
             self.data_received.emit(f"RX: {hex_str}")
             
+            # 可靠模式：NAK和带序号的应答交给ReliableLink，普通应答唤醒等待该命令的请求
+            frame_id = frame[2]
+            listener = self.link_listener
+            if listener is not None and cmd == self.CMD_LINK_NAK and len(frame) > 8:
+                listener.on_nak(frame[6])
+                return
+            if listener is not None and frame_id != 0:
+                listener.on_frame(frame_id, cmd, resp_code, bytes(frame[6:-2]))
+            else:
+                self._resolve_response(cmd, resp_code, bytes(frame[6:-2]))
+            
             # 解析响应（详细说明）
             if resp_code == 0x00:
                 logger.info(f"  └─ 响应: 成功 (OK)")
@@ -874,9 +1248,10 @@ class SerialComm(QObject):
                    'enabled': 是否使能, 'moving': 是否运动中}
         """
         data = bytes([servo_id])
-        response = self.send_servo_command(self.CMD_SERVO_360_GET_INFO, data)
+        response = self.send_and_wait(self.CMD_SERVO_360_GET_INFO, data)
         
-        if response and len(response) >= 4:
+        if response and response[0] == self.RESP_OK and len(response[1]) >= 4:
+            response = response[1]
             # 响应数据：[current_speed(1)] [target_speed(1)] [enabled(1)] [moving(1)]
             current_speed = int.from_bytes([response[0]], 'little', signed=True)
             target_speed = int.from_bytes([response[1]], 'little', signed=True)
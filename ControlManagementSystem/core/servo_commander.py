@@ -5,11 +5,22 @@
 基于运动缓冲区，Pico自主调度执行
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Union, Iterator
 from models.timeline_data import TimelineData
-from models.component import ComponentType
+from models.channel_map import ChannelMap
 from core.logger import get_logger
 from core.serial_comm import SerialComm
+from core.upload_scheduler import UploadScheduler, PLANNER_BUFFER_SIZE, FEED_OVERRIDE_MIN, FEED_OVERRIDE_MAX
+from core.motion_compiler import CompiledProgram, compile_program, program_content_hash, shift_block, split_program
+from core.program_cache import ProgramCache
+from core.reliable_link import ReliableLink
+from core.stream_verifier import StreamVerifier
+from core.trajectory_model import plan_junctions
+from core.frame_streamer import FrameStreamer, bake_program
+from core.resume_checkpoint import ResumeCheckpoint, CheckpointStore
+import itertools
+import struct
+import threading
 import time
 
 logger = get_logger()
@@ -20,28 +31,156 @@ class ServoCommander:
     
     架构特点：
     1. 上位机将时间线转换为运动指令序列
-    2. 流式发送到Pico的运动缓冲区（不等待）
+    2. 按截止时间即时上传到Pico的运动缓冲区（EDF调度）
     3. Pico根据时间戳自主调度执行
-    4. 上位机只监听状态，无需参与调度
+    4. 上位机只补充后续指令并监听状态
     """
     
     def __init__(self, serial_comm: SerialComm):
         self.serial_comm = serial_comm
-        self.servo_count = 18
+        self.servo_count = serial_comm.servo_count
         self.should_stop = False
-        self.current_positions = [90.0] * 18
+        self.current_positions = [90.0] * self.servo_count
+        
+        # 本串口连接的驱动板（时间线通道路由中的板名），None表示第一块板
+        self.board_name: Optional[str] = None
+        
+        # 上传提前量（ms）：块至少在截止时间前这么久送达
+        self.upload_lead_time_ms = 100.0
+        self.last_upload_stats = {}
+        
+        # 关键帧精简容差（度），0表示不精简
+        self.decimation_tolerance = 0.1
+        self.last_decimation_report = {}
+        
+        # 编译结果磁盘缓存
+        self.program_cache = ProgramCache()
+        self._key_memo = None  # (时间线, (版本, 起始角度, 容差, 整体循环), 内容哈希)
+        
+        # 可靠传输（序号 + 滑动窗口 + 选择重传），设备不支持时自动退化为普通模式
+        self.reliable_upload = True
+        self.link = ReliableLink(serial_comm)
+        
+        # 预装块连续发送不等应答，启动前整体校验一次，不一致时只重传差异部分
+        self.stream_prefill = True
+        self.verifier = StreamVerifier(serial_comm)
+        
+        # 预规划块：上位机按完整程序计算衔接速度和梯形参数，设备不再前瞻重算（需固件支持ADD_PLANNED_BLOCK）
+        self.preplanned_upload = False
+        
+        # 上位机定时模式：按20ms帧表发送MOVE_ALL，由上位机掌握时序（不使用设备规划器）
+        self.host_timed = False
+        self.frame_streamer = FrameStreamer(serial_comm)
+        
+        # 播放速度倍率（%），设备端程序时钟按此走速，运行中可调
+        self.feed_override = 100
+        self._scheduler: Optional[UploadScheduler] = None
+        
+        # 断线续传：按设备返回的已执行块数记录检查点
+        self.checkpoints = CheckpointStore()
+        self.checkpoint: Optional[ResumeCheckpoint] = None
+        self.last_resume_stats = {}
+    
+    def set_feed_override(self, percent: int) -> bool:
+        """
+        设置播放速度倍率（运行中即时生效）
+        
+        设备端按倍率推进程序时钟并缩放插值步长，块之间的衔接速度规划不变；
+        正在进行的即时上传按同一倍率换算截止时间
+        
+        Args:
+            percent: 倍率百分比（10~200）
+        
+        Returns:
+            bool: 是否发送成功
+        """
+        if not FEED_OVERRIDE_MIN <= percent <= FEED_OVERRIDE_MAX:
+            logger.error(f"速度倍率超出范围: {percent}%")
+            return False
+        if not self.serial_comm.set_feed_override(percent):
+            logger.error(f"设置速度倍率失败: {percent}%")
+            return False
+        self.feed_override = percent
+        scheduler = self._scheduler
+        if scheduler is not None:
+            scheduler.set_time_scale(percent / 100.0)
+        logger.info(f"速度倍率: {percent}%")
+        return True
+    
+    def connected_board(self, channel_map: ChannelMap) -> str:
+        """本串口连接的驱动板在通道路由中的板名"""
+        return self.board_name or channel_map.board_names[0]
+    
+    def start_positions(self, timeline_data: TimelineData) -> List[float]:
+        """时间线各通道的起始角度（本板通道取当前角度，其余通道按90°）"""
+        channel_map = timeline_data.channel_map
+        if len(channel_map.boards) > 1:
+            positions = [90.0] * channel_map.channel_count
+            board = self.connected_board(channel_map)
+            if board in channel_map.board_names:
+                for channel, position in zip(channel_map.channels_of(board), self.current_positions):
+                    positions[channel] = position
+            return positions
+        missing = timeline_data.channel_count - len(self.current_positions)
+        return self.current_positions + [90.0] * missing if missing > 0 else self.current_positions
+    
+    def program_key(self, timeline_data: TimelineData, loop_all: bool = False) -> str:
+        """时间线内容哈希（时间线版本和编译参数都未变化时直接复用上次结果）"""
+        start_positions = self.start_positions(timeline_data)
+        signature = (timeline_data.version, tuple(start_positions), self.decimation_tolerance, loop_all)
+        memo = self._key_memo
+        if memo is not None and memo[0] is timeline_data and memo[1] == signature:
+            return memo[2]
+        key = program_content_hash(timeline_data, start_positions, self.decimation_tolerance, loop_all)
+        self._key_memo = (timeline_data, signature, key)
+        return key
+    
+    def compile_program(self, timeline_data: TimelineData, loop_all: bool = False) -> CompiledProgram:
+        """编译时间线（优先使用缓存）"""
+        key = self.program_key(timeline_data, loop_all)
+        program = self.program_cache.get(key)
+        if program is None:
+            program = compile_program(timeline_data, self.start_positions(timeline_data),
+                                      self.decimation_tolerance, key=key, loop_all=loop_all)
+            if program.blocks:
+                self.program_cache.put(program)
+        
+        self.last_decimation_report = program.metadata.get('decimation', {})
+        return program
+    
+    def board_program(self, program: CompiledProgram, channel_map: ChannelMap) -> CompiledProgram:
+        """整条时间线的程序中本板的部分（通道号改写为板内编号，同样写入编译缓存以便续传）"""
+        board = self.connected_board(channel_map)
+        cached = self.program_cache.get(f"{program.key}:{board}")
+        if cached is not None:
+            return cached
+        routed = split_program(program, channel_map)[board]
+        if routed.blocks:
+            self.program_cache.put(routed)
+        return routed
     
     def execute_timeline(self, timeline_data: TimelineData, should_loop: bool = False) -> bool:
         """
         执行时间线（流式缓冲区模式）
         
+        时间线分布在多块驱动板上时只执行本串口所连板（board_name）的通道
+        
         Args:
             timeline_data: 时间线数据
-            should_loop: 是否循环（暂不支持）
+            should_loop: 整条时间线循环执行，直到停止（循环模式的轨道总是单独循环）
             
         Returns:
             bool: 是否成功
         """
+        self.should_stop = False
+        channel_map = timeline_data.channel_map
+        board = self.connected_board(channel_map)
+        if board not in channel_map.board_names:
+            logger.error(f"通道路由中没有驱动板{board}: {channel_map}")
+            return False
+        if len(channel_map.boards) > 1:
+            logger.warning(f"时间线分布在{len(channel_map.boards)}块驱动板上，只执行已连接的板{board}的通道"
+                           f"（多板同步执行使用MultiBoardController.execute_timeline）")
         try:
             # 1. 清空Pico的运动缓冲区
             logger.info("=" * 80)
@@ -56,164 +195,425 @@ class ServoCommander:
             
             # 2. 生成所有运动指令
             logger.info("步骤2/5: 生成运动指令...")
-            motion_blocks = []
-            
-            for track in timeline_data.tracks:
-                if not track.visible or not track.components:
-                    continue
-                
-                servo_id = track.motor_id
-                current_pos = self.current_positions[servo_id]
-                
-                for component in track.components:
-                    # 只处理运动组件
-                    if component.type not in [ComponentType.FORWARD_ROTATION, ComponentType.REVERSE_ROTATION]:
-                        continue
-                    
-                    # 计算时间戳（秒→毫秒）
-                    timestamp_ms = int(component.start_time * 1000)
-                    
-                    # 获取目标角度
-                    target_angle = component.target_angle
-                    
-                    # 获取运动参数（默认梯形模式）
-                    motion_mode = component.parameters.get('motion_mode', 'trapezoid')
-                    
-                    if motion_mode == 'trapezoid':
-                        # 梯形速度模式
-                        velocity = component.parameters.get('velocity', 30.0)
-                        acceleration = component.parameters.get('acceleration', 60.0)
-                        deceleration = component.parameters.get('deceleration', 0.0)
-                        
-                        motion_blocks.append({
-                            'timestamp_ms': timestamp_ms,
-                            'servo_id': servo_id,
-                            'angle': target_angle,
-                            'velocity': velocity,
-                            'acceleration': acceleration,
-                            'deceleration': deceleration
-                        })
-                        
-                        distance = abs(target_angle - current_pos)
-                        logger.info(f"  生成: t={timestamp_ms}ms 舵机{servo_id}: {current_pos:.1f}°→{target_angle:.1f}° (Δ{distance:.1f}°) v={velocity}°/s a={acceleration}°/s²")
-                        
-                        current_pos = target_angle
-                    else:
-                        logger.warning(f"  跳过非梯形模式: {motion_mode}")
+            program = self.compile_program(timeline_data, loop_all=should_loop)
+            if len(channel_map.boards) > 1:
+                program = self.board_program(program, channel_map)
+            motion_blocks = program.blocks
             
             if not motion_blocks:
                 logger.warning("没有生成任何运动指令")
                 return False
             
-            # 3. 按时间排序
-            motion_blocks.sort(key=lambda x: x['timestamp_ms'])
             logger.info(f"共生成{len(motion_blocks)}条运动指令")
             
             # 4. 收集需要使能的舵机
             logger.info("步骤3/5: 使能舵机...")
-            active_servos = set(block['servo_id'] for block in motion_blocks)
+            active_servos = set(block['servo_id'] for block in motion_blocks) | set(program.loops)
             logger.info(f"使能舵机: {sorted(active_servos)}")
             
             for servo_id in active_servos:
                 self.serial_comm.enable_servo(servo_id)
                 time.sleep(0.05)
             
-            # 5. 流式发送到Pico
-            logger.info("步骤4/5: 流式上传指令到Pico...")
-            
-            success_count = 0
-            failed_count = 0
-            
-            for i, block in enumerate(motion_blocks):
-                result = self.serial_comm.add_motion_block(
-                    block['timestamp_ms'],
-                    block['servo_id'],
-                    block['angle'],
-                    block['velocity'],
-                    block['acceleration'],
-                    block['deceleration']
-                )
-                
-                if result:
-                    success_count += 1
-                    # 每10条或最后一条时输出进度
-                    if (i + 1) % 10 == 0 or (i + 1) == len(motion_blocks):
-                        logger.info(f"  上传进度: {i+1}/{len(motion_blocks)} 条")
-                else:
-                    failed_count += 1
-                    logger.error(f"  指令{i+1}上传失败（缓冲区可能已满）")
-                    if failed_count >= 3:
-                        logger.error("连续失败，终止上传")
-                        break
-                
-                # 短暂延时避免串口拥堵
-                time.sleep(0.01)
-            
-            logger.info(f"上传完成: 成功{success_count}条，失败{failed_count}条")
-            
-            if success_count == 0:
-                logger.error("没有成功上传任何指令")
-                return False
+            if self.host_timed:
+                return self._stream_frames(program)
             
-            # 6. 查询缓冲区状态
-            time.sleep(0.1)
-            status = self.serial_comm.get_buffer_status()
-            logger.info(f"缓冲区状态: 已用={status['count']}/{32-status['available']}, 可用={status['available']}")
+            # 5. 按截止时间上传并启动Pico自主执行（记录检查点，断线后可续传）
+            self._begin_checkpoint(ResumeCheckpoint(program.key))
+            if program.is_looping:
+                # 循环程序：按周期平移时间戳持续上传，直到停止
+                periods = program.metadata.get('loop_periods_ms', {})
+                logger.info(f"循环执行: 周期 {periods} ms，按停止结束")
+                return self._end_checkpoint(self.execute_looping(program.iter_blocks()))
+            
+            if not self.upload_and_start(motion_blocks):
+                return self._end_checkpoint(False)
             
-            # 7. 启动Pico自主执行
-            logger.info("步骤5/5: 启动Pico自主执行...")
+            end_ms = max(block['timestamp_ms'] for block in motion_blocks)
+            return self._end_checkpoint(self._monitor_execution(len(motion_blocks), end_ms))
+            
+        except Exception as e:
+            logger.error(f"执行时间线失败: {e}", exc_info=True)
+            return self._end_checkpoint(False)
+    
+    def execute_looping(self, motion_blocks: Iterator[Dict[str, Any]],
+                        start_motion: Optional[Callable[[], Union[bool, float]]] = None,
+                        append: bool = False) -> bool:
+        """
+        循环程序：在上传线程按周期持续上传，启动后由调用线程监听执行状态，直到停止
+        
+        Returns:
+            bool: 是否正常结束；停止、上传失败或设备无应答返回False
+        """
+        started = threading.Event()
+        abort = threading.Event()
+        result = {'started': False}
+        
+        def start() -> Union[bool, float]:
+            value = (start_motion or self._start_motion)()
+            result['started'] = bool(value)
+            started.set()
+            return value
+        
+        def upload():
+            try:
+                self.upload_and_start(motion_blocks, start, append=append, abort=abort)
+            except Exception as e:
+                logger.error(f"循环上传失败: {e}", exc_info=True)
+                self.serial_comm.stop_motion()
+            finally:
+                started.set()
+        
+        uploader = threading.Thread(target=upload, name="loop-upload", daemon=True)
+        uploader.start()
+        started.wait()
+        if not result['started']:
+            uploader.join()
+            return False
+        
+        try:
+            return self._monitor_execution(None, None, uploader)
+        finally:
+            abort.set()
+            uploader.join()
+    
+    def _monitor_execution(self, total_blocks: Optional[int], end_ms: Optional[int],
+                           uploader: Optional[threading.Thread] = None) -> bool:
+        """
+        等待设备执行完所有块并输出进度
+        
+        Args:
+            total_blocks: 程序总块数（按检查点的已执行块数计算进度），循环程序为None
+            end_ms: 最后一个块在本次启动中的时间戳，循环程序为None（只按停止结束）
+            uploader: 循环程序的上传线程，上传中断时结束监听
+        
+        Returns:
+            bool: 是否执行完成；停止或设备无应答（连接断开）返回False
+        """
+        logger.info("=" * 80)
+        logger.info("✓ Pico已开始自主执行！")
+        logger.info("  Pico将根据时间戳自动调度每条指令")
+        logger.info("  上位机无需参与调度，只监听执行状态")
+        logger.info("=" * 80)
+        if end_ms is not None:
+            logger.info(f"预计执行时长: {end_ms / 1000.0 * 100 / self.feed_override + 5.0:.1f}秒")
+        logger.info("监听执行状态...")
+        
+        last_executed = -1
+        while True:
+            time.sleep(1.0)
             
-            if not self.serial_comm.start_motion():
-                logger.error("启动执行失败")
+            if self.should_stop:
+                logger.info("检测到停止信号，停止Pico执行")
+                self.serial_comm.stop_motion()
                 return False
             
-            logger.info("=" * 80)
-            logger.info("✓ Pico已开始自主执行！")
-            logger.info("  Pico将根据时间戳自动调度每条指令")
-            logger.info("  上位机无需参与调度，只监听执行状态")
-            logger.info("=" * 80)
+            if uploader is not None and not uploader.is_alive():
+                logger.error("循环上传已中断，停止监听")
+                return False
+            
+            status = self.serial_comm.query_buffer_status()
+            if status is None:
+                logger.error("查询执行状态无应答，连接可能已断开（重连后可续传）")
+                return False
+            self._record_progress(status['executed'])
             
-            # 8. 等待并监听状态
-            if motion_blocks:
-                last_block = motion_blocks[-1]
-                estimated_duration = last_block['timestamp_ms'] / 1000.0 + 5.0
-                
-                logger.info(f"预计执行时长: {estimated_duration:.1f}秒")
-                logger.info("监听执行状态...")
-                
-                start_time = time.time()
-                last_count = status['count']
-                
-                while time.time() - start_time < estimated_duration:
-                    time.sleep(1.0)
-                    
-                    if self.should_stop:
-                        logger.info("检测到停止信号，停止Pico执行")
-                        self.serial_comm.stop_motion()
-                        return False
-                    
-                    status = self.serial_comm.get_buffer_status()
-                    
-                    # 只在指令数量变化时输出
-                    if status['count'] != last_count:
-                        progress = (len(motion_blocks) - status['count']) / len(motion_blocks) * 100
-                        logger.info(f"  执行进度: {progress:.0f}% (剩余{status['count']}条)")
-                        last_count = status['count']
-                    
-                    if status['count'] == 0 and not status['running']:
-                        logger.info("=" * 80)
-                        logger.info("✓ 所有运动指令执行完成！")
-                        logger.info("=" * 80)
-                        break
+            # 只在已执行块数变化时输出
+            if status['executed'] != last_executed:
+                if total_blocks:
+                    progress = self.checkpoint.consumed / total_blocks * 100
+                    logger.info(f"  执行进度: {progress:.0f}% (已执行{self.checkpoint.consumed}/{total_blocks}条)")
                 else:
-                    # 超时
-                    logger.warning("执行超时，可能还有指令未完成")
+                    logger.info(f"  循环执行中: 已执行{self.checkpoint.consumed}条")
+                last_executed = status['executed']
             
-            return True
+            if end_ms is None:
+                if not status['running']:
+                    logger.warning("设备已停止执行，结束循环上传")
+                    return False
+                continue
             
-        except Exception as e:
-            logger.error(f"执行时间线失败: {e}", exc_info=True)
+            if status['count'] == 0 and not status['running']:
+                logger.info("=" * 80)
+                logger.info("✓ 所有运动指令执行完成！")
+                logger.info("=" * 80)
+                return True
+            
+            # 设备程序时钟已按倍率和暂停折算
+            if status['program_time_ms'] > end_ms + 5000:
+                logger.warning("执行超时，可能还有指令未完成")
+                return True
+    
+    # ==================== 断线续传 ====================
+    
+    def _begin_checkpoint(self, checkpoint: ResumeCheckpoint):
+        self.checkpoint = checkpoint
+        self.checkpoints.save(checkpoint, force=True)
+    
+    def _record_progress(self, executed: int):
+        """根据设备返回的已执行块数更新检查点（节流写入）"""
+        checkpoint = self.checkpoint
+        if checkpoint is not None and executed > checkpoint.executed:
+            checkpoint.executed = executed
+            self.checkpoints.save(checkpoint)
+    
+    def _end_checkpoint(self, completed: bool) -> bool:
+        """执行结束：完成或被停止时删除检查点，异常中断时保留以便续传"""
+        if completed or self.should_stop:
+            self.checkpoints.clear()
+        elif self.checkpoint is not None:
+            self.checkpoints.save(self.checkpoint, force=True)
+            logger.warning(f"执行中断，已保存续传检查点: 已执行{self.checkpoint.consumed}块")
+        self.checkpoint = None
+        return completed
+    
+    def has_checkpoint(self) -> bool:
+        """是否有可续传的程序"""
+        return self.checkpoints.load() is not None
+    
+    @staticmethod
+    def _upload_order(program: CompiledProgram) -> Iterator[Dict[str, Any]]:
+        """按上传顺序（即设备执行顺序）遍历程序的运动块"""
+        if program.is_looping:
+            return program.iter_blocks()
+        return iter(sorted(program.blocks, key=lambda b: b['timestamp_ms']))
+    
+    def resume_program(self) -> bool:
+        """
+        断线重连后续传检查点记录的程序
+        
+        设备仍在执行时只追加其缓冲区之后的块（时间戳不变，程序时钟继续）；
+        设备已停止（缓冲区取空或设备重启）时从第一个未执行的块起整体前移时间戳重新启动
+        
+        Returns:
+            bool: 是否执行完成
+        """
+        self.should_stop = False
+        t_begin = time.perf_counter()
+        checkpoint = self.checkpoints.load()
+        if checkpoint is None:
+            logger.warning("没有可续传的程序")
             return False
+        program = self.program_cache.get(checkpoint.program_key)
+        if program is None:
+            logger.error("续传失败: 编译缓存中找不到该程序")
+            return False
+        status = self.serial_comm.query_buffer_status()
+        if status is None:
+            logger.error("续传失败: 设备无应答")
+            return False
+        
+        append = status['running']
+        if append:
+            # 已接收的块 = 已执行 + 缓冲区中
+            skip = checkpoint.block_offset + status['executed'] + status['count']
+            resumed = ResumeCheckpoint(program.key, checkpoint.block_offset,
+                                       checkpoint.time_offset_ms, status['executed'])
+        else:
+            executed = status['executed']
+            if executed < checkpoint.executed:
+                logger.warning(f"设备已执行块数({executed})小于检查点({checkpoint.executed})，"
+                               f"设备可能已重启，按检查点续传")
+                executed = checkpoint.executed
+                for servo_id in set(block['servo_id'] for block in program.blocks) | set(program.loops):
+                    self.serial_comm.enable_servo(servo_id)
+                if self.feed_override != 100:
+                    self.serial_comm.set_feed_override(self.feed_override)
+            skip = checkpoint.block_offset + executed
+            resumed = ResumeCheckpoint(program.key, skip)
+        
+        remaining = itertools.islice(self._upload_order(program), skip, None)
+        first = next(remaining, None)
+        if first is not None and not append:
+            resumed.time_offset_ms = first['timestamp_ms']
+        self._begin_checkpoint(resumed)
+        
+        stats = {'mode': 'append' if append else 'restart', 'skipped_blocks': skip, 'latency_ms': None}
+        self.last_resume_stats = stats
+        logger.info(f"续传: {'追加到正在执行的程序' if append else '重新启动'}, 跳过已完成的{skip}块")
+        
+        def start_motion() -> Union[bool, float]:
+            if append:
+                # 设备时钟继续走：程序时间0对应的主机时间
+                started = time.perf_counter() - status['program_time_ms'] / (10.0 * self.feed_override)
+            else:
+                started = self._start_motion()
+            stats['latency_ms'] = (time.perf_counter() - t_begin) * 1000.0
+            logger.info(f"续传恢复延迟: {stats['latency_ms']:.1f}ms")
+            return started
+        
+        if first is not None:
+            if not append:
+                response = self.serial_comm.send_and_wait(SerialComm.CMD_CLEAR_BUFFER)
+                if response is None or response[0] != SerialComm.RESP_OK:
+                    logger.error("续传失败: 清空缓冲区无应答")
+                    return self._end_checkpoint(False)
+            blocks = (shift_block(block, block['timestamp_ms'] - resumed.time_offset_ms)
+                      for block in itertools.chain([first], remaining))
+            if program.is_looping:
+                return self._end_checkpoint(self.execute_looping(blocks, start_motion, append))
+            if not self.upload_and_start(blocks, start_motion, append=append):
+                return self._end_checkpoint(False)
+        elif not append:
+            logger.info("检查点中的程序已全部执行")
+            return self._end_checkpoint(True)
+        
+        end_ms = max(block['timestamp_ms'] for block in program.blocks) - resumed.time_offset_ms
+        return self._end_checkpoint(self._monitor_execution(len(program.blocks), end_ms))
+    
+    def _stream_frames(self, program: CompiledProgram) -> bool:
+        """上位机定时模式：烘焙帧表并按周期发送，直到播放结束或停止"""
+        logger.info("步骤4/5: 烘焙逐帧位置表...")
+        table = bake_program(program, self.current_positions)
+        
+        logger.info("步骤5/5: 上位机定时发送MOVE_ALL帧...")
+        self.frame_streamer.start(table)
+        while not self.frame_streamer.wait(0.2):
+            if self.should_stop:
+                logger.info("检测到停止信号，停止帧流")
+                self.frame_streamer.stop()
+                break
+        
+        report = self.frame_streamer.report()
+        self.last_upload_stats = {'frames': report}
+        if self.frame_streamer.last_pose is not None:
+            self.current_positions = list(self.frame_streamer.last_pose)
+        logger.info(f"帧流抖动: p50 {report['jitter_p50_ms']:.2f}ms, p99 {report['jitter_p99_ms']:.2f}ms, "
+                    f"最大{report['max_jitter_ms']:.2f}ms, 错过截止{report['missed']}次")
+        return not self.should_stop
+    
+    def upload_and_start(self, motion_blocks: Union[List[Dict[str, Any]], Iterator[Dict[str, Any]]],
+                         start_motion: Optional[Callable[[], Union[bool, float]]] = None,
+                         append: bool = False, abort: Optional[threading.Event] = None) -> bool:
+        """
+        测量RTT，预装运动块、启动执行并即时上传其余块
+        
+        Args:
+            motion_blocks: 运动块列表；循环程序传入按时间戳排序的迭代器（不预规划、不做整体校验）
+            start_motion: 启动回调，None表示立即发送START_MOTION（多板同步时替换为预约启动）
+            append: 设备已在执行，只追加后续块（逐块确认，不做预装连续校验）
+            abort: 结束上传的事件（循环程序的监听线程结束时设置）
+        
+        Returns:
+            bool: 全部块是否已上传，失败时已停止设备执行
+        """
+        streaming = not isinstance(motion_blocks, list)
+        if self.preplanned_upload and not streaming:
+            motion_blocks = self.preplan_blocks(motion_blocks)
+        
+        logger.info("步骤4/5: 测量链路RTT...")
+        rtt = self.serial_comm.measure_rtt()
+        scheduler = UploadScheduler(
+            capacity=PLANNER_BUFFER_SIZE,
+            lead_time_ms=self.upload_lead_time_ms,
+            rtt_ms=rtt * 1000.0 if rtt is not None else 5.0
+        )
+        scheduler.set_time_scale(self.feed_override / 100.0)
+        self._scheduler = scheduler
+        
+        if self.reliable_upload:
+            self.link.open()
+        
+        logger.info("步骤5/5: 预装指令并启动Pico自主执行，其余指令即时上传...")
+        try:
+            uploaded = scheduler.run(
+                motion_blocks,
+                self._upload_block,
+                start_motion or self._start_motion,
+                should_stop=lambda: self.should_stop or (abort is not None and abort.is_set()),
+                send_blocks=None if append else self._prefill_blocks
+            )
+        finally:
+            self.link.close()
+            self._scheduler = None
+        self.last_upload_stats = dict(scheduler.stats)
+        self.last_upload_stats['link'] = dict(self.link.stats, retransmit_rate=self.link.retransmit_rate)
+        if self.stream_prefill:
+            self.last_upload_stats['stream'] = dict(self.verifier.stats)
+            if uploaded and not streaming:
+                # 全部块上传后再核对一次整个程序（运行中只记录结果，无法再修复）
+                payloads = [self._block_payload(entry['block']) for entry in scheduler.last_schedule]
+                self.last_upload_stats['stream']['program_verified'] = self.verifier.verify(payloads)
+                if self.last_upload_stats['stream']['program_verified'] is False:
+                    logger.warning("程序整体校验不一致，设备执行的运动块可能有误")
+        logger.debug(f"发送队列统计: {self.serial_comm.get_tx_stats()}")
+        
+        if not uploaded:
+            self.serial_comm.stop_motion()
+        return uploaded
+    
+    def preplan_blocks(self, motion_blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        生成预规划块（按上传顺序镜像固件的前瞻规划）
+        
+        Returns:
+            带ADD_PLANNED_BLOCK数据的运动块副本，按上传顺序排列
+        """
+        ordered = sorted(motion_blocks, key=lambda b: b['timestamp_ms'])
+        plans = plan_junctions(ordered, self.current_positions)
+        return [dict(block,
+                     payload=SerialComm.pack_planned_block(self._block_payload(block), plan),
+                     command=SerialComm.CMD_ADD_PLANNED_BLOCK)
+                for block, plan in zip(ordered, plans)]
+    
+    @staticmethod
+    def _block_command(block: Dict[str, Any]) -> int:
+        return block.get('command', SerialComm.CMD_ADD_MOTION_BLOCK)
+    
+    @staticmethod
+    def _block_payload(block: Dict[str, Any]) -> bytes:
+        """运动块的ADD_MOTION_BLOCK数据（编译时已生成则直接使用）"""
+        data = block.get('payload')
+        if data is None:
+            data = SerialComm.pack_motion_block(
+                block['timestamp_ms'],
+                block['servo_id'],
+                block['angle'],
+                block['velocity'],
+                block['acceleration'],
+                block['deceleration']
+            )
+        return data
+    
+    @staticmethod
+    def _available_slots(response) -> Optional[int]:
+        if response is None or response[0] != SerialComm.RESP_OK or not response[1]:
+            return None
+        return response[1][0]
+    
+    def _upload_block(self, block: Dict[str, Any]):
+        """上传单个运动块
+        
+        Returns:
+            设备剩余槽位数，失败返回None
+        """
+        response = self.link.send(self._block_command(block), self._block_payload(block))
+        if response is not None and response[0] == SerialComm.RESP_OK and len(response[1]) >= 5:
+            self._record_progress(struct.unpack_from('<I', response[1], 1)[0])
+        return self._available_slots(response)
+    
+    def _upload_blocks(self, blocks: List[Dict[str, Any]]) -> List[Optional[int]]:
+        """批量上传运动块（可靠模式下在窗口内连续发送）"""
+        responses = self.link.send_many(
+            [(self._block_command(block), self._block_payload(block)) for block in blocks])
+        return [self._available_slots(response) for response in responses]
+    
+    def _prefill_blocks(self, blocks: List[Dict[str, Any]]) -> List[Optional[int]]:
+        """预装运动块：连续发送并整体校验，校验失败时清空后逐块确认上传"""
+        if self.stream_prefill:
+            if blocks and self.verifier.upload([self._block_payload(block) for block in blocks],
+                                               self._block_command(blocks[0])):
+                return [PLANNER_BUFFER_SIZE - i for i in range(1, len(blocks) + 1)]
+            logger.warning("连续上传校验失败，改为逐块确认上传")
+            response = self.serial_comm.send_and_wait(SerialComm.CMD_CLEAR_BUFFER)
+            if response is None or response[0] != SerialComm.RESP_OK:
+                return [None] * len(blocks)
+        return self._upload_blocks(blocks)
+    
+    def _start_motion(self) -> bool:
+        """启动执行并等待设备确认"""
+        response = self.serial_comm.send_and_wait(self.serial_comm.CMD_START_MOTION)
+        return response is not None and response[0] == SerialComm.RESP_OK
     
     def stop(self):
         """停止执行"""
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运动块连续上传与整体校验
+不等待逐块应答连续发送运动块，启动前只比较一次设备端的块数和累积CRC；
+不一致时读取各块CRC定位第一个差异，截断设备缓冲区后只重传其后的块
+"""
+
+import struct
+from typing import Optional, Tuple, List, Dict, Any, Sequence
+from core.logger import get_logger
+from core.serial_comm import SerialComm
+
+logger = get_logger()
+
+# 与固件 cmd_motion_buffer.c 保持一致
+STREAM_CRC_INIT = 0xFFFF
+BLOCK_CRC_QUERY_MAX = 32        # 单次GET_BLOCK_CRCS最多返回的块数
+STREAM_LOG_SIZE = 33            # 设备记录的最近块数（规划器容量 + 1）
+STREAM_COUNT_MODULO = 1 << 16   # 设备块计数为uint16，超过65535块后回绕
+
+
+class StreamVerifier:
+    """连续上传（不等应答）+ 累积CRC校验 + 差异重传"""
+
+    def __init__(self, serial_comm: SerialComm, max_repairs: int = 3, timeout: float = 0.5):
+        """
+        Args:
+            serial_comm: 串口通信对象
+            max_repairs: 校验不一致时的最大重传轮数
+            timeout: 查询应答超时（秒）
+        """
+        self.serial_comm = serial_comm
+        self.max_repairs = max_repairs
+        self.timeout = timeout
+        self.stats: Dict[str, Any] = {}
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.stats = {'streamed': 0, 'resent': 0, 'repairs': 0, 'verified': False}
+
+    def stream_crc(self, payloads: Sequence[bytes]) -> int:
+        """本地计算累积CRC（与设备按接受顺序累积的方式一致）"""
+        crc = STREAM_CRC_INIT
+        for payload in payloads:
+            crc = self.serial_comm.crc16_ccitt(payload, crc)
+        return crc
+
+    # ==================== 设备查询 ====================
+
+    def query(self) -> Optional[Tuple[int, int]]:
+        """查询设备已接受的块数和累积CRC，失败返回None"""
+        response = self.serial_comm.send_and_wait(SerialComm.CMD_GET_STREAM_CRC, b'', self.timeout)
+        if response is None or response[0] != SerialComm.RESP_OK or len(response[1]) < 4:
+            return None
+        return struct.unpack_from('<HH', response[1])
+
+    def block_crcs(self, start: int, count: int) -> Optional[List[int]]:
+        """读取设备端第start块起的各块CRC，失败返回None"""
+        crcs: List[int] = []
+        while len(crcs) < count:
+            n = min(count - len(crcs), BLOCK_CRC_QUERY_MAX)
+            response = self.serial_comm.send_and_wait(
+                SerialComm.CMD_GET_BLOCK_CRCS, struct.pack('<HB', start + len(crcs), n), self.timeout)
+            if response is None or response[0] != SerialComm.RESP_OK or len(response[1]) < 3:
+                return None
+            returned = response[1][2]
+            if returned == 0:
+                break
+            crcs.extend(struct.unpack_from(f'<{returned}H', response[1], 3))
+        return crcs
+
+    def truncate(self, keep: int) -> bool:
+        """丢弃设备端第keep块之后接受的块（仅启动前）"""
+        response = self.serial_comm.send_and_wait(
+            SerialComm.CMD_TRUNCATE_BUFFER, struct.pack('<H', keep), self.timeout)
+        return response is not None and response[0] == SerialComm.RESP_OK
+
+    # ==================== 上传 ====================
+
+    def stream(self, payloads: Sequence[bytes], cmd: int = SerialComm.CMD_ADD_MOTION_BLOCK) -> bool:
+        """连续发送运动块，不等待应答"""
+        for payload in payloads:
+            if not self.serial_comm.send_servo_command(cmd, payload):
+                return False
+            self.stats['streamed'] += 1
+        return True
+
+    def verify(self, payloads: Sequence[bytes]) -> Optional[bool]:
+        """比较设备与本地的块数和累积CRC，查询失败返回None"""
+        status = self.query()
+        if status is None:
+            return None
+        count, crc = status
+        return count == len(payloads) % STREAM_COUNT_MODULO and crc == self.stream_crc(payloads)
+
+    def upload(self, payloads: Sequence[bytes], cmd: int = SerialComm.CMD_ADD_MOTION_BLOCK) -> bool:
+        """
+        连续上传并在启动前校验（设备缓冲区需已清空）
+
+        Args:
+            payloads: 按顺序的运动块数据
+            cmd: ADD_MOTION_BLOCK 或 ADD_PLANNED_BLOCK
+
+        Returns:
+            bool: 设备接受的块与本地完全一致
+        """
+        self._reset_stats()
+        if not self.stream(payloads, cmd):
+            return False
+
+        for attempt in range(self.max_repairs + 1):
+            status = self.query()
+            if status is None:
+                logger.warning("查询上传校验失败")
+                return False
+            count, crc = status
+            if count == len(payloads) % STREAM_COUNT_MODULO and crc == self.stream_crc(payloads):
+                self.stats['verified'] = True
+                logger.info(f"上传校验一致: {count}块, CRC 0x{crc:04X}, 重传{self.stats['resent']}块")
+                return True
+            if attempt == self.max_repairs:
+                break
+
+            keep = self._first_difference(payloads, count)
+            if keep is None:
+                return False
+            logger.warning(f"上传校验不一致: 设备{count}块 CRC 0x{crc:04X}, 期望{len(payloads)}块, "
+                           f"从第{keep}块起重传")
+            if keep < count and not self.truncate(keep):
+                logger.warning("截断设备缓冲区失败")
+                return False
+            self.stats['repairs'] += 1
+            self.stats['resent'] += len(payloads) - keep
+            if not self.stream(payloads[keep:], cmd):
+                return False
+
+        logger.error(f"上传校验{self.max_repairs}次重传后仍不一致")
+        return False
+
+    def _first_difference(self, payloads: Sequence[bytes], count: int) -> Optional[int]:
+        """定位设备端第一个与本地不同的块（设备只记录最近的块）"""
+        first = max(0, count - STREAM_LOG_SIZE)
+        common = min(count, len(payloads))
+        if first >= common:
+            return common if first == 0 else None
+        crcs = self.block_crcs(first, common - first)
+        if crcs is None:
+            logger.warning("读取块校验失败")
+            return None
+        for offset, device_crc in enumerate(crcs):
+            index = first + offset
+            if device_crc != self.serial_comm.crc16_ccitt(payloads[index]):
+                return index
+        return first + len(crcs)
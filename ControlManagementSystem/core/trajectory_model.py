@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上位机轨迹模型
+复刻固件的梯形速度曲线（interpolation.c / planner.c），用于在上位机预测舵机位置
+"""
+
+import bisect
+import math
+from typing import List, Dict, Any, Tuple, Optional
+
+# 协议分辨率（ADD_MOTION_BLOCK）
+ANGLE_RESOLUTION = 0.01         # 角度：0.01度
+RATE_RESOLUTION = 0.1           # 速度/加速度：0.1度/秒(²)
+RATE_MAX = 65535 * RATE_RESOLUTION
+
+
+def quantize(value: float, step: float) -> float:
+    """按协议分辨率量化"""
+    return round(value / step) * step
+
+
+def quantize_block(block: Dict[str, Any]) -> Dict[str, Any]:
+    """返回按协议编码精度量化后的运动块副本"""
+    quantized = dict(block)
+    quantized['timestamp_ms'] = int(block['timestamp_ms'])
+    quantized['angle'] = quantize(block['angle'], ANGLE_RESOLUTION)
+    for key in ('velocity', 'acceleration', 'deceleration'):
+        quantized[key] = min(RATE_MAX, max(0.0, quantize(block.get(key, 0.0), RATE_RESOLUTION)))
+    return quantized
+
+
+def trapezoid_profile(distance: float, max_velocity: float,
+                      acceleration: float, deceleration: float = 0.0) -> Tuple[float, float, float, float]:
+    """
+    计算梯形速度曲线（与固件 calculate_trapezoid_profile 一致）
+
+    Args:
+        distance: 移动距离（绝对值，度）
+        max_velocity: 最大速度（度/秒）
+        acceleration: 加速度（度/秒²）
+        deceleration: 减速度（度/秒²，0表示与加速度相同）
+
+    Returns:
+        (t_accel, t_const, t_decel, v_max_actual)，时间单位秒
+    """
+    if deceleration <= 0.0:
+        deceleration = acceleration
+
+    if distance <= 0.0 or max_velocity <= 0.0 or acceleration <= 0.0 or deceleration <= 0.0:
+        return 0.0, 0.0, 0.0, 0.0
+
+    d_accel = max_velocity * max_velocity / (2.0 * acceleration)
+    d_decel = max_velocity * max_velocity / (2.0 * deceleration)
+
+    if d_accel + d_decel <= distance:
+        # 标准梯形
+        return (max_velocity / acceleration,
+                (distance - d_accel - d_decel) / max_velocity,
+                max_velocity / deceleration,
+                max_velocity)
+
+    # 三角形
+    v_max = math.sqrt(distance / (1.0 / (2.0 * acceleration) + 1.0 / (2.0 * deceleration)))
+    return v_max / acceleration, 0.0, v_max / deceleration, v_max
+
+
+def trapezoid_position(start: float, end: float, t: float,
+                       profile: Tuple[float, float, float, float]) -> float:
+    """
+    计算梯形运动t秒时的位置（与固件 interpolate_trapezoid 一致）
+
+    Args:
+        start: 起始角度
+        end: 目标角度
+        t: 运动开始后的时间（秒）
+        profile: trapezoid_profile()的返回值
+    """
+    t_accel, t_const, t_decel, v_max = profile
+    t_total = t_accel + t_const + t_decel
+    if t <= 0.0:
+        return start
+    if t >= t_total:
+        return end
+
+    if t < t_accel:
+        s = 0.5 * (v_max / t_accel) * t * t
+    elif t < t_accel + t_const:
+        s = 0.5 * v_max * t_accel + v_max * (t - t_accel)
+    else:
+        dt = t - t_accel - t_const
+        s = 0.5 * v_max * t_accel + v_max * t_const + v_max * dt - 0.5 * (v_max / t_decel) * dt * dt
+
+    distance = end - start
+    ratio = min(1.0, max(0.0, s / abs(distance)))
+    return start + distance * ratio
+
+
+def solve_velocity(distance: float, duration: float,
+                   acceleration: float, deceleration: float = 0.0) -> Optional[float]:
+    """
+    求使梯形运动恰好在duration秒内完成的最大速度
+
+    Returns:
+        速度（度/秒），加速度不足以在该时间内完成时返回None
+    """
+    if deceleration <= 0.0:
+        deceleration = acceleration
+    if distance <= 0.0:
+        return 0.0
+    if duration <= 0.0 or acceleration <= 0.0:
+        return None
+
+    # T = v/(2a) + v/(2d) + D/v  =>  c·v² - T·v + D = 0，取较小根（梯形可行解）
+    c = 1.0 / (2.0 * acceleration) + 1.0 / (2.0 * deceleration)
+    disc = duration * duration - 4.0 * c * distance
+    if disc < 0.0:
+        return None
+    return (duration - math.sqrt(disc)) / (2.0 * c)
+
+
+class ChannelTrajectory:
+    """
+    单个通道的位置-时间模型
+
+    每个块在其时间戳开始，从上一块的目标角度出发做一次独立的梯形运动；
+    新块开始时覆盖尚未完成的运动（与固件 planner_add_motion 的起点规则一致）。
+    """
+
+    def __init__(self, start_position: float = 90.0):
+        self.start_position = start_position
+        self.segments: List[Tuple[float, float, float, Tuple[float, float, float, float]]] = []
+        self._starts: List[float] = []
+
+    def add_block(self, block: Dict[str, Any]):
+        """追加运动块（需按时间戳顺序）"""
+        start = self.segments[-1][2] if self.segments else self.start_position
+        profile = trapezoid_profile(abs(block['angle'] - start), block['velocity'],
+                                    block['acceleration'], block.get('deceleration', 0.0))
+        t0 = block['timestamp_ms'] / 1000.0
+        self.segments.append((t0, start, block['angle'], profile))
+        self._starts.append(t0)
+
+    def position_at(self, t: float) -> float:
+        """t秒（从START开始计时）时的位置"""
+        index = bisect.bisect_right(self._starts, t) - 1
+        if index < 0:
+            return self.start_position
+        t0, start, end, profile = self.segments[index]
+        return trapezoid_position(start, end, t - t0, profile)
+
+    def end_time(self) -> float:
+        """最后一次运动的结束时间（秒）"""
+        if not self.segments:
+            return 0.0
+        t0, _, _, profile = self.segments[-1]
+        return t0 + sum(profile[:3])
+
+
+def build_trajectories(blocks: List[Dict[str, Any]],
+                       start_positions: List[float]) -> Dict[int, ChannelTrajectory]:
+    """按通道构建轨迹模型"""
+    trajectories: Dict[int, ChannelTrajectory] = {}
+    for block in sorted(blocks, key=lambda b: b['timestamp_ms']):
+        servo_id = block['servo_id']
+        if servo_id not in trajectories:
+            trajectories[servo_id] = ChannelTrajectory(start_positions[servo_id])
+        trajectories[servo_id].add_block(block)
+    return trajectories
+
+
+def evaluate_pose(trajectories: Dict[int, ChannelTrajectory],
+                  start_positions: List[float], t: float) -> List[float]:
+    """计算t秒时所有通道的位置"""
+    pose = list(start_positions)
+    for servo_id, trajectory in trajectories.items():
+        pose[servo_id] = trajectory.position_at(t)
+    return pose
+
+
+# ==================== 前瞻规划镜像（planner.c） ====================
+
+# 与固件 planner.h 保持一致
+MIN_JUNCTION_SPEED = 5.0        # 最小衔接速度（度/秒）
+JUNCTION_DEVIATION = 0.05       # 衔接偏差系数
+JUNCTION_MAX_GAP_MS = 10        # 下一块在本块结束后这么久内开始才衔接（PLANNER_TICK_MS）
+
+
+def junction_speed(prev: Dict[str, Any], current: Dict[str, Any]) -> float:
+    """两个位置块之间的衔接速度（与固件 planner_calculate_junction_speed 一致）"""
+    if prev['servo_id'] != current['servo_id']:
+        return 0.0
+    # 任一块距离为0（停留）或反向运动，必须停止
+    if (prev['abs_distance'] < 0.01 or current['abs_distance'] < 0.01 or
+            (prev['distance'] > 0.0) != (current['distance'] > 0.0)):
+        return 0.0
+    # 下一块不是紧接着开始（中间有停顿），必须停止
+    if current['timestamp_ms'] > prev['timestamp_ms'] + prev['rest_duration_ms'] + JUNCTION_MAX_GAP_MS:
+        return 0.0
+
+    a_min = min(prev['acceleration'], current['acceleration'])
+    v_junction = min(prev['nominal_speed'], current['nominal_speed'])
+    avg_distance = (prev['abs_distance'] + current['abs_distance']) * 0.5
+    v_junction = min(v_junction, math.sqrt(2.0 * a_min * JUNCTION_DEVIATION * avg_distance))
+    return max(v_junction, MIN_JUNCTION_SPEED)
+
+
+def max_entry_speed(plan: Dict[str, Any]) -> float:
+    """能在本块距离内减速到退出速度的最大进入速度（与固件 planner_max_entry_speed 一致）"""
+    return min(plan['nominal_speed'],
+               math.sqrt(plan['exit_speed'] ** 2 + 2.0 * plan['deceleration'] * plan['abs_distance']))
+
+
+def recalculate_trapezoid(plan: Dict[str, Any]):
+    """按进入/退出速度重新计算梯形曲线（与固件 planner_recalculate_trapezoid 一致）"""
+    distance = plan['abs_distance']
+    if distance < 0.01:
+        return
+
+    v_entry, v_exit, v_max = plan['entry_speed'], plan['exit_speed'], plan['nominal_speed']
+    accel, decel = plan['acceleration'], plan['deceleration']
+    d_accel = (v_max * v_max - v_entry * v_entry) / (2.0 * accel)
+    d_decel = (v_max * v_max - v_exit * v_exit) / (2.0 * decel)
+
+    if d_accel + d_decel <= distance:
+        plan['v_max_actual'] = v_max
+        plan['t_accel'] = (v_max - v_entry) / accel
+        plan['t_decel'] = (v_max - v_exit) / decel
+        plan['t_const'] = (distance - d_accel - d_decel) / v_max
+        return
+
+    c1 = 1.0 / (2.0 * accel)
+    c2 = 1.0 / (2.0 * decel)
+    v_sq = (distance + v_entry * v_entry * c1 + v_exit * v_exit * c2) / (c1 + c2)
+    if v_sq > 0.0:
+        v_peak = min(math.sqrt(v_sq), v_max)
+        plan['v_max_actual'] = v_peak
+        plan['t_accel'] = (v_peak - v_entry) / accel
+        plan['t_decel'] = (v_peak - v_exit) / decel
+    else:
+        plan['v_max_actual'] = v_entry
+        plan['t_accel'] = 0.0
+        plan['t_decel'] = (v_entry - v_exit) / decel
+    plan['t_const'] = 0.0
+
+
+def plan_junctions(blocks: List[Dict[str, Any]], start_positions: List[float]) -> List[Dict[str, float]]:
+    """
+    在上位机按完整程序执行固件规划器的反向/前向传递
+
+    复刻 planner_add_motion 的起点规则与初始梯形，以及 planner_reverse_pass /
+    planner_forward_pass 的计算顺序：同一舵机、同向且首尾相接的块以衔接速度
+    不停顿地过渡，其余块从静止到静止。
+
+    Args:
+        blocks: 按上传顺序排列的运动块（已量化）
+        start_positions: 各通道起始角度
+
+    Returns:
+        与blocks一一对应的 {'entry_speed', 'exit_speed', 'v_max_actual', 't_accel', 't_const', 't_decel'}
+    """
+    plans = []
+    last_target = list(start_positions)
+    for block in blocks:
+        servo_id = block['servo_id']
+        # 固件：同一舵机连续的块以上一目标为起点，否则取当前角度（上位机以该通道上一目标近似）
+        start = last_target[servo_id]
+        acceleration = block['acceleration']
+        deceleration = block['deceleration'] if block['deceleration'] > 0 else acceleration
+        distance = block['angle'] - start
+        t_accel, t_const, t_decel, v_peak = trapezoid_profile(
+            abs(distance), block['velocity'], acceleration, deceleration)
+        plans.append({
+            'servo_id': servo_id,
+            'timestamp_ms': block['timestamp_ms'],
+            'distance': distance,
+            'abs_distance': abs(distance),
+            'nominal_speed': block['velocity'],
+            'acceleration': acceleration,
+            'deceleration': deceleration,
+            'entry_speed': 0.0,
+            'exit_speed': 0.0,
+            'max_entry_speed': 0.0,
+            'v_max_actual': v_peak,
+            't_accel': t_accel,
+            't_const': t_const,
+            't_decel': t_decel,
+            'rest_duration_ms': int((t_accel + t_const + t_decel) * 1000.0),
+        })
+        last_target[servo_id] = block['angle']
+
+    # 反向传递：最后一块减速到0，其余块的退出速度受衔接速度和下一块最大进入速度限制
+    nxt = None
+    for current in reversed(plans):
+        current['exit_speed'] = 0.0 if nxt is None else min(junction_speed(current, nxt),
+                                                             nxt['max_entry_speed'])
+        current['max_entry_speed'] = max_entry_speed(current)
+        nxt = current
+
+    # 前向传递：进入速度取上一块的退出速度，退出速度受加速能力限制
+    entry_speed = 0.0
+    for current in plans:
+        current['entry_speed'] = min(entry_speed, current['max_entry_speed'])
+        v_max_exit = math.sqrt(current['entry_speed'] ** 2 +
+                               2.0 * current['acceleration'] * current['abs_distance'])
+        current['exit_speed'] = min(current['exit_speed'], v_max_exit)
+        if current['acceleration'] > 0.0 and current['deceleration'] > 0.0:
+            recalculate_trapezoid(current)
+        entry_speed = current['exit_speed']
+
+    keys = ('entry_speed', 'exit_speed', 'v_max_actual', 't_accel', 't_const', 't_decel')
+    return [{key: plan[key] for key in keys} for plan in plans]
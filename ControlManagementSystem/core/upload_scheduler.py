@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运动块上传调度器 - 最早截止时间优先（EDF）
+按截止时间即时（Just-in-time）上传运动块，降低规划器缓冲区峰值占用
+"""
+
+import heapq
+import itertools
+import time
+from collections import deque
+from typing import List, Dict, Any, Callable, Optional, Union, Iterable, Iterator
+from core.logger import get_logger
+
+logger = get_logger()
+
+# 与固件保持一致
+PLANNER_BUFFER_SIZE = 32        # 规划器环形缓冲区容量（planner.h）
+PLANNER_TICK_MS = 20            # 规划器调度周期，每周期最多执行一个块（TIME_EVENT_INTERP_MS）
+FEED_OVERRIDE_MIN = 10          # 速度倍率范围（%）
+FEED_OVERRIDE_MAX = 200
+
+
+class UploadScheduler:
+    """
+    EDF上传调度器
+
+    固件规划器是按时间戳顺序消费的FIFO，执行一个块即释放一个槽位，
+    且缓冲区被取空时会自动停止。因此第k个块必须在第k-1个块被执行之前送达，
+    同时只能在第k-32个块被执行、腾出槽位之后发送。
+
+    调度器在设备时间轴（从START_MOTION开始计时，单位ms）上为每个块计算：
+    - exec_ms:     预计执行时间（考虑每个调度周期只执行一个块）
+    - due_ms:      必须送达的时间（前一块执行、缓冲区可能取空的时刻）
+    - deadline_ms: 最晚安全发送时间 = 前一块执行时间 - 提前量 - RTT
+    - earliest_ms: 最早可发送时间（腾出槽位的时间）
+    - send_ms:     计划发送时间（在链路带宽约束下尽量靠近截止时间）
+
+    设备端速度倍率改变程序时钟的走速，上传时按同一倍率换算程序时间，
+    计划本身（程序时间轴）不需要重算。
+    """
+
+    def __init__(self, capacity: int = PLANNER_BUFFER_SIZE,
+                 lead_time_ms: float = 100.0,
+                 rtt_ms: float = 5.0,
+                 frame_time_ms: float = 2.0,
+                 warn_margin_ms: float = 50.0,
+                 tick_ms: float = PLANNER_TICK_MS):
+        """
+        Args:
+            capacity: 规划器缓冲区容量
+            lead_time_ms: 提前量，块至少在截止前这么久送达
+            rtt_ms: 链路往返时间
+            frame_time_ms: 单帧上传耗时（含应答）
+            warn_margin_ms: 距截止时间不足该值时发出告警
+            tick_ms: 固件调度周期
+        """
+        self.capacity = capacity
+        self.lead_time_ms = lead_time_ms
+        self.rtt_ms = rtt_ms
+        self.frame_time_ms = frame_time_ms
+        self.warn_margin_ms = warn_margin_ms
+        self.tick_ms = tick_ms
+
+        self.stats: Dict[str, Any] = {}
+        self._reset_stats()
+        self.last_schedule: List[Dict[str, Any]] = []
+
+        # 程序时钟：(基准主机时间, 基准程序时间ms, 倍率)，倍率改变时重设基准
+        self._clock = (time.perf_counter(), 0.0, 1.0)
+
+    def _reset_stats(self):
+        self.stats = {
+            'blocks': 0,
+            'prefilled': 0,
+            'sent': 0,
+            'retries': 0,
+            'at_risk': 0,
+            'missed': 0,
+            'predicted_peak': 0,
+            'peak_occupancy': 0,
+        }
+
+    @property
+    def time_scale(self) -> float:
+        return self._clock[2]
+
+    def set_time_scale(self, scale: float):
+        """
+        设置程序时钟倍率（与设备速度倍率一致，1.0为原速），可在上传过程中调用
+
+        Args:
+            scale: 程序时间 / 主机时间
+        """
+        now = time.perf_counter()
+        self._clock = (now, self._program_ms(now), scale)
+
+    def _program_ms(self, now: float) -> float:
+        base_t, base_ms, scale = self._clock
+        return base_ms + (now - base_t) * 1000.0 * scale
+
+    def plan(self, blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        生成上传计划
+
+        Args:
+            blocks: 运动块列表（需包含timestamp_ms）
+
+        Returns:
+            按截止时间排序的计划列表，每项为 {'block', 'exec_ms', 'due_ms', 'deadline_ms', 'earliest_ms', 'send_ms'}
+        """
+        # EDF：按截止时间（即时间戳顺序）出队
+        heap = [(block['timestamp_ms'], i, block) for i, block in enumerate(blocks)]
+        heapq.heapify(heap)
+
+        schedule = []
+        prev_exec = None
+        while heap:
+            timestamp_ms, _, block = heapq.heappop(heap)
+            exec_ms = timestamp_ms if prev_exec is None else max(timestamp_ms, prev_exec + self.tick_ms)
+            # 首块必须在START之前送达；其余块必须在前一块执行（缓冲区取空）之前送达
+            due_ms = 0.0 if prev_exec is None else prev_exec
+            schedule.append({
+                'block': block,
+                'exec_ms': exec_ms,
+                'due_ms': due_ms,
+                'deadline_ms': due_ms - self.lead_time_ms - self.rtt_ms,
+                'earliest_ms': float('-inf'),
+                'send_ms': 0.0,
+            })
+            prev_exec = exec_ms
+
+        # 反向传递：链路每帧需要frame_time_ms，密集段整体前移
+        self._backward_pass(schedule)
+
+        # 容量约束：第k块要等第k-capacity块执行后才有槽位
+        at_risk = 0
+        for k in range(self.capacity, len(schedule)):
+            entry = schedule[k]
+            entry['earliest_ms'] = schedule[k - self.capacity]['exec_ms']
+            if entry['send_ms'] < entry['earliest_ms']:
+                at_risk += 1
+                logger.warning(f"截止时间风险: t={entry['block']['timestamp_ms']}ms 舵机{entry['block']['servo_id']} "
+                               f"最晚发送{entry['deadline_ms']:.0f}ms, 但槽位最早{entry['earliest_ms']:.0f}ms才释放")
+                entry['send_ms'] = entry['earliest_ms']
+
+        # 预测峰值占用：发送时刻之前已执行的块会先被移除
+        peak = 0
+        executed = 0
+        for k, entry in enumerate(schedule):
+            while executed < k and schedule[executed]['exec_ms'] <= max(entry['send_ms'], 0.0):
+                executed += 1
+            peak = max(peak, k + 1 - executed)
+
+        self._reset_stats()
+        self.last_schedule = schedule
+        self.stats['blocks'] = len(schedule)
+        self.stats['at_risk'] = at_risk
+        self.stats['predicted_peak'] = peak
+
+        logger.info(f"上传计划: {len(schedule)}块, 预测峰值占用{peak}/{self.capacity}, "
+                    f"提前量{self.lead_time_ms:.0f}ms, RTT {self.rtt_ms:.1f}ms, 风险块{at_risk}")
+        return schedule
+
+    def _backward_pass(self, schedule: List[Dict[str, Any]]) -> None:
+        next_send = float('inf')
+        for entry in reversed(schedule):
+            entry['send_ms'] = min(entry['deadline_ms'], next_send - self.frame_time_ms)
+            next_send = entry['send_ms']
+
+    def iter_plan(self, blocks: Iterable[Dict[str, Any]], lookahead: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        逐块生成上传计划（用于无限长的循环程序，内存占用恒定）
+
+        输入需已按时间戳排序。带宽前移只在lookahead块的窗口内计算，
+        峰值占用不做预测；计划项格式与plan()相同。
+
+        Args:
+            blocks: 按时间戳排序的运动块迭代器
+            lookahead: 反向传递窗口，默认为缓冲区容量的两倍
+        """
+        window_size = lookahead or self.capacity * 2
+        window: deque = deque()
+        executed: deque = deque(maxlen=self.capacity)
+        prev_exec = None
+
+        self._reset_stats()
+        self.last_schedule = []
+        source = iter(blocks)
+        while True:
+            for block in itertools.islice(source, window_size - len(window)):
+                exec_ms = block['timestamp_ms'] if prev_exec is None \
+                    else max(block['timestamp_ms'], prev_exec + self.tick_ms)
+                due_ms = 0.0 if prev_exec is None else prev_exec
+                window.append({
+                    'block': block,
+                    'exec_ms': exec_ms,
+                    'due_ms': due_ms,
+                    'deadline_ms': due_ms - self.lead_time_ms - self.rtt_ms,
+                    'earliest_ms': float('-inf'),
+                    'send_ms': 0.0,
+                })
+                prev_exec = exec_ms
+            if not window:
+                return
+
+            self._backward_pass(window)
+            entry = window.popleft()
+            if len(executed) == self.capacity:
+                entry['earliest_ms'] = executed[0]
+                if entry['send_ms'] < entry['earliest_ms']:
+                    self.stats['at_risk'] += 1
+                    entry['send_ms'] = entry['earliest_ms']
+            executed.append(entry['exec_ms'])
+            self.stats['blocks'] += 1
+            yield entry
+
+    def run(self, blocks: Union[List[Dict[str, Any]], Iterator[Dict[str, Any]]],
+            send_block: Callable[[Dict[str, Any]], Optional[int]],
+            start_motion: Callable[[], Union[bool, float]],
+            should_stop: Callable[[], bool] = lambda: False,
+            send_blocks: Optional[Callable[[List[Dict[str, Any]]], List[Optional[int]]]] = None) -> bool:
+        """
+        按计划上传并启动执行
+
+        Args:
+            blocks: 运动块列表；传入迭代器时逐块计划（循环程序），直到迭代结束或停止
+            send_block: 上传单个块，成功返回设备剩余槽位数，失败返回None
+            start_motion: 启动设备执行，返回是否成功；预约启动时返回设备时间原点
+                          对应的主机时间（perf_counter秒）
+            should_stop: 停止检查回调
+            send_blocks: 批量上传（用于预装，可在窗口内连续发送），返回各块的剩余槽位数
+
+        Returns:
+            bool: 全部块是否已上传
+        """
+        if isinstance(blocks, list):
+            entries = iter(self.plan(blocks))
+        else:
+            entries = self.iter_plan(blocks)
+
+        # 预装：开始前必须到位的块（至少首块）
+        prefill = []
+        entry = next(entries, None)
+        while entry is not None and (not prefill or entry['send_ms'] < 0):
+            prefill.append(entry)
+            entry = next(entries, None)
+        if not prefill:
+            return False
+
+        if send_blocks is not None:
+            results = send_blocks([item['block'] for item in prefill])
+            for available in results:
+                if not self._record_sent(available):
+                    logger.error("预装运动块失败")
+                    return False
+        else:
+            for item in prefill:
+                if not self._send(item, send_block):
+                    logger.error("预装运动块失败")
+                    return False
+        self.stats['prefilled'] = len(prefill)
+        logger.info(f"预装{len(prefill)}块, 其余即时上传")
+
+        started = start_motion()
+        if not started:
+            logger.error("启动执行失败")
+            return False
+        if isinstance(started, float):
+            t0 = started
+        else:
+            # 设备在收到START后开始计时，取单程延迟作为时间原点
+            t0 = time.perf_counter() - self.rtt_ms / 2000.0
+        self._clock = (t0, 0.0, self._clock[2])
+
+        failed_count = 0
+        while entry is not None:
+            if should_stop():
+                logger.info("上传被停止")
+                return False
+
+            now_ms = self._program_ms(time.perf_counter())
+            wait_ms = entry['send_ms'] - now_ms
+            if wait_ms > 0:
+                # 程序时间按倍率换算为主机等待时间
+                time.sleep(min(wait_ms / self.time_scale, self.tick_ms) / 1000.0)
+                continue
+
+            slack_ms = entry['due_ms'] - self.rtt_ms - now_ms
+            if slack_ms < 0:
+                self.stats['missed'] += 1
+                logger.error(f"错过截止时间: t={entry['block']['timestamp_ms']}ms 舵机{entry['block']['servo_id']} "
+                             f"超时{-slack_ms:.0f}ms, 缓冲区可能已取空")
+            elif slack_ms < self.warn_margin_ms:
+                self.stats['at_risk'] += 1
+                logger.warning(f"截止时间临近: t={entry['block']['timestamp_ms']}ms 舵机{entry['block']['servo_id']} "
+                               f"余量{slack_ms:.0f}ms")
+
+            if self._send(entry, send_block):
+                failed_count = 0
+                entry = next(entries, None)
+            else:
+                failed_count += 1
+                self.stats['retries'] += 1
+                if failed_count >= 3:
+                    logger.error("连续失败，终止上传")
+                    return False
+                time.sleep(self.tick_ms / 1000.0)
+
+        logger.info(f"上传完成: {self.stats}")
+        return True
+
+    def _send(self, entry: Dict[str, Any], send_block: Callable[[Dict[str, Any]], Optional[int]]) -> bool:
+        """发送单个块并根据应答更新占用统计"""
+        return self._record_sent(send_block(entry['block']))
+
+    def _record_sent(self, available: Optional[int]) -> bool:
+        """根据应答中的剩余槽位数更新占用统计"""
+        if available is None:
+            return False
+
+        self.stats['sent'] += 1
+        occupancy = self.capacity - available
+        if occupancy > self.stats['peak_occupancy']:
+            self.stats['peak_occupancy'] = occupancy
+        return True
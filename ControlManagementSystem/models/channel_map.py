@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+通道路由
+时间轴的每条轨道是一个全局通道，按板的顺序依次映射到 (板, 板内通道号)，
+通道数由各板通道数之和决定，不再固定为18
+"""
+
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Any, List, Sequence, Tuple
+
+# 每块驱动板的通道数（Pico 2固件支持18路PWM）
+DEFAULT_CHANNELS_PER_BOARD = 18
+
+
+@dataclass(frozen=True)
+class BoardChannels:
+    """一块驱动板及其通道数"""
+    name: str
+    channels: int
+
+
+class ChannelMap:
+    """全局通道号 <-> (板名, 板内通道号)"""
+
+    def __init__(self, boards: Sequence[BoardChannels]):
+        if not boards:
+            raise ValueError("至少需要一块驱动板")
+        names = [board.name for board in boards]
+        if len(set(names)) != len(names):
+            raise ValueError(f"板名重复: {names}")
+        self.boards: Tuple[BoardChannels, ...] = tuple(boards)
+        self._first: Dict[str, int] = {}       # 板名 -> 第一个全局通道号
+        self._board_of = array('H')            # 全局通道号 -> 板序号
+        self._local_of = array('H')            # 全局通道号 -> 板内通道号
+        for index, board in enumerate(self.boards):
+            if board.channels <= 0:
+                raise ValueError(f"板{board.name}通道数无效: {board.channels}")
+            self._first[board.name] = len(self._board_of)
+            self._board_of.extend([index] * board.channels)
+            self._local_of.extend(range(board.channels))
+
+    @classmethod
+    def uniform(cls, channel_count: int = DEFAULT_CHANNELS_PER_BOARD,
+                channels_per_board: int = DEFAULT_CHANNELS_PER_BOARD) -> 'ChannelMap':
+        """
+        按每板通道数依次分配（最后一块板可以不满）
+
+        Args:
+            channel_count: 总通道数
+            channels_per_board: 每块板的通道数
+        """
+        boards = []
+        for index, first in enumerate(range(0, channel_count, channels_per_board)):
+            boards.append(BoardChannels(f'板{index}', min(channels_per_board, channel_count - first)))
+        return cls(boards)
+
+    @property
+    def channel_count(self) -> int:
+        return len(self._board_of)
+
+    @property
+    def board_names(self) -> List[str]:
+        return [board.name for board in self.boards]
+
+    def route(self, channel: int) -> Tuple[str, int]:
+        """全局通道号 -> (板名, 板内通道号)"""
+        return self.boards[self._board_of[channel]].name, self._local_of[channel]
+
+    def global_channel(self, board_name: str, local_channel: int) -> int:
+        """(板名, 板内通道号) -> 全局通道号"""
+        return self._first[board_name] + local_channel
+
+    def channels_of(self, board_name: str) -> range:
+        """板上的全局通道号"""
+        first = self._first[board_name]
+        return range(first, first + self.boards[self._board_of[first]].channels)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {'boards': [{'name': board.name, 'channels': board.channels} for board in self.boards]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ChannelMap':
+        """从字典创建实例"""
+        return cls([BoardChannels(item['name'], item['channels']) for item in data['boards']])
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ChannelMap) and self.boards == other.boards
+
+    def __repr__(self) -> str:
+        return f"ChannelMap({', '.join(f'{b.name}:{b.channels}' for b in self.boards)})"
@@ -2,12 +2,12 @@
 # -*- coding: utf-8 -*-
 """
 部件数据模型
-支持18个舵机（编号0-17）
+舵机ID为时间轴的全局通道号（见ChannelMap）
 """
 
+import itertools
 from enum import Enum
 from typing import Dict, Any, Optional
-import uuid
 
 class ComponentType(Enum):
     """部件类型枚举"""
@@ -17,26 +17,169 @@ class ComponentType(Enum):
     HOME = "归零"
     STOP = "停止"
 
+# 部件ID（进程内递增的整数，对外以字符串形式提供）
+_next_uid = itertools.count(1)
+_MAX_UID = 2 ** 24        # 沿用文件中ID的上限（ID索引按ID直接寻址，过大的ID会占用大量内存）
+
+def allocate_uids(count: int) -> range:
+    """连续分配count个部件ID（按列加载部件时使用，不创建部件对象）"""
+    global _next_uid
+    first = next(_next_uid)
+    _next_uid = itertools.count(first + count)
+    return range(first, first + count)
+
+def reserve_uid(value: Any) -> Optional[int]:
+    """
+    登记文件中保存的部件ID，之后分配的ID都比它大
+
+    Returns:
+        int: 可以沿用的ID；不是本程序生成的ID（如旧版本的UUID）时返回None
+    """
+    global _next_uid
+    try:
+        uid = int(value)
+    except (TypeError, ValueError):
+        return None
+    if str(uid) != str(value) or not 0 < uid < _MAX_UID:
+        return None
+    first = next(_next_uid)
+    _next_uid = itertools.count(max(first, uid + 1))
+    return uid
+
 class Component:
-    """部件基类"""
+    """
+    部件基类
+
+    加入轨道后部件数据保存在轨道的列式存储（ComponentStore）中，部件对象只是其中一行的视图；
+    新建或从轨道移除的部件把数据保存在自身。两种状态下接口相同。
+    """
+    
+    __slots__ = ('_uid', '_store', '_row', '_data', '__weakref__')
     
     def __init__(self, component_type: ComponentType, motor_id: int = 0):
-        self.id = str(uuid.uuid4())
-        self.type = component_type
-        self.motor_id = motor_id  # 舵机ID (0-17)
-        self.start_time = 0.0  # 起始时间（秒）
-        self.duration = 1.0    # 持续时间（秒）
-        self.parameters = {}   # 参数字典
-        self.selected = False  # 是否被选中
+        self._uid = next(_next_uid)
+        self._store = None   # 所属轨道的列式存储
+        self._row = -1
+        # 独立部件的数据：类型, 舵机ID(全局通道号), 起始时间(秒), 持续时间(秒), 参数字典, 是否被选中
+        self._data = [component_type, motor_id, 0.0, 1.0, {}, False]
+    
+    @property
+    def id(self) -> str:
+        return str(self._uid)
+    
+    @property
+    def type(self) -> ComponentType:
+        store = self._store
+        return self._data[0] if store is None else store.component_type(self._row)
+    
+    @property
+    def motor_id(self) -> int:
+        store = self._store
+        return self._data[1] if store is None else store.motor_id
+    
+    @motor_id.setter
+    def motor_id(self, value: int):
+        # 轨道中的部件属于轨道对应的舵机
+        if self._store is None:
+            self._data[1] = value
+    
+    @property
+    def start_time(self) -> float:
+        store = self._store
+        return self._data[2] if store is None else store.start[self._row]
+    
+    @start_time.setter
+    def start_time(self, value: float):
+        self.set_position(value, self.duration)
+    
+    @property
+    def duration(self) -> float:
+        store = self._store
+        return self._data[3] if store is None else store.duration[self._row]
+    
+    @duration.setter
+    def duration(self, value: float):
+        self.set_position(self.start_time, value)
+    
+    @property
+    def parameters(self) -> Dict[str, Any]:
+        """
+        参数字典
+        
+        轨道中的部件每次返回新组装的字典，应通过update_parameters修改参数
+        """
+        store = self._store
+        return self._data[4] if store is None else store.parameters(self._row)
+    
+    @parameters.setter
+    def parameters(self, value: Dict[str, Any]):
+        store = self._store
+        if store is None:
+            self._data[4] = value
+        else:
+            old_parameters = store.parameters(self._row)
+            store.set_parameters(self._row, value)
+            store.track._parameters_changed(self, old_parameters)
+    
+    @property
+    def selected(self) -> bool:
+        store = self._store
+        return self._data[5] if store is None else self._row in store.selected
+    
+    @selected.setter
+    def selected(self, value: bool):
+        store = self._store
+        if store is None:
+            self._data[5] = value
+        elif value:
+            store.selected.add(self._row)
+        else:
+            store.selected.discard(self._row)
         
     def get_end_time(self) -> float:
         """获取结束时间"""
-        return self.start_time + self.duration
+        store = self._store
+        if store is None:
+            return self._data[2] + self._data[3]
+        return store.start[self._row] + store.duration[self._row]
     
     def set_position(self, start_time: float, duration: float):
-        """设置位置和时长"""
-        self.start_time = start_time
-        self.duration = duration
+        """设置位置和时长（所属轨道只收到一次移动通知）"""
+        store = self._store
+        if store is None:
+            self._data[2] = start_time
+            self._data[3] = duration
+            return
+        row = self._row
+        old_start, old_duration = store.start[row], store.duration[row]
+        if start_time == old_start and duration == old_duration:
+            return
+        store.start[row] = start_time
+        store.duration[row] = duration
+        store.track._component_moved(self, old_start, old_duration)
+    
+    def update_parameters(self, values: Dict[str, Any]):
+        """
+        修改参数并通知所属轨道
+        
+        时间轴中的部件应通过此方法修改参数
+        """
+        store = self._store
+        if store is None:
+            self._data[4].update(values)
+        else:
+            old_parameters = store.parameters(self._row)
+            store.update_parameters(self._row, values)
+            store.track._parameters_changed(self, old_parameters)
+    
+    def copy(self) -> 'Component':
+        """复制为新的独立部件（新ID，不属于任何轨道）"""
+        component = self.__class__.__new__(self.__class__)
+        component._uid = next(_next_uid)
+        component._store = None
+        component._row = -1
+        component._data = [self.type, self.motor_id, self.start_time, self.duration, dict(self.parameters), False]
+        return component
     
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
@@ -51,17 +194,20 @@ class Component:
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Component':
-        """从字典创建实例"""
-        component = cls(ComponentType(data['type']), data['motor_id'])
-        component.id = data['id']
-        component.start_time = data['start_time']
-        component.duration = data['duration']
-        component.parameters = data['parameters']
+        """从字典创建实例（沿用文件中的ID，无法沿用时分配新的ID）"""
+        component = create_component(ComponentType(data['type']), data['motor_id'])
+        uid = reserve_uid(data.get('id'))
+        if uid is not None:
+            component._uid = uid
+        component.set_position(data['start_time'], data['duration'])
+        component.parameters = dict(data['parameters'])
         return component
 
 class ForwardRotationComponent(Component):
     """正转部件"""
     
+    __slots__ = ()
+    
     def __init__(self, motor_id: int = 0, target_angle: float = 90.0, duration: float = 1.0, speed_ms: int = 1000):
         super().__init__(ComponentType.FORWARD_ROTATION, motor_id)
         self.parameters = {
@@ -78,6 +224,8 @@ class ForwardRotationComponent(Component):
 class ReverseRotationComponent(Component):
     """反转部件"""
     
+    __slots__ = ()
+    
     def __init__(self, motor_id: int = 0, target_angle: float = 90.0, duration: float = 1.0, speed_ms: int = 1000):
         super().__init__(ComponentType.REVERSE_ROTATION, motor_id)
         self.parameters = {
@@ -94,6 +242,8 @@ class ReverseRotationComponent(Component):
 class DelayComponent(Component):
     """延时部件"""
     
+    __slots__ = ()
+    
     def __init__(self, motor_id: int = 0, delay_time: float = 1.0):
         super().__init__(ComponentType.DELAY, motor_id)
         self.parameters = {
@@ -103,6 +253,8 @@ class DelayComponent(Component):
 class HomeComponent(Component):
     """归零部件"""
     
+    __slots__ = ()
+    
     def __init__(self, motor_id: int = 0, speed_ms: int = 1000):
         super().__init__(ComponentType.HOME, motor_id)
         self.parameters = {
@@ -112,10 +264,21 @@ class HomeComponent(Component):
 class StopComponent(Component):
     """停止部件"""
     
+    __slots__ = ()
+    
     def __init__(self, motor_id: int = 0):
         super().__init__(ComponentType.STOP, motor_id)
         self.parameters = {}
 
+# 类型 -> 部件类（列式存储按类型码创建行视图）
+COMPONENT_CLASSES = {
+    ComponentType.FORWARD_ROTATION: ForwardRotationComponent,
+    ComponentType.REVERSE_ROTATION: ReverseRotationComponent,
+    ComponentType.DELAY: DelayComponent,
+    ComponentType.HOME: HomeComponent,
+    ComponentType.STOP: StopComponent,
+}
+
 def create_component(component_type: ComponentType, motor_id: int = 0, **kwargs) -> Component:
     """工厂函数：根据类型创建部件"""
     duration = kwargs.get('duration', 1.0)  # 获取持续时间，默认1秒
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+部件列式存储
+每条轨道的部件按列保存在紧凑数组中（起始时间、时长、类型码、按类型映射的参数列），
+部件对象只是某一行的视图，不再为每个部件保存实例字典和重复键名的参数字典
+"""
+
+import struct
+import weakref
+from array import array
+from typing import Dict, Any, List, Tuple
+from .component import Component, ComponentType, COMPONENT_CLASSES
+
+# 类型码（数组中保存的一字节类型）
+TYPE_CODES: Dict[ComponentType, int] = {t: code for code, t in enumerate(ComponentType)}
+CODE_TYPES: List[ComponentType] = list(ComponentType)
+
+# 运动模式取值（保存为一字节编码）
+MOTION_MODES = ('time', 'trapezoid')
+
+# 各类型的参数到列的映射（顺序即导出参数字典的键顺序）
+#   f0: 浮点列  i0: 整数列  m0: 运动模式列
+#   p0-p2: 速度曲线（速度、加速度、减速度）。同一轨道上的部件几乎总是使用相同的曲线，
+#          三个值作为一组去重保存在曲线表中，每行只保存曲线编号
+# 类型不符（例如整数角度）或未列出的参数原样保存在溢出字典中，保证读写结果完全一致
+PARAMETER_SCHEMA: Dict[ComponentType, Tuple[Tuple[str, str], ...]] = {
+    ComponentType.FORWARD_ROTATION: (('target_angle', 'f0'), ('speed_ms', 'i0'), ('motion_mode', 'm0'),
+                                     ('velocity', 'p0'), ('acceleration', 'p1'), ('deceleration', 'p2')),
+    ComponentType.REVERSE_ROTATION: (('target_angle', 'f0'), ('speed_ms', 'i0'), ('motion_mode', 'm0'),
+                                     ('velocity', 'p0'), ('acceleration', 'p1'), ('deceleration', 'p2')),
+    ComponentType.DELAY: (('delay_time', 'f0'),),
+    ComponentType.HOME: (('speed_ms', 'i0'), ('home_angle', 'f0')),
+    ComponentType.STOP: (),
+}
+
+_INT32_MIN, _INT32_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+def _fits(column: str, value: Any) -> bool:
+    """值能否无损保存在该列中"""
+    if column[0] in 'fp':
+        return type(value) is float
+    if column[0] == 'i':
+        return type(value) is int and _INT32_MIN <= value <= _INT32_MAX
+    return value in MOTION_MODES
+
+
+class ComponentStore:
+    """
+    一条轨道的部件列
+
+    行号在部件存续期间不变，移除的行放入空闲列表供后续复用。
+    每行最多同时存在一个视图对象（弱引用登记），行被移除时该视图转为独立部件，继续持有自己的数据。
+    """
+
+    def __init__(self, track):
+        self.track = track                    # 所属轨道（接收移动/参数变更通知），撤销历史中保存的存储为None
+        self.uid = array('i')                 # 0表示空闲行
+        self.start = array('d')
+        self.duration = array('d')
+        self.type_code = array('B')
+        self.present = array('B')             # 参数列存在位（按PARAMETER_SCHEMA顺序）
+        self.f0 = array('d')
+        self.i0 = array('i')
+        self.m0 = array('B')
+        self.profile = array('I')             # 速度曲线编号
+        self.profiles: List[Tuple[float, float, float]] = [(0.0, 0.0, 0.0)]
+        self._profile_ids: Dict[bytes, int] = {struct.pack('3d', 0.0, 0.0, 0.0): 0}  # 按位比较，区分-0.0
+        self.extras: Dict[int, Dict[str, Any]] = {}   # 行 -> 无法按列保存的参数
+        self.selected = set()                          # 选中的行
+        self._free: List[int] = []
+        self._views: 'weakref.WeakValueDictionary[int, Component]' = weakref.WeakValueDictionary()
+
+    @property
+    def motor_id(self) -> int:
+        return self.track.motor_id
+
+    # ==================== 行 ====================
+
+    def _allocate(self) -> int:
+        """取一个空行（优先复用空闲行），参数存在位清零"""
+        if self._free:
+            row = self._free.pop()
+            self.present[row] = 0
+            return row
+        row = len(self.uid)
+        self.uid.append(0)
+        self.start.append(0.0)
+        self.duration.append(0.0)
+        self.type_code.append(0)
+        self.present.append(0)
+        self.f0.append(0.0)
+        self.i0.append(0)
+        self.m0.append(0)
+        self.profile.append(0)
+        return row
+
+    def add(self, component: Component) -> int:
+        """把独立部件的数据移入新行，部件成为该行的视图"""
+        component_type, _, start, duration, parameters, selected = component._data
+        row = self._allocate()
+        self.uid[row] = component._uid
+        self.start[row] = start
+        self.duration[row] = duration
+        self.type_code[row] = TYPE_CODES[component_type]
+        self._write_parameters(row, parameters)
+        if selected:
+            self.selected.add(row)
+        component._store = self
+        component._row = row
+        component._data = None
+        self._views[row] = component
+        return row
+
+    def remove(self, row: int) -> Component:
+        """
+        释放行
+
+        Returns:
+            Component: 持有该行数据的独立部件（原视图对象，没有视图时新建）
+        """
+        component = self.view(row)
+        self.release(row)
+        return component
+
+    def release(self, row: int):
+        """释放行（该行的视图转为独立部件）"""
+        component = self._views.get(row)
+        if component is not None:
+            self._detach_view(row, component)
+        self.uid[row] = 0
+        self.extras.pop(row, None)
+        self.selected.discard(row)
+        self._free.append(row)
+
+    def _detach_view(self, row: int, component: Component):
+        component._data = [self.component_type(row), self.motor_id, self.start[row], self.duration[row],
+                           self.parameters(row), row in self.selected]
+        component._store = None
+        component._row = -1
+        del self._views[row]
+
+    def detach_views(self):
+        """仍被引用的视图全部转为独立部件，行数据保留（整体移出轨道之前调用）"""
+        for row in list(self._views.keys()):
+            component = self._views.get(row)
+            if component is not None:
+                self._detach_view(row, component)
+
+    def rows(self) -> List[int]:
+        """使用中的行"""
+        return [row for row, uid in enumerate(self.uid) if uid]
+
+    def copy_row(self, source: 'ComponentStore', source_row: int) -> int:
+        """
+        复制另一存储中的一行（保留部件ID，不经过视图和参数字典）
+
+        Returns:
+            int: 本存储中的新行号
+        """
+        row = self._allocate()
+        self.uid[row] = source.uid[source_row]
+        self.start[row] = source.start[source_row]
+        self.duration[row] = source.duration[source_row]
+        self.type_code[row] = source.type_code[source_row]
+        self.present[row] = source.present[source_row]
+        self.f0[row] = source.f0[source_row]
+        self.i0[row] = source.i0[source_row]
+        self.m0[row] = source.m0[source_row]
+        self.profile[row] = self._intern_profile(source.profiles[source.profile[source_row]])
+        extras = source.extras.get(source_row)
+        if extras:
+            self.extras[row] = dict(extras)
+        if source_row in source.selected:
+            self.selected.add(row)
+        return row
+
+    def snapshot(self) -> 'ComponentStore':
+        """
+        列数据的独立副本（track为None，不含视图和选中状态）
+
+        复制整列而不是逐行读取，供后台线程编码使用，之后对本存储的修改不影响副本
+        """
+        copy = ComponentStore(None)
+        for name in ('uid', 'start', 'duration', 'type_code', 'present', 'f0', 'i0', 'm0', 'profile'):
+            setattr(copy, name, getattr(self, name)[:])
+        copy.profiles = list(self.profiles)
+        copy._profile_ids = dict(self._profile_ids)
+        copy.extras = {row: dict(values) for row, values in self.extras.items()}
+        copy._free = list(self._free)
+        return copy
+
+    def view(self, row: int) -> Component:
+        """行的视图对象（已有视图时返回同一对象）"""
+        component = self._views.get(row)
+        if component is None:
+            cls = COMPONENT_CLASSES[CODE_TYPES[self.type_code[row]]]
+            component = cls.__new__(cls)
+            component._uid = self.uid[row]
+            component._store = self
+            component._row = row
+            component._data = None
+            self._views[row] = component
+        return component
+
+    def component_type(self, row: int) -> ComponentType:
+        return CODE_TYPES[self.type_code[row]]
+
+    # ==================== 参数 ====================
+
+    def parameters(self, row: int) -> Dict[str, Any]:
+        """组装行的参数字典（新字典，修改它不会写回）"""
+        parameters = {}
+        present = self.present[row]
+        if present:
+            profile = self.profiles[self.profile[row]]
+            for bit, (key, column) in enumerate(PARAMETER_SCHEMA[CODE_TYPES[self.type_code[row]]]):
+                if present & (1 << bit):
+                    if column[0] == 'p':
+                        parameters[key] = profile[int(column[1])]
+                    elif column == 'm0':
+                        parameters[key] = MOTION_MODES[self.m0[row]]
+                    else:
+                        parameters[key] = getattr(self, column)[row]
+        extras = self.extras.get(row)
+        if extras:
+            parameters.update(extras)
+        return parameters
+
+    def set_parameters(self, row: int, parameters: Dict[str, Any]):
+        """整体替换行的参数"""
+        self.present[row] = 0
+        self.extras.pop(row, None)
+        self._write_parameters(row, parameters)
+
+    def update_parameters(self, row: int, values: Dict[str, Any]):
+        """合并修改行的参数（与dict.update相同的语义）"""
+        self._write_parameters(row, values)
+
+    def _write_parameters(self, row: int, values: Dict[str, Any]):
+        schema = PARAMETER_SCHEMA[CODE_TYPES[self.type_code[row]]]
+        present = self.present[row]
+        extras = self.extras.get(row)
+        profile = None
+        for key, value in values.items():
+            for bit, (name, column) in enumerate(schema):
+                if name == key:
+                    break
+            else:
+                bit = -1
+            if bit >= 0 and _fits(column, value):
+                if column[0] == 'p':
+                    if profile is None:
+                        profile = list(self.profiles[self.profile[row]])
+                    profile[int(column[1])] = value
+                elif column == 'm0':
+                    self.m0[row] = MOTION_MODES.index(value)
+                else:
+                    getattr(self, column)[row] = value
+                present |= 1 << bit
+                if extras is not None:
+                    extras.pop(key, None)
+            else:
+                if bit >= 0:
+                    present &= ~(1 << bit)
+                if extras is None:
+                    extras = self.extras[row] = {}
+                extras[key] = value
+        self.present[row] = present
+        if extras is not None and not extras:
+            del self.extras[row]
+        if profile is not None:
+            self.profile[row] = self._intern_profile(tuple(profile))
+
+    def _intern_profile(self, profile: Tuple[float, float, float]) -> int:
+        """速度曲线编号（曲线表只增不减，大小取决于用过的不同曲线数）"""
+        key = struct.pack('3d', *profile)
+        profile_id = self._profile_ids.get(key)
+        if profile_id is None:
+            profile_id = self._profile_ids[key] = len(self.profiles)
+            self.profiles.append(profile)
+        return profile_id
+
+    # ==================== 统计 ====================
+
+    def nbytes(self) -> int:
+        """列数组占用的字节数（不含溢出参数和曲线表）"""
+        columns = (self.uid, self.start, self.duration, self.type_code, self.present,
+                   self.f0, self.i0, self.m0, self.profile)
+        return sum(column.itemsize * len(column) for column in columns)
+
+    def __len__(self) -> int:
+        return len(self.uid) - len(self._free)
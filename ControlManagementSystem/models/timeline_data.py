@@ -2,58 +2,546 @@
 # -*- coding: utf-8 -*-
 """
 时间轴数据模型
-支持18个舵机（编号0-17）
+通道数由通道路由（ChannelMap）决定，默认一块板18个舵机（编号0-17）
 """
 
-from typing import List, Dict, Any, Optional
+import bisect
+import heapq
+import itertools
+import math
+from array import array
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterator, NamedTuple, Iterable, Set
 from dataclasses import dataclass
 from enum import Enum
-from .component import Component
+from .component import Component, allocate_uids
+from .component_store import ComponentStore
+from .channel_map import ChannelMap, DEFAULT_CHANNELS_PER_BOARD
 
 class LoopMode(Enum):
     """循环模式枚举"""
     SINGLE = "单次"
     LOOP = "循环"
 
-@dataclass
+class ChangeKind(Enum):
+    """时间轴变更类型"""
+    COMPONENT_ADDED = "添加部件"
+    COMPONENT_REMOVED = "移除部件"
+    COMPONENT_MOVED = "移动部件"          # 起始时间或时长改变
+    PARAMETERS_CHANGED = "修改参数"
+    TRACK_CHANGED = "修改轨道"            # 循环模式等轨道属性
+    TRACK_CLEARED = "清空轨道"
+    BATCH = "批量修改"                   # batch()期间的所有变更合并为一次通知
+
+# 逆操作：(函数, 参数)，依次执行一组逆操作恢复变更前的状态（见core.edit_history）
+Inverse = Tuple[Callable[..., Any], Tuple[Any, ...]]
+
+@dataclass(frozen=True)
+class TimelineChange:
+    """时间轴变更事件"""
+    kind: ChangeKind
+    motor_id: int                          # 批量修改为-1
+    component_id: Optional[str] = None
+    motor_ids: Tuple[int, ...] = ()        # 批量修改涉及的轨道
+    inverse: Tuple[Inverse, ...] = ()      # 撤销该变更的逆操作，空表示不可撤销
+
+# 镜像轨道时按 180° - 角度 翻转的参数
+MIRRORED_PARAMETERS = ('target_angle', 'home_angle')
+
+class TimelineEvent(NamedTuple):
+    """时间轴事件（部件开始或结束）"""
+    time: float
+    type: str                    # 'start' 或 'end'
+    track: 'MotorTrack'
+    component: Component
+
+class ComponentIndex:
+    """
+    部件ID索引：整数ID -> (轨道, 行)
+
+    ID是进程内递增的整数，用两个按ID直接寻址的数组保存所在轨道的序号和行号，
+    不为每个部件保存字典项
+    """
+    
+    def __init__(self):
+        self.tracks: List['MotorTrack'] = []
+        self._slot = array('h')    # 轨道序号，-1表示不在索引中
+        self._row = array('i')
+    
+    def register(self, track: 'MotorTrack') -> int:
+        """登记轨道，返回轨道序号"""
+        self.tracks.append(track)
+        return len(self.tracks) - 1
+    
+    def set(self, uid: int, slot: int, row: int):
+        size = len(self._slot)
+        if uid >= size:
+            grow = max(uid + 1, 2 * size) - size
+            self._slot.extend(array('h', [-1]) * grow)
+            self._row.extend(array('i', [0]) * grow)
+        self._slot[uid] = slot
+        self._row[uid] = row
+    
+    def set_range(self, uids: range, slot: int, rows: array):
+        """登记连续ID的部件（按列加载整条轨道时使用）"""
+        if not uids:
+            return
+        self.set(uids[-1], slot, rows[-1])
+        self._slot[uids.start:uids.stop] = array('h', [slot]) * len(uids)
+        self._row[uids.start:uids.stop] = rows
+    
+    def discard(self, uid: int):
+        if uid < len(self._slot):
+            self._slot[uid] = -1
+    
+    def lookup(self, component_id: str) -> Optional[Tuple['MotorTrack', int]]:
+        """按部件ID查找 (轨道, 行)"""
+        try:
+            uid = int(component_id)
+        except (TypeError, ValueError):
+            return None
+        return self.find(uid)
+    
+    def find(self, uid: int) -> Optional[Tuple['MotorTrack', int]]:
+        """按整数ID查找 (轨道, 行)"""
+        if 0 < uid < len(self._slot):
+            slot = self._slot[uid]
+            if slot >= 0:
+                return self.tracks[slot], self._row[uid]
+        return None
+    
+    def clear(self):
+        self.tracks.clear()
+        self._slot = array('h')
+        self._row = array('i')
+
 class MotorTrack:
-    """电机轨道数据"""
-    motor_id: int
-    name: str  # 电机名称 (X/Y/Z/A/B/C/U/V)
-    loop_mode: LoopMode = LoopMode.SINGLE
-    components: List[Component] = None
+    """
+    电机轨道数据
+
+    部件数据按列保存在ComponentStore中，components等接口返回行视图。
+    行号按起始时间排序保存（起始时间相同按加入顺序），并记录最长部件时长作为上界：
+    与时刻t重叠的部件起始时间一定在 [t - 最长时长, t] 内，点查询和范围查询用二分查找定位。
+    部件的起始时间或时长被修改时由部件通知轨道更新排序。
+
+    每次内容变更version加1（供使用方判断轨道是否需要重建），并通知所属时间轴；
+    通知附带逆操作（只记录变更涉及的部件），撤销历史据此恢复。
+
+    从项目文件加载的轨道可以延迟解码：_loader不为None时，第一次访问部件数据才调用它填充。
+    """
+    
+    _LAZY_FIELDS = frozenset(('_store', '_order', '_starts', '_max_duration'))
+    
+    def __init__(self, motor_id: int, name: str, loop_mode: LoopMode = LoopMode.SINGLE,
+                 components: Optional[List[Component]] = None):
+        self._loader: Optional[Callable[['MotorTrack'], None]] = None
+        self.motor_id = motor_id
+        self.name = name  # 电机名称
+        self.loop_mode = loop_mode
+        self._store = ComponentStore(self)
+        self._order = array('i')           # 按起始时间排序的行号
+        self._starts = array('d')          # 与_order对应的起始时间（二分查找键）
+        self._max_duration = 0.0           # 部件时长上界（移除部件时不缩小）
+        self._index = ComponentIndex()
+        self._slot = self._index.register(self)
+        self._observer: Optional[Callable[['MotorTrack', ChangeKind, Optional[Component], float,
+                                           Optional[Tuple[Inverse, ...]]], None]] = None
+        self.version = 0
+        for component in components or []:
+            self._insert(component)
+    
+    @classmethod
+    def lazy(cls, motor_id: int, name: str, loop_mode: LoopMode,
+             loader: Callable[['MotorTrack'], None]) -> 'MotorTrack':
+        """
+        延迟解码的轨道
+        
+        Args:
+            loader: loader(track) 设置 _store/_order/_starts/_max_duration 并登记ID索引
+        """
+        track = cls(motor_id, name, loop_mode)
+        del track._store, track._order, track._starts, track._max_duration
+        track._loader = loader
+        return track
+    
+    def __getattr__(self, name: str):
+        # 只在属性不存在时调用：延迟解码的轨道第一次访问部件数据
+        loader = self.__dict__.get('_loader')
+        if loader is None or name not in MotorTrack._LAZY_FIELDS:
+            raise AttributeError(name)
+        self._loader = None
+        loader(self)
+        return getattr(self, name)
+    
+    @property
+    def loaded(self) -> bool:
+        """部件数据是否已解码"""
+        return self._loader is None
+    
+    @property
+    def components(self) -> List[Component]:
+        """按起始时间排序的部件（行视图）"""
+        view = self._store.view
+        return [view(row) for row in self._order]
+    
+    @property
+    def component_count(self) -> int:
+        return len(self._order)
     
-    def __post_init__(self):
-        if self.components is None:
-            self.components = []
+    # ==================== 索引维护 ====================
+    
+    def _attach_index(self, index: ComponentIndex):
+        """改用时间轴共享的ID索引（延迟解码的轨道在解码时登记）"""
+        self._slot = index.register(self)
+        if self._loader is None:
+            uid = self._store.uid
+            for row in self._order:
+                index.set(uid[row], self._slot, row)
+        self._index = index
+    
+    def _insert(self, component: Component):
+        if component._store is not None:
+            raise ValueError(f"部件已在轨道中: {component.id}")
+        row = self._store.add(component)
+        start = self._store.start[row]
+        pos = bisect.bisect_right(self._starts, start)
+        self._starts.insert(pos, start)
+        self._order.insert(pos, row)
+        if self._store.duration[row] > self._max_duration:
+            self._max_duration = self._store.duration[row]
+        self._index.set(component._uid, self._slot, row)
+    
+    def _locate(self, row: int, start_time: float) -> int:
+        """行在排序数组中的位置（起始时间相同的行中逐个比对）"""
+        pos = bisect.bisect_left(self._starts, start_time)
+        while pos < len(self._order) and self._starts[pos] == start_time:
+            if self._order[pos] == row:
+                return pos
+            pos += 1
+        raise ValueError(f"部件不在轨道索引中: {self._store.uid[row]}")
+    
+    def _changed(self, kind: ChangeKind, component: Optional[Component] = None, old_end: float = 0.0,
+                 inverse: Optional[Tuple[Inverse, ...]] = None):
+        """
+        记录一次变更并通知时间轴
+        
+        Args:
+            old_end: 部件变更前的结束时间
+            inverse: 撤销本次变更的逆操作，None表示不可撤销
+        """
+        self.version += 1
+        if self._observer is not None:
+            self._observer(self, kind, component, old_end, inverse)
+    
+    def _component_moved(self, component: Component, old_start: float, old_duration: float):
+        """部件起始时间或时长改变：移到新的排序位置"""
+        row = component._row
+        start = self._store.start[row]
+        if start != old_start:
+            pos = self._locate(row, old_start)
+            del self._starts[pos]
+            del self._order[pos]
+            pos = bisect.bisect_right(self._starts, start)
+            self._starts.insert(pos, start)
+            self._order.insert(pos, row)
+        if self._store.duration[row] > self._max_duration:
+            self._max_duration = self._store.duration[row]
+        inverse = (self._set_positions, (array('i', [component._uid]), array('d', [old_start]), array('d', [old_duration])))
+        self._changed(ChangeKind.COMPONENT_MOVED, component, old_start + old_duration, (inverse,))
+    
+    def _parameters_changed(self, component: Component, old_parameters: Dict[str, Any]):
+        inverse = (self._restore_parameters, (array('i', [component._uid]), [old_parameters], True))
+        self._changed(ChangeKind.PARAMETERS_CHANGED, component, inverse=(inverse,))
+    
+    def _resort(self):
+        """直接改写起始时间列后重建排序（稳定排序，起始时间相同保持原顺序）"""
+        start = self._store.start
+        order = sorted(self._order, key=start.__getitem__)
+        self._order = array('i', order)
+        self._starts = array('d', (start[row] for row in order))
+    
+    def _add_many(self, components: List[Component]):
+        """批量加入部件，最后统一排序（只在TimelineData.batch()中调用）"""
+        if not components:
+            return
+        store = self._store
+        in_order = True
+        last = self._starts[-1] if self._starts else -math.inf
+        uids = array('i', (component._uid for component in components))
+        for component in components:
+            if component._store is not None:
+                raise ValueError(f"部件已在轨道中: {component.id}")
+            component.motor_id = self.motor_id
+            row = store.add(component)
+            start = store.start[row]
+            in_order = in_order and start >= last
+            last = start
+            self._order.append(row)
+            self._starts.append(start)
+            if store.duration[row] > self._max_duration:
+                self._max_duration = store.duration[row]
+            self._index.set(component._uid, self._slot, row)
+        if not in_order:
+            self._resort()
+        self._changed(ChangeKind.COMPONENT_ADDED, inverse=((self._remove_many, (uids,)),))
+    
+    def _rows_in(self, start_time: Optional[float], end_time: Optional[float]) -> array:
+        """起始时间在 [start_time, end_time) 内的行（None表示不限）"""
+        lo = 0 if start_time is None else bisect.bisect_left(self._starts, start_time)
+        hi = len(self._order) if end_time is None else bisect.bisect_left(self._starts, end_time)
+        return self._order[lo:hi]
+    
+    def _rows_of(self, uids: array) -> array:
+        """部件的行号（部件必须都在本轨道中）"""
+        rows = array('i')
+        for uid in uids:
+            entry = self._index.find(uid)
+            if entry is None or entry[0] is not self:
+                raise ValueError(f"部件不在轨道中: {uid}")
+            rows.append(entry[1])
+        return rows
+    
+    def _row_of(self, component_id: str) -> int:
+        """部件在本轨道中的行号，不在本轨道返回-1"""
+        entry = self._index.lookup(component_id)
+        if entry is None or entry[0] is not self:
+            return -1
+        return entry[1]
+    
+    # ==================== 部件操作 ====================
     
     def add_component(self, component: Component):
         """添加部件到轨道"""
         component.motor_id = self.motor_id
-        self.components.append(component)
+        self._insert(component)
+        self._changed(ChangeKind.COMPONENT_ADDED, component,
+                      inverse=((self._remove_many, (array('i', [component._uid]),)),))
     
     def remove_component(self, component_id: str) -> bool:
-        """从轨道移除部件"""
-        for i, comp in enumerate(self.components):
-            if comp.id == component_id:
-                del self.components[i]
-                return True
-        return False
+        """从轨道移除部件（部件对象保留自己的数据，可以再加入其他轨道）"""
+        row = self._row_of(component_id)
+        if row < 0:
+            return False
+        pos = self._locate(row, self._store.start[row])
+        del self._starts[pos]
+        del self._order[pos]
+        self._index.discard(self._store.uid[row])
+        component = self._store.remove(row)
+        if not self._order:
+            self._max_duration = 0.0
+        self._changed(ChangeKind.COMPONENT_REMOVED, component, component.get_end_time(),
+                      ((self._add_many, ([component],)),))
+        return True
+    
+    def clear(self):
+        """清空轨道"""
+        if not self._order:
+            return
+        self._changed(ChangeKind.TRACK_CLEARED, inverse=((self._restore_rows, (self._take_store(),)),))
+    
+    def set_loop_mode(self, loop_mode: LoopMode):
+        """设置循环模式"""
+        if loop_mode != self.loop_mode:
+            old_mode = self.loop_mode
+            self.loop_mode = loop_mode
+            self._changed(ChangeKind.TRACK_CHANGED, inverse=((self.set_loop_mode, (old_mode,)),))
+    
+    def get_component(self, component_id: str) -> Optional[Component]:
+        """获取轨道中指定ID的部件"""
+        row = self._row_of(component_id)
+        return self._store.view(row) if row >= 0 else None
+    
+    # ==================== 逆操作 ====================
+    # 以下方法按部件ID批量恢复数据，本身也发出带逆操作的通知（撤销的逆操作即重做）。
+    # 不增量维护总时长，只在TimelineData.batch()中调用。
+    
+    def _take_store(self) -> ComponentStore:
+        """
+        整体移出所有部件，换上空的存储
+        
+        Returns:
+            ComponentStore: 原存储（视图已转为独立部件，行数据保留，可由_restore_rows放回）
+        """
+        store = self._store
+        for row in self._order:
+            self._index.discard(store.uid[row])
+        store.detach_views()
+        store.track = None
+        self._store = ComponentStore(self)
+        self._order = array('i')
+        self._starts = array('d')
+        self._max_duration = 0.0
+        return store
+    
+    def _remove_many(self, uids: array):
+        """批量移除部件，被移除的行按列复制到独立的存储中（逆操作放回，ID不变）"""
+        if len(uids) == len(self._order):
+            removed = self._take_store()
+        else:
+            rows = self._rows_of(uids)
+            if len(rows) == 1:
+                pos = self._locate(rows[0], self._store.start[rows[0]])
+                del self._starts[pos]
+                del self._order[pos]
+            else:
+                skip = set(rows)
+                keep = [i for i, row in enumerate(self._order) if row not in skip]
+                self._order = array('i', (self._order[i] for i in keep))
+                self._starts = array('d', (self._starts[i] for i in keep))
+            removed = ComponentStore(None)
+            store = self._store
+            for uid, row in zip(uids, rows):
+                removed.copy_row(store, row)
+                self._index.discard(uid)
+                store.release(row)
+            if not self._order:
+                self._max_duration = 0.0
+        self._changed(ChangeKind.COMPONENT_REMOVED, inverse=((self._restore_rows, (removed,)),))
+    
+    def _restore_rows(self, removed: ComponentStore):
+        """放回_remove_many/clear移出的部件（轨道为空时直接沿用该存储）"""
+        if self._order:
+            store = self._store
+            rows = [store.copy_row(removed, row) for row in removed.rows()]
+        else:
+            store = self._store = removed
+            store.track = self
+            rows = store.rows()
+        uids = array('i')
+        for row in rows:
+            uid = store.uid[row]
+            uids.append(uid)
+            self._order.append(row)
+            self._starts.append(store.start[row])
+            if store.duration[row] > self._max_duration:
+                self._max_duration = store.duration[row]
+            self._index.set(uid, self._slot, row)
+        self._resort()
+        self._changed(ChangeKind.COMPONENT_ADDED, inverse=((self._remove_many, (uids,)),))
+    
+    def _set_positions(self, uids: array, starts: Optional[array], durations: Optional[array]):
+        """写入部件的起始时间和时长（None表示该列不变）"""
+        rows = self._rows_of(uids)
+        store = self._store
+        old_starts = None if starts is None else array('d', (store.start[row] for row in rows))
+        old_durations = None if durations is None else array('d', (store.duration[row] for row in rows))
+        if starts is not None and len(rows) == 1:
+            # 单个部件：只移动它的排序位置
+            pos = self._locate(rows[0], old_starts[0])
+            del self._starts[pos]
+            del self._order[pos]
+            pos = bisect.bisect_right(self._starts, starts[0])
+            self._starts.insert(pos, starts[0])
+            self._order.insert(pos, rows[0])
+        for i, row in enumerate(rows):
+            if starts is not None:
+                store.start[row] = starts[i]
+            if durations is not None:
+                store.duration[row] = durations[i]
+                if durations[i] > self._max_duration:
+                    self._max_duration = durations[i]
+        if starts is not None and len(rows) > 1:
+            self._resort()
+        self._changed(ChangeKind.COMPONENT_MOVED,
+                      inverse=((self._set_positions, (uids, old_starts, old_durations)),))
+    
+    def _restore_parameters(self, uids: array, parameters: List[Dict[str, Any]], replace: bool):
+        """
+        写入部件参数
+        
+        Args:
+            parameters: 与uids对应的参数字典
+            replace: 整体替换，否则只修改字典中的键（这些键在部件中必须已存在）
+        """
+        rows = self._rows_of(uids)
+        store = self._store
+        if replace:
+            old = [store.parameters(row) for row in rows]
+        else:
+            old = [{key: current[key] for key in values}
+                   for current, values in zip(map(store.parameters, rows), parameters)]
+        write = store.set_parameters if replace else store.update_parameters
+        for row, values in zip(rows, parameters):
+            write(row, values)
+        self._changed(ChangeKind.PARAMETERS_CHANGED, inverse=((self._restore_parameters, (uids, old, replace)),))
+    
+    # ==================== 时间查询 ====================
     
     def get_component_at_time(self, time: float) -> Optional[Component]:
-        """获取指定时间的部件"""
-        for comp in self.components:
-            if comp.start_time <= time < comp.get_end_time():
-                return comp
+        """获取指定时间的部件（多个部件重叠时返回起始最早的）"""
+        store = self._store
+        lo = bisect.bisect_left(self._starts, time - self._max_duration)
+        hi = bisect.bisect_right(self._starts, time)
+        for i in range(lo, hi):
+            row = self._order[i]
+            if time < store.start[row] + store.duration[row]:
+                return store.view(row)
         return None
     
     def get_components_in_range(self, start_time: float, end_time: float) -> List[Component]:
-        """获取时间范围内的所有部件"""
-        result = []
-        for comp in self.components:
-            if (comp.start_time < end_time and comp.get_end_time() > start_time):
-                result.append(comp)
-        return result
+        """获取时间范围内的所有部件（按起始时间排序）"""
+        store = self._store
+        lo = bisect.bisect_left(self._starts, start_time - self._max_duration)
+        hi = bisect.bisect_left(self._starts, end_time)
+        return [store.view(row) for row in self._order[lo:hi]
+                if store.start[row] + store.duration[row] > start_time]
+    
+    def iter_components(self, start_time: Optional[float] = None) -> Iterator[Component]:
+        """
+        按起始时间顺序逐个生成部件（不建立列表）
+
+        Args:
+            start_time: 只生成该时刻仍未结束的部件，None表示全部
+        """
+        store = self._store
+        if start_time is None:
+            for row in self._order:
+                yield store.view(row)
+            return
+        lo = bisect.bisect_left(self._starts, start_time - self._max_duration)
+        for row in itertools.islice(self._order, lo, None):
+            if store.start[row] + store.duration[row] > start_time or store.start[row] >= start_time:
+                yield store.view(row)
+    
+    def iter_events(self, start_time: Optional[float] = None) -> Iterator[TimelineEvent]:
+        """
+        按时间顺序逐个生成部件的开始/结束事件
+        
+        开始事件按起始时间顺序产生，尚未结束的部件的结束事件暂存在小顶堆中，
+        内存只与同时重叠的部件数有关。同一时刻先产生之前部件的结束事件，再产生之后部件的开始事件。
+        迭代期间不应修改轨道。
+        
+        Args:
+            start_time: 只生成该时刻及之后的事件（此前开始、之后结束的部件只产生结束事件），None表示全部
+        """
+        store = self._store
+        pending: List[Tuple[float, int, int]] = []     # (结束时间, 序号, 行)
+        if start_time is None:
+            start_time = -math.inf
+            lo = 0
+        else:
+            lo = bisect.bisect_left(self._starts, start_time - self._max_duration)
+        for seq, row in enumerate(itertools.islice(self._order, lo, None)):
+            start = store.start[row]
+            while pending and pending[0][0] <= start:
+                end, _, end_row = heapq.heappop(pending)
+                yield TimelineEvent(end, 'end', self, store.view(end_row))
+            end = start + store.duration[row]
+            if start >= start_time:
+                yield TimelineEvent(start, 'start', self, store.view(row))
+            if end >= start_time:
+                heapq.heappush(pending, (end, seq, row))
+        while pending:
+            end, _, end_row = heapq.heappop(pending)
+            yield TimelineEvent(end, 'end', self, store.view(end_row))
+    
+    def get_end_time(self) -> float:
+        """轨道上最后结束的部件的结束时间"""
+        if not self._order:
+            return 0.0
+        store = self._store
+        lo = bisect.bisect_left(self._starts, self._starts[-1] - self._max_duration)
+        return max(store.start[row] + store.duration[row] for row in self._order[lo:])
     
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
@@ -65,45 +553,154 @@ class MotorTrack:
         }
     
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> 'MotorTrack':
-        """从字典创建实例"""
+    def from_dict(cls, data: Dict[str, Any], used_uids: Optional[Set[int]] = None) -> 'MotorTrack':
+        """
+        从字典创建实例（部件沿用文件中的ID）
+        
+        Args:
+            used_uids: 已加载的部件ID，文件中重复的ID改为分配新的ID
+        """
         track = cls(
             motor_id=data['motor_id'],
             name=data['name'],
             loop_mode=LoopMode(data['loop_mode'])
         )
+        if used_uids is None:
+            used_uids = set()
         
         # 重新创建部件对象
         for comp_data in data['components']:
-            from .component import create_component, ComponentType
-            comp_type = ComponentType(comp_data['type'])
-            component = create_component(comp_type, comp_data['motor_id'])
-            component.id = comp_data['id']
-            component.start_time = comp_data['start_time']
-            component.duration = comp_data['duration']
-            component.parameters = comp_data['parameters']
-            track.components.append(component)
+            component = Component.from_dict(comp_data)
+            if component._uid in used_uids:
+                component._uid = allocate_uids(1)[0]
+            used_uids.add(component._uid)
+            component.motor_id = track.motor_id
+            track._insert(component)
         
         return track
 
 class TimelineData:
-    """时间轴数据管理器"""
+    """
+    时间轴数据管理器（部件ID索引到所在轨道和行）
+
+    轨道内容的每次变更都会发出TimelineChange事件并使version加1，
+    总时长随变更增量维护；使用方可以按事件或各轨道的version只处理变化的部分。
+    """
     
-    def __init__(self):
+    def __init__(self, channel_map: Optional[ChannelMap] = None):
+        """
+        Args:
+            channel_map: 通道路由，None表示一块板18个通道
+        """
+        self.channel_map = channel_map or ChannelMap.uniform()
         self.tracks: List[MotorTrack] = []
         self.time_scale = 1.0  # 时间缩放比例
         self.time_unit = "秒"   # 时间单位
         self.total_duration = 0.0  # 总时长
         self.selected_components: List[str] = []  # 选中的部件ID列表
+        self._index = ComponentIndex()  # 部件ID -> (轨道, 行)
+        self._listeners: List[Callable[[TimelineChange], None]] = []
+        self._batch_depth = 0
+        self._batch_tracks = set()   # 批量修改中变更过的轨道
+        self._batch_inverse: List[Optional[Tuple[Inverse, ...]]] = []   # 批量修改中各变更的逆操作
+        self.version = 0
         
-        # 初始化18个舵机轨道
+        # 每个通道一条轨道
         self._initialize_tracks()
     
+    @property
+    def channel_count(self) -> int:
+        return self.channel_map.channel_count
+    
     def _initialize_tracks(self):
-        """初始化18个舵机轨道（编号0-17）"""
-        for i in range(18):
+        """初始化所有通道的轨道（编号0起连续）"""
+        for i in range(len(self.tracks), self.channel_count):
             track = MotorTrack(motor_id=i, name=f'舵机{i}')
-            self.tracks.append(track)
+            self._append_track(track)
+    
+    def _append_track(self, track: MotorTrack):
+        track._attach_index(self._index)
+        track._observer = self._on_track_changed
+        self.tracks.append(track)
+    
+    # ==================== 变更通知 ====================
+    
+    def add_listener(self, listener: Callable[[TimelineChange], None]):
+        """注册变更监听（在修改数据的线程中同步调用）"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+    
+    def remove_listener(self, listener: Callable[[TimelineChange], None]):
+        """注销变更监听"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+    
+    def _on_track_changed(self, track: MotorTrack, kind: ChangeKind, component: Optional[Component],
+                          old_end: float, inverse: Optional[Tuple[Inverse, ...]]):
+        self.version += 1
+        if self._batch_depth:
+            self._batch_tracks.add(track.motor_id)
+            self._batch_inverse.append(inverse)
+            return
+        
+        # 增量维护总时长：只有最后结束的部件变短或被移除时才需要重新计算
+        if kind in (ChangeKind.COMPONENT_ADDED, ChangeKind.COMPONENT_MOVED) \
+                and component.get_end_time() >= self.total_duration:
+            self.total_duration = component.get_end_time()
+        elif kind in (ChangeKind.COMPONENT_REMOVED, ChangeKind.COMPONENT_MOVED) and old_end >= self.total_duration:
+            self._update_total_duration()
+        elif kind == ChangeKind.TRACK_CLEARED:
+            self._update_total_duration()
+        
+        self._notify(TimelineChange(kind, track.motor_id, component.id if component is not None else None,
+                                    inverse=inverse or ()))
+    
+    def _notify(self, change: TimelineChange):
+        for listener in list(self._listeners):
+            listener(change)
+    
+    @contextmanager
+    def batch(self):
+        """
+        批量修改
+        
+        块内的变更不逐个通知：结束时重算一次总时长，并发出一个BATCH事件（motor_ids为涉及的轨道，
+        inverse按相反顺序合并各变更的逆操作，撤销时作为一步）。
+        可以嵌套，最外层结束时通知；块内抛出异常时已完成的修改保留，同样发出通知。
+        
+        用法:
+            with timeline.batch():
+                timeline.add_component(...)
+                timeline.shift(2.0, start_time=10.0)
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._batch_tracks:
+                motor_ids = tuple(sorted(self._batch_tracks))
+                inverses, self._batch_inverse = self._batch_inverse, []
+                self._batch_tracks = set()
+                self._update_total_duration()
+                if any(ops is None for ops in inverses):
+                    inverse = ()
+                else:
+                    inverse = tuple(op for ops in reversed(inverses) for op in ops)
+                self._notify(TimelineChange(ChangeKind.BATCH, -1, motor_ids=motor_ids, inverse=inverse))
+    
+    def track_versions(self) -> Dict[int, int]:
+        """各轨道的当前版本"""
+        return {track.motor_id: track.version for track in self.tracks}
+    
+    def dirty_tracks(self, versions: Dict[int, int]) -> List[int]:
+        """
+        与记录的版本相比内容有变化的轨道
+        
+        Args:
+            versions: 使用方上次处理时记录的track_versions()
+        """
+        return [track.motor_id for track in self.tracks if versions.get(track.motor_id) != track.version]
     
     def get_track(self, motor_id: int) -> Optional[MotorTrack]:
         """获取指定电机轨道"""
@@ -115,23 +712,23 @@ class TimelineData:
         """添加部件到指定轨道"""
         if 0 <= track_index < len(self.tracks):
             self.tracks[track_index].add_component(component)
-            self._update_total_duration()
     
     def remove_component(self, component_id: str) -> bool:
         """移除指定部件"""
-        for track in self.tracks:
-            if track.remove_component(component_id):
-                self._update_total_duration()
-                return True
-        return False
+        entry = self._index.lookup(component_id)
+        if entry is None:
+            return False
+        return entry[0].remove_component(component_id)
     
     def get_component(self, component_id: str) -> Optional[Component]:
         """获取指定ID的部件"""
-        for track in self.tracks:
-            for comp in track.components:
-                if comp.id == component_id:
-                    return comp
-        return None
+        entry = self._index.lookup(component_id)
+        return entry[0]._store.view(entry[1]) if entry is not None else None
+    
+    def get_component_track(self, component_id: str) -> Optional[MotorTrack]:
+        """获取部件所在的轨道"""
+        entry = self._index.lookup(component_id)
+        return entry[0] if entry is not None else None
     
     def get_all_components(self) -> List[Component]:
         """获取所有部件"""
@@ -149,57 +746,229 @@ class TimelineData:
                 components.append(comp)
         return components
     
+    def get_components_in_range(self, start_time: float, end_time: float) -> List[Component]:
+        """获取时间范围内所有轨道的部件"""
+        components = []
+        for track in self.tracks:
+            components.extend(track.get_components_in_range(start_time, end_time))
+        return components
+    
+    # ==================== 批量操作 ====================
+    
+    def _selected_tracks(self, motor_ids: Optional[Iterable[int]]) -> List[MotorTrack]:
+        if motor_ids is None:
+            return list(self.tracks)
+        return [track for track in (self.get_track(motor_id) for motor_id in motor_ids) if track is not None]
+    
+    def add_components(self, components: Iterable[Component], track_index: Optional[int] = None) -> int:
+        """
+        批量添加部件
+        
+        Args:
+            components: 独立部件
+            track_index: 全部加入该轨道，None表示按各部件的motor_id分组
+        
+        Returns:
+            int: 加入的部件数
+        """
+        groups: Dict[int, List[Component]] = {}
+        for component in components:
+            index = component.motor_id if track_index is None else track_index
+            if 0 <= index < len(self.tracks):
+                groups.setdefault(index, []).append(component)
+        with self.batch():
+            for index, group in groups.items():
+                self.tracks[index]._add_many(group)
+        return sum(len(group) for group in groups.values())
+    
+    def repeat(self, component_ids: Iterable[str], count: int, stride: float) -> List[Component]:
+        """
+        重复部件
+        
+        Args:
+            component_ids: 要重复的部件
+            count: 重复次数（不含原部件）
+            stride: 每次重复的时间间隔（秒）
+        
+        Returns:
+            List[Component]: 新建的部件
+        """
+        created = []
+        for component_id in component_ids:
+            component = self.get_component(component_id)
+            if component is None:
+                continue
+            for k in range(1, count + 1):
+                copy = component.copy()
+                copy.set_position(component.start_time + k * stride, component.duration)
+                created.append(copy)
+        self.add_components(created)
+        return created
+    
+    def shift(self, delta: float, start_time: Optional[float] = None, end_time: Optional[float] = None,
+              motor_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        平移起始时间在 [start_time, end_time) 内的部件
+        
+        Args:
+            delta: 平移量（秒），负数表示提前；提前量限制为最早的部件到达0秒，所有部件平移量相同
+            start_time/end_time: 时间范围，None表示不限
+            motor_ids: 涉及的轨道，None表示全部
+        
+        Returns:
+            int: 平移的部件数
+        """
+        selected = [(track, track._rows_in(start_time, end_time)) for track in self._selected_tracks(motor_ids)]
+        selected = [(track, rows) for track, rows in selected if rows]
+        if delta < 0 and selected:
+            earliest = min(track._store.start[rows[0]] for track, rows in selected)  # 行按起始时间排序
+            delta = max(delta, -max(earliest, 0.0))
+        if delta == 0:
+            return 0
+        moved = 0
+        with self.batch():
+            for track, rows in selected:
+                start = track._store.start
+                uid = track._store.uid
+                inverse = (track._set_positions, (array('i', (uid[row] for row in rows)),
+                                                  array('d', (start[row] for row in rows)), None))
+                for row in rows:
+                    start[row] += delta
+                track._resort()
+                track._changed(ChangeKind.COMPONENT_MOVED, inverse=(inverse,))
+                moved += len(rows)
+        return moved
+    
+    def scale_durations(self, factor: float, start_time: Optional[float] = None, end_time: Optional[float] = None,
+                        motor_ids: Optional[Iterable[int]] = None, stretch: bool = False) -> int:
+        """
+        按比例缩放部件时长（运动时间speed_ms与延时delay_time同比例缩放）
+        
+        Args:
+            factor: 缩放比例（>0）
+            start_time/end_time: 起始时间范围，None表示不限
+            motor_ids: 涉及的轨道，None表示全部
+            stretch: 同时以start_time（None时为0）为原点缩放起始时间，整段时间伸缩
+        
+        Returns:
+            int: 缩放的部件数
+        """
+        if factor <= 0:
+            raise ValueError(f"缩放比例必须大于0: {factor}")
+        origin = start_time or 0.0
+        scaled = 0
+        with self.batch():
+            for track in self._selected_tracks(motor_ids):
+                rows = track._rows_in(start_time, end_time)
+                if not rows:
+                    continue
+                store = track._store
+                uids = array('i', (store.uid[row] for row in rows))
+                old_starts = array('d', (store.start[row] for row in rows)) if stretch else None
+                old_durations = array('d', (store.duration[row] for row in rows))
+                parameter_uids = array('i')
+                old_parameters = []
+                for row in rows:
+                    store.duration[row] *= factor
+                    if stretch:
+                        store.start[row] = origin + (store.start[row] - origin) * factor
+                    parameters = store.parameters(row)
+                    values = {}
+                    if 'speed_ms' in parameters:
+                        values['speed_ms'] = max(1, int(round(parameters['speed_ms'] * factor)))
+                    if 'delay_time' in parameters:
+                        values['delay_time'] = parameters['delay_time'] * factor
+                    if values:
+                        parameter_uids.append(store.uid[row])
+                        old_parameters.append({key: parameters[key] for key in values})
+                        store.update_parameters(row, values)
+                    if store.duration[row] > track._max_duration:
+                        track._max_duration = store.duration[row]
+                if stretch:
+                    track._resort()
+                inverse = [(track._set_positions, (uids, old_starts, old_durations))]
+                if parameter_uids:
+                    inverse.append((track._restore_parameters, (parameter_uids, old_parameters, False)))
+                track._changed(ChangeKind.COMPONENT_MOVED, inverse=tuple(inverse))
+                scaled += len(rows)
+        return scaled
+    
+    def copy_track(self, source_motor_id: int, target_motor_ids: Iterable[int],
+                   mirror: bool = False, replace: bool = False) -> int:
+        """
+        把轨道的部件复制到其他轨道
+        
+        Args:
+            source_motor_id: 源轨道
+            target_motor_ids: 目标轨道（跳过源轨道本身）
+            mirror: 镜像角度（180° - 角度），用于左右对称安装的舵机
+            replace: 先清空目标轨道，否则与目标轨道已有部件合并
+        
+        Returns:
+            int: 复制的部件数
+        """
+        source = self.get_track(source_motor_id)
+        if source is None:
+            return 0
+        components = source.components
+        copied = 0
+        with self.batch():
+            for target in self._selected_tracks(target_motor_ids):
+                if target is source:
+                    continue
+                if replace:
+                    target.clear()
+                copies = []
+                for component in components:
+                    copy = component.copy()
+                    if mirror:
+                        parameters = copy.parameters
+                        for key in MIRRORED_PARAMETERS:
+                            if isinstance(parameters.get(key), (int, float)):
+                                parameters[key] = 180.0 - parameters[key]
+                    copies.append(copy)
+                target._add_many(copies)
+                copied += len(copies)
+        return copied
+    
     def clear_track(self, track_index: int):
         """清空指定轨道"""
         if 0 <= track_index < len(self.tracks):
-            self.tracks[track_index].components.clear()
-            self._update_total_duration()
+            self.tracks[track_index].clear()
     
     def clear_all(self):
-        """清空所有轨道"""
-        for track in self.tracks:
-            track.components.clear()
-        self._update_total_duration()
+        """清空所有轨道（作为一次批量修改）"""
+        with self.batch():
+            for track in self.tracks:
+                track.clear()
     
     def _update_total_duration(self):
         """更新总时长"""
-        max_duration = 0.0
-        for track in self.tracks:
-            for comp in track.components:
-                end_time = comp.get_end_time()
-                if end_time > max_duration:
-                    max_duration = end_time
-        self.total_duration = max_duration
+        self.total_duration = max((track.get_end_time() for track in self.tracks), default=0.0)
     
-    def get_timeline_events(self) -> List[Dict[str, Any]]:
-        """获取时间轴事件列表（按时间排序）"""
-        events = []
+    def iter_events(self, start_time: Optional[float] = None) -> Iterator[TimelineEvent]:
+        """
+        按时间顺序逐个生成所有轨道的部件开始/结束事件
         
-        for track in self.tracks:
-            for comp in track.components:
-                # 开始事件
-                events.append({
-                    'time': comp.start_time,
-                    'type': 'start',
-                    'component': comp,
-                    'track': track
-                })
-                # 结束事件
-                events.append({
-                    'time': comp.get_end_time(),
-                    'type': 'end',
-                    'component': comp,
-                    'track': track
-                })
-        
-        # 按时间排序
-        events.sort(key=lambda x: x['time'])
-        return events
+        各轨道的事件流本身有序，多路归并即可得到全局顺序，不需要建立和排序完整的事件列表；
+        同一时刻的事件按轨道顺序产生。迭代期间不应修改时间轴。
+        
+        Args:
+            start_time: 从该时刻开始（播放或导出从播放头位置继续时使用），None表示从头开始
+        """
+        return heapq.merge(*(track.iter_events(start_time) for track in self.tracks),
+                           key=lambda event: event.time)
+    
+    def get_timeline_events(self, start_time: Optional[float] = None) -> List[Dict[str, Any]]:
+        """获取时间轴事件列表（按时间排序，需要完整列表时使用；逐个处理应使用iter_events）"""
+        return [{'time': event.time, 'type': event.type, 'component': event.component, 'track': event.track}
+                for event in self.iter_events(start_time)]
     
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
         return {
             'tracks': [track.to_dict() for track in self.tracks],
+            'channel_map': self.channel_map.to_dict(),
             'time_scale': self.time_scale,
             'time_unit': self.time_unit,
             'total_duration': self.total_duration
@@ -207,17 +976,28 @@ class TimelineData:
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'TimelineData':
-        """从字典创建实例"""
-        timeline = cls()
+        """从字典创建实例（没有通道路由的旧文件按轨道数每18个通道一块板）"""
+        if 'channel_map' in data:
+            channel_map = ChannelMap.from_dict(data['channel_map'])
+        else:
+            channel_map = ChannelMap.uniform(len(data['tracks']) or DEFAULT_CHANNELS_PER_BOARD)
+        timeline = cls(channel_map)
         timeline.time_scale = data.get('time_scale', 1.0)
         timeline.time_unit = data.get('time_unit', '秒')
         timeline.total_duration = data.get('total_duration', 0.0)
         
         # 重新创建轨道
-        timeline.tracks.clear()
-        for track_data in data['tracks']:
-            track = MotorTrack.from_dict(track_data)
-            timeline.tracks.append(track)
+        used_uids: Set[int] = set()
+        timeline._set_tracks(MotorTrack.from_dict(track_data, used_uids)
+                             for track_data in data['tracks'][:channel_map.channel_count])
         
         return timeline
+    
+    def _set_tracks(self, tracks: Iterable[MotorTrack]):
+        """替换全部轨道（加载项目时使用，不足通道数的部分补空轨道）"""
+        self.tracks.clear()
+        self._index.clear()
+        for track in tracks:
+            self._append_track(track)
+        self._initialize_tracks()
 
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试共用的时间线构建
+"""
+
+from typing import Any, Callable, Dict, Optional
+
+from models.component import ComponentType, create_component
+from models.timeline_data import TimelineData
+
+
+def build_timeline(count: int, parameters: Optional[Callable[[int], Dict[str, Any]]] = None) -> TimelineData:
+    """
+    部件平均分布到所有轨道，每条轨道上首尾相接（每个部件1秒）
+
+    Args:
+        count: 正转部件总数
+        parameters: 第i个部件的参数，None表示使用默认参数
+
+    Returns:
+        TimelineData: 新时间线
+    """
+    timeline = TimelineData()
+    track_count = len(timeline.tracks)
+    components = []
+    for i in range(count):
+        component = create_component(ComponentType.FORWARD_ROTATION, i % track_count,
+                                     **(parameters(i) if parameters else {}))
+        component.set_position(float(i // track_count), 1.0)
+        components.append(component)
+    timeline.add_components(components)
+    return timeline
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运动块接收速率基准测试 - 比较普通块（设备前瞻重算）与预规划块（上位机规划）
+
+用法: python tools/block_rate_benchmark.py <串口> [轮数]
+"""
+
+import os
+import sys
+import time
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from core.serial_comm import SerialComm
+from core.servo_commander import ServoCommander
+from core.stream_verifier import StreamVerifier
+from core.trajectory_model import plan_junctions, quantize_block, trapezoid_profile
+from core.upload_scheduler import PLANNER_BUFFER_SIZE
+
+# 重算在规划器下一个调度周期执行，读取统计前等待几个周期
+RECALC_SETTLE_S = 0.1
+
+
+def make_blocks(count: int = PLANNER_BUFFER_SIZE):
+    """同一舵机从90度单向扫到170度，每块在上一块结束时开始，相邻块都能衔接"""
+    step = 80.0 / count
+    blocks = []
+    timestamp_ms = 0
+    for i in range(count):
+        blocks.append(quantize_block({
+            'timestamp_ms': timestamp_ms,
+            'servo_id': 0,
+            'angle': 90.0 + step * (i + 1),
+            'velocity': 180.0,
+            'acceleration': 720.0,
+            'deceleration': 0.0,
+        }))
+        timestamp_ms += int(sum(trapezoid_profile(step, 180.0, 720.0)[:3]) * 1000)
+    return blocks
+
+
+def run_format(comm: SerialComm, frames, rounds: int):
+    """
+    测试一种块格式
+
+    Returns:
+        {'ack_rate', 'stream_rate', 'recalc_us_per_block'}
+    """
+    verifier = StreamVerifier(comm)
+    ack_time = stream_time = 0.0
+    recalc_us = 0
+    total = 0
+    for _ in range(rounds):
+        for streamed in (False, True):
+            comm.send_and_wait(SerialComm.CMD_CLEAR_BUFFER)
+            before = comm.get_buffer_status()
+            t0 = time.perf_counter()
+            if streamed:
+                # 连续发送，设备按序处理，校验应答返回即全部处理完
+                for cmd, payload in frames:
+                    comm.send_servo_command(cmd, payload)
+                verifier.query()
+                stream_time += time.perf_counter() - t0
+            else:
+                for cmd, payload in frames:
+                    comm.send_and_wait(cmd, payload)
+                ack_time += time.perf_counter() - t0
+            time.sleep(RECALC_SETTLE_S)
+            after = comm.get_buffer_status()
+            recalc_us += after['recalc_time_us'] - before['recalc_time_us']
+            total += len(frames)
+    comm.send_and_wait(SerialComm.CMD_CLEAR_BUFFER)
+
+    per_mode = total / 2
+    return {
+        'ack_rate': per_mode / ack_time if ack_time else 0.0,
+        'stream_rate': per_mode / stream_time if stream_time else 0.0,
+        'recalc_us_per_block': recalc_us / total if total else 0.0,
+    }
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("[USAGE] python block_rate_benchmark.py <串口> [轮数]")
+        return
+    port = sys.argv[1]
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    comm = SerialComm()
+    if not comm.connect(port):
+        print(f"[ERROR] 无法连接 {port}")
+        return
+
+    try:
+        commander = ServoCommander(comm)
+        blocks = make_blocks()
+        planned = commander.preplan_blocks(blocks)
+        formats = {
+            'ADD_MOTION_BLOCK (设备规划)': [(SerialComm.CMD_ADD_MOTION_BLOCK, ServoCommander._block_payload(b))
+                                          for b in blocks],
+            'ADD_PLANNED_BLOCK (预规划)': [(SerialComm.CMD_ADD_PLANNED_BLOCK, b['payload']) for b in planned],
+        }
+
+        print("=" * 80)
+        print(f"运动块接收速率: {len(blocks)}块 × {rounds}轮")
+        plans = plan_junctions(blocks, commander.current_positions)
+        print(f"平均衔接速度: {sum(p['exit_speed'] for p in plans) / len(plans):.1f} 度/秒")
+        print("=" * 80)
+        for name, frames in formats.items():
+            result = run_format(comm, frames, rounds)
+            print(f"{name}:")
+            print(f"  逐块应答: {result['ack_rate']:.0f} 块/秒")
+            print(f"  连续发送: {result['stream_rate']:.0f} 块/秒")
+            print(f"  设备前瞻重算: {result['recalc_us_per_block']:.1f} us/块")
+    finally:
+        comm.disconnect()
+
+
+if __name__ == '__main__':
+    main()
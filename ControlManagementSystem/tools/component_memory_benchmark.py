@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+部件内存基准测试 - 比较每个部件一个对象（uuid字符串ID + 参数字典）与列式存储的内存占用
+
+用法: python tools/component_memory_benchmark.py [部件数]
+"""
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from models.component import ComponentType
+from models.timeline_data import TimelineData
+from tools.benchmark_timeline import build_timeline
+
+
+class ObjectComponent:
+    """列式存储之前的部件表示：实例字典、uuid字符串ID、每个部件一个参数字典"""
+
+    def __init__(self, motor_id: int, start_time: float):
+        self._track = None
+        self.id = str(uuid.uuid4())
+        self.type = ComponentType.FORWARD_ROTATION
+        self.motor_id = motor_id
+        self._start_time = start_time
+        self._duration = 1.0
+        self.parameters = {
+            'target_angle': 90.0,
+            'speed_ms': 1000,
+            'motion_mode': 'time',
+            'velocity': 30.0,
+            'acceleration': 60.0,
+            'deceleration': 0.0
+        }
+        self.selected = False
+
+
+def build_objects(count: int, track_count: int):
+    """原表示：每条轨道的部件列表、起始时间列表和ID索引字典"""
+    tracks = [([], []) for _ in range(track_count)]
+    index = {}
+    for i in range(count):
+        comp = ObjectComponent(i % track_count, float(i // track_count))
+        components, starts = tracks[comp.motor_id]
+        components.append(comp)
+        starts.append(comp._start_time)
+        index[comp.id] = (tracks[comp.motor_id], comp)
+    return tracks, index
+
+
+def measure(build, *args):
+    """构建后保留的内存（字节）和构建耗时（秒）"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    result = build(*args)
+    elapsed = time.perf_counter() - t0
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, retained, elapsed
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ('-h', '--help'):
+        print("[USAGE] python component_memory_benchmark.py [部件数]")
+        return
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    track_count = len(TimelineData().tracks)
+
+    objects, object_bytes, object_s = measure(build_objects, count, track_count)
+    del objects
+    timeline, store_bytes, store_s = measure(build_timeline, count)
+
+    # 数据一致性：逐个视图读取的参数与原表示相同
+    sample = ObjectComponent(0, 0.0).parameters
+    same = all(comp.parameters == sample for comp in timeline.get_track(0).components)
+    columns = sum(track._store.nbytes() for track in timeline.tracks)
+
+    print("=" * 80)
+    print(f"部件内存: {count}个正转部件, {track_count}条轨道")
+    print("=" * 80)
+    print(f"  {'表示':<16}{'总内存(MB)':>12}{'每部件(B)':>12}{'建立(秒)':>10}")
+    print(f"  {'对象+字典':<16}{object_bytes / 1e6:>12.1f}{object_bytes / count:>12.0f}{object_s:>10.2f}")
+    print(f"  {'列式存储':<16}{store_bytes / 1e6:>12.1f}{store_bytes / count:>12.0f}{store_s:>10.2f}")
+    print(f"  其中列数组: {columns / count:.0f} B/部件, 缩小 {object_bytes / store_bytes:.1f}x, 参数一致: {'是' if same else '否'}")
+
+
+if __name__ == '__main__':
+    main()
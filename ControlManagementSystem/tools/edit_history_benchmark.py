@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+撤销历史基准测试 - 比较每步保存to_dict()快照与逆操作历史的内存和耗时
+
+用法: python tools/edit_history_benchmark.py [部件数] [编辑步数]
+"""
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from models.timeline_data import TimelineData
+from tools.benchmark_timeline import build_timeline
+from core.edit_history import EditHistory
+
+
+def edit(timeline: TimelineData, rng: random.Random, step: int):
+    """常见编辑：移动、改参数、删除，每10步一次整段平移"""
+    if step % 10 == 9:
+        timeline.shift(0.5, start_time=rng.uniform(0, timeline.total_duration))
+        return
+    track = rng.choice(timeline.tracks)
+    component = rng.choice(track.components)
+    kind = step % 3
+    if kind == 0:
+        component.set_position(component.start_time + 0.25, component.duration)
+    elif kind == 1:
+        component.update_parameters({'target_angle': rng.uniform(0, 180)})
+    else:
+        timeline.remove_component(component.id)
+
+
+def run(count: int, steps: int, record):
+    """执行编辑并记录历史，返回 (历史占用字节, 每步耗时ms, 时间轴, 历史)"""
+    timeline = build_timeline(count)
+    rng = random.Random(1)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    history = record(timeline)
+    t0 = time.perf_counter()
+    for step in range(steps):
+        edit(timeline, rng, step)
+        if isinstance(history, list):
+            history.append(timeline.to_dict())
+    elapsed = time.perf_counter() - t0
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return retained, elapsed * 1e3 / steps, timeline, history
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ('-h', '--help'):
+        print("[USAGE] python edit_history_benchmark.py [部件数] [编辑步数]")
+        return
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    snapshot_bytes, snapshot_ms, _, _ = run(count, steps, lambda timeline: [])
+    inverse_bytes, inverse_ms, timeline, history = run(count, steps, EditHistory)
+    final = timeline.to_dict()
+
+    # 全部撤销再全部重做，结果应与编辑后相同
+    t0 = time.perf_counter()
+    undone = sum(1 for _ in iter(history.undo, False))
+    undo_ms = (time.perf_counter() - t0) * 1e3 / max(1, undone)
+    t0 = time.perf_counter()
+    redone = sum(1 for _ in iter(history.redo, False))
+    redo_ms = (time.perf_counter() - t0) * 1e3 / max(1, redone)
+    same = timeline.to_dict() == final
+
+    print("=" * 80)
+    print(f"撤销历史: {count}个部件, {steps}步编辑")
+    print("=" * 80)
+    print(f"  {'方式':<16}{'历史内存(MB)':>14}{'每步(ms)':>12}")
+    print(f"  {'to_dict快照':<16}{snapshot_bytes / 1e6:>14.1f}{snapshot_ms:>12.2f}")
+    print(f"  {'逆操作':<16}{inverse_bytes / 1e6:>14.2f}{inverse_ms:>12.2f}")
+    print(f"  撤销 {undone}步 平均{undo_ms:.2f}ms, 重做 {redone}步 平均{redo_ms:.2f}ms, 结果一致: {'是' if same else '否'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上位机定时帧流抖动测试 - 以50Hz发送MOVE_ALL（全部保持90°），统计发送抖动与错过的截止时间
+
+用法: python tools/frame_jitter_benchmark.py <串口> [秒数]
+"""
+
+import os
+import sys
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from core.serial_comm import SerialComm
+from core.frame_streamer import FrameStreamer, FrameTable, FRAME_PERIOD_MS
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("[USAGE] python frame_jitter_benchmark.py <串口> [秒数]")
+        return
+    port = sys.argv[1]
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 30.0
+
+    comm = SerialComm()
+    if not comm.connect(port):
+        print(f"[ERROR] 无法连接 {port}")
+        return
+
+    try:
+        count = int(seconds * 1000 / FRAME_PERIOD_MS)
+        table = FrameTable([[90.0] * comm.servo_count] * count)
+        streamer = FrameStreamer(comm)
+        streamer.start(table)
+        streamer.wait()
+        report = streamer.report()
+
+        print("=" * 80)
+        print(f"帧流抖动: {report['frames']}帧 × {FRAME_PERIOD_MS}ms")
+        print("=" * 80)
+        print(f"  抖动 p50: {report['jitter_p50_ms']:.3f} ms")
+        print(f"  抖动 p99: {report['jitter_p99_ms']:.3f} ms")
+        print(f"  抖动最大: {report['max_jitter_ms']:.3f} ms")
+        print(f"  发送耗时 p99: {report['write_p99_ms']:.3f} ms")
+        print(f"  自旋余量: {report['spin_margin_ms']:.2f} ms")
+        print(f"  错过截止: {report['missed']}次 (跳过{report['skipped']}帧)")
+    finally:
+        comm.disconnect()
+
+
+if __name__ == '__main__':
+    main()
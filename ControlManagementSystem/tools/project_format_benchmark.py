@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+项目文件基准测试 - 比较JSON格式与二进制格式的保存/加载耗时和文件大小
+
+用法: python tools/project_format_benchmark.py [部件数] [输出目录]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from models.timeline_data import TimelineData
+from tools.benchmark_timeline import build_timeline
+from core.project_manager import ProjectManager, PROJECT_EXTENSION
+
+
+def timed(func, *args):
+    t0 = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - t0
+
+
+def content(timeline: TimelineData) -> str:
+    """比较用的内容（去掉每次加载都会重新分配的部件ID）"""
+    data = timeline.to_dict()
+    for track in data['tracks']:
+        for component in track['components']:
+            del component['id']
+    return json.dumps(data, sort_keys=True)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ('-h', '--help'):
+        print("[USAGE] python project_format_benchmark.py [部件数] [输出目录]")
+        return
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    directory = sys.argv[2] if len(sys.argv) > 2 else tempfile.mkdtemp()
+    manager = ProjectManager()
+    timeline = build_timeline(count, lambda i: {'target_angle': float(i % 180), 'speed_ms': 500 + i % 500})
+    expected = content(timeline)
+
+    rows = []
+    for label, name, compression in (("JSON", "bench.json", 'none'),
+                                     ("二进制", "bench" + PROJECT_EXTENSION, 'none'),
+                                     ("二进制+zlib", "bench_zlib" + PROJECT_EXTENSION, 'zlib')):
+        path = os.path.join(directory, name)
+        _, save_s = timed(manager.save_project, timeline, path, compression)
+        loaded, open_s = timed(manager.load_project, path)
+        # 延迟解码的轨道在此全部解码
+        _, decode_s = timed(lambda: [track.component_count for track in loaded.tracks])
+        rows.append((label, os.path.getsize(path), save_s, open_s, open_s + decode_s, content(loaded) == expected))
+
+    json_row = rows[0]
+    print("=" * 80)
+    print(f"项目文件: {count}个部件, {len(timeline.tracks)}条轨道")
+    print("=" * 80)
+    print(f"  {'格式':<14}{'大小(MB)':>10}{'保存(ms)':>10}{'打开(ms)':>10}{'全部解码(ms)':>14}{'保存加速':>10}{'加载加速':>10}  一致")
+    for label, size, save_s, open_s, load_s, same in rows:
+        print(f"  {label:<14}{size / 1e6:>10.2f}{save_s * 1e3:>10.1f}{open_s * 1e3:>10.1f}{load_s * 1e3:>14.1f}"
+              f"{json_row[2] / save_s:>9.0f}x{json_row[4] / load_s:>9.0f}x  {'是' if same else '否'}")
+
+
+if __name__ == '__main__':
+    main()
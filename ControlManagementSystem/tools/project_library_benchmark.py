@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+项目库基准测试 - 比较逐个解析项目文件与项目库索引（首次扫描、增量扫描、列出）的耗时
+
+用法: python tools/project_library_benchmark.py [项目数] [每个项目的部件数]
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from tools.benchmark_timeline import build_timeline
+from core.project_format import encode_project
+from core.project_manager import PROJECT_EXTENSION
+from core.project_library import ProjectLibrary
+
+
+def timed(func, *args):
+    t0 = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - t0) * 1e3
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ('-h', '--help'):
+        print("[USAGE] python project_library_benchmark.py [项目数] [每个项目的部件数]")
+        return
+    project_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    component_count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    directory = tempfile.mkdtemp()
+    try:
+        timeline = build_timeline(component_count)
+        metadata = {'version': '1.0.0', 'created_time': '', 'modified_time': ''}
+        binary = encode_project(timeline, metadata)
+        text = json.dumps(dict(metadata, timeline_data=timeline.to_dict()), ensure_ascii=False).encode('utf-8')
+        projects = os.path.join(directory, 'projects')
+        os.makedirs(projects)
+        for i in range(project_count):
+            with open(os.path.join(projects, f"p{i}{PROJECT_EXTENSION}"), 'wb') as f:
+                f.write(binary)
+        legacy = os.path.join(directory, 'legacy')
+        os.makedirs(legacy)
+        for i in range(project_count):
+            with open(os.path.join(legacy, f"p{i}.json"), 'wb') as f:
+                f.write(text)
+
+        # 原方式：每次列出都解析每个JSON项目
+        def parse_all():
+            for name in os.listdir(legacy):
+                with open(os.path.join(legacy, name), 'r', encoding='utf-8') as f:
+                    json.load(f)
+        _, parse_ms = timed(parse_all)
+
+        library = ProjectLibrary(os.path.join(directory, 'library.db'))
+        first, first_ms = timed(library.scan, projects)
+        again, again_ms = timed(library.scan, projects)
+        for i in range(10):
+            os.utime(os.path.join(projects, f"p{i}{PROJECT_EXTENSION}"), ns=(i + 1, i + 1))
+        changed, changed_ms = timed(library.scan, projects)
+        records, list_ms = timed(library.projects, projects)
+        library.close()
+
+        print("=" * 80)
+        print(f"项目库: {project_count}个项目, 每个{component_count}个部件")
+        print("=" * 80)
+        print(f"  逐个解析JSON项目:         {parse_ms:>10.1f}ms")
+        print(f"  首次扫描(只读文件头):     {first_ms:>10.1f}ms  {first}")
+        print(f"  再次扫描(无变化):         {again_ms:>10.1f}ms  {again}")
+        print(f"  再次扫描(10个文件变化):   {changed_ms:>10.1f}ms  {changed}")
+        print(f"  列出项目(查询索引):       {list_ms:>10.1f}ms  {len(records)}个")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+时间轴索引基准测试 - 比较逐个遍历与ID索引/二分查找的查询和删除耗时
+
+用法: python tools/timeline_index_benchmark.py [部件数] [查询次数]
+"""
+
+import os
+import random
+import sys
+import time
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from models.timeline_data import TimelineData
+from tools.benchmark_timeline import build_timeline
+
+
+# ==================== 遍历实现（索引之前的查询方式） ====================
+
+def scan_get_component(timeline: TimelineData, component_id: str):
+    for track in timeline.tracks:
+        for comp in track.components:
+            if comp.id == component_id:
+                return comp
+    return None
+
+
+def scan_at_time(track, time_s: float):
+    for comp in track.components:
+        if comp.start_time <= time_s < comp.get_end_time():
+            return comp
+    return None
+
+
+def scan_in_range(track, start_time: float, end_time: float):
+    return [comp for comp in track.components
+            if comp.start_time < end_time and comp.get_end_time() > start_time]
+
+
+def timed(func, args_list):
+    t0 = time.perf_counter()
+    results = [func(*args) for args in args_list]
+    return (time.perf_counter() - t0) * 1e6 / len(args_list), results
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ('-h', '--help'):
+        print("[USAGE] python timeline_index_benchmark.py [部件数] [查询次数]")
+        return
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    rng = random.Random(1)
+    t0 = time.perf_counter()
+    timeline = build_timeline(count)
+    build_s = time.perf_counter() - t0
+
+    ids = [comp.id for comp in timeline.get_all_components()]
+    duration = timeline.total_duration
+    id_args = [(timeline, rng.choice(ids)) for _ in range(queries)]
+    point_args = [(rng.choice(timeline.tracks), rng.uniform(0, duration)) for _ in range(queries)]
+    range_args = []
+    for _ in range(queries):
+        start = rng.uniform(0, duration)
+        range_args.append((rng.choice(timeline.tracks), start, start + 10.0))
+
+    rows = []
+    scan_us, expected = timed(scan_get_component, id_args)
+    index_us, actual = timed(lambda t, cid: t.get_component(cid), id_args)
+    rows.append(("按ID查找", scan_us, index_us, expected == actual))
+
+    scan_us, expected = timed(scan_at_time, point_args)
+    index_us, actual = timed(lambda track, t: track.get_component_at_time(t), point_args)
+    rows.append(("时刻查询", scan_us, index_us, expected == actual))
+
+    scan_us, expected = timed(scan_in_range, range_args)
+    index_us, actual = timed(lambda track, s, e: track.get_components_in_range(s, e), range_args)
+    rows.append(("范围查询(10秒)", scan_us, index_us, expected == actual))
+
+    # 删除：遍历方式只计查找位置（与原实现相同），索引方式计完整删除
+    removed = rng.sample(ids, queries)
+    scan_us, _ = timed(scan_get_component, [(timeline, cid) for cid in removed])
+    index_us, results = timed(timeline.remove_component, [(cid,) for cid in removed])
+    rows.append(("删除部件", scan_us, index_us, all(results)))
+
+    print("=" * 80)
+    print(f"时间轴索引: {count}个部件, {len(timeline.tracks)}条轨道, 每项{queries}次 (建立{build_s:.2f}秒)")
+    print("=" * 80)
+    print(f"  {'操作':<16}{'遍历(us)':>12}{'索引(us)':>12}{'加速':>10}  结果一致")
+    for name, scan_us, index_us, same in rows:
+        print(f"  {name:<16}{scan_us:>12.1f}{index_us:>12.2f}{scan_us / index_us:>9.0f}x  {'是' if same else '否'}")
+
+
+if __name__ == '__main__':
+    main()
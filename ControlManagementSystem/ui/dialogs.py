@@ -12,6 +12,7 @@ from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
 from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QFont
 from models.component import Component, ComponentType
+from models.channel_map import DEFAULT_CHANNELS_PER_BOARD
 import logging
 
 logger = logging.getLogger('servo_controller')
@@ -299,15 +300,16 @@ class ComponentEditDialog(QDialog):
             old_speed_ms = self.component.parameters.get('speed_ms', 1000)
             old_mode = self.component.parameters.get('motion_mode', 'time')
             
-            self.component.parameters['target_angle'] = self.angle_spin.value()
-            self.component.parameters['speed_ms'] = self.speed_ms_spin.value()
-            
             # 保存运动模式和梯形速度参数
             motion_mode = 'time' if self.motion_mode_combo.currentIndex() == 0 else 'trapezoid'
-            self.component.parameters['motion_mode'] = motion_mode
-            self.component.parameters['velocity'] = self.velocity_spin.value()
-            self.component.parameters['acceleration'] = self.acceleration_spin.value()
-            self.component.parameters['deceleration'] = self.deceleration_spin.value()
+            self.component.update_parameters({
+                'target_angle': self.angle_spin.value(),
+                'speed_ms': self.speed_ms_spin.value(),
+                'motion_mode': motion_mode,
+                'velocity': self.velocity_spin.value(),
+                'acceleration': self.acceleration_spin.value(),
+                'deceleration': self.deceleration_spin.value()
+            })
             
             # 详细日志: 参数修改
             logger.info("=" * 80)
@@ -322,11 +324,13 @@ class ComponentEditDialog(QDialog):
             logger.info("=" * 80)
             
         elif self.component.type == ComponentType.HOME:
-            self.component.parameters['home_angle'] = self.home_angle_spin.value()
-            self.component.parameters['speed_ms'] = self.speed_ms_spin.value()
+            self.component.update_parameters({
+                'home_angle': self.home_angle_spin.value(),
+                'speed_ms': self.speed_ms_spin.value()
+            })
             logger.info(f"[UI操作] 编辑归零部件: 舵机{self.component.motor_id}, 归零角度={self.home_angle_spin.value()}°")
         elif self.component.type == ComponentType.DELAY:
-            self.component.parameters['delay_time'] = self.delay_spin.value()
+            self.component.update_parameters({'delay_time': self.delay_spin.value()})
             logger.info(f"[UI操作] 编辑延时部件: 舵机{self.component.motor_id}, 延时={self.delay_spin.value()}s")
         
         self.component_updated.emit(self.component)
@@ -458,7 +462,7 @@ class ServoSettingsDialog(QDialog):
         
         # 舵机数量
         self.servo_count_spin = QSpinBox()
-        self.servo_count_spin.setRange(1, 32)
+        self.servo_count_spin.setRange(1, 512)
         self.servo_count_spin.setValue(18)
         self.servo_count_spin.setSuffix(" 个")
         servo_layout.addRow("舵机数量:", self.servo_count_spin)
@@ -560,9 +564,10 @@ class ServoSettingsDialog(QDialog):
 class MoveComponentDialog(QDialog):
     """移动部件对话框"""
     
-    def __init__(self, component: Component, parent=None):
+    def __init__(self, component: Component, parent=None, channel_count: int = DEFAULT_CHANNELS_PER_BOARD):
         super().__init__(parent)
         self.component = component
+        self.channel_count = channel_count
         self.init_ui()
     
     def init_ui(self):
@@ -575,7 +580,7 @@ class MoveComponentDialog(QDialog):
         # 目标舵机
         form_layout = QFormLayout()
         self.motor_combo = QComboBox()
-        for i in range(18):
+        for i in range(self.channel_count):
             self.motor_combo.addItem(f"舵机 {i + 1}")
         self.motor_combo.setCurrentIndex(self.component.motor_id)
         form_layout.addRow("目标舵机:", self.motor_combo)
@@ -773,7 +778,7 @@ class DefaultParametersDialog(QDialog):
         
         # 舵机数量
         self.servo_count_spin = QSpinBox()
-        self.servo_count_spin.setRange(1, 32)
+        self.servo_count_spin.setRange(1, 512)
         self.servo_count_spin.setValue(18)
         self.servo_count_spin.setSuffix(" 个")
         layout.addRow("舵机数量:", self.servo_count_spin)
@@ -875,13 +880,13 @@ class DefaultParametersDialog(QDialog):
         # 保存配置
         config = self.config_manager.config
         
-        # 舵机参数
-        config['servo'] = {
+        # 舵机参数（保留对话框中没有的项，如每板通道数）
+        config['servo'] = dict(config.get('servo', {}), **{
             'servo_count': self.servo_count_spin.value(),
             'angle_min': self.angle_min_spin.value(),
             'angle_max': self.angle_max_spin.value(),
             'default_speed_ms': self.default_speed_ms_spin.value()
-        }
+        })
         
         # 运动参数
         config['default_motion'] = {
@@ -10,7 +10,7 @@ from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QDockWidget, QSplitter, QMessageBox, QFileDialog,
                              QProgressBar, QLabel, QTextEdit, QDialog, QTabWidget,
                              QGroupBox, QFormLayout, QPushButton, QLineEdit, QSizePolicy,
-                             QCheckBox)
+                             QCheckBox, QSlider)
 from PyQt5.QtCore import Qt, pyqtSignal, QTimer
 from PyQt5.QtGui import QIcon, QKeySequence, QFont
 import os
@@ -20,8 +20,13 @@ from ui.timeline_widget import TimelineWidget
 from ui.dialogs import ComponentEditDialog, SerialSettingsDialog, ServoSettingsDialog
 from core.serial_comm import SerialComm
 from core.servo_commander import ServoCommander
-from core.project_manager import ProjectManager
+from core.upload_scheduler import FEED_OVERRIDE_MIN, FEED_OVERRIDE_MAX
+from core.jog_coalescer import JogCoalescer
+from core.pose_scrubber import PoseScrubber
+from core.project_manager import ProjectManager, PROJECT_EXTENSION
 from core.config_manager import ConfigManager
+from core.edit_history import EditHistory
+from core.autosave import AutoSaver, find_recoveries, recover, discard_recovery
 from models.component import Component
 from core.logger import get_logger
 from models.timeline_data import TimelineData, LoopMode
@@ -30,6 +35,12 @@ import logging
 
 logger = get_logger()
 
+# 自动保存检查间隔（毫秒）：只比较版本号，写盘在后台线程
+AUTOSAVE_TICK_MS = 250
+
+# 速度倍率滑块停止变化多久后发送（毫秒）：拖动过程中只更新显示，松开或停顿后发送一次
+FEED_OVERRIDE_DELAY_MS = 150
+
 class MainWindow(QMainWindow):
     """主窗口类"""
     
@@ -41,22 +52,26 @@ class MainWindow(QMainWindow):
         logger.info("配置管理器初始化完成")
         
         # 初始化组件
-        self.timeline_data = TimelineData()
+        self.timeline_data = TimelineData(self.config_manager.get_channel_map())
         self.serial_comm = SerialComm()
         self.servo_commander = ServoCommander(self.serial_comm)
+        self.jog_coalescer = JogCoalescer(self.serial_comm)
+        self.pose_scrubber = PoseScrubber(self.servo_commander, self.jog_coalescer)
+        self.scrub_mode = False  # 实时预览：拖动播放头驱动硬件
         self.project_manager = ProjectManager()
         
         # 舵机设置（简化配置）
         self.servo_settings = {
-            'servo_count': 18,
+            'servo_count': self.timeline_data.channel_count,
             'angle_min': 0.0,
             'angle_max': 180.0,
             'default_speed_ms': 1000
         }
         
         # 舵机使能状态管理
-        self.servo_enable_states = [False] * 18  # 18个舵机的使能状态
-        self.servo_current_angles = [90.0] * 18  # 18个舵机的当前角度（默认90度）
+        # 串口连接的驱动板上各舵机的状态（多板时其余板的通道由多板同步执行控制）
+        self.servo_enable_states = [False] * self.serial_comm.servo_count  # 使能状态
+        self.servo_current_angles = [90.0] * self.serial_comm.servo_count  # 当前角度（默认90度）
         self.enable_all_mode = False  # 全部使能模式
         
         logger.info(f"舵机参数: {self.servo_settings['servo_count']}个舵机, 角度范围{self.servo_settings['angle_min']}-{self.servo_settings['angle_max']}°")
@@ -68,6 +83,12 @@ class MainWindow(QMainWindow):
         
         # 初始化UI
         self.init_ui()
+        self.edit_history = EditHistory(self.timeline_widget.timeline_data)  # 撤销/重做（记录时间轴控件中的数据）
+        self.autosaver = AutoSaver()  # 后台自动保存到恢复目录
+        self.autosaver.attach(self.timeline_widget.timeline_data)
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.timeout.connect(self.autosaver.tick)
+        self.autosave_timer.start(AUTOSAVE_TICK_MS)
         self.setup_connections()
         self.setup_logging()
         
@@ -78,6 +99,9 @@ class MainWindow(QMainWindow):
         
         # 居中显示
         self.center_window()
+        
+        # 窗口显示后检查上次异常退出留下的修改
+        QTimer.singleShot(0, self.offer_recovery)
     
     def init_ui(self):
         """初始化UI"""
@@ -158,10 +182,12 @@ class MainWindow(QMainWindow):
         
         undo_action = QAction("撤销(&U)", self)
         undo_action.setShortcut(QKeySequence.Undo)
+        undo_action.triggered.connect(self.undo_edit)
         edit_menu.addAction(undo_action)
         
         redo_action = QAction("重做(&R)", self)
         redo_action.setShortcut(QKeySequence.Redo)
+        redo_action.triggered.connect(self.redo_edit)
         edit_menu.addAction(redo_action)
         
         edit_menu.addSeparator()
@@ -235,6 +261,12 @@ class MainWindow(QMainWindow):
         self.run_action.triggered.connect(self.run_program)
         toolbar.addAction(self.run_action)
         
+        # 续传按钮（断线重连后只上传未执行的块）
+        self.resume_action = QAction("续传", self)
+        self.resume_action.setEnabled(False)
+        self.resume_action.triggered.connect(self.resume_program)
+        toolbar.addAction(self.resume_action)
+        
         # 停止按钮
         self.stop_action = QAction("停止", self)
         self.stop_action.setEnabled(False)
@@ -248,6 +280,23 @@ class MainWindow(QMainWindow):
         self.pause_action.triggered.connect(self.pause_program)
         toolbar.addAction(self.pause_action)
         
+        # 速度倍率（运行中即时生效）
+        toolbar.addWidget(QLabel(" 速度:"))
+        self.feed_slider = QSlider(Qt.Horizontal)
+        self.feed_slider.setRange(FEED_OVERRIDE_MIN, FEED_OVERRIDE_MAX)
+        self.feed_slider.setValue(100)
+        self.feed_slider.setFixedWidth(120)
+        self.feed_slider.valueChanged.connect(self.on_feed_override_changed)
+        self.feed_slider.sliderReleased.connect(self.apply_feed_override)
+        toolbar.addWidget(self.feed_slider)
+        self.feed_timer = QTimer(self)
+        self.feed_timer.setSingleShot(True)
+        self.feed_timer.setInterval(FEED_OVERRIDE_DELAY_MS)
+        self.feed_timer.timeout.connect(self.apply_feed_override)
+        self.feed_label = QLabel("100%")
+        self.feed_label.setMinimumWidth(40)
+        toolbar.addWidget(self.feed_label)
+        
         toolbar.addSeparator()
         
         # 输出运动逻辑表按钮
@@ -350,7 +399,7 @@ class MainWindow(QMainWindow):
         
         # 舵机位置标签
         self.servo_labels = {}
-        servo_names = [f'舵机{i}' for i in range(18)]  # 舵机0-17
+        servo_names = [f'舵机{i}' for i in range(self.serial_comm.servo_count)]  # 本板舵机
         for servo in servo_names:
             label = QLabel("0.00°")
             label.setStyleSheet("color: #333; font-family: monospace;")
@@ -600,6 +649,9 @@ class MainWindow(QMainWindow):
         self.timeline_widget.servo_enable_clicked.connect(self.on_servo_enable_clicked)
         self.timeline_widget.jog_plus_clicked.connect(self.on_jog_plus_clicked)
         self.timeline_widget.jog_minus_clicked.connect(self.on_jog_minus_clicked)
+        self.timeline_widget.track_created.connect(self.on_track_created)
+        self.timeline_widget.time_changed.connect(self.on_time_changed)
+        self.timeline_widget.scrub_mode_changed.connect(self.on_scrub_mode_changed)
         
         # 串口通信信号
         self.serial_comm.connected.connect(self.on_serial_connected)
@@ -657,8 +709,10 @@ class MainWindow(QMainWindow):
     def new_project(self):
         """新建项目"""
         if self.check_unsaved_changes():
-            new_timeline_data = self.project_manager.create_new_project()
+            new_timeline_data = self.project_manager.create_new_project(self.config_manager.get_channel_map())
             self.timeline_widget.set_timeline_data(new_timeline_data)
+            self.edit_history.attach(new_timeline_data)
+            self.autosaver.attach(new_timeline_data)
             self.gcode_text.clear()
             self.update_window_title()
             logger.info("新建项目")
@@ -671,12 +725,15 @@ class MainWindow(QMainWindow):
             project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
             
             filename, _ = QFileDialog.getOpenFileName(
-                self, "打开项目", project_root, "项目文件 (*.json);;所有文件 (*)"
+                self, "打开项目", project_root, f"项目文件 (*{PROJECT_EXTENSION} *.json);;所有文件 (*)"
             )
             if filename:
                 timeline_data = self.project_manager.load_project(filename)
                 if timeline_data:
                     self.timeline_widget.set_timeline_data(timeline_data)
+                    self.edit_history.attach(timeline_data)
+                    self.autosaver.attach(timeline_data, filename)
+                    self.project_manager.add_to_recent_projects(filename)
                     self.update_window_title()
                     logger.info(f"打开项目: {filename}")
     
@@ -699,6 +756,8 @@ class MainWindow(QMainWindow):
                 self.project_manager.get_current_project_path()
             )
             if success:
+                self.autosaver.attach(self.timeline_widget.timeline_data, self.project_manager.get_current_project_path())
+                self.project_manager.add_to_recent_projects(self.project_manager.get_current_project_path())
                 self.update_window_title()
                 logger.info("项目已保存")
         else:
@@ -709,14 +768,16 @@ class MainWindow(QMainWindow):
         # 获取项目根目录（MotorControllerSystem的上级目录）
         import os
         project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        default_filename = os.path.join(project_root, f"project_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        default_filename = os.path.join(project_root, f"project_{datetime.now().strftime('%Y%m%d_%H%M%S')}{PROJECT_EXTENSION}")
         
         filename, _ = QFileDialog.getSaveFileName(
-            self, "另存为项目", default_filename, "项目文件 (*.json);;所有文件 (*)"
+            self, "另存为项目", default_filename, f"项目文件 (*{PROJECT_EXTENSION});;JSON导出 (*.json);;所有文件 (*)"
         )
         if filename:
             success = self.project_manager.save_as_project(self.timeline_widget.timeline_data, filename)
             if success:
+                self.autosaver.attach(self.timeline_widget.timeline_data, filename)
+                self.project_manager.add_to_recent_projects(filename)
                 self.update_window_title()
                 logger.info(f"项目已保存: {filename}")
     
@@ -738,15 +799,68 @@ class MainWindow(QMainWindow):
     def clear_timeline(self):
         """清空时间轴"""
         reply = QMessageBox.question(
-            self, "确认", "确定要清空时间轴吗？此操作不可撤销。",
+            self, "确认", "确定要清空时间轴吗？（可通过撤销恢复）",
             QMessageBox.Yes | QMessageBox.No, QMessageBox.No
         )
         if reply == QMessageBox.Yes:
-            self.timeline_data.clear_all()
-            self.timeline_widget.set_timeline_data(self.timeline_data)
+            self.timeline_widget.timeline_data.clear_all()
             self.gcode_text.clear()
+            self.project_manager.set_modified(True)
+            self.update_window_title()
             logger.info("清空时间轴")
     
+    def offer_recovery(self):
+        """程序启动时询问是否恢复上次异常退出前自动保存的修改"""
+        for recovery in find_recoveries(self.autosaver.directory):
+            name = recovery.project_path or "未命名项目"
+            saved_time = datetime.fromtimestamp(recovery.saved_time).strftime('%Y-%m-%d %H:%M:%S')
+            reply = QMessageBox.question(
+                self, "恢复未保存的修改",
+                f"程序上次未正常退出，发现自动保存的修改:\n{name}\n保存时间: {saved_time}\n\n是否恢复？",
+                QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes
+            )
+            if reply != QMessageBox.Yes:
+                discard_recovery(recovery.journal_path)
+                continue
+            try:
+                timeline_data, project_path = recover(recovery.journal_path)
+            except Exception as e:
+                logger.error(f"恢复失败: {e}")
+                QMessageBox.warning(self, "恢复失败", f"无法恢复自动保存的修改:\n{e}")
+                continue
+            self.timeline_widget.set_timeline_data(timeline_data)
+            self.edit_history.attach(timeline_data)
+            self.project_manager.current_project_path = project_path
+            self.project_manager.set_modified(True)
+            # 恢复的内容写入本次会话的日志后才删除旧的恢复文件
+            self.autosaver.attach(timeline_data, project_path, modified=True)
+            self.autosaver.flush()
+            self.autosaver.wait()
+            discard_recovery(recovery.journal_path)
+            self.update_window_title()
+            self.status_bar.showMessage(f"已恢复: {name}", 5000)
+            return
+    
+    def undo_edit(self):
+        """撤销"""
+        description = self.edit_history.undo_description
+        if self.edit_history.undo():
+            self.project_manager.set_modified(True)
+            self.update_window_title()
+            self.status_bar.showMessage(f"已撤销: {description}", 3000)
+        else:
+            self.status_bar.showMessage("没有可撤销的操作", 3000)
+    
+    def redo_edit(self):
+        """重做"""
+        description = self.edit_history.redo_description
+        if self.edit_history.redo():
+            self.project_manager.set_modified(True)
+            self.update_window_title()
+            self.status_bar.showMessage(f"已重做: {description}", 3000)
+        else:
+            self.status_bar.showMessage("没有可重做的操作", 3000)
+    
     def show_serial_settings(self):
         """显示串口设置"""
         dialog = SerialSettingsDialog(parent=self)
@@ -766,7 +880,7 @@ class MainWindow(QMainWindow):
     def home_all_servos(self):
         """所有舵机归零（回到90度中位）"""
         if self.is_connected:
-            angles = [90.0] * 18  # 18个舵机
+            angles = [90.0] * self.serial_comm.servo_count  # 本板所有舵机
             self.serial_comm.move_all_servos(angles, 1000)
             logger.info("所有舵机归零到90度")
         else:
@@ -840,6 +954,9 @@ class MainWindow(QMainWindow):
                 self.current_port_label.setText(port_name)
                 self.current_port_label.setStyleSheet("color: #007bff; padding: 2px 8px; min-width: 60px; font-weight: bold;")
                 logger.info(f"串口连接成功: {port_name}")
+                # 设备上电默认原速，同步滑块上的倍率
+                if self.feed_slider.value() != 100:
+                    self.servo_commander.set_feed_override(self.feed_slider.value())
             else:
                 QMessageBox.warning(self, "错误", "串口连接失败")
         else:
@@ -866,10 +983,10 @@ class MainWindow(QMainWindow):
             # 使能所有舵机
             if self.is_connected:
                 self.serial_comm.enable_servo(0xFF)  # 0xFF表示全部使能
-                logger.info("全部使能模式：使能所有18个舵机")
+                logger.info("全部使能模式：使能所有舵机")
             
             # 更新所有舵机轨道显示为使能状态
-            for servo_id in range(18):
+            for servo_id in range(len(self.servo_enable_states)):
                 self.servo_enable_states[servo_id] = True
                 if servo_id in self.timeline_widget.motor_tracks:
                     self.timeline_widget.motor_tracks[servo_id].set_enable_state(True)
@@ -884,7 +1001,7 @@ class MainWindow(QMainWindow):
                 logger.info("单个使能模式：禁用所有舵机，可单独使能")
             
             # 更新所有舵机轨道显示为禁用状态
-            for servo_id in range(18):
+            for servo_id in range(len(self.servo_enable_states)):
                 self.servo_enable_states[servo_id] = False
                 if servo_id in self.timeline_widget.motor_tracks:
                     self.timeline_widget.motor_tracks[servo_id].set_enable_state(False)
@@ -896,22 +1013,34 @@ class MainWindow(QMainWindow):
             return
         
         logger.info("开始执行舵机控制程序")
+        # 流式缓冲区模式：Pico自主调度执行
+        self._execute_in_background(
+            lambda: self.servo_commander.execute_timeline(self.timeline_widget.timeline_data))
+    
+    def resume_program(self):
+        """续传断线前未执行完的程序"""
+        if not self.is_connected:
+            QMessageBox.warning(self, "警告", "请先连接串口")
+            return
         
-        # 在后台线程执行（新架构：流式缓冲区模式）
+        logger.info("续传断线前的程序")
+        self._execute_in_background(self.servo_commander.resume_program)
+    
+    def _execute_in_background(self, task):
+        """在后台线程执行程序并更新运行状态"""
         import threading
         def execute_thread():
             self.is_running = True
             self.run_action.setEnabled(False)
+            self.resume_action.setEnabled(False)
             self.stop_action.setEnabled(True)
             self.running_label.setText("运行中")
             
-            # 流式缓冲区模式：Pico自主调度执行
-            success = self.servo_commander.execute_timeline(
-                self.timeline_widget.timeline_data
-            )
+            success = task()
             
             self.is_running = False
             self.run_action.setEnabled(True)
+            self.resume_action.setEnabled(self.is_connected and self.servo_commander.has_checkpoint())
             self.stop_action.setEnabled(False)
             self.running_label.setText("就绪")
             
@@ -958,6 +1087,23 @@ class MainWindow(QMainWindow):
             self.running_label.setText("运行中")
             logger.info("程序继续运行")
     
+    def on_feed_override_changed(self, value: int):
+        """速度倍率滑块（拖动中的连续变化合并为一次发送）"""
+        self.feed_label.setText(f"{value}%")
+        if not self.feed_slider.isSliderDown():
+            self.feed_timer.start()
+    
+    def apply_feed_override(self):
+        """发送滑块当前的速度倍率（与上次发送的相同时跳过）"""
+        self.feed_timer.stop()
+        value = self.feed_slider.value()
+        if value == self.servo_commander.feed_override:
+            return
+        if self.is_connected:
+            self.servo_commander.set_feed_override(value)
+        else:
+            self.servo_commander.feed_override = value
+    
     def generate_command_preview(self):
         """生成命令序列预览"""
         preview_text = self.servo_commander.generate_preview_text(self.timeline_widget.timeline_data)
@@ -984,8 +1130,7 @@ class MainWindow(QMainWindow):
         """部件被移动"""
         component = self.timeline_data.get_component(component_id)
         if component:
-            component.start_time = new_start_time
-            component.duration = new_duration
+            component.set_position(new_start_time, new_duration)
             self.project_manager.set_modified(True)
             self.update_window_title()
     
@@ -1022,6 +1167,11 @@ class MainWindow(QMainWindow):
             if servo_id in self.timeline_widget.motor_tracks:
                 self.timeline_widget.motor_tracks[servo_id].set_enable_state(self.servo_enable_states[servo_id])
     
+    def on_track_created(self, servo_id: int):
+        """轨道控件按需创建后同步使能状态"""
+        if servo_id < len(self.servo_enable_states):
+            self.timeline_widget.motor_tracks[servo_id].set_enable_state(self.servo_enable_states[servo_id])
+    
     def on_jog_plus_clicked(self, servo_id: int):
         """Jog+按钮点击处理 - 手动后退10度"""
         if not self.is_connected:
@@ -1037,14 +1187,10 @@ class MainWindow(QMainWindow):
         current_angle = self.servo_current_angles[servo_id]
         
         # 发送jog+命令（减少10度）
-        success, new_angle = self.serial_comm.jog_servo(servo_id, current_angle, -10)
-        
-        if success:
-            # 更新当前角度
-            self.servo_current_angles[servo_id] = new_angle
-            logger.info(f"舵机{servo_id} Jog+ ({current_angle:.1f}° → {new_angle:.1f}°)")
-        else:
-            logger.error(f"舵机{servo_id} Jog+命令发送失败")
+        # 连续点击只保留最新目标，按上限频率合并发送
+        new_angle = self.jog_coalescer.jog(servo_id, current_angle, -10)
+        self.servo_current_angles[servo_id] = new_angle
+        logger.info(f"舵机{servo_id} Jog+ ({current_angle:.1f}° → {new_angle:.1f}°)")
     
     def on_jog_minus_clicked(self, servo_id: int):
         """Jog-按钮点击处理 - 手动前进10度"""
@@ -1061,14 +1207,27 @@ class MainWindow(QMainWindow):
         current_angle = self.servo_current_angles[servo_id]
         
         # 发送jog-命令（增加10度）
-        success, new_angle = self.serial_comm.jog_servo(servo_id, current_angle, 10)
-        
-        if success:
-            # 更新当前角度
-            self.servo_current_angles[servo_id] = new_angle
-            logger.info(f"舵机{servo_id} Jog- ({current_angle:.1f}° → {new_angle:.1f}°)")
-        else:
-            logger.error(f"舵机{servo_id} Jog-命令发送失败")
+        # 连续点击只保留最新目标，按上限频率合并发送
+        new_angle = self.jog_coalescer.jog(servo_id, current_angle, 10)
+        self.servo_current_angles[servo_id] = new_angle
+        logger.info(f"舵机{servo_id} Jog- ({current_angle:.1f}° → {new_angle:.1f}°)")
+    
+    def on_scrub_mode_changed(self, enabled: bool):
+        """实时预览开关"""
+        self.scrub_mode = enabled
+        logger.info(f"实时预览{'开启' if enabled else '关闭'}")
+        if enabled:
+            self.on_time_changed(self.timeline_widget.current_time)
+    
+    def on_time_changed(self, time: float):
+        """播放头移动：实时预览模式下把该时刻的姿态发送到硬件"""
+        if not self.scrub_mode or not self.is_connected or self.is_running:
+            return
+        try:
+            pose = self.pose_scrubber.scrub(self.timeline_widget.timeline_data, time)
+            self.servo_current_angles = list(pose)
+        except Exception as e:
+            logger.error(f"实时预览失败: {e}")
     
     def on_component_updated(self, component: Component):
         """部件参数更新"""
@@ -1081,6 +1240,7 @@ class MainWindow(QMainWindow):
         self.is_connected = True
         self.connect_action.setText("断开")
         self.run_action.setEnabled(True)
+        self.resume_action.setEnabled(not self.is_running and self.servo_commander.has_checkpoint())
         self.connection_label.setText("已连接")
         self.connection_label.setStyleSheet("color: green; font-weight: bold;")
         
@@ -1101,6 +1261,7 @@ class MainWindow(QMainWindow):
         self.is_connected = False
         self.connect_action.setText("连接")
         self.run_action.setEnabled(False)
+        self.resume_action.setEnabled(False)
         self.connection_label.setText("未连接")
         self.connection_label.setStyleSheet("color: red; font-weight: bold;")
         
@@ -1316,16 +1477,16 @@ class MainWindow(QMainWindow):
                 f"舵机数量: {self.servo_settings['servo_count']}个\n"
                 f"角度范围: {self.servo_settings['angle_min']}° - {self.servo_settings['angle_max']}°\n"
                 f"默认运动时间: {self.servo_settings['default_speed_ms']}ms\n\n"
-                f"所有舵机将使用这些参数进行控制"
+                f"所有舵机将使用这些参数进行控制（舵机数量在新建项目时生效）"
             )
             
-            # 同时保存到配置文件
-            self.config_manager.set_servo_settings({
+            # 同时保存到配置文件（保留每板通道数等其他项）
+            self.config_manager.set_servo_settings(dict(self.config_manager.get_servo_settings(), **{
                 'servo_count': self.servo_settings['servo_count'],
                 'angle_min': self.servo_settings['angle_min'],
                 'angle_max': self.servo_settings['angle_max'],
                 'default_speed_ms': self.servo_settings['default_speed_ms']
-            })
+            }))
             self.config_manager.save()
     
     def set_start_positions(self):
@@ -1457,7 +1618,7 @@ class MainWindow(QMainWindow):
         # 添加时间轴总览
         text += "【时间轴总览】\n"
         all_components = []
-        for motor_id in range(18):
+        for motor_id in sorted(motion_data):
             track_data = motion_data.get(motor_id, {})
             components = track_data.get('components', [])
             for comp in components:
@@ -1481,6 +1642,10 @@ class MainWindow(QMainWindow):
     def closeEvent(self, event):
         """窗口关闭事件"""
         if self.check_unsaved_changes():
+            # 正常退出不需要恢复文件
+            self.autosave_timer.stop()
+            self.autosaver.close()
+            
             # 断开串口连接
             if self.is_connected:
                 self.serial_comm.disconnect()
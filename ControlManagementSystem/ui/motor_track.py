@@ -10,7 +10,7 @@ from PyQt5.QtWidgets import (QWidget, QHBoxLayout, QLabel, QComboBox,
 from PyQt5.QtCore import Qt, pyqtSignal, QRect, QPoint, QMimeData
 from PyQt5.QtGui import QPainter, QColor, QPen, QBrush, QFont, QDragEnterEvent, QDropEvent
 from models.component import Component, ComponentType, create_component
-from models.timeline_data import LoopMode
+from models.timeline_data import LoopMode, TimelineData
 import logging
 
 logger = logging.getLogger('servo_controller')
@@ -36,6 +36,7 @@ class ComponentWidget(QWidget):
         self.drag_start_pos = QPoint()
         self.drag_start_time = 0.0
         self.drag_start_duration = 0.0
+        self.pending_position = None  # 拖动中的(起始时间, 持续时间)，松开鼠标时提交
         
         self.setFixedHeight(45)
         self.setStyleSheet(self._get_style_sheet())
@@ -210,6 +211,7 @@ class ComponentWidget(QWidget):
             self.drag_start_time = self.component.start_time
             self.drag_start_duration = self.component.duration
             self.resize_start_x = event.globalX()
+            self.pending_position = None
             
             # 如果在移动模式，只支持拖动
             if self.is_move_mode:
@@ -287,15 +289,13 @@ class ComponentWidget(QWidget):
             new_start_time = max(0, new_start_time)
             new_duration = max(0.1, new_duration)  # 最小0.1秒
             
-            # 发送移动信号
-            self.component_moved.emit(self.component.id, new_start_time, new_duration)
+            self._preview_position(new_start_time, new_duration, timeline_widget.time_scale)
         elif self.resize_handle == 'right':
             # 右侧调整：只改变持续时间
             new_duration = self.drag_start_duration + delta_time
             new_duration = max(0.1, new_duration)  # 最小0.1秒
             
-            # 发送调整大小信号
-            self.component_resized.emit(self.component.id, self.drag_start_time, new_duration)
+            self._preview_position(self.drag_start_time, new_duration, timeline_widget.time_scale)
     
     def _update_cursor(self, pos):
         """更新鼠标光标"""
@@ -321,9 +321,24 @@ class ComponentWidget(QWidget):
         if event.button() == Qt.LeftButton:
             self.is_resizing = False
             self.resize_handle = None
+            self._commit_position()
         
         super().mouseReleaseEvent(event)
     
+    def _preview_position(self, start_time: float, duration: float, time_scale: float):
+        """拖动中只更新显示，松开鼠标时再提交（一次拖动只产生一次修改）"""
+        self.pending_position = (start_time, duration)
+        self.setGeometry(int(start_time * time_scale), self.y(), int(duration * time_scale), self.height())
+    
+    def _commit_position(self):
+        """提交拖动结果"""
+        if self.pending_position is None:
+            return
+        new_start_time, new_duration = self.pending_position
+        self.pending_position = None
+        if (new_start_time, new_duration) != (self.drag_start_time, self.drag_start_duration):
+            self.component_moved.emit(self.component.id, new_start_time, new_duration)
+    
     def _can_resize_left(self):
         """检查左侧是否可以调整大小"""
         # 获取轨道组件
@@ -390,8 +405,7 @@ class ComponentWidget(QWidget):
         # 限制在有效范围内
         new_start_time = max(0, new_start_time)
         
-        # 发送移动信号
-        self.component_moved.emit(self.component.id, new_start_time, new_duration)
+        self._preview_position(new_start_time, new_duration, timeline_widget.time_scale)
     
     def _handle_move_mode_drag(self, event):
         """处理移动模式下的拖拽，吸附到时间刻度，避免覆盖"""
@@ -419,13 +433,8 @@ class ComponentWidget(QWidget):
         # 检查是否与其他部件重叠
         new_start_time = self._find_valid_position(new_start_time, motor_track)
         
-        # 更新部件位置（实时）
-        self.component.start_time = new_start_time
-        
-        # 更新显示位置
-        new_x = int(new_start_time * motor_track.time_scale)
-        new_width = int(self.component.duration * motor_track.time_scale)
-        self.setGeometry(new_x, self.y(), new_width, self.height())
+        # 更新显示位置（松开鼠标时提交）
+        self._preview_position(new_start_time, self.component.duration, motor_track.time_scale)
     
     def _find_valid_position(self, target_time: float, motor_track) -> float:
         """查找有效位置，避免与其他部件重叠"""
@@ -575,10 +584,11 @@ class MotorTrack(QWidget):
     jog_plus_clicked = pyqtSignal(int)  # Jog+点击信号，传递舵机ID
     jog_minus_clicked = pyqtSignal(int)  # Jog-点击信号，传递舵机ID
     
-    def __init__(self, motor_id: int, motor_name: str, parent=None):
+    def __init__(self, motor_id: int, motor_name: str, timeline_data: TimelineData, parent=None):
         super().__init__(parent)
         self.motor_id = motor_id
         self.motor_name = motor_name
+        self.timeline_data = timeline_data  # 所属时间线（多个部件的联动修改作为一次修改）
         self.is_enabled = False  # 舵机使能状态
         self.components = {}  # 部件ID -> ComponentWidget
         self.time_scale = 100.0  # 像素/秒
@@ -971,36 +981,38 @@ class MotorTrack(QWidget):
         if abs(duration_delta) < 0.01:  # 变化太小，忽略
             return
         
-        # 更新当前部件的持续时间
-        current_component.duration = new_duration
-        
-        # 获取所有部件，按起始时间排序
-        all_components = [comp.component for comp in self.components.values()]
-        all_components.sort(key=lambda x: x.start_time)
-        
-        # 找到当前部件在列表中的位置
-        current_index = -1
-        for i, comp in enumerate(all_components):
-            if comp.id == component_id:
-                current_index = i
-                break
-        
-        if current_index == -1:
-            return
-        
-        # 重新计算当前部件的起始时间，确保不与前面的部件重叠
-        if current_index > 0:
-            prev_component = all_components[current_index - 1]
-            old_start_time = current_component.start_time
-            current_component.start_time = round(prev_component.get_end_time())
-        else:
-            current_component.start_time = 0.0
-        
-        # 推动后续部件，对齐到时间刻度的最小单位（1秒）
-        for i in range(current_index + 1, len(all_components)):
-            old_start_time = all_components[i].start_time
-            new_start_time = all_components[i].start_time + duration_delta
-            all_components[i].start_time = round(new_start_time)  # 四舍五入到最近的整数秒
+        # 时长变化与推动后续部件作为一次修改（撤销时一步恢复）
+        with self.timeline_data.batch():
+            # 更新当前部件的持续时间
+            current_component.duration = new_duration
+            
+            # 获取所有部件，按起始时间排序
+            all_components = [comp.component for comp in self.components.values()]
+            all_components.sort(key=lambda x: x.start_time)
+            
+            # 找到当前部件在列表中的位置
+            current_index = -1
+            for i, comp in enumerate(all_components):
+                if comp.id == component_id:
+                    current_index = i
+                    break
+            
+            if current_index == -1:
+                return
+            
+            # 重新计算当前部件的起始时间，确保不与前面的部件重叠
+            if current_index > 0:
+                prev_component = all_components[current_index - 1]
+                old_start_time = current_component.start_time
+                current_component.start_time = round(prev_component.get_end_time())
+            else:
+                current_component.start_time = 0.0
+            
+            # 推动后续部件，对齐到时间刻度的最小单位（1秒）
+            for i in range(current_index + 1, len(all_components)):
+                old_start_time = all_components[i].start_time
+                new_start_time = all_components[i].start_time + duration_delta
+                all_components[i].start_time = round(new_start_time)  # 四舍五入到最近的整数秒
         
         # 更新所有部件的位置
         self._update_component_positions()
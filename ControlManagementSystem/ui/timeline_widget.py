@@ -3,15 +3,15 @@
 """
 时间轴组件
 主要的时间轴可视化控件
-支持18个舵机（编号0-17）
+轨道数随通道路由变化，轨道控件在滚动到可见范围时才创建
 """
 
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QScrollArea, 
-                             QLabel, QFrame, QSlider, QSpinBox, QComboBox)
-from PyQt5.QtCore import Qt, pyqtSignal, QTimer, QRect
+                             QLabel, QFrame, QSlider, QSpinBox, QComboBox, QCheckBox)
+from PyQt5.QtCore import Qt, pyqtSignal, QTimer, QRect, QEvent
 from PyQt5.QtGui import QPainter, QColor, QPen, QFont, QBrush
 from ui.motor_track import MotorTrack
-from models.timeline_data import TimelineData, LoopMode
+from models.timeline_data import TimelineData, TimelineChange, ChangeKind, LoopMode
 from models.component import ComponentType, create_component
 import logging
 
@@ -20,6 +20,8 @@ logger = logging.getLogger('servo_controller')
 class TimeRuler(QWidget):
     """时间标尺控件"""
     
+    time_scrubbed = pyqtSignal(float)  # 拖动播放头（秒）
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         self.time_scale = 100.0  # 像素/秒
@@ -64,6 +66,25 @@ class TimeRuler(QWidget):
         self.current_time = time
         self.update()
     
+    def _time_at(self, x: int) -> float:
+        """标尺x坐标对应的时间（秒）"""
+        label_width = 80  # 舵机标签宽度（与_draw_current_time_line一致）
+        return max(0.0, (x - label_width) / self.time_scale + self.time_offset)
+    
+    def mousePressEvent(self, event):
+        """点击标尺：播放头跳到该时间"""
+        if event.button() == Qt.LeftButton:
+            self.set_current_time(self._time_at(event.x()))
+            self.time_scrubbed.emit(self.current_time)
+        super().mousePressEvent(event)
+    
+    def mouseMoveEvent(self, event):
+        """按住拖动：连续移动播放头"""
+        if event.buttons() & Qt.LeftButton:
+            self.set_current_time(self._time_at(event.x()))
+            self.time_scrubbed.emit(self.current_time)
+        super().mouseMoveEvent(event)
+    
     def paintEvent(self, event):
         """绘制事件"""
         painter = QPainter(self)
@@ -148,14 +169,21 @@ class TimelineWidget(QWidget):
     component_deleted = pyqtSignal(str)  # 部件ID
     loop_mode_changed = pyqtSignal(int, LoopMode)  # 舵机ID, 循环模式
     time_changed = pyqtSignal(float)  # 当前时间改变
+    scrub_mode_changed = pyqtSignal(bool)  # 实时预览（拖动播放头驱动硬件）开关
     servo_enable_clicked = pyqtSignal(int)  # 舵机使能点击信号，传递舵机ID
     jog_plus_clicked = pyqtSignal(int)  # Jog+点击信号，传递舵机ID
     jog_minus_clicked = pyqtSignal(int)  # Jog-点击信号，传递舵机ID
+    track_created = pyqtSignal(int)  # 轨道控件已创建（按需创建），传递舵机ID
+    
+    TRACK_SPACING = 3  # 轨道间距（像素）
     
     def __init__(self, parent=None, config_manager=None):
         super().__init__(parent)
-        self.timeline_data = TimelineData()
-        self.motor_tracks = {}  # 舵机ID -> MotorTrack
+        self.timeline_data = TimelineData(config_manager.get_channel_map() if config_manager else None)
+        self.timeline_data.add_listener(self._on_timeline_changed)
+        self._synced_versions = {}  # 舵机ID -> 轨道控件对应的数据版本
+        self.motor_tracks = {}  # 舵机ID -> MotorTrack（只含已创建的轨道）
+        self._row_height = 60    # 轨道高度，创建第一条轨道后按其实际高度更新
         self.time_scale = 100.0  # 像素/秒
         self.time_offset = 0.0   # 时间偏移
         self.current_time = 0.0
@@ -177,6 +205,7 @@ class TimelineWidget(QWidget):
         self.time_ruler = TimeRuler()
         self.time_ruler.set_time_scale(self.time_scale)  # 设置初始缩放
         self.time_ruler.set_time_offset(0.0)  # 确保从0秒开始
+        self.time_ruler.time_scrubbed.connect(self._on_time_scrubbed)
         layout.addWidget(self.time_ruler)
         
         # 滚动区域
@@ -186,14 +215,13 @@ class TimelineWidget(QWidget):
         self.scroll_area.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
         self.scroll_area.setContentsMargins(0, 0, 0, 0)  # 确保没有边距
         
-        # 轨道容器
+        # 轨道容器：按行号定位轨道控件（不使用布局，未创建的轨道只占位置）
         self.tracks_widget = QWidget()
-        self.tracks_layout = QVBoxLayout()
-        self.tracks_layout.setContentsMargins(0, 0, 0, 0)
-        self.tracks_layout.setSpacing(3)  # 恢复合适的轨道间距
-        self.tracks_widget.setLayout(self.tracks_layout)
+        self.tracks_widget.installEventFilter(self)
         
         self.scroll_area.setWidget(self.tracks_widget)
+        self.scroll_area.viewport().installEventFilter(self)
+        self.scroll_area.verticalScrollBar().valueChanged.connect(self._create_visible_tracks)
         layout.addWidget(self.scroll_area)
         
         # 同步轨道宽度
@@ -266,41 +294,134 @@ class TimelineWidget(QWidget):
         self.duration_label = QLabel("0.0 秒")
         control_layout.addWidget(self.duration_label)
         
+        # 实时预览：拖动播放头时在硬件上显示该时刻的姿态
+        self.scrub_checkbox = QCheckBox("实时预览")
+        self.scrub_checkbox.setToolTip("拖动时间标尺上的播放头，舵机实时移动到该时刻的位置")
+        self.scrub_checkbox.toggled.connect(self.scrub_mode_changed.emit)
+        control_layout.addWidget(self.scrub_checkbox)
+        
         control_layout.addStretch()
         control_frame.setLayout(control_layout)
         parent_layout.addWidget(control_frame)
     
     def _create_motor_tracks(self):
-        """创建舵机轨道"""
-        for track in self.timeline_data.tracks:
-            motor_track = MotorTrack(track.motor_id, track.name)
-            motor_track.component_dropped.connect(self.component_dropped.emit)
-            motor_track.component_selected.connect(self._on_component_selected)
-            motor_track.component_moved.connect(self._on_component_moved)
-            motor_track.component_resized.connect(self._on_component_resized)
-            motor_track.component_deleted.connect(self._on_component_deleted)
-            motor_track.loop_mode_changed.connect(self._on_loop_mode_changed)
-            motor_track.servo_enable_clicked.connect(self.servo_enable_clicked.emit)
-            motor_track.jog_plus_clicked.connect(self.jog_plus_clicked.emit)
-            motor_track.jog_minus_clicked.connect(self.jog_minus_clicked.emit)
-            
-            self.motor_tracks[track.motor_id] = motor_track
-            self.tracks_layout.addWidget(motor_track)
+        """
+        创建舵机轨道
+        
+        只创建第一条轨道（确定轨道高度）和当前可见的轨道，其余轨道滚动到可见范围时再创建，
+        启动耗时与通道总数无关
+        """
+        for motor_track in self.motor_tracks.values():
+            motor_track.deleteLater()
+        self.motor_tracks = {}
+        self._synced_versions = {}
+        
+        first = self._ensure_track(0)
+        if first is not None:
+            self._row_height = max(first.minimumHeight(), first.sizeHint().height())
+        self.tracks_widget.setMinimumHeight(len(self.timeline_data.tracks) * self._row_pitch())
+        self._layout_tracks()
+        self._create_visible_tracks()
+    
+    def _row_pitch(self) -> int:
+        return self._row_height + self.TRACK_SPACING
+    
+    def _ensure_track(self, motor_id: int):
+        """获取轨道控件，尚未创建时按数据创建"""
+        motor_track = self.motor_tracks.get(motor_id)
+        if motor_track is not None:
+            return motor_track
+        track = self.timeline_data.get_track(motor_id)
+        if track is None:
+            return None
+        
+        motor_track = MotorTrack(track.motor_id, track.name, self.timeline_data, self.tracks_widget)
+        motor_track.set_time_scale(self.time_scale)
+        for component in track.components:
+            motor_track.add_component(component)
+        motor_track.loop_combo.setCurrentText(track.loop_mode.value)
+        if self.is_move_mode:
+            motor_track.set_move_mode(True, self.moving_component_id)
+        self._synced_versions[motor_id] = track.version
+        
+        motor_track.component_dropped.connect(self.component_dropped.emit)
+        motor_track.component_selected.connect(self._on_component_selected)
+        motor_track.component_moved.connect(self._on_component_moved)
+        motor_track.component_resized.connect(self._on_component_resized)
+        motor_track.component_deleted.connect(self._on_component_deleted)
+        motor_track.loop_mode_changed.connect(self._on_loop_mode_changed)
+        motor_track.servo_enable_clicked.connect(self.servo_enable_clicked.emit)
+        motor_track.jog_plus_clicked.connect(self.jog_plus_clicked.emit)
+        motor_track.jog_minus_clicked.connect(self.jog_minus_clicked.emit)
+        
+        motor_track.setGeometry(0, motor_id * self._row_pitch(), self.tracks_widget.width(), self._row_height)
+        motor_track.show()
+        self.motor_tracks[motor_id] = motor_track
+        self.track_created.emit(motor_id)
+        return motor_track
+    
+    def _layout_tracks(self):
+        """按行号放置已创建的轨道控件（宽度跟随容器）"""
+        width = self.tracks_widget.width()
+        for motor_id, motor_track in self.motor_tracks.items():
+            motor_track.setGeometry(0, motor_id * self._row_pitch(), width, self._row_height)
+    
+    def _create_visible_tracks(self, *args):
+        """创建滚动区域中可见（含上下各一条）的轨道"""
+        pitch = self._row_pitch()
+        top = self.scroll_area.verticalScrollBar().value()
+        bottom = top + self.scroll_area.viewport().height()
+        last = min(len(self.timeline_data.tracks) - 1, bottom // pitch + 1)
+        for motor_id in range(max(0, top // pitch - 1), last + 1):
+            self._ensure_track(motor_id)
+    
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Resize:
+            if obj is self.tracks_widget:
+                self._layout_tracks()
+            else:
+                self._create_visible_tracks()
+        return super().eventFilter(obj, event)
+    
+    def scroll_to_track(self, motor_id: int):
+        """滚动到指定轨道（必要时创建）"""
+        motor_track = self._ensure_track(motor_id)
+        if motor_track is not None:
+            self.scroll_area.ensureWidgetVisible(motor_track)
     
     def set_timeline_data(self, timeline_data: TimelineData):
-        """设置时间轴数据"""
+        """设置时间轴数据（通道数不同时重建轨道控件）"""
+        if timeline_data is not self.timeline_data:
+            self.timeline_data.remove_listener(self._on_timeline_changed)
+            timeline_data.add_listener(self._on_timeline_changed)
+            self._synced_versions = {}
+        rebuild = len(timeline_data.tracks) != len(self.timeline_data.tracks)
         self.timeline_data = timeline_data
+        if rebuild:
+            self._create_motor_tracks()
+        for motor_track in self.motor_tracks.values():
+            motor_track.timeline_data = timeline_data
         self._update_all_tracks()
         self._update_duration_display()
     
+    def _on_timeline_changed(self, change: TimelineChange):
+        """数据变更：总时长已增量维护，直接刷新显示；批量修改后重建涉及的轨道"""
+        if change.kind == ChangeKind.BATCH:
+            self._update_all_tracks()
+        self._update_duration_display()
+    
     def _update_all_tracks(self):
-        """更新所有轨道"""
+        """更新轨道（只重建数据版本与控件不一致的轨道）"""
+        dirty = set(self.timeline_data.dirty_tracks(self._synced_versions))
         for track in self.timeline_data.tracks:
             if track.motor_id in self.motor_tracks:
                 motor_track = self.motor_tracks[track.motor_id]
                 
                 # 同步时间缩放
                 motor_track.set_time_scale(self.time_scale)
+                if track.motor_id not in dirty:
+                    continue
+                self._synced_versions[track.motor_id] = track.version
                 
                 # 清除现有部件
                 for component_id in list(motor_track.components.keys()):
@@ -421,7 +542,8 @@ class TimelineWidget(QWidget):
         
         # 选中当前部件
         component = self.timeline_data.get_component(component_id)
-        if component and component.motor_id in self.motor_tracks:
+        if component:
+            self.scroll_to_track(component.motor_id)
             self.motor_tracks[component.motor_id].select_component(component_id)
         
         self.component_selected.emit(component_id)
@@ -430,8 +552,7 @@ class TimelineWidget(QWidget):
         """部件被移动"""
         component = self.timeline_data.get_component(component_id)
         if component:
-            component.start_time = new_start_time
-            component.duration = new_duration
+            component.set_position(new_start_time, new_duration)
             self._update_duration_display()
             self.component_moved.emit(component_id, new_start_time, new_duration)
     
@@ -439,8 +560,7 @@ class TimelineWidget(QWidget):
         """部件调整大小"""
         component = self.timeline_data.get_component(component_id)
         if component:
-            component.start_time = start_time
-            component.duration = duration
+            component.set_position(start_time, duration)
             self._update_duration_display()
             self.component_resized.emit(component_id, start_time, duration)
     
@@ -453,7 +573,7 @@ class TimelineWidget(QWidget):
         """循环模式改变"""
         track = self.timeline_data.get_track(motor_id)
         if track:
-            track.loop_mode = loop_mode
+            track.set_loop_mode(loop_mode)
         self.loop_mode_changed.emit(motor_id, loop_mode)
     
     def _on_unit_changed(self, unit: str):
@@ -476,6 +596,14 @@ class TimelineWidget(QWidget):
         self.time_ruler.set_current_time(self.current_time)
         self.time_changed.emit(self.current_time)
     
+    def _on_time_scrubbed(self, time: float):
+        """拖动播放头"""
+        self.current_time = time
+        self.time_spinbox.blockSignals(True)
+        self.time_spinbox.setValue(int(time))
+        self.time_spinbox.blockSignals(False)
+        self.time_changed.emit(self.current_time)
+    
     def get_selected_component(self):
         """获取选中的部件"""
         if self.selected_component_id:
@@ -532,7 +660,7 @@ class TimelineWidget(QWidget):
         component.start_time = new_start_time
         
         # 添加到目标轨道
-        target_track = self.motor_tracks.get(target_motor_id)
+        target_track = self._ensure_track(target_motor_id)
         if target_track:
             # 解决重叠问题
             component = self._resolve_component_overlap(component, target_motor_id)
@@ -568,36 +696,25 @@ class TimelineWidget(QWidget):
         """获取运动逻辑表数据"""
         motion_data = {}
         
-        for motor_id in range(18):
-            track = self.timeline_data.get_track(motor_id)
-            if track:
-                # 获取轨道信息
-                track_data = {
-                    'name': track.name,
-                    'loop_mode': track.loop_mode.value,
-                    'components': []
-                }
-                
-                # 获取所有部件信息
-                for component in track.components:
-                    comp_data = {
-                        'type': component.type.value,
-                        'start_time': component.start_time,
-                        'duration': component.duration,
-                        'parameters': component.parameters.copy()
-                    }
-                    track_data['components'].append(comp_data)
-                
-                # 按起始时间排序
-                track_data['components'].sort(key=lambda x: x['start_time'])
-                motion_data[motor_id] = track_data
-            else:
-                # 空轨道
-                motion_data[motor_id] = {
-                    'name': f'舵机{motor_id}',
-                    'loop_mode': '单次',
-                    'components': []
+        for track in self.timeline_data.tracks:
+            # 获取轨道信息
+            track_data = {
+                'name': track.name,
+                'loop_mode': track.loop_mode.value,
+                'components': []
+            }
+            
+            # 获取所有部件信息（轨道内已按起始时间排序）
+            for component in track.components:
+                comp_data = {
+                    'type': component.type.value,
+                    'start_time': component.start_time,
+                    'duration': component.duration,
+                    'parameters': component.parameters.copy()
                 }
+                track_data['components'].append(comp_data)
+            
+            motion_data[track.motor_id] = track_data
         
         return motion_data
 
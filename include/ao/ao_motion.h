@@ -63,5 +63,28 @@ bool AO_Motion_set_trajectory(uint8_t axis_id, trajectory_queue_t *trajectory);
  */
 interpolator_t* AO_Motion_get_interpolator(uint8_t axis_id);
 
+/**
+ * @brief 预约在指定设备时间启动规划器（多板同步启动）
+ * @param start_time_us 启动时间（time_us_64时钟），必须晚于当前时间
+ * @return true 成功, false 缓冲区为空/时间已过/硬件定时器不可用
+ */
+bool AO_Motion_arm_start(uint64_t start_time_us);
+
+/**
+ * @brief 取消预约启动
+ */
+void AO_Motion_disarm_start(void);
+
+/**
+ * @brief 是否处于预约等待中
+ */
+bool AO_Motion_is_armed(void);
+
+/**
+ * @brief 获取最近一次预约启动的实际触发时间
+ * @return 触发时间（us），从未触发返回0
+ */
+uint64_t AO_Motion_get_armed_fire_us(void);
+
 #endif // AO_MOTION_H
 
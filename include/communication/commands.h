@@ -152,6 +152,13 @@ void cmd_traj_get_info(const protocol_frame_t *frame, command_result_t *result);
  */
 void cmd_add_motion_block(const protocol_frame_t *frame, command_result_t *result);
 
+/**
+ * @brief 处理ADD_PLANNED_BLOCK命令（添加预规划速度的运动块）
+ * @param frame 协议帧
+ * @param result 处理结果
+ */
+void cmd_add_planned_block(const protocol_frame_t *frame, command_result_t *result);
+
 /**
  * @brief 处理START_MOTION命令（开始执行缓冲区指令）
  * @param frame 协议帧
@@ -194,6 +201,48 @@ void cmd_clear_buffer(const protocol_frame_t *frame, command_result_t *result);
  */
 void cmd_get_buffer_status(const protocol_frame_t *frame, command_result_t *result);
 
+/**
+ * @brief 处理GET_TIME命令（查询设备时钟）
+ * @param frame 协议帧
+ * @param result 处理结果
+ */
+void cmd_get_time(const protocol_frame_t *frame, command_result_t *result);
+
+/**
+ * @brief 处理ARM_START命令（预约在指定设备时间启动）
+ * @param frame 协议帧
+ * @param result 处理结果
+ */
+void cmd_arm_start(const protocol_frame_t *frame, command_result_t *result);
+
+/**
+ * @brief 处理GET_STREAM_CRC命令（查询已接收运动块的累积校验）
+ * @param frame 协议帧
+ * @param result 处理结果
+ */
+void cmd_get_stream_crc(const protocol_frame_t *frame, command_result_t *result);
+
+/**
+ * @brief 处理GET_BLOCK_CRCS命令（查询各运动块校验）
+ * @param frame 协议帧
+ * @param result 处理结果
+ */
+void cmd_get_block_crcs(const protocol_frame_t *frame, command_result_t *result);
+
+/**
+ * @brief 处理TRUNCATE_BUFFER命令（丢弃出错位置之后的运动块）
+ * @param frame 协议帧
+ * @param result 处理结果
+ */
+void cmd_truncate_buffer(const protocol_frame_t *frame, command_result_t *result);
+
+/**
+ * @brief 处理SET_FEED_OVERRIDE命令（设置或查询进给倍率）
+ * @param frame 协议帧
+ * @param result 处理结果
+ */
+void cmd_set_feed_override(const protocol_frame_t *frame, command_result_t *result);
+
 // ==================== 360度连续旋转舵机命令 ====================
 
 /**
@@ -231,5 +280,42 @@ void cmd_servo_360_set_accel(const protocol_frame_t *frame, command_result_t *re
  */
 void cmd_servo_360_get_info(const protocol_frame_t *frame, command_result_t *result);
 
+// ==================== Flash程序存储命令 ====================
+
+/**
+ * @brief 处理PROGRAM_BEGIN命令（擦除槽位并开始写入）
+ * @param frame 协议帧
+ * @param result 处理结果
+ */
+void cmd_program_begin(const protocol_frame_t *frame, command_result_t *result);
+
+/**
+ * @brief 处理PROGRAM_WRITE命令（按顺序写入运动块）
+ * @param frame 协议帧
+ * @param result 处理结果
+ */
+void cmd_program_write(const protocol_frame_t *frame, command_result_t *result);
+
+/**
+ * @brief 处理PROGRAM_END命令（写入剩余数据并校验CRC）
+ * @param frame 协议帧
+ * @param result 处理结果
+ */
+void cmd_program_end(const protocol_frame_t *frame, command_result_t *result);
+
+/**
+ * @brief 处理PROGRAM_LIST命令（查询所有槽位）
+ * @param frame 协议帧
+ * @param result 处理结果
+ */
+void cmd_program_list(const protocol_frame_t *frame, command_result_t *result);
+
+/**
+ * @brief 处理PROGRAM_RUN命令（脱机运行指定槽位）
+ * @param frame 协议帧
+ * @param result 处理结果
+ */
+void cmd_program_run(const protocol_frame_t *frame, command_result_t *result);
+
 #endif // COMMANDS_H
 
@@ -19,6 +19,15 @@
  */
 uint16_t crc16_ccitt(const uint8_t *data, size_t length);
 
+/**
+ * @brief 在已有CRC基础上继续计算（分段数据的累积校验）
+ * @param crc 之前的CRC值（首段使用0xFFFF）
+ * @param data 数据指针
+ * @param length 数据长度
+ * @return 累积后的CRC-16校验值
+ */
+uint16_t crc16_ccitt_update(uint16_t crc, const uint8_t *data, size_t length);
+
 /**
  * @brief 验证CRC-16校验
  * @param data 数据指针（包含CRC）
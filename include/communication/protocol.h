@@ -45,6 +45,11 @@
 #define CMD_SAVE_FLASH          0x30    // 保存参数到Flash
 #define CMD_LOAD_FLASH          0x31    // 从Flash加载参数
 #define CMD_SET_START_POSITIONS 0x33    // 设置起始位置
+#define CMD_PROGRAM_BEGIN       0x34    // 开始写入Flash程序（擦除槽位）
+#define CMD_PROGRAM_WRITE       0x35    // 写入程序数据块
+#define CMD_PROGRAM_END         0x36    // 结束写入并校验
+#define CMD_PROGRAM_LIST        0x37    // 查询程序槽位
+#define CMD_PROGRAM_RUN         0x38    // 运行Flash中的程序
 
 // 运动缓冲区管理命令（新架构 - Look-Ahead Planner）
 #define CMD_ADD_MOTION_BLOCK    0x40    // 添加运动指令到缓冲区（位置模式）
@@ -54,6 +59,15 @@
 #define CMD_RESUME_MOTION       0x44    // 恢复执行
 #define CMD_CLEAR_BUFFER        0x45    // 清空缓冲区
 #define CMD_GET_BUFFER_STATUS   0x46    // 查询缓冲区状态
+#define CMD_GET_TIME            0x47    // 查询设备时钟（带时间戳的PING，用于多板时钟同步）
+#define CMD_ARM_START           0x48    // 预约在指定设备时间开始执行
+#define CMD_LINK_RESET          0x49    // 进入可靠传输模式并设置起始序号
+#define CMD_LINK_NAK            0x4A    // 设备发出：请求重传指定序号的帧
+#define CMD_GET_STREAM_CRC      0x4B    // 查询已接收运动块的累积校验
+#define CMD_GET_BLOCK_CRCS      0x4C    // 查询最近接收的各运动块校验
+#define CMD_TRUNCATE_BUFFER     0x4D    // 丢弃指定序号之后接收的运动块（未启动时）
+#define CMD_ADD_PLANNED_BLOCK   0x4E    // 添加上位机预规划速度的运动块（跳过前瞻重算）
+#define CMD_SET_FEED_OVERRIDE   0x4F    // 设置/查询进给倍率（运行中即时生效）
 
 // 360度连续旋转舵机命令（新增）
 #define CMD_ADD_CONTINUOUS_MOTION  0x50    // 添加速度控制块到缓冲区
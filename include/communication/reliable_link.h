@@ -0,0 +1,97 @@
+/**
+ * @file reliable_link.h
+ * @brief 可靠传输：帧序号、接收窗口与选择重传
+ * @date 2025-11-04
+ *
+ * 帧头中的ID字段在可靠模式下作为序号使用（1-255循环，0表示普通帧）。
+ * 接收端按序号顺序交付命令：
+ *   - 收到期望序号：立即交付，并依次交付窗口内已缓存的后续帧
+ *   - 收到窗口内的后续帧：缓存，并发送NAK请求重传缺失的期望帧
+ *   - 收到已交付的帧（应答丢失导致的重传）：重发缓存的应答，不重复执行
+ * 上位机发送LINK_RESET指定起始序号后进入可靠模式。
+ */
+
+#ifndef RELIABLE_LINK_H
+#define RELIABLE_LINK_H
+
+#include <stdint.h>
+#include <stdbool.h>
+#include "communication/protocol.h"
+
+// ==================== 配置 ====================
+#define RELIABLE_WINDOW_SIZE        8       // 接收窗口（乱序缓存帧数）
+#define RELIABLE_CACHE_SIZE         16      // 已交付帧的应答缓存数
+#define RELIABLE_CACHE_DATA_LEN     16      // 每条缓存应答的最大数据长度
+#define RELIABLE_SEQ_MODULO         255     // 序号空间（1-255）
+
+/**
+ * @brief 接收处理结果
+ */
+typedef enum {
+    RELIABLE_DELIVER = 0,       // 按序到达，交付该帧
+    RELIABLE_BUFFERED,          // 乱序到达已缓存，需发送NAK
+    RELIABLE_DUPLICATE,         // 已交付过，需重发缓存应答
+    RELIABLE_DROP               // 超出窗口，丢弃并发送NAK
+} reliable_result_t;
+
+/**
+ * @brief 缓存的应答
+ */
+typedef struct {
+    bool valid;
+    uint8_t seq;
+    uint8_t cmd;
+    uint8_t resp_code;
+    uint8_t data_len;
+    uint8_t data[RELIABLE_CACHE_DATA_LEN];
+} reliable_response_t;
+
+/**
+ * @brief 初始化（非可靠模式）
+ */
+void reliable_link_init(void);
+
+/**
+ * @brief 进入可靠模式并设置期望的起始序号，清空窗口和应答缓存
+ * @param start_seq 起始序号（1-255）
+ * @return true 成功, false 序号无效
+ */
+bool reliable_link_reset(uint8_t start_seq);
+
+/**
+ * @brief 是否处于可靠模式
+ */
+bool reliable_link_active(void);
+
+/**
+ * @brief 获取期望的下一个序号（NAK内容）
+ */
+uint8_t reliable_link_expected(void);
+
+/**
+ * @brief 处理一个带序号的帧
+ * @param frame 协议帧（id为序号）
+ * @return 处理结果
+ */
+reliable_result_t reliable_link_receive(const protocol_frame_t *frame);
+
+/**
+ * @brief 交付完成后推进期望序号
+ * @return 窗口中按序可交付的下一帧，无则返回NULL
+ */
+const protocol_frame_t* reliable_link_advance(void);
+
+/**
+ * @brief 记录已交付帧的应答（用于重复帧的重发）
+ */
+void reliable_link_cache_response(uint8_t seq, uint8_t cmd, uint8_t resp_code,
+                                  const uint8_t *data, uint16_t data_len);
+
+/**
+ * @brief 查找已交付帧的应答
+ * @param seq 序号
+ * @return 缓存的应答，未找到返回NULL
+ */
+const reliable_response_t* reliable_link_cached_response(uint8_t seq);
+
+#endif // RELIABLE_LINK_H
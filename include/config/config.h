@@ -121,6 +121,11 @@
 // #endif
 #define FLASH_PARAM_VERSION     1               // 参数版本号
 
+// 运动程序存储区（紧跟参数扇区之后）
+#define FLASH_PROGRAM_OFFSET    (FLASH_STORAGE_OFFSET + 4096)   // 程序区起始偏移（参数占用一个扇区）
+#define FLASH_PROGRAM_SLOT_COUNT    4                           // 程序槽位数量
+#define FLASH_PROGRAM_SLOT_SIZE     (64 * 1024)                 // 每个槽位大小（4080个运动块）
+
 // ==================== 安全参数 ====================
 #define WATCHDOG_TIMEOUT_MS     5000        // 看门狗超时时间
 #define COMM_TIMEOUT_MS         3000        // 通信超时时间
@@ -41,6 +41,7 @@ enum ServoSignals {
     MOTION_STOP_SIG,                     // 21 - 停止运动
     MOTION_COMPLETE_SIG,                 // 22 - 运动完成
     INTERP_TICK_SIG,                     // 23 - 插值时钟（20ms）
+    MOTION_ARMED_START_SIG,              // 24 - 预约启动时间到达
     
     // ========== 系统监控事件 (30-39) ==========
     ERROR_SIG = 30,                      // 30 - 错误事件
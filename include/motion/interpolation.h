@@ -82,6 +82,8 @@ typedef struct {
     float t_const;              // 匀速阶段时间（秒）
     float t_decel;              // 减速阶段时间（秒）
     float v_max_actual;         // 实际达到的最大速度（度/秒）
+    float v_entry;              // 进入速度（度/秒，规划器衔接，默认0）
+    float v_exit;               // 退出速度（度/秒，规划器衔接，默认0）
     bool use_trapezoid;         // 是否使用梯形速度曲线
     
     // 轨迹规划
@@ -220,11 +222,14 @@ void interpolator_set_trapezoid_motion(interpolator_t *interp,
  * @param t_const 匀速时间
  * @param t_decel 减速时间
  * @param v_max 最大速度
+ * @param v_entry 进入速度（从静止开始为0）
+ * @param v_exit 退出速度（减速到静止为0）
  * @return 插值结果
  */
 float interpolate_trapezoid(float start, float end, float t_current,
                             float distance, float t_accel, float t_const, 
-                            float t_decel, float v_max);
+                            float t_decel, float v_max,
+                            float v_entry, float v_exit);
 
 // ==================== 轨迹规划函数 ====================
 
@@ -32,6 +32,12 @@
 // 速度衔接参数
 #define MIN_JUNCTION_SPEED      5.0f    // 最小衔接速度（度/秒）
 #define JUNCTION_DEVIATION      0.05f   // 衔接偏差系数（越小越平滑，但速度越慢）
+#define JUNCTION_MAX_GAP_MS     PLANNER_TICK_MS  // 下一块在本块（静止到静止）结束后这么久内开始才衔接
+
+// 进给倍率（%）
+#define FEED_OVERRIDE_MIN       10
+#define FEED_OVERRIDE_MAX       200
+#define FEED_OVERRIDE_DEFAULT   100
 
 // ==================== 运动块结构 ====================
 
@@ -43,7 +49,8 @@ typedef struct {
     uint8_t nominal_length : 1;     // 能否达到最大速度
     uint8_t junction_valid : 1;     // 衔接速度已计算
     uint8_t is_continuous : 1;      // 是否为360度连续旋转模式
-    uint8_t reserved : 4;           // 保留
+    uint8_t preplanned : 1;         // 上位机已规划速度，不参与前瞻重算
+    uint8_t reserved : 3;           // 保留
 } plan_block_flags_t;
 
 /**
@@ -76,6 +83,7 @@ typedef struct {
     float t_decel;                  // 减速阶段时间（秒）
     float v_max_actual;             // 实际达到的最大速度
     uint32_t duration_ms;           // 总时间（毫秒）
+    uint32_t rest_duration_ms;      // 从静止到静止的总时间（判断与下一块是否首尾相接）
     
     // ========== 360度连续旋转参数（新增）==========
     int8_t target_speed_pct;        // 目标速度百分比 (-100 到 +100)
@@ -89,6 +97,18 @@ typedef struct {
     bool valid;                     // 是否有效
 } plan_block_t;
 
+/**
+ * @brief 上位机预先规划的速度参数（ADD_PLANNED_BLOCK）
+ */
+typedef struct {
+    float entry_speed;              // 进入速度（度/秒）
+    float exit_speed;               // 退出速度（度/秒）
+    float v_max_actual;             // 实际最大速度（度/秒）
+    float t_accel;                  // 加速阶段时间（秒）
+    float t_const;                  // 匀速阶段时间（秒）
+    float t_decel;                  // 减速阶段时间（秒）
+} plan_profile_t;
+
 /**
  * @brief 运动规划器（整合缓冲区+调度器+前瞻规划）
  */
@@ -102,12 +122,24 @@ typedef struct {
     // ========== 调度状态 ==========
     bool running;                   // 是否正在执行
     bool paused;                    // 是否暂停
-    uint32_t start_time;            // 开始执行的绝对时间
+    uint64_t start_time_us;         // 开始执行的绝对时间（us，设备时钟）
+    uint64_t program_time_us;       // 程序时间（按进给倍率累积，与块时间戳比较）
+    uint64_t last_tick_us;          // 程序时间上次累积到的设备时间
+    uint16_t feed_pct;              // 进给倍率（%）
     
     // ========== 规划状态 ==========
     bool recalculate_flag;          // 全局重新规划标志
     uint8_t last_servo_id;          // 上一个舵机ID（用于判断连续性）
     float last_target_angle;        // 上一个目标角度
+    float tail_entry_speed;         // 已派发的上一块的退出速度（缓冲区第一块的进入速度）
+    
+    // ========== 统计 ==========
+    uint32_t recalc_count;          // 前瞻重算次数
+    uint32_t recalc_time_us;        // 前瞻重算累计耗时（us）
+    
+    // 执行进度（断线续传）
+    uint32_t executed_count;        // 本次启动后已执行的块数
+    uint32_t last_executed_ms;      // 最近执行的块的时间戳
 } motion_planner_t;
 
 /**
@@ -155,6 +187,25 @@ bool planner_add_motion(uint32_t timestamp_ms,
                        float acceleration,
                        float deceleration);
 
+/**
+ * @brief 添加运动块，速度参数由上位机预先规划（位置模式 - 180度舵机）
+ * @param timestamp_ms 时间戳
+ * @param servo_id 舵机ID
+ * @param target_angle 目标角度
+ * @param velocity 速度
+ * @param acceleration 加速度
+ * @param deceleration 减速度（0表示使用加速度）
+ * @param profile 预规划的速度参数，NULL表示由规划器前瞻计算
+ * @return true 成功, false 失败（缓冲区满）
+ */
+bool planner_add_planned_motion(uint32_t timestamp_ms,
+                                uint8_t servo_id,
+                                float target_angle,
+                                float velocity,
+                                float acceleration,
+                                float deceleration,
+                                const plan_profile_t *profile);
+
 /**
  * @brief 添加360度舵机速度控制块到规划器（速度模式 - 360度舵机）
  * @param timestamp_ms 时间戳
@@ -177,6 +228,13 @@ bool planner_add_continuous_motion(uint32_t timestamp_ms,
  */
 void planner_clear(void);
 
+/**
+ * @brief 丢弃最新添加的若干个块（仅限未开始执行时，用于上位机重传出错的尾部）
+ * @param drop 丢弃的块数
+ * @return true 成功, false 正在执行或块数不足
+ */
+bool planner_truncate(uint8_t drop);
+
 /**
  * @brief 获取缓冲区可用空间
  * @return 可用空间数量
@@ -209,6 +267,13 @@ bool planner_is_full(void);
  */
 bool planner_start(void);
 
+/**
+ * @brief 以指定的设备时间作为时间原点启动规划器（多板同步启动）
+ * @param start_time_us 时间原点（time_us_64时钟）
+ * @return true 成功, false 失败（缓冲区为空）
+ */
+bool planner_start_at(uint64_t start_time_us);
+
 /**
  * @brief 停止规划器
  */
@@ -236,6 +301,36 @@ bool planner_is_running(void);
  */
 bool planner_is_paused(void);
 
+// ==================== 进给倍率 ====================
+
+/**
+ * @brief 设置进给倍率（运行中立即生效）
+ * @description 
+ *   程序时间按 实际时间×倍率 累积，块时间戳与程序时间比较；
+ *   插值器的时间步长按同一倍率缩放。整条轨迹只是时间轴均匀伸缩，
+ *   衔接速度与梯形参数无需重算，速度按倍率、加速度按倍率平方变化。
+ * @param pct 倍率（FEED_OVERRIDE_MIN ~ FEED_OVERRIDE_MAX，100为原速）
+ * @return true 成功, false 超出范围
+ */
+bool planner_set_feed_override(uint16_t pct);
+
+/**
+ * @brief 获取进给倍率（%）
+ */
+uint16_t planner_get_feed_override(void);
+
+/**
+ * @brief 获取当前程序时间（ms）
+ */
+uint32_t planner_get_program_time_ms(void);
+
+/**
+ * @brief 把实际时间间隔换算为程序时间（规划器运行中按倍率缩放，余数累积到下次）
+ * @param wall_ms 实际时间（ms）
+ * @return 程序时间（ms）
+ */
+uint32_t planner_scale_interval_ms(uint32_t wall_ms);
+
 // ==================== 规划器核心 ====================
 
 /**
@@ -258,6 +353,20 @@ void planner_recalculate(void);
  */
 void planner_force_recalculate(void);
 
+/**
+ * @brief 获取前瞻重算统计（用于评估预规划块节省的MCU时间）
+ * @param count 输出：重算次数
+ * @param time_us 输出：累计耗时（us）
+ */
+void planner_get_recalc_stats(uint32_t *count, uint32_t *time_us);
+
+/**
+ * @brief 获取执行进度（上位机断线重连后据此只续传未执行的块）
+ * @param executed 输出：本次启动后已执行的块数
+ * @param last_timestamp_ms 输出：最近执行的块的时间戳
+ */
+void planner_get_progress(uint32_t *executed, uint32_t *last_timestamp_ms);
+
 // ==================== 查询函数 ====================
 
 /**
@@ -290,6 +399,7 @@ void planner_get_status(char *buf, size_t size);
 
 /**
  * @brief 计算两个块之间的衔接速度
+ * @description 同一舵机、同向且首尾相接的位置块才能不停顿衔接，否则返回0
  * @param prev 前一个块
  * @param current 当前块
  * @return 衔接速度（度/秒）
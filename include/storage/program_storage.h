@@ -0,0 +1,98 @@
+/**
+ * @file program_storage.h
+ * @brief 运动程序Flash存储与脱机回放
+ * @date 2025-11-02
+ *
+ * 在参数扇区之后预留若干程序槽位，每个槽位保存一段编译好的运动程序
+ * （ADD_MOTION_BLOCK格式的13字节记录，按16字节对齐）。
+ * 写入按页（256字节）进行并回读校验，全部写完后校验整体CRC，最后写入槽位头。
+ * 回放时从Flash逐块补充到规划器，无需上位机连接。
+ */
+
+#ifndef PROGRAM_STORAGE_H
+#define PROGRAM_STORAGE_H
+
+#include <stdint.h>
+#include <stdbool.h>
+#include "config/config.h"
+
+// ==================== 存储布局 ====================
+#define PROGRAM_RECORD_SIZE         16      // 每条记录占用字节（13字节数据 + 3字节填充）
+#define PROGRAM_BLOCK_DATA_SIZE     13      // ADD_MOTION_BLOCK数据长度
+#define PROGRAM_HEADER_SIZE         256     // 槽位头（一页）
+#define PROGRAM_MAX_BLOCKS          ((FLASH_PROGRAM_SLOT_SIZE - PROGRAM_HEADER_SIZE) / PROGRAM_RECORD_SIZE)
+
+/**
+ * @brief 槽位信息
+ */
+typedef struct {
+    bool valid;                 // 槽位内是否有完整程序
+    uint16_t block_count;       // 运动块数量
+    uint16_t crc;               // 记录区CRC-16
+} program_slot_info_t;
+
+/**
+ * @brief 初始化程序存储
+ */
+void program_storage_init(void);
+
+/**
+ * @brief 开始写入程序（擦除槽位）
+ * @param slot 槽位号
+ * @param block_count 运动块数量
+ * @param crc 记录区CRC-16（上位机计算）
+ * @return true 成功, false 参数无效
+ */
+bool program_storage_begin(uint8_t slot, uint16_t block_count, uint16_t crc);
+
+/**
+ * @brief 写入一批运动块（必须按顺序）
+ * @param index 第一块的序号
+ * @param data 运动块数据（每块13字节）
+ * @param count 块数量
+ * @return true 成功, false 序号不连续或页校验失败
+ */
+bool program_storage_write(uint16_t index, const uint8_t *data, uint8_t count);
+
+/**
+ * @brief 结束写入：写入剩余页、校验整体CRC、写入槽位头
+ * @return true 程序完整有效, false 校验失败
+ */
+bool program_storage_end(void);
+
+/**
+ * @brief 获取下一个待写入的块序号
+ */
+uint16_t program_storage_next_index(void);
+
+/**
+ * @brief 查询槽位信息
+ * @param slot 槽位号
+ * @param info 输出信息
+ * @return true 槽位号有效
+ */
+bool program_storage_get_info(uint8_t slot, program_slot_info_t *info);
+
+/**
+ * @brief 开始回放指定槽位的程序
+ * @param slot 槽位号
+ * @return true 成功启动, false 槽位无效
+ */
+bool program_player_start(uint8_t slot);
+
+/**
+ * @brief 停止回放
+ */
+void program_player_stop(void);
+
+/**
+ * @brief 回放轮询：把Flash中的后续块补充到规划器（在插值周期中调用）
+ */
+void program_player_poll(void);
+
+/**
+ * @brief 是否正在回放
+ */
+bool program_player_is_active(void);
+
+#endif // PROGRAM_STORAGE_H
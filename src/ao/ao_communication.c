@@ -14,6 +14,8 @@
 #include "config/config.h"
 #include "communication/protocol.h"
 #include "communication/crc16.h"
+#include "communication/commands.h"
+#include "communication/reliable_link.h"
 #include "servo/servo_control.h"
 #include "servo/servo_manager.h"
 #include "storage/param_manager.h"
@@ -37,6 +39,7 @@ QActive * const AO_Communication = &AO_Communication_inst.super;
 static void send_response(uint8_t id, uint8_t cmd, uint8_t resp_code, 
                          const uint8_t *data, uint16_t data_len);
 static void handle_move_single(const protocol_frame_t *frame);
+static void handle_move_multi(const protocol_frame_t *frame);
 static void handle_move_all(const protocol_frame_t *frame);
 static void handle_move_trapezoid(const protocol_frame_t *frame);
 static void handle_get_single(const protocol_frame_t *frame);
@@ -44,6 +47,9 @@ static void handle_get_all(const protocol_frame_t *frame);
 static void handle_enable(const protocol_frame_t *frame);
 static void handle_set_start_positions(const protocol_frame_t *frame);
 static void handle_ping(const protocol_frame_t *frame);
+static void dispatch_frame(AO_Communication_t * const me, const protocol_frame_t *frame);
+static void handle_sequenced_frame(AO_Communication_t * const me, const protocol_frame_t *frame);
+static void send_nak(void);
 
 // ==================== 状态处理函数声明 ====================
 
@@ -61,6 +67,7 @@ void AO_Communication_ctor(void) {
     ring_buffer_init(&me->rx_buffer, me->rx_buffer_mem, USB_RX_BUFFER_SIZE);
     ring_buffer_init(&me->tx_buffer, me->tx_buffer_mem, USB_TX_BUFFER_SIZE);
     protocol_parser_init(&me->parser);
+    reliable_link_init();
     
     me->usb_connected = false;
     me->cmd_count = 0;
@@ -121,7 +128,8 @@ static QState AO_Communication_active(AO_Communication_t * const me, QEvt const
             
             if (me->usb_connected) {
                 uint32_t rx_count = 0;
-                while (usb_bridge_available() > 0) {
+                // 接收环形缓冲区满时停止搬运，剩余数据留在桥接缓冲区等下次轮询（连续上传时不丢字节）
+                while (!ring_buffer_is_full(&me->rx_buffer) && usb_bridge_available() > 0) {
                     int ch = usb_bridge_getchar();
                     if (ch < 0) break;
                     uint8_t byte = (uint8_t)ch;
@@ -138,6 +146,7 @@ static QState AO_Communication_active(AO_Communication_t * const me, QEvt const
                 uint8_t byte;
                 uint32_t parse_count = 0;
                 bool entered_loop = false;
+                uint32_t parse_errors = me->parser.error_count;
                 
                 while (ring_buffer_get(&me->rx_buffer, &byte)) {
                     if (!entered_loop) {
@@ -170,63 +179,21 @@ static QState AO_Communication_active(AO_Communication_t * const me, QEvt const
                             usb_bridge_printf("[USB] CMD: 0x%02X, len=%d\n", frame->cmd, frame->len);
                             #endif
                             
-                            switch (frame->cmd) {
-                                case CMD_MOVE_SINGLE:
-                                    handle_move_single(frame);
-                                    break;
-                                case CMD_MOVE_ALL:
-                                    handle_move_all(frame);
-                                    break;
-                                case CMD_MOVE_TRAPEZOID:
-                                    handle_move_trapezoid(frame);
-                                    break;
-                                case CMD_GET_SINGLE:
-                                    handle_get_single(frame);
-                                    break;
-                                case CMD_GET_ALL:
-                                    handle_get_all(frame);
-                                    break;
-                                case CMD_ENABLE:
-                                case CMD_DISABLE:
-                                    handle_enable(frame);
-                                    break;
-                                case CMD_SAVE_FLASH:
-                                    {
-                                        static QEvt const flash_save = QEVT_INITIALIZER(CMD_FLASH_SAVE_SIG);
-                                        QACTIVE_POST(AO_System, &flash_save, me);
-                                    }
-                                    send_response(frame->id, frame->cmd, RESP_OK, NULL, 0);
-                                    break;
-                                case CMD_LOAD_FLASH:
-                                    {
-                                        static QEvt const flash_load = QEVT_INITIALIZER(CMD_FLASH_LOAD_SIG);
-                                        QACTIVE_POST(AO_System, &flash_load, me);
-                                    }
-                                    send_response(frame->id, frame->cmd, RESP_OK, NULL, 0);
-                                    break;
-                                case CMD_SET_START_POSITIONS:
-                                    handle_set_start_positions(frame);
-                                    break;
-                                case CMD_PING:
-                                    handle_ping(frame);
-                                    break;
-                                case CMD_ESTOP:
-                                    {
-                                        static QEvt const estop = QEVT_INITIALIZER(ESTOP_SIG);
-                                        QACTIVE_POST(AO_System, &estop, me);
-                                        QACTIVE_POST(AO_Motion, &estop, me);
-                                    }
-                                    send_response(frame->id, frame->cmd, RESP_OK, NULL, 0);
-                                    break;
-                                default:
-                                    send_response(frame->id, frame->cmd, RESP_INVALID_CMD, NULL, 0);
-                                    break;
+                            if (frame->id != 0 && frame->cmd != CMD_LINK_RESET) {
+                                handle_sequenced_frame(me, frame);
+                            } else {
+                                dispatch_frame(me, frame);
                             }
                         }
                         protocol_parser_reset(&me->parser);
                     }
                 }
                 
+                // 可靠模式下收到损坏的帧：立即NAK，无需等待上位机超时
+                if (me->parser.error_count != parse_errors && reliable_link_active()) {
+                    send_nak();
+                }
+                
                 #if DEBUG_USB
                 if (rx_count > 0 && !entered_loop) {
                     LOG_DEBUG("[USB] WARNING: Had RX data but never entered parse loop!\n");
@@ -242,23 +209,23 @@ static QState AO_Communication_active(AO_Communication_t * const me, QEvt const
                     LOG_DEBUG("[USB] TX buffer not empty, attempting to send...\n");
                     #endif
                     
-                    // 发送数据到USB Bridge
+                    // 发送数据到USB Bridge（按64字节分块，直到缓冲区清空）
+                    // 注意先检查块是否已满再取字节，否则第65个字节会被取出后丢弃
                     uint8_t tx_byte;
-                    size_t sent = 0;
                     uint8_t tx_buffer_temp[64];
-                    while (ring_buffer_get(&me->tx_buffer, &tx_byte) && sent < 64) {
-                        tx_buffer_temp[sent++] = tx_byte;
-                    }
-                    if (sent > 0) {
-                        usb_bridge_write(tx_buffer_temp, sent);
-                        #if DEBUG_USB
-                        LOG_DEBUG("[USB] TX: sent %d bytes\n", sent);
-                        #endif
-                    } else {
-                        #if DEBUG_USB
-                        LOG_DEBUG("[USB] TX: write not available\n");
-                        #endif
-                    }
+                    size_t sent;
+                    do {
+                        sent = 0;
+                        while (sent < sizeof(tx_buffer_temp) && ring_buffer_get(&me->tx_buffer, &tx_byte)) {
+                            tx_buffer_temp[sent++] = tx_byte;
+                        }
+                        if (sent > 0) {
+                            usb_bridge_write(tx_buffer_temp, sent);
+                            #if DEBUG_USB
+                            LOG_DEBUG("[USB] TX: sent %d bytes\n", sent);
+                            #endif
+                        }
+                    } while (sent == sizeof(tx_buffer_temp));
                 }
             }
             status = Q_HANDLED();
@@ -274,6 +241,127 @@ static QState AO_Communication_active(AO_Communication_t * const me, QEvt const
     return status;
 }
 
+// ==================== 命令分发 ====================
+
+/**
+ * @brief 分发一个完整的命令帧
+ */
+static void dispatch_frame(AO_Communication_t * const me, const protocol_frame_t *frame) {
+    switch (frame->cmd) {
+        case CMD_MOVE_SINGLE:
+            handle_move_single(frame);
+            break;
+        case CMD_MOVE_MULTI:
+            handle_move_multi(frame);
+            break;
+        case CMD_MOVE_ALL:
+            handle_move_all(frame);
+            break;
+        case CMD_MOVE_TRAPEZOID:
+            handle_move_trapezoid(frame);
+            break;
+        case CMD_GET_SINGLE:
+            handle_get_single(frame);
+            break;
+        case CMD_GET_ALL:
+            handle_get_all(frame);
+            break;
+        case CMD_ENABLE:
+        case CMD_DISABLE:
+            handle_enable(frame);
+            break;
+        case CMD_SAVE_FLASH:
+            {
+                static QEvt const flash_save = QEVT_INITIALIZER(CMD_FLASH_SAVE_SIG);
+                QACTIVE_POST(AO_System, &flash_save, me);
+            }
+            send_response(frame->id, frame->cmd, RESP_OK, NULL, 0);
+            break;
+        case CMD_LOAD_FLASH:
+            {
+                static QEvt const flash_load = QEVT_INITIALIZER(CMD_FLASH_LOAD_SIG);
+                QACTIVE_POST(AO_System, &flash_load, me);
+            }
+            send_response(frame->id, frame->cmd, RESP_OK, NULL, 0);
+            break;
+        case CMD_SET_START_POSITIONS:
+            handle_set_start_positions(frame);
+            break;
+        case CMD_PING:
+            handle_ping(frame);
+            break;
+        case CMD_LINK_RESET:
+            // 进入可靠模式：[start_seq(1)]
+            if (frame->len == 1 && reliable_link_reset(frame->data[0])) {
+                send_response(frame->id, frame->cmd, RESP_OK, NULL, 0);
+            } else {
+                send_response(frame->id, frame->cmd, RESP_INVALID_PARAM, NULL, 0);
+            }
+            break;
+        case CMD_ESTOP:
+            {
+                static QEvt const estop = QEVT_INITIALIZER(ESTOP_SIG);
+                QACTIVE_POST(AO_System, &estop, me);
+                QACTIVE_POST(AO_Motion, &estop, me);
+            }
+            send_response(frame->id, frame->cmd, RESP_OK, NULL, 0);
+            break;
+        default:
+            {
+                // 运动缓冲区、360度舵机等命令交由命令处理器分发
+                static command_result_t result;
+                if (commands_process(frame, &result)) {
+                    send_response(frame->id, frame->cmd, result.resp_code,
+                                  result.data, result.data_len);
+                }
+            }
+            break;
+    }
+}
+
+/**
+ * @brief 发送NAK：请求上位机重传期望序号的帧
+ */
+static void send_nak(void) {
+    uint8_t expected = reliable_link_expected();
+    send_response(0, CMD_LINK_NAK, RESP_OK, &expected, 1);
+}
+
+/**
+ * @brief 处理带序号的帧（可靠模式）：按序交付，乱序缓存，重复帧重发应答
+ */
+static void handle_sequenced_frame(AO_Communication_t * const me, const protocol_frame_t *frame) {
+    switch (reliable_link_receive(frame)) {
+        case RELIABLE_DELIVER: {
+            if (!reliable_link_active()) {
+                dispatch_frame(me, frame);
+                break;
+            }
+            // 交付本帧及窗口中已按序到齐的后续帧
+            const protocol_frame_t *next = frame;
+            while (next != NULL) {
+                dispatch_frame(me, next);
+                next = reliable_link_advance();
+            }
+            break;
+        }
+        
+        case RELIABLE_DUPLICATE: {
+            const reliable_response_t *cached = reliable_link_cached_response(frame->id);
+            if (cached != NULL) {
+                send_response(frame->id, cached->cmd, cached->resp_code, cached->data, cached->data_len);
+            }
+            break;
+        }
+        
+        case RELIABLE_BUFFERED:
+        case RELIABLE_DROP:
+        default:
+            send_nak();
+            break;
+    }
+}
+
 // ==================== 命令处理函数实现 ====================
 
 static void handle_move_single(const protocol_frame_t *frame) {
@@ -333,6 +421,47 @@ static void handle_move_single(const protocol_frame_t *frame) {
     send_response(frame->id, frame->cmd, RESP_OK, NULL, 0);
 }
 
+/**
+ * @brief 多轴选择性控制（只移动列出的舵机，其余舵机的运动不受影响）
+ *
+ * 数据格式：[count(1)] + count×[id(1) 角度高 角度低] + [时间高 时间低]
+ */
+static void handle_move_multi(const protocol_frame_t *frame) {
+    uint8_t count = (frame->len > 0) ? frame->data[0] : 0;
+    
+    if (count == 0 || count > SERVO_COUNT || frame->len < 1 + count * 3 + 2) {
+        send_response(frame->id, frame->cmd, RESP_INVALID_PARAM, NULL, 0);
+        return;
+    }
+    for (uint8_t i = 0; i < count; i++) {
+        if (frame->data[1 + i * 3] >= SERVO_COUNT) {
+            send_response(frame->id, frame->cmd, RESP_INVALID_PARAM, NULL, 0);
+            return;
+        }
+    }
+    
+    // 参数验证通过，分配事件
+    MotionStartEvt *evt = Q_NEW(MotionStartEvt, MOTION_START_SIG);
+    evt->axis_count = count;
+    for (uint8_t i = 0; i < SERVO_COUNT; i++) {
+        evt->target_positions[i] = servo_get_angle(i);  // 未列出的舵机保持当前角度
+    }
+    for (uint8_t i = 0; i < count; i++) {
+        const uint8_t *item = &frame->data[1 + i * 3];
+        evt->axis_ids[i] = item[0];
+        evt->target_positions[item[0]] = (float)((item[1] << 8) | item[2]) / 100.0f;
+    }
+    const uint8_t *duration = &frame->data[1 + count * 3];
+    evt->duration_ms = (duration[0] << 8) | duration[1];
+    
+    #if DEBUG_USB
+    LOG_DEBUG("[CMD] MOVE_MULTI: %d axes, duration=%d ms\n", count, evt->duration_ms);
+    #endif
+    
+    QACTIVE_POST(AO_Motion, &evt->super, AO_Communication);
+    send_response(frame->id, frame->cmd, RESP_OK, NULL, 0);
+}
+
 static void handle_move_all(const protocol_frame_t *frame) {
     #if DEBUG_USB
     LOG_DEBUG("[CMD] MOVE_ALL handler called, len=%d\n", frame->len);
@@ -560,7 +689,7 @@ static void handle_ping(const protocol_frame_t *frame) {
 
 static void send_response(uint8_t id, uint8_t cmd, uint8_t resp_code,
                          const uint8_t *data, uint16_t data_len) {
-    uint8_t resp_buffer[128];
+    uint8_t resp_buffer[PROTOCOL_MAX_DATA_LEN + 8];
     uint16_t idx = 0;
     
     resp_buffer[idx++] = PROTOCOL_FRAME_HEADER1;
@@ -582,6 +711,9 @@ static void send_response(uint8_t id, uint8_t cmd, uint8_t resp_code,
     AO_Communication_t *me = &AO_Communication_inst;
     ring_buffer_write(&me->tx_buffer, resp_buffer, idx);
     
+    // 可靠模式下记录应答，重复帧到达时直接重发
+    reliable_link_cache_response(id, cmd, resp_code, data, data_len);
+    
     #if DEBUG_USB
     LOG_DEBUG("[RESP] Built response: len=%d, resp_code=%d\n", 
            idx, resp_code);
@@ -17,6 +17,8 @@
 #include "test/auto_test.h"
 #include "utils/usb_bridge.h"
 #include "motion/planner.h"  // 使用Look-Ahead运动规划器
+#include "storage/program_storage.h"
+#include "pico/stdlib.h"
 #include <stdio.h>
 #include <math.h>
 
@@ -41,6 +43,57 @@ static QState AO_Motion_initial(AO_Motion_t * const me, void const * const par);
 static QState AO_Motion_idle(AO_Motion_t * const me, QEvt const * const e);
 static QState AO_Motion_moving(AO_Motion_t * const me, QEvt const * const e);
 
+// ==================== 预约启动（多板同步） ====================
+
+// 预约状态（fire_us在硬件定时器中断中写入）
+static struct {
+    volatile bool armed;            // 等待触发
+    alarm_id_t alarm_id;
+    uint64_t start_time_us;         // 预约的时间原点
+    volatile uint64_t fire_us;      // 实际触发时间
+} g_armed_start;
+
+/**
+ * @brief 硬件定时器回调（中断上下文）：记录触发时间并通知AO
+ */
+static int64_t armed_start_alarm_callback(alarm_id_t id, void *user_data) {
+    (void)id;
+    (void)user_data;
+    
+    g_armed_start.fire_us = time_us_64();
+    
+    static QEvt const armed_evt = QEVT_INITIALIZER(MOTION_ARMED_START_SIG);
+    QACTIVE_POST(AO_Motion, &armed_evt, 0);
+    
+    return 0;  // 单次触发
+}
+
+/**
+ * @brief 处理预约启动：启动规划器并把插值时钟相位对齐到启动时刻
+ */
+static void AO_Motion_armed_start(AO_Motion_t * const me) {
+    if (!g_armed_start.armed) {
+        return;  // 触发后被取消
+    }
+    g_armed_start.armed = false;
+    
+    // 以预约时间（而非事件处理时间）作为时间原点，各板时间轴一致
+    if (!planner_start_at(g_armed_start.start_time_us)) {
+        MOTION_DEBUG("[AO-MOTION] Armed start: planner empty\n");
+        return;
+    }
+    
+    // 插值定时器的相位各板不同，重新装填使后续调度节拍对齐（误差不超过1个QF tick）
+    QTimeEvt_disarm(&me->interp_timer);
+    QTimeEvt_armX(&me->interp_timer, TIME_EVENT_INTERP_MS, TIME_EVENT_INTERP_MS);
+    
+    // 立即调度t=0的块
+    planner_update();
+    
+    MOTION_DEBUG("[AO-MOTION] Armed start: target=%llu fired=%llu\n",
+                 g_armed_start.start_time_us, g_armed_start.fire_us);
+}
+
 // ==================== 运动执行回调 ====================
 /**
  * @brief 规划器回调：执行规划好的运动块
@@ -97,6 +150,8 @@ static void planner_execute_block_callback(const plan_block_t *block) {
     interp->t_const = block->t_const;
     interp->t_decel = block->t_decel;
     interp->v_max_actual = block->v_max_actual;
+    interp->v_entry = block->entry_speed;
+    interp->v_exit = block->exit_speed;
     interp->duration = block->duration_ms;
     
     #if DEBUG_MOTION_SUMMARY
@@ -238,16 +293,24 @@ static QState AO_Motion_idle(AO_Motion_t * const me, QEvt const * const e) {
         
         case INTERP_TICK_SIG: {
             // 运动规划器更新（每20ms检查一次）
-            // 执行：时间戳检查、前瞻规划、运动调度
+            // 执行：Flash程序补块、时间戳检查、前瞻规划、运动调度
+            program_player_poll();
             planner_update();
             
             status = Q_HANDLED();
             break;
         }
         
+        case MOTION_ARMED_START_SIG: {
+            AO_Motion_armed_start(me);
+            status = Q_HANDLED();
+            break;
+        }
+        
         case ESTOP_SIG: {
-            // 空闲状态下收到急停，直接处理
-            LOG_DEBUG("[AO-MOTION] ESTOP in IDLE (no action needed)\n");
+            // 空闲状态下收到急停，取消预约启动
+            LOG_DEBUG("[AO-MOTION] ESTOP in IDLE\n");
+            AO_Motion_disarm_start();
             status = Q_HANDLED();
             break;
         }
@@ -282,11 +345,44 @@ static QState AO_Motion_moving(AO_Motion_t * const me, QEvt const * const e) {
             break;
         }
         
+        case MOTION_START_SIG: {
+            // 运动中收到新的位置命令（点动、滑块、帧流）：只重定向命令列出的舵机，
+            // 其余舵机继续当前运动。规划器的梯形运动进行中时保持原行为（忽略）
+            MotionStartEvt const *evt = Q_EVT_CAST(MotionStartEvt);
+            bool has_trapezoid = false;
+            for (uint8_t i = 0; i < SERVO_COUNT; i++) {
+                if (me->interpolator.axes[i].state == MOTION_STATE_MOVING &&
+                    me->interpolator.axes[i].type == INTERP_TYPE_TRAPEZOID) {
+                    has_trapezoid = true;
+                    break;
+                }
+            }
+            
+            if (!has_trapezoid) {
+                for (uint8_t i = 0; i < evt->axis_count && i < SERVO_COUNT; i++) {
+                    uint8_t axis = evt->axis_ids[i];
+                    if (axis < SERVO_COUNT) {
+                        interpolator_set_motion(&me->interpolator.axes[axis],
+                                                servo_get_angle(axis),
+                                                evt->target_positions[axis],
+                                                evt->duration_ms,
+                                                INTERP_TYPE_S_CURVE);
+                    }
+                }
+            }
+            status = Q_HANDLED();
+            break;
+        }
+        
         case INTERP_TICK_SIG: {
-            // 更新插值器（20ms周期）
+            // 运动中同样需要按时间戳调度后续块（多舵机交错运动）
+            program_player_poll();
+            planner_update();
+            
+            // 更新插值器（20ms周期，规划器运行中按进给倍率缩放时间步长）
             float output_positions[SERVO_COUNT];
             multi_interpolator_update(&me->interpolator, 
-                                     TIME_EVENT_INTERP_MS, 
+                                     planner_scale_interval_ms(TIME_EVENT_INTERP_MS), 
                                      output_positions);
             
             // 错误检查：防止无效值导致卡死
@@ -352,10 +448,17 @@ static QState AO_Motion_moving(AO_Motion_t * const me, QEvt const * const e) {
             break;
         }
         
+        case MOTION_ARMED_START_SIG: {
+            AO_Motion_armed_start(me);
+            status = Q_HANDLED();
+            break;
+        }
+        
         case MOTION_STOP_SIG:
         case ESTOP_SIG: {
             // 停止运动
             LOG_DEBUG("[AO-MOTION] Motion stopped\n");
+            AO_Motion_disarm_start();
             
             // 停止插值器
             for (uint8_t i = 0; i < SERVO_COUNT; i++) {
@@ -435,4 +538,39 @@ interpolator_t* AO_Motion_get_interpolator(uint8_t axis_id) {
     return &AO_Motion_inst.interpolator.axes[axis_id];
 }
 
+bool AO_Motion_arm_start(uint64_t start_time_us) {
+    if (planner_is_empty() || start_time_us <= time_us_64()) {
+        return false;
+    }
+    
+    AO_Motion_disarm_start();
+    g_armed_start.start_time_us = start_time_us;
+    g_armed_start.fire_us = 0;
+    g_armed_start.armed = true;
+    
+    // 使用硬件定时器触发，不受1ms QF tick和20ms插值周期量化影响
+    alarm_id_t id = add_alarm_at(from_us_since_boot(start_time_us),
+                                 armed_start_alarm_callback, NULL, false);
+    if (id <= 0) {
+        g_armed_start.armed = false;
+        return false;
+    }
+    
+    g_armed_start.alarm_id = id;
+    return true;
+}
+
+void AO_Motion_disarm_start(void) {
+    if (g_armed_start.armed) {
+        cancel_alarm(g_armed_start.alarm_id);
+        g_armed_start.armed = false;
+    }
+}
 
+bool AO_Motion_is_armed(void) {
+    return g_armed_start.armed;
+}
+
+uint64_t AO_Motion_get_armed_fire_us(void) {
+    return g_armed_start.fire_us;
+}
@@ -7,8 +7,11 @@
 #include "communication/commands.h"
 #include "communication/protocol.h"
 #include "motion/planner.h"  // 使用Look-Ahead运动规划器
+#include "ao/ao_motion.h"
+#include "pico/stdlib.h"
 #include "utils/usb_bridge.h"
 #include "config/config.h"
+#include "communication/crc16.h"
 #include <string.h>
 
 // 运动规划器提供缓冲区管理、前瞻规划和调度接口
@@ -20,20 +23,52 @@
     #define CMD_DEBUG(...) ((void)0)
 #endif
 
+// ==================== 上传校验 ====================
+// 记录CLEAR_BUFFER之后被规划器接受的ADD_MOTION_BLOCK数据。上位机可连续发送而不等待逐块应答，
+// 启动前只比较一次块数和累积CRC；不一致时再读取各块CRC定位第一个差异，截断后重传其后的块。
+// 日志比缓冲区多一项，截断全部缓冲块时仍能取得保留部分的累积CRC。
+#define STREAM_LOG_SIZE     (PLANNER_BUFFER_SIZE + 1)
+#define STREAM_CRC_INIT     0xFFFF
+
+typedef struct {
+    uint16_t block_crc;     // 该块13字节数据的CRC
+    uint16_t stream_crc;    // 截至该块（含）的累积CRC
+} stream_entry_t;
+
+static struct {
+    uint16_t count;                         // 已接受的块数
+    uint16_t crc;                           // 累积CRC
+    stream_entry_t log[STREAM_LOG_SIZE];    // 最近接受的块，按序号取模存放
+} g_stream = { 0, STREAM_CRC_INIT };
+
+static void stream_reset(void) {
+    g_stream.count = 0;
+    g_stream.crc = STREAM_CRC_INIT;
+}
+
+static void stream_append(const uint8_t *data, uint8_t len) {
+    stream_entry_t *entry = &g_stream.log[g_stream.count % STREAM_LOG_SIZE];
+    g_stream.crc = crc16_ccitt_update(g_stream.crc, data, len);
+    entry->block_crc = crc16_ccitt(data, len);
+    entry->stream_crc = g_stream.crc;
+    g_stream.count++;
+}
+
 /**
- * @brief 处理ADD_MOTION_BLOCK命令
- * @description 数据格式：[timestamp_ms(4)] [servo_id(1)] [angle(2)] [velocity(2)] [accel(2)] [decel(2)]
- *              total: 13字节
+ * @brief 序号为index的块是否仍在日志中
  */
-void cmd_add_motion_block(const protocol_frame_t *frame, command_result_t *result) {
-    // 检查数据长度
-    if (frame->len != 13) {
-        result->resp_code = RESP_INVALID_PARAM;
-        result->data_len = 0;
-        CMD_DEBUG("[CMD] ADD_BLOCK: Invalid length %d (expected 13)\n", frame->len);
-        return;
-    }
-    
+static bool stream_logged(uint16_t index) {
+    return index < g_stream.count && (uint16_t)(g_stream.count - index) <= STREAM_LOG_SIZE;
+}
+
+/**
+ * @brief 解析运动块公共部分并加入规划器
+ * @param frame 协议帧（前13字节为运动块）
+ * @param result 处理结果
+ * @param profile 预规划速度参数，NULL表示由规划器前瞻计算
+ */
+static void add_motion_block(const protocol_frame_t *frame, command_result_t *result,
+                             const plan_profile_t *profile) {
     // 解析数据
     const uint8_t *data = frame->data;
     
@@ -75,9 +110,9 @@ void cmd_add_motion_block(const protocol_frame_t *frame, command_result_t *resul
         return;
     }
     
-    // 添加到规划器（规划器会自动进行前瞻规划）
-    if (!planner_add_motion(timestamp_ms, servo_id, target_angle, 
-                           velocity, acceleration, deceleration)) {
+    // 添加到规划器（普通块由规划器自动进行前瞻规划）
+    if (!planner_add_planned_motion(timestamp_ms, servo_id, target_angle,
+                                    velocity, acceleration, deceleration, profile)) {
         result->resp_code = RESP_BUSY;  // 缓冲区已满
         result->data_len = 0;
         CMD_DEBUG("[CMD] ADD_BLOCK: Planner buffer full\n");
@@ -85,10 +120,70 @@ void cmd_add_motion_block(const protocol_frame_t *frame, command_result_t *resul
     }
     
     // 成功添加（调试输出由planner.c负责）
+    stream_append(data, frame->len);
     
+    // 返回可用空间和已执行块数（上位机据此记录续传检查点）
+    uint32_t executed;
+    planner_get_progress(&executed, NULL);
     result->resp_code = RESP_OK;
-    result->data[0] = planner_available();  // 返回可用空间
-    result->data_len = 1;
+    result->data[0] = planner_available();
+    for (int i = 0; i < 4; i++) {
+        result->data[1 + i] = (uint8_t)(executed >> (8 * i));
+    }
+    result->data_len = 5;
+}
+
+/**
+ * @brief 处理ADD_MOTION_BLOCK命令
+ * @description 数据格式：[timestamp_ms(4)] [servo_id(1)] [angle(2)] [velocity(2)] [accel(2)] [decel(2)]
+ *              total: 13字节
+ */
+void cmd_add_motion_block(const protocol_frame_t *frame, command_result_t *result) {
+    // 检查数据长度
+    if (frame->len != 13) {
+        result->resp_code = RESP_INVALID_PARAM;
+        result->data_len = 0;
+        CMD_DEBUG("[CMD] ADD_BLOCK: Invalid length %d (expected 13)\n", frame->len);
+        return;
+    }
+    
+    add_motion_block(frame, result, NULL);
+}
+
+/**
+ * @brief 读取32位小端整数
+ */
+static uint32_t get_u32_le(const uint8_t *src) {
+    return (uint32_t)src[0] | ((uint32_t)src[1] << 8) |
+           ((uint32_t)src[2] << 16) | ((uint32_t)src[3] << 24);
+}
+
+/**
+ * @brief 处理ADD_PLANNED_BLOCK命令
+ * @description 数据格式：[ADD_MOTION_BLOCK的13字节]
+ *              [entry(2)] [exit(2)] [v_max(2)]      0.1度/秒精度
+ *              [t_accel(4)] [t_const(4)] [t_decel(4)] 微秒
+ *              total: 31字节。速度参数由上位机按完整程序规划，规划器直接使用，不再前瞻重算
+ */
+void cmd_add_planned_block(const protocol_frame_t *frame, command_result_t *result) {
+    if (frame->len != 31) {
+        result->resp_code = RESP_INVALID_PARAM;
+        result->data_len = 0;
+        CMD_DEBUG("[CMD] ADD_PLANNED: Invalid length %d (expected 31)\n", frame->len);
+        return;
+    }
+    
+    const uint8_t *data = &frame->data[13];
+    plan_profile_t profile = {
+        .entry_speed = (float)(data[0] | (data[1] << 8)) / 10.0f,
+        .exit_speed = (float)(data[2] | (data[3] << 8)) / 10.0f,
+        .v_max_actual = (float)(data[4] | (data[5] << 8)) / 10.0f,
+        .t_accel = (float)get_u32_le(&data[6]) / 1000000.0f,
+        .t_const = (float)get_u32_le(&data[10]) / 1000000.0f,
+        .t_decel = (float)get_u32_le(&data[14]) / 1000000.0f,
+    };
+    
+    add_motion_block(frame, result, &profile);
 }
 
 /**
@@ -113,6 +208,7 @@ void cmd_start_motion(const protocol_frame_t *frame, command_result_t *result) {
  * @brief 处理STOP_MOTION命令
  */
 void cmd_stop_motion(const protocol_frame_t *frame, command_result_t *result) {
+    AO_Motion_disarm_start();
     planner_stop();
     CMD_DEBUG("[CMD] STOP_MOTION\n");
     result->resp_code = RESP_OK;
@@ -143,7 +239,9 @@ void cmd_resume_motion(const protocol_frame_t *frame, command_result_t *result)
  * @brief 处理CLEAR_BUFFER命令
  */
 void cmd_clear_buffer(const protocol_frame_t *frame, command_result_t *result) {
+    AO_Motion_disarm_start();
     planner_clear();
+    stream_reset();
     // 调试输出由planner.c负责
     result->resp_code = RESP_OK;
     result->data_len = 0;
@@ -152,6 +250,8 @@ void cmd_clear_buffer(const protocol_frame_t *frame, command_result_t *result) {
 /**
  * @brief 处理GET_BUFFER_STATUS命令
  * @description 返回数据：[count(1)] [running(1)] [paused(1)] [available(1)]
+ *              [recalc_count(4)] [recalc_time_us(4)]（前瞻重算统计，小端序）
+ *              [executed(4)] [last_timestamp_ms(4)] [program_time_ms(4)]（执行进度，用于断线续传）
  */
 void cmd_get_buffer_status(const protocol_frame_t *frame, command_result_t *result) {
     result->resp_code = RESP_OK;
@@ -159,9 +259,192 @@ void cmd_get_buffer_status(const protocol_frame_t *frame, command_result_t *resu
     result->data[1] = planner_is_running() ? 1 : 0;
     result->data[2] = planner_is_paused() ? 1 : 0;
     result->data[3] = planner_available();
-    result->data_len = 4;
+    
+    uint32_t recalc_count, recalc_time_us;
+    planner_get_recalc_stats(&recalc_count, &recalc_time_us);
+    uint32_t executed, last_timestamp_ms;
+    planner_get_progress(&executed, &last_timestamp_ms);
+    uint32_t program_time_ms = planner_get_program_time_ms();
+    for (int i = 0; i < 4; i++) {
+        result->data[4 + i] = (uint8_t)(recalc_count >> (8 * i));
+        result->data[8 + i] = (uint8_t)(recalc_time_us >> (8 * i));
+        result->data[12 + i] = (uint8_t)(executed >> (8 * i));
+        result->data[16 + i] = (uint8_t)(last_timestamp_ms >> (8 * i));
+        result->data[20 + i] = (uint8_t)(program_time_ms >> (8 * i));
+    }
+    result->data_len = 24;
     
     CMD_DEBUG("[CMD] BUFFER_STATUS: count=%d avail=%d\n",
              result->data[0], result->data[3]);
 }
 
+/**
+ * @brief 写入64位小端整数
+ */
+static void put_u64_le(uint8_t *dst, uint64_t value) {
+    for (int i = 0; i < 8; i++) {
+        dst[i] = (uint8_t)(value >> (8 * i));
+    }
+}
+
+/**
+ * @brief 处理GET_TIME命令
+ * @description 返回数据：[now_us(8)] [armed(1)] [fire_us(8)]，小端序
+ *              now_us在命令处理时采样，上位机以最小RTT的一次交换估计时钟偏移；
+ *              fire_us为最近一次预约启动的实际触发时间，用于测量多板启动偏差
+ */
+void cmd_get_time(const protocol_frame_t *frame, command_result_t *result) {
+    (void)frame;
+    put_u64_le(&result->data[0], time_us_64());
+    result->data[8] = AO_Motion_is_armed() ? 1 : 0;
+    put_u64_le(&result->data[9], AO_Motion_get_armed_fire_us());
+    result->resp_code = RESP_OK;
+    result->data_len = 17;
+}
+
+/**
+ * @brief 处理ARM_START命令
+ * @description 数据格式：[start_time_us(8)]，小端序，设备时钟
+ *              缓冲区需已预装，到达指定时间后以该时间为原点启动规划器
+ */
+void cmd_arm_start(const protocol_frame_t *frame, command_result_t *result) {
+    result->data_len = 0;
+    
+    if (frame->len != 8) {
+        result->resp_code = RESP_INVALID_PARAM;
+        return;
+    }
+    
+    uint64_t start_time_us = 0;
+    for (int i = 7; i >= 0; i--) {
+        start_time_us = (start_time_us << 8) | frame->data[i];
+    }
+    
+    if (!AO_Motion_arm_start(start_time_us)) {
+        result->resp_code = RESP_ERROR;  // 缓冲区为空或时间已过
+        CMD_DEBUG("[CMD] ARM_START: rejected\n");
+        return;
+    }
+    
+    CMD_DEBUG("[CMD] ARM_START: armed\n");
+    result->resp_code = RESP_OK;
+}
+
+/**
+ * @brief 处理GET_STREAM_CRC命令
+ * @description 返回数据：[count(2)] [crc(2)]，小端序
+ *              count为CLEAR_BUFFER之后接受的运动块数，crc为这些块数据依次累积的CRC-16
+ */
+void cmd_get_stream_crc(const protocol_frame_t *frame, command_result_t *result) {
+    (void)frame;
+    result->data[0] = (uint8_t)(g_stream.count & 0xFF);
+    result->data[1] = (uint8_t)(g_stream.count >> 8);
+    result->data[2] = (uint8_t)(g_stream.crc & 0xFF);
+    result->data[3] = (uint8_t)(g_stream.crc >> 8);
+    result->resp_code = RESP_OK;
+    result->data_len = 4;
+}
+
+/**
+ * @brief 处理GET_BLOCK_CRCS命令
+ * @description 数据格式：[start(2)] [n(1)]
+ *              返回数据：[start(2)] [n(1)] [crc(2) × n]，小端序
+ *              只能查询最近接受的块，n超出已接受范围时截短
+ */
+void cmd_get_block_crcs(const protocol_frame_t *frame, command_result_t *result) {
+    result->data_len = 0;
+    
+    if (frame->len != 3) {
+        result->resp_code = RESP_INVALID_PARAM;
+        return;
+    }
+    
+    uint16_t start = frame->data[0] | (frame->data[1] << 8);
+    uint8_t n = frame->data[2];
+    if (n > PLANNER_BUFFER_SIZE) {
+        n = PLANNER_BUFFER_SIZE;
+    }
+    if (start > g_stream.count || (start < g_stream.count && !stream_logged(start))) {
+        result->resp_code = RESP_INVALID_PARAM;
+        CMD_DEBUG("[CMD] GET_BLOCK_CRCS: index %d not logged\n", start);
+        return;
+    }
+    if (n > g_stream.count - start) {
+        n = (uint8_t)(g_stream.count - start);
+    }
+    
+    result->data[0] = frame->data[0];
+    result->data[1] = frame->data[1];
+    result->data[2] = n;
+    for (uint8_t i = 0; i < n; i++) {
+        uint16_t crc = g_stream.log[(uint16_t)(start + i) % STREAM_LOG_SIZE].block_crc;
+        result->data[3 + 2 * i] = (uint8_t)(crc & 0xFF);
+        result->data[4 + 2 * i] = (uint8_t)(crc >> 8);
+    }
+    result->resp_code = RESP_OK;
+    result->data_len = 3 + 2 * n;
+}
+
+/**
+ * @brief 处理TRUNCATE_BUFFER命令
+ * @description 数据格式：[keep(2)]，保留前keep个已接受的块，丢弃其后的块
+ *              只能在启动前丢弃仍在缓冲区中的块；返回数据：[count(2)] [crc(2)]
+ */
+void cmd_truncate_buffer(const protocol_frame_t *frame, command_result_t *result) {
+    result->data_len = 0;
+    
+    if (frame->len != 2) {
+        result->resp_code = RESP_INVALID_PARAM;
+        return;
+    }
+    
+    uint16_t keep = frame->data[0] | (frame->data[1] << 8);
+    if (keep > g_stream.count || (keep > 0 && !stream_logged(keep - 1)) ||
+        g_stream.count - keep > planner_get_count()) {
+        result->resp_code = RESP_INVALID_PARAM;
+        CMD_DEBUG("[CMD] TRUNCATE: keep %d of %d not possible\n", keep, g_stream.count);
+        return;
+    }
+    
+    if (!planner_truncate((uint8_t)(g_stream.count - keep))) {
+        result->resp_code = RESP_BUSY;  // 已开始执行
+        CMD_DEBUG("[CMD] TRUNCATE: planner running\n");
+        return;
+    }
+    
+    g_stream.crc = (keep > 0) ? g_stream.log[(keep - 1) % STREAM_LOG_SIZE].stream_crc : STREAM_CRC_INIT;
+    g_stream.count = keep;
+    CMD_DEBUG("[CMD] TRUNCATE: keep %d\n", keep);
+    
+    cmd_get_stream_crc(frame, result);
+}
+
+/**
+ * @brief 处理SET_FEED_OVERRIDE命令
+ * @description 数据：[pct(2)]设置倍率，空数据仅查询；
+ *              返回：[pct(2)] [program_time_ms(4)]，小端序
+ */
+void cmd_set_feed_override(const protocol_frame_t *frame, command_result_t *result) {
+    result->data_len = 0;
+    
+    if (frame->len != 0 && frame->len != 2) {
+        result->resp_code = RESP_INVALID_PARAM;
+        return;
+    }
+    if (frame->len == 2 && !planner_set_feed_override(frame->data[0] | (frame->data[1] << 8))) {
+        result->resp_code = RESP_INVALID_PARAM;
+        return;
+    }
+    
+    uint16_t pct = planner_get_feed_override();
+    uint32_t program_ms = planner_get_program_time_ms();
+    result->data[0] = (uint8_t)pct;
+    result->data[1] = (uint8_t)(pct >> 8);
+    for (int i = 0; i < 4; i++) {
+        result->data[2 + i] = (uint8_t)(program_ms >> (8 * i));
+    }
+    result->data_len = 6;
+    result->resp_code = RESP_OK;
+    
+    CMD_DEBUG("[CMD] FEED_OVERRIDE: %d%%, t=%lu ms\n", pct, (unsigned long)program_ms);
+}
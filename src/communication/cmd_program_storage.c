@@ -0,0 +1,121 @@
+/**
+ * @file cmd_program_storage.c
+ * @brief Flash程序存储相关命令处理实现
+ * @date 2025-11-02
+ */
+
+#include "communication/commands.h"
+#include "communication/protocol.h"
+#include "storage/program_storage.h"
+#include "utils/usb_bridge.h"
+#include "config/config.h"
+#include <string.h>
+
+// ==================== 调试宏 ====================
+#if DEBUG_COMMAND
+    #define CMD_DEBUG(...) usb_bridge_printf(__VA_ARGS__)
+#else
+    #define CMD_DEBUG(...) ((void)0)
+#endif
+
+/**
+ * @brief 处理PROGRAM_BEGIN命令
+ * @description 数据格式：[slot(1)] [block_count(2)] [crc(2)]，小端序
+ */
+void cmd_program_begin(const protocol_frame_t *frame, command_result_t *result) {
+    result->data_len = 0;
+
+    if (frame->len != 5) {
+        result->resp_code = RESP_INVALID_PARAM;
+        return;
+    }
+
+    uint8_t slot = frame->data[0];
+    uint16_t block_count = frame->data[1] | (frame->data[2] << 8);
+    uint16_t crc = frame->data[3] | (frame->data[4] << 8);
+
+    if (!program_storage_begin(slot, block_count, crc)) {
+        result->resp_code = RESP_INVALID_PARAM;
+        CMD_DEBUG("[CMD] PROGRAM_BEGIN: invalid slot=%d count=%d\n", slot, block_count);
+        return;
+    }
+
+    CMD_DEBUG("[CMD] PROGRAM_BEGIN: slot=%d count=%d\n", slot, block_count);
+    result->resp_code = RESP_OK;
+}
+
+/**
+ * @brief 处理PROGRAM_WRITE命令
+ * @description 数据格式：[index(2)] [count(1)] [block(13) × count]
+ *              返回：[next_index(2)]，失败时上位机据此重新同步
+ */
+void cmd_program_write(const protocol_frame_t *frame, command_result_t *result) {
+    uint8_t count = (frame->len >= 3) ? frame->data[2] : 0;
+
+    if (frame->len < 3 || count == 0 || frame->len != 3 + count * PROGRAM_BLOCK_DATA_SIZE) {
+        result->resp_code = RESP_INVALID_PARAM;
+    } else {
+        uint16_t index = frame->data[0] | (frame->data[1] << 8);
+        result->resp_code = program_storage_write(index, &frame->data[3], count) ? RESP_OK : RESP_ERROR;
+    }
+
+    uint16_t next_index = program_storage_next_index();
+    result->data[0] = next_index & 0xFF;
+    result->data[1] = (next_index >> 8) & 0xFF;
+    result->data_len = 2;
+}
+
+/**
+ * @brief 处理PROGRAM_END命令
+ */
+void cmd_program_end(const protocol_frame_t *frame, command_result_t *result) {
+    (void)frame;
+    result->data_len = 0;
+    result->resp_code = program_storage_end() ? RESP_OK : RESP_ERROR;
+    CMD_DEBUG("[CMD] PROGRAM_END: %s\n", result->resp_code == RESP_OK ? "OK" : "FAILED");
+}
+
+/**
+ * @brief 处理PROGRAM_LIST命令
+ * @description 返回：[slot_count(1)] + 每个槽位 [valid(1)] [block_count(2)] [crc(2)]
+ */
+void cmd_program_list(const protocol_frame_t *frame, command_result_t *result) {
+    (void)frame;
+    uint8_t idx = 0;
+
+    result->data[idx++] = FLASH_PROGRAM_SLOT_COUNT;
+    for (uint8_t slot = 0; slot < FLASH_PROGRAM_SLOT_COUNT; slot++) {
+        program_slot_info_t info;
+        program_storage_get_info(slot, &info);
+        result->data[idx++] = info.valid ? 1 : 0;
+        result->data[idx++] = info.block_count & 0xFF;
+        result->data[idx++] = (info.block_count >> 8) & 0xFF;
+        result->data[idx++] = info.crc & 0xFF;
+        result->data[idx++] = (info.crc >> 8) & 0xFF;
+    }
+
+    result->resp_code = RESP_OK;
+    result->data_len = idx;
+}
+
+/**
+ * @brief 处理PROGRAM_RUN命令
+ * @description 数据格式：[slot(1)]
+ */
+void cmd_program_run(const protocol_frame_t *frame, command_result_t *result) {
+    result->data_len = 0;
+
+    if (frame->len != 1) {
+        result->resp_code = RESP_INVALID_PARAM;
+        return;
+    }
+
+    if (!program_player_start(frame->data[0])) {
+        result->resp_code = RESP_ERROR;
+        CMD_DEBUG("[CMD] PROGRAM_RUN: slot %d invalid\n", frame->data[0]);
+        return;
+    }
+
+    CMD_DEBUG("[CMD] PROGRAM_RUN: slot %d\n", frame->data[0]);
+    result->resp_code = RESP_OK;
+}
@@ -119,6 +119,10 @@ bool commands_process(const protocol_frame_t *frame, command_result_t *result) {
             cmd_add_motion_block(frame, result);
             break;
             
+        case CMD_ADD_PLANNED_BLOCK:
+            cmd_add_planned_block(frame, result);
+            break;
+            
         case CMD_START_MOTION:
             cmd_start_motion(frame, result);
             break;
@@ -143,6 +147,30 @@ bool commands_process(const protocol_frame_t *frame, command_result_t *result) {
             cmd_get_buffer_status(frame, result);
             break;
             
+        case CMD_GET_TIME:
+            cmd_get_time(frame, result);
+            break;
+            
+        case CMD_ARM_START:
+            cmd_arm_start(frame, result);
+            break;
+            
+        case CMD_GET_STREAM_CRC:
+            cmd_get_stream_crc(frame, result);
+            break;
+            
+        case CMD_GET_BLOCK_CRCS:
+            cmd_get_block_crcs(frame, result);
+            break;
+            
+        case CMD_TRUNCATE_BUFFER:
+            cmd_truncate_buffer(frame, result);
+            break;
+            
+        case CMD_SET_FEED_OVERRIDE:
+            cmd_set_feed_override(frame, result);
+            break;
+            
         // 360度连续旋转舵机命令
         case CMD_ADD_CONTINUOUS_MOTION:
             cmd_add_continuous_motion(frame, result);
@@ -164,6 +192,27 @@ bool commands_process(const protocol_frame_t *frame, command_result_t *result) {
             cmd_servo_360_get_info(frame, result);
             break;
             
+        // Flash程序存储命令
+        case CMD_PROGRAM_BEGIN:
+            cmd_program_begin(frame, result);
+            break;
+            
+        case CMD_PROGRAM_WRITE:
+            cmd_program_write(frame, result);
+            break;
+            
+        case CMD_PROGRAM_END:
+            cmd_program_end(frame, result);
+            break;
+            
+        case CMD_PROGRAM_LIST:
+            cmd_program_list(frame, result);
+            break;
+            
+        case CMD_PROGRAM_RUN:
+            cmd_program_run(frame, result);
+            break;
+            
         default:
             #if DEBUG_COMMAND
             CMD_DEBUG("[CMD] ERROR: Invalid command=0x%02X (not recognized)\n", frame->cmd);
@@ -50,8 +50,10 @@ static const uint16_t crc16_table[256] = {
 };
 
 uint16_t crc16_ccitt(const uint8_t *data, size_t length) {
-    uint16_t crc = CRC16_INIT;
-    
+    return crc16_ccitt_update(CRC16_INIT, data, length);
+}
+
+uint16_t crc16_ccitt_update(uint16_t crc, const uint8_t *data, size_t length) {
     for (size_t i = 0; i < length; i++) {
         uint8_t index = (crc >> 8) ^ data[i];
         crc = (crc << 8) ^ crc16_table[index];
@@ -0,0 +1,164 @@
+/**
+ * @file reliable_link.c
+ * @brief 可靠传输实现
+ * @date 2025-11-04
+ */
+
+#include "communication/reliable_link.h"
+#include "utils/usb_bridge.h"
+#include "config/config.h"
+#include <string.h>
+
+// ==================== 调试宏 ====================
+#if DEBUG_COMMAND
+    #define LINK_DEBUG(...) usb_bridge_printf(__VA_ARGS__)
+#else
+    #define LINK_DEBUG(...) ((void)0)
+#endif
+
+// 乱序缓存槽位
+typedef struct {
+    bool valid;
+    protocol_frame_t frame;
+} reliable_slot_t;
+
+static struct {
+    bool active;
+    uint8_t expected;                               // 期望的下一个序号
+    reliable_slot_t window[RELIABLE_WINDOW_SIZE];   // 乱序到达的帧
+    reliable_response_t cache[RELIABLE_CACHE_SIZE]; // 最近交付帧的应答（环形）
+    uint8_t cache_next;
+} g_link;
+
+// ==================== 内部函数 ====================
+
+/**
+ * @brief 序号差 (a - b)，结果在 [0, 254]
+ */
+static inline uint8_t seq_distance(uint8_t a, uint8_t b) {
+    return (uint8_t)(((a - 1) - (b - 1) + RELIABLE_SEQ_MODULO) % RELIABLE_SEQ_MODULO);
+}
+
+static inline uint8_t seq_next(uint8_t seq) {
+    return (seq % RELIABLE_SEQ_MODULO) + 1;
+}
+
+static reliable_slot_t* find_slot(uint8_t seq) {
+    for (int i = 0; i < RELIABLE_WINDOW_SIZE; i++) {
+        if (g_link.window[i].valid && g_link.window[i].frame.id == seq) {
+            return &g_link.window[i];
+        }
+    }
+    return NULL;
+}
+
+// ==================== 公共接口 ====================
+
+void reliable_link_init(void) {
+    memset(&g_link, 0, sizeof(g_link));
+}
+
+bool reliable_link_reset(uint8_t start_seq) {
+    if (start_seq == 0) {
+        return false;
+    }
+    memset(&g_link, 0, sizeof(g_link));
+    g_link.active = true;
+    g_link.expected = start_seq;
+    LINK_DEBUG("[LINK] Reset, expected=%d\n", start_seq);
+    return true;
+}
+
+bool reliable_link_active(void) {
+    return g_link.active;
+}
+
+uint8_t reliable_link_expected(void) {
+    return g_link.expected;
+}
+
+reliable_result_t reliable_link_receive(const protocol_frame_t *frame) {
+    if (!g_link.active) {
+        return RELIABLE_DELIVER;  // 未进入可靠模式，按普通帧处理
+    }
+
+    uint8_t distance = seq_distance(frame->id, g_link.expected);
+
+    if (distance == 0) {
+        return RELIABLE_DELIVER;
+    }
+
+    if (distance < RELIABLE_WINDOW_SIZE) {
+        // 窗口内的后续帧：缓存等待缺失帧重传
+        if (find_slot(frame->id) == NULL) {
+            for (int i = 0; i < RELIABLE_WINDOW_SIZE; i++) {
+                if (!g_link.window[i].valid) {
+                    g_link.window[i].valid = true;
+                    memcpy(&g_link.window[i].frame, frame, sizeof(protocol_frame_t));
+                    break;
+                }
+            }
+        }
+        LINK_DEBUG("[LINK] Buffered seq=%d, missing %d\n", frame->id, g_link.expected);
+        return RELIABLE_BUFFERED;
+    }
+
+    if (distance >= RELIABLE_SEQ_MODULO - RELIABLE_CACHE_SIZE) {
+        // 落后于期望序号：已交付帧的重传
+        return RELIABLE_DUPLICATE;
+    }
+
+    LINK_DEBUG("[LINK] Out of window seq=%d, expected %d\n", frame->id, g_link.expected);
+    return RELIABLE_DROP;
+}
+
+const protocol_frame_t* reliable_link_advance(void) {
+    if (!g_link.active) {
+        return NULL;
+    }
+
+    // 释放刚交付的帧（若来自窗口）
+    reliable_slot_t *done = find_slot(g_link.expected);
+    if (done != NULL) {
+        done->valid = false;
+    }
+
+    g_link.expected = seq_next(g_link.expected);
+
+    // 下一帧已在窗口中则继续交付（槽位在下次advance时释放，交付期间数据保持有效）
+    reliable_slot_t *next = find_slot(g_link.expected);
+    return next != NULL ? &next->frame : NULL;
+}
+
+void reliable_link_cache_response(uint8_t seq, uint8_t cmd, uint8_t resp_code,
+                                  const uint8_t *data, uint16_t data_len) {
+    if (!g_link.active || seq == 0) {
+        return;
+    }
+
+    // 重发缓存应答时不重复记录
+    if (reliable_link_cached_response(seq) != NULL) {
+        return;
+    }
+
+    reliable_response_t *entry = &g_link.cache[g_link.cache_next];
+    g_link.cache_next = (g_link.cache_next + 1) % RELIABLE_CACHE_SIZE;
+
+    entry->valid = true;
+    entry->seq = seq;
+    entry->cmd = cmd;
+    entry->resp_code = resp_code;
+    entry->data_len = (data_len > RELIABLE_CACHE_DATA_LEN) ? RELIABLE_CACHE_DATA_LEN : (uint8_t)data_len;
+    if (data != NULL && entry->data_len > 0) {
+        memcpy(entry->data, data, entry->data_len);
+    }
+}
+
+const reliable_response_t* reliable_link_cached_response(uint8_t seq) {
+    for (int i = 0; i < RELIABLE_CACHE_SIZE; i++) {
+        if (g_link.cache[i].valid && g_link.cache[i].seq == seq) {
+            return &g_link.cache[i];
+        }
+    }
+    return NULL;
+}
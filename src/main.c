@@ -32,6 +32,7 @@
 #include "servo/servo_control.h"
 #include "servo/servo_manager.h"
 #include "storage/param_manager.h"
+#include "storage/program_storage.h"
 #include "utils/error_handler.h"
 #include "utils/usb_bridge.h"  // USB桥接器（Core1独占串口）
 
@@ -84,6 +85,7 @@ static bool hardware_init(void) {
     
     // 5. 初始化参数管理（加载Flash参数）
     param_manager_init();
+    program_storage_init();
     
     // 6. 上电位置设置（总是尝试从Flash恢复，安全优先）
     if (param_manager_load_positions()) {
@@ -134,7 +134,9 @@ float interpolator_update(interpolator_t *interp, uint32_t delta_time) {
                     interp->t_accel,
                     interp->t_const,
                     interp->t_decel,
-                    interp->v_max_actual
+                    interp->v_max_actual,
+                    interp->v_entry,
+                    interp->v_exit
                 );
             } else {
                 // 回退到线性插值
@@ -268,6 +270,8 @@ void interpolator_set_trapezoid_motion(interpolator_t *interp,
     interp->type = INTERP_TYPE_TRAPEZOID;
     interp->state = MOTION_STATE_MOVING;
     interp->use_trapezoid = true;
+    interp->v_entry = 0.0f;
+    interp->v_exit = 0.0f;
     
     // 运动参数
     interp->motion_params = *params;
@@ -307,7 +311,8 @@ void interpolator_set_trapezoid_motion(interpolator_t *interp,
 
 float interpolate_trapezoid(float start, float end, float t_current,
                             float distance, float t_accel, float t_const, 
-                            float t_decel, float v_max) {
+                            float t_decel, float v_max,
+                            float v_entry, float v_exit) {
     // 总时间
     float t_total = t_accel + t_const + t_decel;
     
@@ -329,9 +334,9 @@ float interpolate_trapezoid(float start, float end, float t_current,
     if (t_current < t_accel) {
         // 阶段1：加速
         current_phase = 1;
-        // s(t) = 0.5 * a * t²
-        float accel = v_max / t_accel;
-        s = 0.5f * accel * t_current * t_current;
+        // s(t) = v_entry * t + 0.5 * a * t²
+        float accel = (v_max - v_entry) / t_accel;
+        s = v_entry * t_current + 0.5f * accel * t_current * t_current;
         
         #if DEBUG_MOTION_PROGRESS
         if (last_phase != 1) {
@@ -346,8 +351,7 @@ float interpolate_trapezoid(float start, float end, float t_current,
         // 阶段2：匀速
         current_phase = 2;
         // s(t) = s_accel + v_max * (t - t_accel)
-        float accel = v_max / t_accel;
-        float s_accel = 0.5f * accel * t_accel * t_accel;
+        float s_accel = 0.5f * (v_entry + v_max) * t_accel;
         float dt = t_current - t_accel;
         s = s_accel + v_max * dt;
         
@@ -362,9 +366,8 @@ float interpolate_trapezoid(float start, float end, float t_current,
         // 阶段3：减速
         current_phase = 3;
         // s(t) = s_accel + s_const + v_max * t' - 0.5 * d * t'²
-        float accel = v_max / t_accel;
-        float decel = v_max / t_decel;
-        float s_accel = 0.5f * accel * t_accel * t_accel;
+        float decel = (v_max - v_exit) / t_decel;
+        float s_accel = 0.5f * (v_entry + v_max) * t_accel;
         float s_const = v_max * t_const;
         float dt = t_current - t_accel - t_const;
         s = s_accel + s_const + v_max * dt - 0.5f * decel * dt * dt;
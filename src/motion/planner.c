@@ -53,7 +53,7 @@ static planner_execute_callback_t g_execute_callback = NULL;
 
 static void planner_reverse_pass(void);
 static void planner_forward_pass(void);
-static plan_block_t* planner_get_block(uint8_t index);
+static void planner_advance_clock(void);
 
 // ==================== 初始化函数 ====================
 
@@ -70,6 +70,7 @@ void planner_init(motion_planner_t *planner) {
     planner->paused = false;
     planner->recalculate_flag = false;
     planner->last_servo_id = 0xFF;
+    planner->feed_pct = FEED_OVERRIDE_DEFAULT;
     
     PLANNER_DEBUG("[PLANNER] Initialized\n");
 }
@@ -91,6 +92,17 @@ bool planner_add_motion(uint32_t timestamp_ms,
                        float velocity,
                        float acceleration,
                        float deceleration) {
+    return planner_add_planned_motion(timestamp_ms, servo_id, target_angle,
+                                      velocity, acceleration, deceleration, NULL);
+}
+
+bool planner_add_planned_motion(uint32_t timestamp_ms,
+                                uint8_t servo_id,
+                                float target_angle,
+                                float velocity,
+                                float acceleration,
+                                float deceleration,
+                                const plan_profile_t *profile) {
     // 检查缓冲区是否已满
     if (g_planner.count >= PLANNER_BUFFER_SIZE) {
         PLANNER_DEBUG("[PLANNER] Buffer full, cannot add motion\n");
@@ -134,6 +146,8 @@ bool planner_add_motion(uint32_t timestamp_ms,
     block->flags.recalculate = true;        // 需要重新规划
     block->flags.nominal_length = false;    // 稍后计算
     block->flags.junction_valid = false;
+    block->flags.is_continuous = false;
+    block->flags.preplanned = false;
     block->valid = true;
     
     // ========== 初步计算梯形曲线（假设从0到0）==========
@@ -175,6 +189,23 @@ bool planner_add_motion(uint32_t timestamp_ms,
     block->t_decel = t_decel;
     block->v_max_actual = v_max_actual;
     block->duration_ms = (uint32_t)((t_accel + t_const + t_decel) * 1000.0f);
+    block->rest_duration_ms = block->duration_ms;
+    
+    // ========== 预规划块：直接使用上位机的速度参数 ==========
+    if (profile != NULL) {
+        block->entry_speed = profile->entry_speed;
+        block->exit_speed = profile->exit_speed;
+        block->max_entry_speed = profile->entry_speed;
+        block->v_max_actual = profile->v_max_actual;
+        block->t_accel = profile->t_accel;
+        block->t_const = profile->t_const;
+        block->t_decel = profile->t_decel;
+        block->duration_ms = (uint32_t)((profile->t_accel + profile->t_const + profile->t_decel) * 1000.0f);
+        block->flags.nominal_length = (profile->t_const > 0.0f);
+        block->flags.recalculate = false;
+        block->flags.junction_valid = true;
+        block->flags.preplanned = true;
+    }
     
     // ========== 更新缓冲区状态 ==========
     g_planner.head = NEXT_INDEX(g_planner.head);
@@ -182,8 +213,10 @@ bool planner_add_motion(uint32_t timestamp_ms,
     g_planner.last_servo_id = servo_id;
     g_planner.last_target_angle = target_angle;
     
-    // ========== 触发重新规划 ==========
-    g_planner.recalculate_flag = true;
+    // ========== 触发重新规划（预规划块无需重算）==========
+    if (profile == NULL) {
+        g_planner.recalculate_flag = true;
+    }
     
     PLANNER_DEBUG("[PLANNER] Added: t=%d S%d %d->%d deg, v=%d, count=%d\n",
                  (int)timestamp_ms, servo_id, (int)start_angle, 
@@ -298,6 +331,7 @@ void planner_clear(void) {
     g_planner.paused = false;
     g_planner.recalculate_flag = false;
     g_planner.last_servo_id = 0xFF;
+    g_planner.tail_entry_speed = 0.0f;
     
     for (int i = 0; i < PLANNER_BUFFER_SIZE; i++) {
         g_planner.blocks[i].valid = false;
@@ -306,6 +340,32 @@ void planner_clear(void) {
     PLANNER_DEBUG("[PLANNER] Cleared\n");
 }
 
+bool planner_truncate(uint8_t drop) {
+    if (g_planner.running || drop > g_planner.count) {
+        return false;
+    }
+    
+    for (uint8_t i = 0; i < drop; i++) {
+        g_planner.head = PREV_INDEX(g_planner.head);
+        g_planner.blocks[g_planner.head].valid = false;
+    }
+    g_planner.count -= drop;
+    
+    // 恢复连续性判断所用的"上一个块"（其衔接速度需按新的下一块重新计算）
+    if (g_planner.count > 0) {
+        plan_block_t *last = &g_planner.blocks[PREV_INDEX(g_planner.head)];
+        last->flags.junction_valid = false;
+        g_planner.last_servo_id = last->servo_id;
+        g_planner.last_target_angle = last->target_angle;
+    } else {
+        g_planner.last_servo_id = 0xFF;
+    }
+    g_planner.recalculate_flag = true;
+    
+    PLANNER_DEBUG("[PLANNER] Truncated %d blocks, count=%d\n", drop, g_planner.count);
+    return true;
+}
+
 uint8_t planner_available(void) {
     return PLANNER_BUFFER_SIZE - g_planner.count;
 }
@@ -325,13 +385,22 @@ bool planner_is_full(void) {
 // ==================== 调度控制 ====================
 
 bool planner_start(void) {
+    return planner_start_at(time_us_64());
+}
+
+bool planner_start_at(uint64_t start_time_us) {
     if (g_planner.count == 0) {
         return false;
     }
     
     g_planner.running = true;
     g_planner.paused = false;
-    g_planner.start_time = to_ms_since_boot(get_absolute_time());
+    g_planner.start_time_us = start_time_us;
+    g_planner.program_time_us = 0;
+    g_planner.last_tick_us = start_time_us;
+    g_planner.executed_count = 0;
+    g_planner.last_executed_ms = 0;
+    g_planner.tail_entry_speed = 0.0f;     // 第一块从静止开始
     
     // 执行一次规划
     planner_recalculate();
@@ -344,13 +413,21 @@ bool planner_start(void) {
 void planner_stop(void) {
     g_planner.running = false;
     g_planner.paused = false;
+    g_planner.tail_entry_speed = 0.0f;
 }
 
 void planner_pause(void) {
+    planner_advance_clock();
     g_planner.paused = true;
+    
+    // 暂停期间正在执行的块停在目标位置，恢复后的下一块从静止开始
+    g_planner.tail_entry_speed = 0.0f;
+    g_planner.recalculate_flag = true;
 }
 
 void planner_resume(void) {
+    // 暂停期间不计入程序时间
+    g_planner.last_tick_us = time_us_64();
     g_planner.paused = false;
 }
 
@@ -362,6 +439,50 @@ bool planner_is_paused(void) {
     return g_planner.paused;
 }
 
+// ==================== 进给倍率 ====================
+
+/**
+ * @brief 把程序时间累积到当前设备时间（按当前倍率）
+ */
+static void planner_advance_clock(void) {
+    uint64_t now = time_us_64();
+    if (g_planner.running && !g_planner.paused && now > g_planner.last_tick_us) {
+        g_planner.program_time_us += (now - g_planner.last_tick_us) * g_planner.feed_pct / 100;
+        g_planner.last_tick_us = now;
+    }
+}
+
+bool planner_set_feed_override(uint16_t pct) {
+    if (pct < FEED_OVERRIDE_MIN || pct > FEED_OVERRIDE_MAX) {
+        return false;
+    }
+    // 之前的时间按旧倍率累积，保证程序时间连续
+    planner_advance_clock();
+    g_planner.feed_pct = pct;
+    PLANNER_DEBUG("[PLANNER] Feed override %d%%\n", pct);
+    return true;
+}
+
+uint16_t planner_get_feed_override(void) {
+    return g_planner.feed_pct;
+}
+
+uint32_t planner_get_program_time_ms(void) {
+    planner_advance_clock();
+    return (uint32_t)(g_planner.program_time_us / 1000);
+}
+
+uint32_t planner_scale_interval_ms(uint32_t wall_ms) {
+    static uint32_t remainder = 0;      // 不足1ms的部分（单位：ms/100）
+    if (!g_planner.running || g_planner.feed_pct == 100) {
+        remainder = 0;
+        return wall_ms;
+    }
+    uint32_t scaled = wall_ms * g_planner.feed_pct + remainder;
+    remainder = scaled % 100;
+    return scaled / 100;
+}
+
 // ==================== 规划器核心 ====================
 
 void planner_update(void) {
@@ -383,9 +504,9 @@ void planner_update(void) {
         return;
     }
     
-    // 获取当前时间
-    uint32_t current_time = to_ms_since_boot(get_absolute_time());
-    uint32_t elapsed_ms = current_time - g_planner.start_time;
+    // 获取当前程序时间（按进给倍率累积）
+    planner_advance_clock();
+    uint32_t elapsed_ms = (uint32_t)(g_planner.program_time_us / 1000);
     
     // 获取下一个待执行的块
     plan_block_t *block = &g_planner.blocks[g_planner.tail];
@@ -402,6 +523,9 @@ void planner_update(void) {
             g_execute_callback(block);
         }
         
+        g_planner.executed_count++;
+        g_planner.last_executed_ms = block->timestamp_ms;
+        
         // 移除已执行的块
         planner_discard_current_block();
     }
@@ -413,6 +537,7 @@ void planner_recalculate(void) {
     }
     
     PLANNER_DEBUG("[PLANNER] === Recalculating %d blocks ===\n", g_planner.count);
+    uint64_t t0 = time_us_64();
     
     // 反向传递：计算最大进入速度
     planner_reverse_pass();
@@ -420,6 +545,9 @@ void planner_recalculate(void) {
     // 前向传递：确保速度连续
     planner_forward_pass();
     
+    g_planner.recalc_count++;
+    g_planner.recalc_time_us += (uint32_t)(time_us_64() - t0);
+    
     PLANNER_DEBUG("[PLANNER] === Recalculation complete ===\n");
 }
 
@@ -427,6 +555,24 @@ void planner_force_recalculate(void) {
     g_planner.recalculate_flag = true;
 }
 
+void planner_get_recalc_stats(uint32_t *count, uint32_t *time_us) {
+    if (count != NULL) {
+        *count = g_planner.recalc_count;
+    }
+    if (time_us != NULL) {
+        *time_us = g_planner.recalc_time_us;
+    }
+}
+
+void planner_get_progress(uint32_t *executed, uint32_t *last_timestamp_ms) {
+    if (executed != NULL) {
+        *executed = g_planner.executed_count;
+    }
+    if (last_timestamp_ms != NULL) {
+        *last_timestamp_ms = g_planner.last_executed_ms;
+    }
+}
+
 // ==================== 查询函数 ====================
 
 plan_block_t* planner_get_current_block(void) {
@@ -441,6 +587,8 @@ bool planner_discard_current_block(void) {
         return false;
     }
     
+    // 已派发块的退出速度即下一块的进入速度，之后的重算不再改变它
+    g_planner.tail_entry_speed = g_planner.blocks[g_planner.tail].exit_speed;
     g_planner.blocks[g_planner.tail].valid = false;
     g_planner.tail = NEXT_INDEX(g_planner.tail);
     g_planner.count--;
@@ -472,132 +620,98 @@ void planner_get_status(char *buf, size_t size) {
 // ==================== 核心规划算法 ====================
 
 /**
- * @brief 反向传递 - 从后往前计算最大进入速度
+ * @brief 最大进入速度：能在本块距离内减速到退出速度，且不超过标称速度
+ */
+static float planner_max_entry_speed(const plan_block_t *block) {
+    float v_max = sqrtf(block->exit_speed * block->exit_speed +
+                        2.0f * block->deceleration * block->abs_distance);
+    return MIN(block->nominal_speed, v_max);
+}
+
+/**
+ * @brief 反向传递 - 从后往前计算退出速度和最大进入速度
  * 
  * 算法：
- *   从最后一个块开始，往前遍历
- *   每个块的最大进入速度 = min(
- *       自身最大速度,
- *       sqrt(退出速度² + 2 * 加速度 * 距离),
- *       衔接速度限制
- *   )
+ *   最后一个块必须能减速到0
+ *   往前遍历，每个块的退出速度 = min(与下一块的衔接速度, 下一块的最大进入速度)
+ *   最大进入速度 = min(标称速度, sqrt(退出速度² + 2 * 减速度 * 距离))
+ *   预规划块的速度由上位机按完整程序给出，保持不变，只作为相邻块的边界
  */
 static void planner_reverse_pass(void) {
-    if (g_planner.count <= 1) {
-        // 只有一个块或无块，无需规划
-        if (g_planner.count == 1) {
-            plan_block_t *block = planner_get_block(0);
-            block->entry_speed = 0.0f;
-            block->exit_speed = 0.0f;
-        }
+    if (g_planner.count == 0) {
         return;
     }
     
-    // 从倒数第二个块开始（最后一个块的退出速度必须为0）
     uint8_t block_index = PREV_INDEX(g_planner.head);
-    plan_block_t *current = &g_planner.blocks[block_index];
-    
-    // 最后一个块必须减速到0
-    current->exit_speed = 0.0f;
+    plan_block_t *next = &g_planner.blocks[block_index];
+    if (!next->flags.preplanned) {
+        next->exit_speed = 0.0f;
+        next->max_entry_speed = planner_max_entry_speed(next);
+    }
     
     // 从后往前遍历
     while (block_index != g_planner.tail) {
-        plan_block_t *next = current;
         block_index = PREV_INDEX(block_index);
-        current = &g_planner.blocks[block_index];
+        plan_block_t *current = &g_planner.blocks[block_index];
         
-        if (!current->flags.recalculate) {
-            continue;
-        }
-        
-        // 计算衔接速度（如果是同一个舵机）
-        if (current->servo_id == next->servo_id && 
-            !current->flags.junction_valid) {
-            current->max_junction_speed = planner_calculate_junction_speed(current, next);
-            current->flags.junction_valid = true;
-        } else if (current->servo_id != next->servo_id) {
-            current->max_junction_speed = 0.0f;  // 不同舵机，必须停止
+        if (!current->flags.preplanned) {
+            // 衔接速度只取决于相邻两块，计算一次后缓存
+            if (!current->flags.junction_valid) {
+                current->max_junction_speed = planner_calculate_junction_speed(current, next);
+                current->flags.junction_valid = true;
+            }
+            
+            float next_entry = next->flags.preplanned ? next->entry_speed : next->max_entry_speed;
+            current->exit_speed = MIN(current->max_junction_speed, next_entry);
+            current->max_entry_speed = planner_max_entry_speed(current);
+            
+            PLANNER_DEBUG("[REVERSE] Block S%d: max_entry=%.1f exit=%.1f junction=%.1f\n",
+                         current->servo_id, current->max_entry_speed, 
+                         current->exit_speed, current->max_junction_speed);
         }
-        
-        // 计算基于物理加速度的最大进入速度
-        // v_entry_max² = v_exit² + 2 * a * d
-        float v_exit = next->entry_speed;
-        float v_max_from_accel = sqrtf(v_exit * v_exit + 
-                                       2.0f * current->acceleration * current->abs_distance);
-        
-        // 最大进入速度 = min(标称速度, 物理限制, 衔接限制)
-        current->max_entry_speed = MIN(current->nominal_speed, v_max_from_accel);
-        current->max_entry_speed = MIN(current->max_entry_speed, current->max_junction_speed);
-        
-        // 退出速度 = 下一个块的进入速度（受衔接速度限制）
-        current->exit_speed = MIN(next->entry_speed, current->max_junction_speed);
-        
-        PLANNER_DEBUG("[REVERSE] Block S%d: max_entry=%.1f exit=%.1f junction=%.1f\n",
-                     current->servo_id, current->max_entry_speed, 
-                     current->exit_speed, current->max_junction_speed);
+        next = current;
     }
-    
-    // 第一个块的进入速度为0（从静止开始）
-    current->entry_speed = 0.0f;
 }
 
 /**
  * @brief 前向传递 - 从前往后确保速度连续
  * 
  * 算法：
- *   从第一个块开始，往后遍历
+ *   第一个块的进入速度 = 已派发的上一块的退出速度（启动时为0）
  *   每个块的退出速度 = min(
- *       sqrt(进入速度² + 2 * 加速度 * 距离),
- *       下一个块的进入速度,
- *       衔接速度限制
- *   )
+ *       反向传递得到的退出速度,
+ *       sqrt(进入速度² + 2 * 加速度 * 距离)
+ *   )，并作为下一块的进入速度
  *   重新计算梯形曲线参数
  */
 static void planner_forward_pass(void) {
-    if (g_planner.count == 0) {
-        return;
-    }
-    
-    plan_block_t *current = &g_planner.blocks[g_planner.tail];
+    float entry_speed = g_planner.tail_entry_speed;
     uint8_t block_index = g_planner.tail;
     
-    // 第一个块从0速度开始
-    current->entry_speed = 0.0f;
-    
     // 从前往后遍历
     while (block_index != g_planner.head) {
-        if (current->flags.recalculate) {
+        plan_block_t *current = &g_planner.blocks[block_index];
+        
+        if (!current->flags.preplanned) {
+            current->entry_speed = MIN(entry_speed, current->max_entry_speed);
+            
             // 计算基于物理加速度的最大退出速度
             // v_exit_max² = v_entry² + 2 * a * d
             float v_max_exit = sqrtf(current->entry_speed * current->entry_speed + 
                                      2.0f * current->acceleration * current->abs_distance);
-            
-            // 实际退出速度受多重限制
-            current->exit_speed = MIN(v_max_exit, current->exit_speed);
-            current->exit_speed = MIN(current->exit_speed, current->nominal_speed);
+            current->exit_speed = MIN(current->exit_speed, v_max_exit);
             
             // 根据进入/退出速度重新计算梯形曲线
             planner_recalculate_trapezoid(current);
+            current->flags.recalculate = false;
             
             PLANNER_DEBUG("[FORWARD] Block S%d: entry=%.1f exit=%.1f v_max=%.1f\n",
                          current->servo_id, current->entry_speed, 
                          current->exit_speed, current->v_max_actual);
-            
-            current->flags.recalculate = false;
-        }
-        
-        // 移动到下一个块
-        plan_block_t *next_block = NULL;
-        uint8_t next_index = NEXT_INDEX(block_index);
-        if (next_index != g_planner.head) {
-            next_block = &g_planner.blocks[next_index];
-            
-            // 下一个块的进入速度 = 当前块的退出速度
-            next_block->entry_speed = current->exit_speed;
         }
         
-        current = next_block;
-        block_index = next_index;
+        entry_speed = current->exit_speed;
+        block_index = NEXT_INDEX(block_index);
     }
 }
 
@@ -643,9 +757,15 @@ float planner_calculate_junction_speed(const plan_block_t *prev,
     
     // ========== 位置控制模式（180度舵机）==========
     if (!prev->flags.is_continuous && !current->flags.is_continuous) {
-        // 如果任一块距离为0，不能衔接
-        if (prev->abs_distance < 0.01f || current->abs_distance < 0.01f) {
-            return MIN_JUNCTION_SPEED;
+        // 任一块距离为0（停留）或反向运动，必须停止
+        if (prev->abs_distance < 0.01f || current->abs_distance < 0.01f ||
+            (prev->distance > 0.0f) != (current->distance > 0.0f)) {
+            return 0.0f;
+        }
+        
+        // 下一块不是紧接着开始（中间有停顿），必须停止
+        if (current->timestamp_ms > prev->timestamp_ms + prev->rest_duration_ms + JUNCTION_MAX_GAP_MS) {
+            return 0.0f;
         }
         
         // 取两段运动的较小加速度作为限制
@@ -749,9 +869,3 @@ void planner_recalculate_trapezoid(plan_block_t *block) {
     block->duration_ms = (uint32_t)((t_accel + t_const + t_decel) * 1000.0f);
 }
 
-// ==================== 辅助函数 ====================
-
-static plan_block_t* planner_get_block(uint8_t index) {
-    return planner_get_block_by_index(index);
-}
-
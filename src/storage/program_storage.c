@@ -0,0 +1,307 @@
+/**
+ * @file program_storage.c
+ * @brief 运动程序Flash存储与脱机回放实现
+ * @date 2025-11-02
+ */
+
+#include "storage/program_storage.h"
+#include "motion/planner.h"
+#include "communication/crc16.h"
+#include "utils/error_handler.h"
+#include "utils/usb_bridge.h"
+#include "hardware/flash.h"
+#include "hardware/sync.h"
+#include "pico/stdlib.h"
+#include <string.h>
+#include <stddef.h>
+
+// 调试宏
+#if DEBUG_FLASH
+    #define PROG_DEBUG(fmt, ...) usb_bridge_printf("[PROGRAM] " fmt, ##__VA_ARGS__)
+#else
+    #define PROG_DEBUG(fmt, ...)
+#endif
+
+// 槽位头魔数
+#define PROGRAM_MAGIC       0x47505653  // "SVPG"
+#define PROGRAM_VERSION     1
+
+/**
+ * @brief 槽位头（写在槽位第一页）
+ */
+typedef struct {
+    uint32_t magic;
+    uint8_t version;
+    uint8_t record_size;
+    uint16_t block_count;
+    uint16_t crc;               // 记录区CRC-16
+    uint16_t header_crc;        // 以上字段的CRC-16
+} program_header_t;
+
+// 写入状态
+static struct {
+    bool active;                // 正在写入
+    uint8_t slot;
+    uint16_t block_count;
+    uint16_t crc;
+    uint16_t next_index;        // 下一个待写入的块序号
+    uint32_t page_offset;       // 当前页在Flash中的偏移
+    uint16_t page_fill;         // 当前页已填充字节数
+    uint8_t page[FLASH_PAGE_SIZE];
+} g_writer;
+
+// 回放状态
+static struct {
+    bool active;
+    bool started;               // 规划器已启动
+    uint8_t slot;
+    uint16_t block_count;
+    uint16_t next_index;
+} g_player;
+
+// ==================== 内部函数 ====================
+
+static inline uint32_t slot_offset(uint8_t slot) {
+    return FLASH_PROGRAM_OFFSET + (uint32_t)slot * FLASH_PROGRAM_SLOT_SIZE;
+}
+
+static inline const uint8_t* flash_ptr(uint32_t offset) {
+    return (const uint8_t*)(XIP_BASE + offset);
+}
+
+static uint16_t header_crc(const program_header_t *header) {
+    return crc16_ccitt((const uint8_t*)header, offsetof(program_header_t, header_crc));
+}
+
+/**
+ * @brief 写入一页并回读校验
+ */
+static bool program_page(uint32_t offset, const uint8_t *data) {
+    uint32_t ints = save_and_disable_interrupts();
+    flash_range_program(offset, data, FLASH_PAGE_SIZE);
+    restore_interrupts(ints);
+
+    if (crc16_ccitt(flash_ptr(offset), FLASH_PAGE_SIZE) != crc16_ccitt(data, FLASH_PAGE_SIZE)) {
+        PROG_DEBUG("Page verify FAILED at 0x%X\n", offset);
+        error_set(ERROR_FLASH_WRITE);
+        return false;
+    }
+    return true;
+}
+
+static bool flush_page(void) {
+    if (g_writer.page_fill == 0) {
+        return true;
+    }
+    // 未用部分保持擦除值
+    memset(&g_writer.page[g_writer.page_fill], 0xFF, FLASH_PAGE_SIZE - g_writer.page_fill);
+    if (!program_page(g_writer.page_offset, g_writer.page)) {
+        return false;
+    }
+    g_writer.page_offset += FLASH_PAGE_SIZE;
+    g_writer.page_fill = 0;
+    return true;
+}
+
+static bool read_header(uint8_t slot, program_header_t *header) {
+    memcpy(header, flash_ptr(slot_offset(slot)), sizeof(program_header_t));
+    return header->magic == PROGRAM_MAGIC &&
+           header->version == PROGRAM_VERSION &&
+           header->record_size == PROGRAM_RECORD_SIZE &&
+           header->block_count <= PROGRAM_MAX_BLOCKS &&
+           header->header_crc == header_crc(header);
+}
+
+/**
+ * @brief 解析一条记录并加入规划器（格式与ADD_MOTION_BLOCK相同）
+ */
+static bool record_to_planner(const uint8_t *data) {
+    uint32_t timestamp_ms = (uint32_t)data[0] | ((uint32_t)data[1] << 8) |
+                            ((uint32_t)data[2] << 16) | ((uint32_t)data[3] << 24);
+    uint8_t servo_id = data[4];
+    int16_t angle_raw = (int16_t)(data[5] | (data[6] << 8));
+    uint16_t vel_raw = data[7] | (data[8] << 8);
+    uint16_t accel_raw = data[9] | (data[10] << 8);
+    uint16_t decel_raw = data[11] | (data[12] << 8);
+
+    if (servo_id >= SERVO_COUNT) {
+        return true;  // 跳过无效记录
+    }
+
+    return planner_add_motion(timestamp_ms, servo_id,
+                              (float)angle_raw / 100.0f,
+                              (float)vel_raw / 10.0f,
+                              (float)accel_raw / 10.0f,
+                              (float)decel_raw / 10.0f);
+}
+
+// ==================== 写入接口 ====================
+
+void program_storage_init(void) {
+    memset(&g_writer, 0, sizeof(g_writer));
+    memset(&g_player, 0, sizeof(g_player));
+}
+
+bool program_storage_begin(uint8_t slot, uint16_t block_count, uint16_t crc) {
+    if (slot >= FLASH_PROGRAM_SLOT_COUNT || block_count == 0 || block_count > PROGRAM_MAX_BLOCKS) {
+        return false;
+    }
+    if (g_player.active && g_player.slot == slot) {
+        program_player_stop();
+    }
+
+    // 逐扇区擦除，扇区之间恢复中断，减少对USB和时间事件的影响
+    uint32_t erase_size = PROGRAM_HEADER_SIZE + (uint32_t)block_count * PROGRAM_RECORD_SIZE;
+    erase_size = (erase_size + FLASH_SECTOR_SIZE - 1) / FLASH_SECTOR_SIZE * FLASH_SECTOR_SIZE;
+    for (uint32_t offset = 0; offset < erase_size; offset += FLASH_SECTOR_SIZE) {
+        uint32_t ints = save_and_disable_interrupts();
+        flash_range_erase(slot_offset(slot) + offset, FLASH_SECTOR_SIZE);
+        restore_interrupts(ints);
+    }
+
+    g_writer.active = true;
+    g_writer.slot = slot;
+    g_writer.block_count = block_count;
+    g_writer.crc = crc;
+    g_writer.next_index = 0;
+    g_writer.page_offset = slot_offset(slot) + PROGRAM_HEADER_SIZE;
+    g_writer.page_fill = 0;
+
+    PROG_DEBUG("Begin slot %d: %d blocks, erased %d bytes\n", slot, block_count, erase_size);
+    return true;
+}
+
+bool program_storage_write(uint16_t index, const uint8_t *data, uint8_t count) {
+    if (!g_writer.active || index != g_writer.next_index ||
+        (uint32_t)index + count > g_writer.block_count) {
+        return false;
+    }
+
+    for (uint8_t i = 0; i < count; i++) {
+        uint8_t *record = &g_writer.page[g_writer.page_fill];
+        memcpy(record, &data[i * PROGRAM_BLOCK_DATA_SIZE], PROGRAM_BLOCK_DATA_SIZE);
+        memset(record + PROGRAM_BLOCK_DATA_SIZE, 0x00, PROGRAM_RECORD_SIZE - PROGRAM_BLOCK_DATA_SIZE);
+        g_writer.page_fill += PROGRAM_RECORD_SIZE;
+
+        if (g_writer.page_fill == FLASH_PAGE_SIZE && !flush_page()) {
+            g_writer.active = false;
+            return false;
+        }
+    }
+
+    g_writer.next_index += count;
+    return true;
+}
+
+bool program_storage_end(void) {
+    if (!g_writer.active || g_writer.next_index != g_writer.block_count) {
+        return false;
+    }
+    g_writer.active = false;
+
+    if (!flush_page()) {
+        return false;
+    }
+
+    // 校验整个记录区
+    uint32_t data_offset = slot_offset(g_writer.slot) + PROGRAM_HEADER_SIZE;
+    uint16_t crc = crc16_ccitt(flash_ptr(data_offset), (size_t)g_writer.block_count * PROGRAM_RECORD_SIZE);
+    if (crc != g_writer.crc) {
+        PROG_DEBUG("Slot %d CRC mismatch: 0x%04X != 0x%04X\n", g_writer.slot, crc, g_writer.crc);
+        return false;
+    }
+
+    // 最后写入槽位头，未完成的写入不会被当作有效程序
+    memset(g_writer.page, 0xFF, FLASH_PAGE_SIZE);
+    program_header_t *header = (program_header_t*)g_writer.page;
+    header->magic = PROGRAM_MAGIC;
+    header->version = PROGRAM_VERSION;
+    header->record_size = PROGRAM_RECORD_SIZE;
+    header->block_count = g_writer.block_count;
+    header->crc = crc;
+    header->header_crc = header_crc(header);
+
+    if (!program_page(slot_offset(g_writer.slot), g_writer.page)) {
+        return false;
+    }
+
+    PROG_DEBUG("Slot %d stored: %d blocks, CRC 0x%04X\n", g_writer.slot, g_writer.block_count, crc);
+    return true;
+}
+
+uint16_t program_storage_next_index(void) {
+    return g_writer.next_index;
+}
+
+bool program_storage_get_info(uint8_t slot, program_slot_info_t *info) {
+    if (slot >= FLASH_PROGRAM_SLOT_COUNT || info == NULL) {
+        return false;
+    }
+
+    program_header_t header;
+    info->valid = read_header(slot, &header);
+    info->block_count = info->valid ? header.block_count : 0;
+    info->crc = info->valid ? header.crc : 0;
+    return true;
+}
+
+// ==================== 回放接口 ====================
+
+bool program_player_start(uint8_t slot) {
+    program_header_t header;
+    if (slot >= FLASH_PROGRAM_SLOT_COUNT || !read_header(slot, &header) || header.block_count == 0) {
+        return false;
+    }
+
+    planner_clear();
+    g_player.active = true;
+    g_player.started = false;
+    g_player.slot = slot;
+    g_player.block_count = header.block_count;
+    g_player.next_index = 0;
+
+    // 预装满规划器后立即启动
+    program_player_poll();
+    g_player.started = planner_start();
+    if (!g_player.started) {
+        g_player.active = false;
+        return false;
+    }
+
+    PROG_DEBUG("Playing slot %d (%d blocks)\n", slot, header.block_count);
+    return true;
+}
+
+void program_player_stop(void) {
+    g_player.active = false;
+    g_player.started = false;
+}
+
+void program_player_poll(void) {
+    if (!g_player.active) {
+        return;
+    }
+
+    // 规划器被停止（STOP/ESTOP/CLEAR）后结束回放
+    if (g_player.started && !planner_is_running()) {
+        program_player_stop();
+        return;
+    }
+
+    const uint8_t *records = flash_ptr(slot_offset(g_player.slot) + PROGRAM_HEADER_SIZE);
+    while (g_player.next_index < g_player.block_count && !planner_is_full()) {
+        if (!record_to_planner(&records[(uint32_t)g_player.next_index * PROGRAM_RECORD_SIZE])) {
+            break;
+        }
+        g_player.next_index++;
+    }
+
+    if (g_player.next_index >= g_player.block_count) {
+        // 全部块已交给规划器，剩余由规划器自行执行完毕
+        program_player_stop();
+    }
+}
+
+bool program_player_is_active(void) {
+    return g_player.active;
+}